@@ -1,9 +1,19 @@
 import json
-import boto3
 import os
 from botocore.exceptions import ClientError
+from session_profile import get_user_profile
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+TABLES = ['user_profile']
+preload_clients(CLIENTS, TABLES)
 
 def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS, TABLES)
+
     try:
         print("INSIDE GET USER DETAILS LAMBDA FUNCTION")
         print("Full event:", json.dumps(event, indent=2))
@@ -37,22 +47,18 @@ def lambda_handler(event, context):
         if not username:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'username is required'})
+                'body': dumps({'error': 'username is required'})
             }
 
         # lowercase username
         username = username.lower()
 
-        # Initialize DynamoDB resource
-        dynamodb = boto3.resource('dynamodb')
+        # Lookup user_profile table (skipped when invoke_agent already put the
+        # profile into the session attributes)
+        user_profile_table = get_table('user_profile')
+        user_details = get_user_profile(event, username, user_profile_table)
         
-        # Lookup user_profile table
-        user_profile_table = dynamodb.Table('user_profile')
-        user_response = user_profile_table.get_item(
-            Key={'username': username}
-        )
-        
-        if 'Item' not in user_response:
+        if user_details is None:
             return {
                 "messageVersion": "1.0",
                 "response": {
@@ -62,7 +68,7 @@ def lambda_handler(event, context):
                     "httpStatusCode": 404,
                     "responseBody": {
                         "application/json": {
-                            "body": json.dumps({
+                            "body": dumps({
                                 "error": f"User with username '{username}' not found"
                             })
                         }
@@ -70,9 +76,6 @@ def lambda_handler(event, context):
                 }
             }
         
-        # Get the user details from the response
-        user_details = user_response['Item']
-        
         # Return formatted Bedrock Agent response
         return {
             "messageVersion": "1.0",
@@ -83,7 +86,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 200,
                 "responseBody": {
                     "application/json": {
-                        "body": user_details
+                        "body": dumps(user_details)
                     }
                 }
             }
@@ -102,7 +105,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 500,
                 "responseBody": {
                     "application/json": {
-                        "body": json.dumps({'error': f"DynamoDB error: {str(e)}"})
+                        "body": dumps({'error': f"DynamoDB error: {str(e)}"})
                     }
                 }
             }
@@ -119,7 +122,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 500,
                 "responseBody": {
                     "application/json": {
-                        "body": json.dumps({'error': f"Unhandled exception: {str(e)}"})
+                        "body": dumps({'error': f"Unhandled exception: {str(e)}"})
                     }
                 }
             }
@@ -1,9 +1,25 @@
 import json
-import boto3
 import os
 from botocore.exceptions import ClientError
+from session_profile import get_user_profile
+from cert_info import KEY_ATTRIBUTE, CATEGORY_FIELDS, apply_budget, categorize, fields_for, get_cert_info, prime_cert_info
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+TABLES = ['user_profile', 'CertInfo']
+preload_clients(CLIENTS, TABLES)
 
 def lambda_handler(event, context):
+    if is_warmup_event(event):
+        response = warmup_response(CLIENTS, TABLES)
+        # Sent by create_quiz when a user's recommended_cert changes
+        prime = event.get('prime') or {}
+        if prime.get('certification'):
+            response['primed'] = prime_cert_info(get_table('CertInfo'), prime['certification'])
+        return response
+
     try:
         print("INSIDE GET CERT INFO LAMBDA FUNCTION")
         print("Full event:", json.dumps(event, indent=2))
@@ -37,19 +53,14 @@ def lambda_handler(event, context):
         if not username:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'username is required'})
+                'body': dumps({'error': 'username is required'})
             }
 
-        # Initialize DynamoDB resource
-        dynamodb = boto3.resource('dynamodb')
-        
-        # Step 1: Lookup user_profile table
-        user_profile_table = dynamodb.Table('user_profile')
-        user_response = user_profile_table.get_item(
-            Key={'username': username}
-        )
+        # Step 1: Lookup user_profile table (or use the profile from the session)
+        user_profile_table = get_table('user_profile')
+        user_profile = get_user_profile(event, username, user_profile_table)
         
-        if 'Item' not in user_response:
+        if user_profile is None:
             return {
                 "messageVersion": "1.0",
                 "response": {
@@ -59,7 +70,7 @@ def lambda_handler(event, context):
                     "httpStatusCode": 404,
                     "responseBody": {
                         "application/json": {
-                            "body": json.dumps({
+                            "body": dumps({
                                 "error": f"User with username '{username}' not found"
                             })
                         }
@@ -68,7 +79,7 @@ def lambda_handler(event, context):
             }
         
         # Get recommended_cert from user profile
-        recommended_cert = user_response['Item'].get('recommended_cert')
+        recommended_cert = user_profile.get('recommended_cert')
         
         if not recommended_cert:
             return {
@@ -80,7 +91,7 @@ def lambda_handler(event, context):
                     "httpStatusCode": 404,
                     "responseBody": {
                         "application/json": {
-                            "body": json.dumps({
+                            "body": dumps({
                                 "error": f"No recommended certification found for user '{username}'"
                             })
                         }
@@ -88,13 +99,42 @@ def lambda_handler(event, context):
                 }
             }
         
-        # Step 2: Lookup CertInfo table
-        cert_info_table = dynamodb.Table('CertInfo')
-        cert_response = cert_info_table.get_item(
-            Key={'CertificationName': recommended_cert}
-        )
-        
-        if 'Item' not in cert_response:
+        # Step 2: Decide which CertInfo attributes the question needs. Explicit
+        # fields win, then the category, then a category guessed from the
+        # question text; with none of them the whole record is returned.
+        category = params.get('category')
+        if category and category != 'all' and category not in CATEGORY_FIELDS:
+            return {
+                "messageVersion": "1.0",
+                "response": {
+                    "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+                    "apiPath": event.get('apiPath'),
+                    "httpMethod": event.get('httpMethod', 'GET'),
+                    "httpStatusCode": 400,
+                    "responseBody": {
+                        "application/json": {
+                            "body": dumps({
+                                "error": f"category must be one of {', '.join(list(CATEGORY_FIELDS) + ['all'])}"
+                            })
+                        }
+                    }
+                }
+            }
+        if not category and params.get('question'):
+            category = categorize(params['question'])
+        fields = fields_for(params.get('fields'), None if category == 'all' else category)
+
+        # Step 3: Lookup CertInfo table, projected to those attributes
+        cert_info_table = get_table('CertInfo')
+        cert_info = get_cert_info(cert_info_table, recommended_cert, fields)
+
+        if cert_info is not None and fields and set(cert_info) == {KEY_ATTRIBUTE}:
+            # None of the projected attributes exist on this record
+            print(f"No {fields} on {recommended_cert}, returning the whole record")
+            fields = None
+            cert_info = get_cert_info(cert_info_table, recommended_cert)
+
+        if cert_info is None:
             return {
                 "messageVersion": "1.0",
                 "response": {
@@ -104,17 +144,22 @@ def lambda_handler(event, context):
                     "httpStatusCode": 404,
                     "responseBody": {
                         "application/json": {
-                            "body": json.dumps({
+                            "body": dumps({
                                 "error": f"Certification '{recommended_cert}' not found in CertInfo table"
                             })
                         }
                     }
                 }
             }
-        
-        # Step 3: Return the entire CertInfo record
-        cert_info = cert_response['Item']
-        
+
+        # Step 4: Keep every attribute within its size budget
+        cert_info, truncated_fields = apply_budget(cert_info)
+        if truncated_fields:
+            cert_info['truncated_fields'] = truncated_fields
+        if fields:
+            cert_info['category'] = 'fields' if params.get('fields') else category
+        print(f"Returning {len(cert_info)} attributes of {recommended_cert} (category {category}, truncated {truncated_fields})")
+
         # Return formatted Bedrock Agent response
         return {
             "messageVersion": "1.0",
@@ -125,7 +170,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 200,
                 "responseBody": {
                     "application/json": {
-                        "body": cert_info
+                        "body": dumps(cert_info)
                     }
                 }
             }
@@ -144,7 +189,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 500,
                 "responseBody": {
                     "application/json": {
-                        "body": json.dumps({'error': f"DynamoDB error: {str(e)}"})
+                        "body": dumps({'error': f"DynamoDB error: {str(e)}"})
                     }
                 }
             }
@@ -160,7 +205,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 500,
                 "responseBody": {
                     "application/json": {
-                        "body": json.dumps({'error': f"Unhandled exception: {str(e)}"})
+                        "body": dumps({'error': f"Unhandled exception: {str(e)}"})
                     }
                 }
             }
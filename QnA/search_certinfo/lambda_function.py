@@ -0,0 +1,135 @@
+import json
+import time
+from botocore.exceptions import ClientError
+from cert_index import LEVELS, cached_index, get_index
+from json_codec import dumps
+from aws_clients import PRELOAD_CLIENTS, get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+TABLES = ['CertInfo']
+preload_clients(CLIENTS, TABLES)
+
+MAX_LIMIT = 20
+
+
+def cert_table():
+    return get_table('CertInfo')
+
+
+# Build the index during init as well, so the first search is as fast as the
+# rest. Best effort: without it the first search builds the index.
+if PRELOAD_CLIENTS:
+    try:
+        get_index(cert_table)
+    except Exception as e:
+        print(f"Cert index not built at init: {str(e)}")
+
+def lambda_handler(event, context):
+    if is_warmup_event(event):
+        # No I/O here: report the index built at init, if any
+        response = warmup_response(CLIENTS, TABLES)
+        index = cached_index()
+        response['certifications_indexed'] = len(index.docs) if index is not None else None
+        return response
+
+    try:
+        print("INSIDE SEARCH CERT INFO LAMBDA FUNCTION")
+        print("Full event:", json.dumps(event, indent=2))
+
+        # Extract parameters from event['parameters']
+        params = {}
+        if 'parameters' in event:
+            for param in event['parameters']:
+                name = param.get('name')
+                value = param.get('value')
+                if name and value is not None:
+                    params[name] = value
+
+        # Fallback: try extracting from requestBody (optional)
+        if not params and 'requestBody' in event:
+            try:
+                content = event['requestBody'].get('content', {})
+                app_json = content.get('application/json', {})
+                properties = app_json.get('properties', [])
+                for prop in properties:
+                    name = prop.get('name')
+                    value = prop.get('value')
+                    if name and value is not None:
+                        params[name] = value
+            except Exception as e:
+                print(f"Error extracting from requestBody: {e}")
+
+        query = params.get('query', '')
+        level = str(params.get('level', '')).lower() or None
+        service = params.get('service')
+        role = params.get('role')
+        no_prerequisites = str(params.get('no_prerequisites', 'false')).lower() == 'true'
+
+        if not (query or level or service or role or no_prerequisites):
+            return create_error_response(event, 400, 'query or at least one filter (level, service, role, no_prerequisites) is required')
+        if level and level not in LEVELS:
+            return create_error_response(event, 400, f"level must be one of {', '.join(LEVELS)}")
+        try:
+            limit = min(max(int(params.get('limit', 5)), 1), MAX_LIMIT)
+        except ValueError:
+            return create_error_response(event, 400, 'limit must be a valid number')
+
+        index = get_index(cert_table)
+        started = time.perf_counter()
+        results, total_matches = index.search(query, level, service, role, no_prerequisites, limit)
+        took_us = int((time.perf_counter() - started) * 1_000_000)
+        print(f"Search '{query}' matched {total_matches} certifications in {took_us} us")
+
+        response_body = {
+            "query": query,
+            "filters": {"level": level, "service": service, "role": role, "no_prerequisites": no_prerequisites},
+            "total_matches": total_matches,
+            "results": results,
+            "took_us": took_us
+        }
+
+        # Return formatted Bedrock Agent response
+        return {
+            "messageVersion": "1.0",
+            "response": {
+                "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+                "apiPath": event.get('apiPath'),
+                "httpMethod": event.get('httpMethod', 'GET'),
+                "httpStatusCode": 200,
+                "responseBody": {
+                    "application/json": {
+                        "body": dumps(response_body)
+                    }
+                }
+            }
+        }
+
+    except ClientError as e:
+        print(f"DynamoDB ClientError: {str(e)}")
+        return create_error_response(event, 500, f"DynamoDB error: {str(e)}")
+    except Exception as e:
+        print(f"Unhandled error: {str(e)}")
+        return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
+
+
+def create_error_response(event, status_code, error_message):
+    """
+    Helper function to create standardized error responses
+    """
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'GET'),
+            "httpStatusCode": status_code,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps({
+                        "error": error_message
+                    })
+                }
+            }
+        }
+    }
@@ -1,9 +1,21 @@
 import json
-import boto3
 import os
 from botocore.exceptions import ClientError
+from gap_analytics import record_answer
+from quiz_store import end_generation, load_quiz, record_packed_answer, recorded_packed_answer
+from score_sketch import record_completed_quiz
+from async_jobs import FAILED, JOBS_TABLE, POLL_AFTER_SECONDS, fail_stale, get_job, is_stale
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+preload_clients(CLIENTS)
 
 def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS)
+
     try:
         print("INSIDE SHOW NEXT QUESTION LAMBDA FUNCTION")
         print("Full event:", json.dumps(event, indent=2))
@@ -70,15 +82,53 @@ def lambda_handler(event, context):
             except ValueError:
                 return create_error_response(event, 400, 'user_answer must be A, B, C, D or 0-3')
 
-        # Initialize AWS clients
-        dynamodb = boto3.resource('dynamodb')
-        
         # Get table names from environment or use defaults
         quiz_table_name = os.environ.get('QUIZ_TABLE', 'quiz')
         question_table_name = os.environ.get('QUESTION_TABLE', 'question')
+        user_knowledge_table_name = os.environ.get('USER_KNOWLEDGE_TABLE', 'user_knowledge')
 
-        question_table = dynamodb.Table(question_table_name)
-        quiz_table = dynamodb.Table(quiz_table_name)
+        question_table = get_table(question_table_name)
+        quiz_table = get_table(quiz_table_name)
+        user_knowledge_table = get_table(user_knowledge_table_name)
+
+        # Step 0: Load the quiz. Packed quizzes (one item per quiz) are served
+        # from the warm-container cache after the first read; two-table quizzes
+        # keep the original question-row flow below.
+        try:
+            quiz_item, packed_quiz = load_quiz(quiz_table, username, quiz_id)
+        except ClientError as e:
+            print(f"Error fetching quiz: {str(e)}")
+            return create_error_response(event, 500, f"Error fetching quiz: {str(e)}")
+
+        if packed_quiz is not None:
+            return answer_packed_quiz(
+                event,
+                quiz_table,
+                user_knowledge_table,
+                packed_quiz,
+                quiz_id,
+                username,
+                current_order_int,
+                user_answer_index
+            )
+
+        if quiz_item is None:
+            return create_error_response(event, 404, f"Quiz {quiz_id} not found")
+
+        # An async quiz may not have the next question yet. The answer is
+        # then left unrecorded, so sending it again later just works. If the
+        # job generating it is gone, the quiz ends with the questions it has.
+        if quiz_item.get('generation_job') and current_order_int < int(quiz_item.get('max_score', 0)):
+            try:
+                next_row = question_table.get_item(Key={'quiz_id': quiz_id, 'order': str(current_order_int + 1)})
+            except ClientError as e:
+                print(f"Error fetching next question: {str(e)}")
+                return create_error_response(event, 500, f"Error fetching next question: {str(e)}")
+            if 'Item' not in next_row:
+                if not generation_stalled(quiz_item['generation_job']):
+                    return create_pending_response(event, quiz_id, quiz_item['generation_job'], current_order_int + 1)
+                end_generation(quiz_table, username, quiz_id, current_order_int, job_id=quiz_item['generation_job'])
+                quiz_item['max_score'] = current_order_int
 
         # Step 1: Get the current question to check the answer
         try:
@@ -99,7 +149,9 @@ def lambda_handler(event, context):
             print(f"Error fetching current question: {str(e)}")
             return create_error_response(event, 500, f"Error fetching current question: {str(e)}")
 
-        # Step 2: Check if the answer is correct and update the current question
+        # Step 2: Check if the answer is correct and update the current question.
+        # The update only applies to an unanswered question, so an answer
+        # sent twice keeps the first one.
         is_correct = (user_answer_index == correct_answer)
         user_score = 1 if is_correct else 0
         
@@ -110,6 +162,7 @@ def lambda_handler(event, context):
                     'order': str(current_order_int)
                 },
                 UpdateExpression='SET user_score = :score, answered_correctly = :correct, user_answer = :user_answer',
+                ConditionExpression='attribute_not_exists(user_answer)',
                 ExpressionAttributeValues={
                     ':score': user_score,
                     ':correct': is_correct,
@@ -118,41 +171,68 @@ def lambda_handler(event, context):
             )
             print(f"Updated question {current_order_int}: user_score={user_score}, answered_correctly={is_correct}")
         except ClientError as e:
-            print(f"Error updating current question: {str(e)}")
-            return create_error_response(event, 500, f"Error updating question: {str(e)}")
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"Error updating current question: {str(e)}")
+                return create_error_response(event, 500, f"Error updating question: {str(e)}")
+            try:
+                current_question = question_table.get_item(
+                    Key={'quiz_id': quiz_id, 'order': str(current_order_int)},
+                    ConsistentRead=True
+                )['Item']
+            except ClientError as e:
+                print(f"Error fetching current question: {str(e)}")
+                return create_error_response(event, 500, f"Error fetching current question: {str(e)}")
+            is_correct = bool(current_question['answered_correctly'])
+            user_score = int(current_question['user_score'])
+            print(f"Question {current_order_int} was answered already; keeping answered_correctly={is_correct}")
 
-        # Step 3: Update quiz table with cumulative score
+        # Step 3: Update quiz table with cumulative score, once per question:
+        # answered_orders also lets a resent answer finish a first attempt
+        # that failed before this step
+        max_score = int(quiz_item.get('max_score', 0))
         try:
-            # Get current quiz to update total user_score
-            quiz_response = quiz_table.get_item(Key={
-                    'username': username,
-                    'id': quiz_id
-                })
-            
-            if 'Item' not in quiz_response:
-                return create_error_response(event, 404, f"Quiz {quiz_id} not found")
-            
-            quiz_item = quiz_response['Item']
-            current_total_score = int(quiz_item.get('user_score', 0))
-            new_total_score = current_total_score + user_score
-            
-            quiz_table.update_item(
+            update_response = quiz_table.update_item(
                 Key={
                     'username': username,
                     'id': quiz_id
                 },
-                UpdateExpression='SET user_score = :score',
+                UpdateExpression='SET user_score = user_score + :score ADD answered_orders :order',
+                ConditionExpression='NOT contains(answered_orders, :order_number)',
                 ExpressionAttributeValues={
-                    ':score': new_total_score
-                }
+                    ':score': user_score,
+                    ':order': {current_order_int},
+                    ':order_number': current_order_int
+                },
+                ReturnValues='UPDATED_NEW'
             )
+            new_total_score = int(update_response['Attributes']['user_score'])
             print(f"Updated quiz total score: {new_total_score}")
-            
-            max_score = int(quiz_item.get('max_score', 0))
-            
         except ClientError as e:
-            print(f"Error updating quiz score: {str(e)}")
-            return create_error_response(event, 500, f"Error updating quiz score: {str(e)}")
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"Error updating quiz score: {str(e)}")
+                return create_error_response(event, 500, f"Error updating quiz score: {str(e)}")
+            try:
+                new_total_score = int(quiz_table.get_item(
+                    Key={'username': username, 'id': quiz_id},
+                    ProjectionExpression='user_score',
+                    ConsistentRead=True
+                )['Item']['user_score'])
+            except ClientError as e:
+                print(f"Error fetching quiz score: {str(e)}")
+                return create_error_response(event, 500, f"Error fetching quiz score: {str(e)}")
+            print(f"Score for question {current_order_int} was counted already: {new_total_score}")
+
+        # Step 3b: Fold the answer into the user's time-decayed knowledge stats
+        # (used by ShowResult to rank gaps). Best effort: never fails the answer.
+        update_knowledge_stats(
+            user_knowledge_table,
+            username,
+            quiz_item.get('recommended_cert'),
+            quiz_item.get('topic'),
+            current_question,
+            is_correct,
+            f"{quiz_id}#{current_order_int}"
+        )
 
         # Step 4: Get the next question
         next_order = current_order_int + 1
@@ -164,41 +244,155 @@ def lambda_handler(event, context):
                     'order': str(next_order)
                 }
             )
-            
-            if 'Item' not in next_question_response:
-                # No more questions - quiz is complete
-                response_body = {
-                    "quiz_id": quiz_id,
-                    "previous_question_correct": is_correct,
-                    "correct_answer": correct_answer,
-                    "quiz_complete": True,
-                    "message": f"Quiz completed! You've answered all {current_order_int} questions.",
-                    "final_score": new_total_score,
-                    "max_score": max_score
-                }
-                
-                return {
-                    "messageVersion": "1.0",
-                    "response": {
-                        "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
-                        "apiPath": event.get('apiPath'),
-                        "httpMethod": event.get('httpMethod', 'POST'),
-                        "httpStatusCode": 200,
-                        "responseBody": {
-                            "application/json": {
-                                "body": json.dumps(response_body)
-                            }
-                        }
-                    }
-                }
-            
-            next_question = next_question_response['Item']
+            next_question = next_question_response.get('Item')
             
         except ClientError as e:
             print(f"Error fetching next question: {str(e)}")
             return create_error_response(event, 500, f"Error fetching next question: {str(e)}")
 
-        # Step 5: Prepare response with next question
+        # Step 4b: A completed quiz joins the score distribution of its cert
+        # and topic (common/score_sketch.py), which ShowResult ranks against
+        if next_question is None:
+            record_completed_quiz(quiz_table, username, quiz_id, quiz_item.get('recommended_cert'),
+                                  quiz_item.get('topic'), new_total_score, max_score)
+
+        # Step 5: Prepare response with next question (or the final score)
+        return create_answer_response(
+            event,
+            quiz_id,
+            is_correct,
+            correct_answer,
+            current_order_int,
+            next_question,
+            new_total_score,
+            max_score
+        )
+
+    except ClientError as e:
+        print(f"DynamoDB ClientError: {str(e)}")
+        return create_error_response(event, 500, f"DynamoDB error: {str(e)}")
+    except Exception as e:
+        print(f"Unhandled error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
+
+
+def answer_packed_quiz(event, quiz_table, user_knowledge_table, quiz, quiz_id, username, current_order, user_answer_index):
+    """
+    Packed layout: the question comes from the cached quiz and the answer is
+    recorded with a single list-index UpdateItem on the quiz row
+    """
+    questions = quiz['questions']
+    if current_order < 1 or current_order > len(questions):
+        return create_error_response(event, 404, f"Question with order {current_order} not found for quiz {quiz_id}")
+
+    if quiz.get('generation_job') and len(questions) <= current_order < quiz['max_score']:
+        if not generation_stalled(quiz['generation_job']):
+            return create_pending_response(event, quiz_id, quiz['generation_job'], current_order + 1)
+        end_generation(quiz_table, username, quiz_id, len(questions), job_id=quiz['generation_job'])
+        quiz = dict(quiz, max_score=len(questions), generation_job=None)
+
+    current_question = questions[current_order - 1]
+    correct_answer = int(current_question['correct_answer'])
+    is_correct = (user_answer_index == correct_answer)
+
+    try:
+        new_total_score = record_packed_answer(
+            quiz_table,
+            username,
+            quiz_id,
+            current_order,
+            user_answer_index,
+            is_correct
+        )
+        if new_total_score is None:
+            # Answered already (e.g. the answer was sent twice): reply with
+            # what was recorded the first time instead of scoring it again
+            recorded, new_total_score = recorded_packed_answer(quiz_table, username, quiz_id, current_order)
+            if 'user_answer' not in recorded:
+                return create_error_response(event, 500, f"Could not record the answer to question {current_order} of quiz {quiz_id}")
+            is_correct = bool(recorded['answered_correctly'])
+            print(f"Answer {current_order} for packed quiz {quiz_id} was recorded already: correct={is_correct}")
+        else:
+            print(f"Recorded answer {current_order} for packed quiz {quiz_id}: correct={is_correct}, score={new_total_score}")
+    except ClientError as e:
+        print(f"Error updating packed quiz: {str(e)}")
+        return create_error_response(event, 500, f"Error updating quiz score: {str(e)}")
+
+    update_knowledge_stats(
+        user_knowledge_table,
+        username,
+        quiz.get('recommended_cert'),
+        quiz.get('topic'),
+        current_question,
+        is_correct,
+        f"{quiz_id}#{current_order}"
+    )
+
+    next_question = questions[current_order] if current_order < len(questions) else None
+    if next_question is None:
+        record_completed_quiz(quiz_table, username, quiz_id, quiz.get('recommended_cert'),
+                              quiz.get('topic'), new_total_score, quiz['max_score'])
+    return create_answer_response(
+        event,
+        quiz_id,
+        is_correct,
+        correct_answer,
+        current_order,
+        next_question,
+        new_total_score,
+        quiz['max_score']
+    )
+
+
+def generation_stalled(job_id):
+    """
+    Whether the job adding an async quiz's questions is gone: failed,
+    expired, or its worker stopped without finishing (see common/async_jobs.py)
+    """
+    jobs_table = get_table(JOBS_TABLE)
+    try:
+        job = get_job(jobs_table, job_id)
+        if job is not None and is_stale(job):
+            fail_stale(jobs_table, job)
+            return True
+    except ClientError as e:
+        print(f"Could not check job {job_id}: {str(e)}")
+        return False
+    return job is None or job['status'] == FAILED
+
+
+def update_knowledge_stats(user_knowledge_table, username, cert, topic, question, is_correct, answer_id):
+    """
+    Best-effort update of the knowledge-gap stats; errors are only logged.
+    answer_id keeps a resent answer from being counted twice.
+    """
+    try:
+        if not record_answer(user_knowledge_table, username, cert, topic, question, is_correct, answer_id=answer_id):
+            print(f"Answer {answer_id} already in the knowledge stats")
+    except ClientError as e:
+        print(f"Error updating knowledge stats: {str(e)}")
+
+
+def create_answer_response(event, quiz_id, is_correct, correct_answer, current_order, next_question, new_total_score, max_score):
+    """
+    Response after an answer: the next question, or the final score when
+    there is no next question
+    """
+    if next_question is None:
+        # No more questions - quiz is complete
+        response_body = {
+            "quiz_id": quiz_id,
+            "previous_question_correct": is_correct,
+            "correct_answer": correct_answer,
+            "quiz_complete": True,
+            "message": f"Quiz completed! You've answered all {current_order} questions.",
+            "final_score": new_total_score,
+            "max_score": max_score
+        }
+    else:
+        next_order = current_order + 1
         response_body = {
             "quiz_id": quiz_id,
             "previous_question_correct": is_correct,
@@ -216,30 +410,50 @@ def lambda_handler(event, context):
             }
         }
 
-        # Return formatted Bedrock Agent response
-        return {
-            "messageVersion": "1.0",
-            "response": {
-                "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
-                "apiPath": event.get('apiPath'),
-                "httpMethod": event.get('httpMethod', 'POST'),
-                "httpStatusCode": 200,
-                "responseBody": {
-                    "application/json": {
-                        "body": json.dumps(response_body)
-                    }
+    # Return formatted Bedrock Agent response
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'POST'),
+            "httpStatusCode": 200,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps(response_body)
                 }
             }
         }
+    }
 
-    except ClientError as e:
-        print(f"DynamoDB ClientError: {str(e)}")
-        return create_error_response(event, 500, f"DynamoDB error: {str(e)}")
-    except Exception as e:
-        print(f"Unhandled error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
+
+def create_pending_response(event, quiz_id, job_id, next_order):
+    """
+    202 when the next question of an async quiz is still being generated
+    """
+    response_body = {
+        "quiz_id": quiz_id,
+        "generation_pending": True,
+        "job_id": job_id,
+        "next_order": next_order,
+        "retry_after_seconds": POLL_AFTER_SECONDS,
+        "message": f"Question {next_order} is still being prepared. The answer was not recorded yet; "
+                   f"send it again in about {POLL_AFTER_SECONDS} seconds."
+    }
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'POST'),
+            "httpStatusCode": 202,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps(response_body)
+                }
+            }
+        }
+    }
 
 
 def create_error_response(event, status_code, error_message):
@@ -255,7 +469,7 @@ def create_error_response(event, status_code, error_message):
             "httpStatusCode": status_code,
             "responseBody": {
                 "application/json": {
-                    "body": json.dumps({
+                    "body": dumps({
                         "error": error_message
                     })
                 }
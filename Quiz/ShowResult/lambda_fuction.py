@@ -1,17 +1,42 @@
 import json
-import boto3
 import os
-from decimal import Decimal
+import time
 from botocore.exceptions import ClientError
-
-class DecimalEncoder(json.JSONEncoder):
-    """Helper class to convert DynamoDB Decimal to float"""
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return float(o) if o % 1 else int(o)
-        return super(DecimalEncoder, self).default(o)
+from bedrock_guard import BedrockUnavailable
+from model_router import converse_routed, strip_code_fence
+from gap_analytics import build_knowledge_gaps, load_user_stats, rank_gaps, rebuild_stats
+from quiz_store import PACKED_LAYOUT, question_rows
+from async_jobs import (JOBS_TABLE, POLL_AFTER_SECONDS, JobFailed, create_job, enqueue, get_job, is_job_event,
+                        job_event, run_job, use_async)
+from json_codec import dumps, loads
+from call_ledger import set_context
+from dynamo_fast import FAST_PATH_ENABLED, Projection, get_item, query_partition
+from score_sketch import SCORE_SKETCHES, load_sketches, percentile_rank, sketch_key, without_score
+from aws_clients import get_bedrock_runtime, get_dynamodb, get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients this function uses; built during init (see common/aws_clients.py).
+# bedrock-runtime is left out: it is only needed for quizzes without stored
+# explanations or with KNOWLEDGE_GAP_LLM_ADVICE on, so it is created on demand.
+# lambda queues the background analysis of those results.
+CLIENTS = ['dynamodb', 'dynamodb-client', 'lambda']
+preload_clients(CLIENTS)
+
+KNOWLEDGE_GAP_LLM_ADVICE = os.environ.get('KNOWLEDGE_GAP_LLM_ADVICE', 'false').lower() == 'true'
+
+# Attributes the result path reads, fetched and converted through the
+# low-level client (see common/dynamo_fast.py)
+QUIZ_PROJECTION = Projection(['username', 'id', 'recommended_cert', 'topic', 'max_score', 'layout', 'questions_blob', 'answers',
+                              'score_ranked_at'])
+QUESTION_PROJECTION = Projection(['quiz_id', 'order', 'question', 'options', 'correct_answer', 'user_answer',
+                                  'answered_correctly', 'explanation', 'domain', 'aws_service', 'difficulty'])
 
 def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS)
+
+    if is_job_event(event):
+        return run_job(get_table(JOBS_TABLE), event, {'show_result': complete_result_analysis}, context)
+
     try:
         print("INSIDE SHOW RESULT LAMBDA FUNCTION")
         print("Full event:", json.dumps(event, indent=2))
@@ -52,166 +77,397 @@ def lambda_handler(event, context):
         # lowercase username
         username = username.lower()
 
-        # Initialize AWS clients
-        dynamodb = boto3.resource('dynamodb')
-        bedrock_runtime = boto3.client('bedrock-runtime')
-        
-        # Get table names from environment or use defaults
-        quiz_table_name = os.environ.get('QUIZ_TABLE', 'quiz')
-        question_table_name = os.environ.get('QUESTION_TABLE', 'question')
+        return show_result(event, quiz_id, username)
 
-        # Step 1: Fetch quiz metadata
-        quiz_table = dynamodb.Table(quiz_table_name)
-        
-        try:
-            quiz_response = quiz_table.get_item(Key={'username': username, 'id': quiz_id})
-            if 'Item' not in quiz_response:
-                return create_error_response(event, 404, f"Quiz '{quiz_id}' not found")
-            
-            quiz_data = quiz_response['Item']
-            username = quiz_data.get('username')
-            recommended_cert = quiz_data.get('recommended_cert')
-            topic = quiz_data.get('topic')
-            max_score = int(quiz_data.get('max_score', 0))
-        except ClientError as e:
-            print(f"Error fetching quiz: {str(e)}")
-            return create_error_response(event, 500, f"Error fetching quiz: {str(e)}")
-
-        # Step 2: Fetch all questions for this quiz
-        question_table = dynamodb.Table(question_table_name)
-        
-        try:
+    except ClientError as e:
+        print(f"DynamoDB ClientError: {str(e)}")
+        return create_error_response(event, 500, f"DynamoDB error: {str(e)}")
+    except Exception as e:
+        print(f"Unhandled error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
+
+
+def show_result(event, quiz_id, username, allow_async=True):
+    """
+    The result of a quiz as an action group response. Exceptions are left to
+    the caller. With allow_async, analysis that needs Bedrock is handed to a
+    background job and the score is returned right away.
+    """
+    set_context(handler='show_result', user=username, ref=quiz_id)
+    # Get table names from environment or use defaults
+    quiz_table_name = os.environ.get('QUIZ_TABLE', 'quiz')
+    question_table_name = os.environ.get('QUESTION_TABLE', 'question')
+    user_knowledge_table_name = os.environ.get('USER_KNOWLEDGE_TABLE', 'user_knowledge')
+
+    # Step 1: Fetch quiz metadata
+    try:
+        if FAST_PATH_ENABLED:
+            quiz_data = get_item(quiz_table_name, {'username': username, 'id': quiz_id}, QUIZ_PROJECTION)
+        else:
+            quiz_data = get_table(quiz_table_name).get_item(Key={'username': username, 'id': quiz_id}).get('Item')
+        if quiz_data is None:
+            return create_error_response(event, 404, f"Quiz '{quiz_id}' not found")
+
+        username = quiz_data.get('username')
+        recommended_cert = quiz_data.get('recommended_cert')
+        topic = quiz_data.get('topic')
+        max_score = int(quiz_data.get('max_score', 0))
+    except ClientError as e:
+        print(f"Error fetching quiz: {str(e)}")
+        return create_error_response(event, 500, f"Error fetching quiz: {str(e)}")
+
+    # Step 2: Fetch all questions for this quiz (packed quizzes carry them
+    # in the quiz item itself)
+    try:
+        if quiz_data.get('layout') == PACKED_LAYOUT:
+            questions = question_rows(quiz_data)
+        elif FAST_PATH_ENABLED:
+            questions = query_partition(question_table_name, 'quiz_id', quiz_id, QUESTION_PROJECTION)
+        else:
+            question_table = get_table(question_table_name)
             response = question_table.query(
                 KeyConditionExpression='quiz_id = :quiz_id',
                 ExpressionAttributeValues={':quiz_id': quiz_id}
             )
             questions = response.get('Items', [])
-            
-            if not questions:
-                return create_error_response(event, 404, f"No questions found for quiz '{quiz_id}'")
-            
-            # Sort by order
-            questions.sort(key=lambda x: int(x.get('order', 0)))
-        except ClientError as e:
-            print(f"Error fetching questions: {str(e)}")
-            return create_error_response(event, 500, f"Error fetching questions: {str(e)}")
-
-        # Step 3: Calculate score and prepare question summary
-        user_score = 0
-        question_summary = []
-        
-        for q in questions:
-            correct_answer = q.get('correct_answer')
-            user_answer = q.get('user_answer')
-            is_correct = q.get('answered_correctly')
-            
-            if is_correct:
-                user_score += 1
-            
-            question_summary.append({
-                'order': q.get('order'),
-                'question': q.get('question'),
-                'options': q.get('options', []),
-                'correct_answer': int(correct_answer) if correct_answer is not None else None,
-                'user_answer': int(user_answer) if user_answer is not None else None,
-                'is_correct': is_correct
-            })
-
-        # Step 4: Generate detailed explanations using Bedrock
-        print(f"Generating detailed explanations for {len(questions)} questions")
-        
-        detailed_explanations = generate_explanations_with_bedrock(
-            bedrock_runtime,
-            recommended_cert,
-            topic,
-            question_summary
-        )
 
-        # Step 5: Identify knowledge gaps
-        incorrect_questions = [q for q in question_summary if not q['is_correct']]
-        knowledge_gaps = identify_knowledge_gaps(
-            bedrock_runtime,
-            recommended_cert,
-            topic,
-            incorrect_questions,
-            question_summary
-        )
+        if not questions:
+            return create_error_response(event, 404, f"No questions found for quiz '{quiz_id}'")
 
-        # Step 6: Prepare response
-        percentage_score = (user_score / max_score * 100) if max_score > 0 else 0
-        
-        response_body = {
+        # Sort by order
+        questions.sort(key=lambda x: int(x.get('order', 0)))
+    except ClientError as e:
+        print(f"Error fetching questions: {str(e)}")
+        return create_error_response(event, 500, f"Error fetching questions: {str(e)}")
+
+    # Step 3: Calculate score and prepare question summary
+    user_score = 0
+    question_summary = []
+
+    for q in questions:
+        correct_answer = q.get('correct_answer')
+        user_answer = q.get('user_answer')
+        is_correct = q.get('answered_correctly')
+
+        if is_correct:
+            user_score += 1
+
+        question_summary.append({
+            'order': q.get('order'),
+            'question': q.get('question'),
+            'options': q.get('options', []),
+            'correct_answer': int(correct_answer) if correct_answer is not None else None,
+            'user_answer': int(user_answer) if user_answer is not None else None,
+            'is_correct': is_correct,
+            'explanation': q.get('explanation')
+        })
+
+    # Step 4: Build detailed explanations from the ones create_quiz stored on
+    # each question. Only questions from older quizzes without a stored
+    # explanation go to Bedrock.
+    detailed_explanations, missing_explanations = assemble_stored_explanations(question_summary)
+
+    # Step 4b: How the score compares with everyone else's on this cert and
+    # topic: one BatchGetItem of two sketches, no quiz scan
+    answered = sum(1 for q in question_summary if q['user_answer'] is not None)
+    ranking = rank_against_others(recommended_cert, topic, user_score, max_score, answered,
+                                  counted='score_ranked_at' in quiz_data)
+
+    # Explanations for older quizzes and LLM gap advice can outlast the action
+    # group timeout: return the score now and finish them in a background job
+    if allow_async and use_async(missing_explanations or KNOWLEDGE_GAP_LLM_ADVICE):
+        score = score_summary(user_score, max_score)
+        if ranking:
+            score["cohort_ranking"] = ranking
+        return start_result_job(event, quiz_id, username, answered, dict({
             "quiz_id": quiz_id,
             "username": username,
             "topic": topic,
-            "recommended_cert": recommended_cert,
-            "final_score": {
-                "correct": user_score,
-                "total": max_score,
-                "percentage": round(percentage_score, 2)
-            },
-            "performance_summary": get_performance_summary(percentage_score),
-            "detailed_explanations": detailed_explanations,
-            "knowledge_gaps": knowledge_gaps,
-            "quiz_statistics": {
-                "total_questions": max_score,
-                "correct_answers": user_score,
-                "incorrect_answers": max_score - user_score,
-                "accuracy_percentage": round(percentage_score, 2)
+            "recommended_cert": recommended_cert
+        }, **score))
+
+    # If Bedrock is throttled or the circuit is open we still return the score,
+    # just without the LLM-generated sections
+    degraded = False
+    if missing_explanations:
+        print(f"Generating detailed explanations for {len(missing_explanations)} questions without stored explanations")
+        try:
+            generated = generate_explanations_with_bedrock(
+                get_bedrock_runtime(),
+                recommended_cert,
+                topic,
+                missing_explanations
+            )
+            detailed_explanations.extend(renumber_generated_explanations(generated, missing_explanations))
+            detailed_explanations.sort(key=lambda x: x.get('question_number') or 0)
+        except BedrockUnavailable as e:
+            print(f"Skipping explanations, Bedrock unavailable: {str(e)}")
+            degraded = True
+
+    # Step 5: Rank knowledge gaps locally from the user's tagged answer history
+    incorrect_questions = [q for q in question_summary if not q['is_correct']]
+    knowledge_gaps = identify_knowledge_gaps(
+        get_table(user_knowledge_table_name),
+        username,
+        recommended_cert,
+        topic,
+        incorrect_questions,
+        questions
+    )
+
+    # Step 6: Prepare response
+    score = score_summary(user_score, max_score)
+    response_body = {
+        "quiz_id": quiz_id,
+        "username": username,
+        "topic": topic,
+        "recommended_cert": recommended_cert,
+        "final_score": score["final_score"],
+        "performance_summary": score["performance_summary"],
+        "detailed_explanations": detailed_explanations,
+        "knowledge_gaps": knowledge_gaps,
+        "quiz_statistics": score["quiz_statistics"]
+    }
+    if ranking:
+        response_body["cohort_ranking"] = ranking
+
+    if degraded:
+        response_body["degraded"] = True
+        response_body["degraded_reason"] = "Detailed feedback is temporarily unavailable, please ask for your results again shortly."
+
+    return create_result_response(event, response_body)
+
+
+def score_summary(user_score, max_score):
+    """
+    The parts of the result that need no Bedrock call
+    """
+    percentage_score = (user_score / max_score * 100) if max_score > 0 else 0
+    return {
+        "final_score": {
+            "correct": user_score,
+            "total": max_score,
+            "percentage": round(percentage_score, 2)
+        },
+        "performance_summary": get_performance_summary(percentage_score),
+        "quiz_statistics": {
+            "total_questions": max_score,
+            "correct_answers": user_score,
+            "incorrect_answers": max_score - user_score,
+            "accuracy_percentage": round(percentage_score, 2)
+        }
+    }
+
+
+def rank_against_others(cert, topic, user_score, max_score, answered, counted=False):
+    """
+    Percentile rank of a completed quiz among all other attempts on its
+    topic and on its cert (common/score_sketch.py). counted: the quiz is in
+    the sketches already (score_ranked_at), so it is taken out before
+    ranking. None for an unfinished quiz, or when there is nothing to
+    compare with yet.
+    """
+    if not SCORE_SKETCHES or not max_score or answered < max_score:
+        return None
+    topic_key, cert_key = sketch_key(cert, topic), sketch_key(cert)
+    try:
+        sketches = load_sketches(get_dynamodb(), [topic_key, cert_key])
+    except ClientError as e:
+        print(f"Score sketches unavailable: {str(e)}")
+        return None
+    ranking = {}
+    for name, key in [('topic', topic_key), ('certification', cert_key)]:
+        if key in sketches:
+            counts = without_score(sketches[key], user_score, max_score) if counted else sketches[key]
+            ranking[name] = percentile_rank(counts, user_score, max_score)
+    return {name: rank for name, rank in ranking.items() if rank} or None
+
+
+def start_result_job(event, quiz_id, username, answered, score_body):
+    """
+    Async result: the job id is derived from the quiz and its answer count,
+    so asking again joins the running job or gets its finished result
+    """
+    jobs_table = get_table(JOBS_TABLE)
+    job_id = f"result-{quiz_id}-{answered}"
+    created, job = create_job(jobs_table, job_id, 'show_result', username, {'quiz_id': quiz_id})
+    if created:
+        try:
+            enqueue(job_id)
+        except Exception as e:
+            print(f"Could not queue job {job_id}, analysing inline: {str(e)}")
+            run_job(jobs_table, job_event(job_id), {'show_result': complete_result_analysis})
+            job = get_job(jobs_table, job_id)
+
+    if job is not None and job.get('result'):
+        print(f"Serving the result of job {job_id} ({job['status']})")
+        return create_result_response(event, loads(job['result']))
+
+    response_body = dict(
+        score_body,
+        results_pending=True,
+        job_id=job_id,
+        retry_after_seconds=POLL_AFTER_SECONDS,
+        message="Explanations and knowledge gaps are still being prepared; ask for the results again shortly."
+    )
+    return create_result_response(event, response_body)
+
+
+def complete_result_analysis(job):
+    """
+    Background job of an async result: the full synchronous result
+    """
+    response = show_result({'apiPath': '/show_result'}, job['payload']['quiz_id'], job['username'], allow_async=False)['response']
+    body = loads(response['responseBody']['application/json']['body'])
+    if response['httpStatusCode'] != 200:
+        raise JobFailed(body.get('error', 'Result analysis failed'))
+    if body.get('degraded'):
+        # Kept as the partial result; the next request starts a new job
+        raise JobFailed(body['degraded_reason'], body)
+    return body
+
+
+def create_result_response(event, response_body):
+    """
+    Return formatted Bedrock Agent response
+    """
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'POST'),
+            "httpStatusCode": 200,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps(response_body)
+                }
             }
         }
+    }
+
+
+def assemble_stored_explanations(question_summary):
+    """
+    Build the explanation entries for incorrectly answered questions from the
+    explanations stored by create_quiz, in the same shape the LLM used to
+    return. Returns (explanations, incorrect questions without a stored one).
+    """
+    explanations = []
+    missing = []
+    for q in question_summary:
+        if q['is_correct']:
+            continue
+        stored = q.get('explanation')
+        if not stored or not stored.get('why_correct'):
+            missing.append(q)
+            continue
+
+        options = q['options']
+        user_answer = q['user_answer']
+        rationales = stored.get('option_rationales') or []
+        user_selected = options[user_answer] if user_answer is not None and user_answer < len(options) else None
+        why_incorrect = rationales[user_answer] if user_answer is not None and user_answer < len(rationales) else ""
+
+        explanations.append({
+            "question_number": int(q['order']),
+            "is_correct": False,
+            "question_text": q['question'],
+            "correct_answer": options[q['correct_answer']] if q['correct_answer'] is not None else None,
+            "user_selected": user_selected,
+            "explanation": {
+                "why_correct": stored['why_correct'],
+                "why_incorrect": why_incorrect,
+                "key_concepts": list(stored.get('key_concepts') or [])
+            }
+        })
+    return explanations, missing
+
+
+def renumber_generated_explanations(generated, questions):
+    """
+    The LLM numbers the questions it was given from 1; map those back to the
+    quiz order so they line up with the stored explanations
+    """
+    renumbered = []
+    for item in generated:
+        if not isinstance(item, dict):
+            continue
+        number = item.get('question_number')
+        if isinstance(number, int) and 1 <= number <= len(questions):
+            item['question_number'] = int(questions[number - 1]['order'])
+        renumbered.append(item)
+    return renumbered
+
+
+def generate_explanations_with_bedrock(bedrock_client, cert_name, topic, question_summary):
+    """
+    Generate detailed explanations for each question using Bedrock
+    """
+    try:
+        prompt = build_explanations_prompt(cert_name, topic, question_summary)
+        print(f"Bedrock explanations prompt: {prompt}")
 
-        # Return formatted Bedrock Agent response
-        return {
-            "messageVersion": "1.0",
-            "response": {
-                "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
-                "apiPath": event.get('apiPath'),
-                "httpMethod": event.get('httpMethod', 'POST'),
-                "httpStatusCode": 200,
-                "responseBody": {
-                    "application/json": {
-                        "body": json.dumps(response_body, cls=DecimalEncoder)
-                    }
+        request_body = {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"text": prompt}]
                 }
+            ],
+            "inferenceConfig": {
+                "maxTokens": 8000,
+                "temperature": 0.7,
+                "topP": 0.9
             }
         }
 
-    except ClientError as e:
-        print(f"DynamoDB ClientError: {str(e)}")
-        return create_error_response(event, 500, f"DynamoDB error: {str(e)}")
+        incorrect_count = len([q for q in question_summary if not q['is_correct']])
+        explanations, model_id = converse_routed(
+            bedrock_client,
+            'result_explanations',
+            incorrect_count,
+            request_body["messages"],
+            request_body["inferenceConfig"],
+            parse_explanations
+        )
+        return explanations if explanations is not None else []
+
+    except BedrockUnavailable:
+        raise
     except Exception as e:
-        print(f"Unhandled error: {str(e)}")
+        print(f"Error generating explanations with Bedrock: {str(e)}")
         import traceback
         traceback.print_exc()
-        return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
+        return []
 
 
-def generate_explanations_with_bedrock(bedrock_client, cert_name, topic, question_summary):
+def build_explanations_prompt(cert_name, topic, question_summary):
     """
-    Generate detailed explanations for each question using Bedrock
+    Prompt used to explain the answers of a completed quiz
     """
-    try:
-        # Prepare question details for Bedrock
-        questions_text = ""
-        for idx, q in enumerate(question_summary, start=1):
-            user_answer_label = chr(65 + q['user_answer']) if q['user_answer'] is not None else "Not answered"
-            correct_answer_label = chr(65 + q['correct_answer'])
-            status = "✓ CORRECT" if q['is_correct'] else "✗ INCORRECT"
-            
-            questions_text += f"\nQuestion {idx} [{status}]:\n"
-            questions_text += f"Question: {q['question']}\n"
-            questions_text += f"Options:\n"
-            for opt_idx, option in enumerate(q['options']):
-                prefix = f"  {chr(65 + opt_idx)}. {option}"
-                if opt_idx == q['user_answer']:
-                    prefix += f" (User selected)"
-                if opt_idx == q['correct_answer']:
-                    prefix += f" (Correct)"
-                questions_text += prefix + "\n"
-            questions_text += "\n"
-
-        prompt = f"""You are an expert AWS certification instructor. Analyze the quiz responses below for the {cert_name} certification, Topic: {topic}.
+    # Prepare question details for Bedrock
+    questions_text = ""
+    for idx, q in enumerate(question_summary, start=1):
+        user_answer_label = chr(65 + q['user_answer']) if q['user_answer'] is not None else "Not answered"
+        correct_answer_label = chr(65 + q['correct_answer'])
+        status = "✓ CORRECT" if q['is_correct'] else "✗ INCORRECT"
+        
+        questions_text += f"\nQuestion {idx} [{status}]:\n"
+        questions_text += f"Question: {q['question']}\n"
+        questions_text += f"Options:\n"
+        for opt_idx, option in enumerate(q['options']):
+            prefix = f"  {chr(65 + opt_idx)}. {option}"
+            if opt_idx == q['user_answer']:
+                prefix += f" (User selected)"
+            if opt_idx == q['correct_answer']:
+                prefix += f" (Correct)"
+            questions_text += prefix + "\n"
+        questions_text += "\n"
+
+    prompt = f"""You are an expert AWS certification instructor. Analyze the quiz responses below for the {cert_name} certification, Topic: {topic}.
 
 {questions_text}
 
@@ -237,101 +493,118 @@ Format your response as a JSON array with this structure:
 ]
 
 Return ONLY valid JSON array, no additional text."""
+    return prompt
+
+
+def parse_explanations(response_text):
+    """
+    Parse the explanations array, or None if the output is unusable
+    """
+    print(f"Bedrock explanations response: {response_text[:500]}...")
+    try:
+        explanations = json.loads(strip_code_fence(response_text))
+    except json.JSONDecodeError as e:
+        print(f"JSON parsing error in explanations: {str(e)}")
+        return None
+
+    if not isinstance(explanations, list):
+        print("Error: Explanations response is not a list")
+        return None
+
+    return explanations
 
-        print(f"Bedrock explanations prompt: {prompt}")
 
+def identify_knowledge_gaps(user_knowledge_table, username, cert_name, topic, incorrect_questions, questions):
+    """
+    Identify knowledge gaps from the user's time-decayed answer stats across
+    all their quizzes (kept up to date by show_next_question). The LLM is only
+    used, when enabled, to phrase the advice for the gaps found here.
+    """
+    try:
+        stats = load_user_stats(user_knowledge_table, username)
+    except ClientError as e:
+        print(f"Error loading knowledge stats: {str(e)}")
+        stats = {}
+
+    if not stats:
+        # No history yet (or not backfilled): rank from this quiz alone
+        now = int(time.time())
+        stats = rebuild_stats(
+            [(now, cert_name, topic, q, bool(q.get('answered_correctly')))
+             for q in questions if q.get('user_answer') is not None],
+            now
+        )
+
+    ranked_gaps = rank_gaps(stats, cert_name)
+    knowledge_gaps = build_knowledge_gaps(ranked_gaps, cert_name, len(incorrect_questions))
+
+    if ranked_gaps and KNOWLEDGE_GAP_LLM_ADVICE:
+        advice = phrase_gap_advice(get_bedrock_runtime(), cert_name, topic, knowledge_gaps['gaps'])
+        if advice:
+            knowledge_gaps['overall_assessment'] = advice['overall_assessment']
+            knowledge_gaps['recommendations'] = advice['recommendations']
+
+    return knowledge_gaps
+
+
+def phrase_gap_advice(bedrock_client, cert_name, topic, gaps):
+    """
+    Ask the LLM to word study advice for gaps that were already ranked
+    locally. Returns None on any failure; the caller keeps the template advice.
+    """
+    try:
         request_body = {
             "messages": [
                 {
                     "role": "user",
-                    "content": [{"text": prompt}]
+                    "content": [{"text": build_knowledge_gaps_prompt(cert_name, topic, gaps)}]
                 }
             ],
             "inferenceConfig": {
-                "maxTokens": 8000,
-                "temperature": 0.7,
+                "maxTokens": 1500,
+                "temperature": 0.5,
                 "topP": 0.9
             }
         }
 
-        response = bedrock_client.converse(
-            modelId="us.amazon.nova-pro-v1:0",
-            messages=request_body["messages"],
-            inferenceConfig=request_body["inferenceConfig"]
+        advice, model_id = converse_routed(
+            bedrock_client,
+            'knowledge_gaps',
+            len(gaps),
+            request_body["messages"],
+            request_body["inferenceConfig"],
+            parse_knowledge_gaps
         )
+        return advice
 
-        response_text = response['output']['message']['content'][0]['text']
-        print(f"Bedrock explanations response: {response_text[:500]}...")
-
-        # Clean up response
-        response_text = response_text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        explanations = json.loads(response_text)
-        
-        if not isinstance(explanations, list):
-            print("Error: Explanations response is not a list")
-            return []
-        
-        return explanations
-
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error in explanations: {str(e)}")
-        return []
+    except BedrockUnavailable as e:
+        print(f"Skipping gap advice, Bedrock unavailable: {str(e)}")
+        return None
     except Exception as e:
-        print(f"Error generating explanations with Bedrock: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return []
+        print(f"Error phrasing gap advice: {str(e)}")
+        return None
 
 
-def identify_knowledge_gaps(bedrock_client, cert_name, topic, incorrect_questions, all_questions):
+def build_knowledge_gaps_prompt(cert_name, topic, gaps):
     """
-    Identify knowledge gaps and recommend learning areas
+    Prompt used to phrase study advice for the ranked knowledge gaps
     """
-    try:
-        if not incorrect_questions:
-            return {
-                "overall_assessment": "Excellent! You answered all questions correctly.",
-                "gaps": [],
-                "recommendations": []
-            }
-
-        # Prepare incorrect questions summary
-        incorrect_summary = ""
-        for q in incorrect_questions:
-            incorrect_summary += f"- {q['question'][:100]}... (Topic: {topic})\n"
+    gaps_text = ""
+    for gap in gaps:
+        gaps_text += f"- {gap['gap']} (severity: {gap['severity']}; {gap['description']})\n"
 
-        prompt = f"""You are an AWS certification advisor for the {cert_name} certification.
+    prompt = f"""You are an AWS certification advisor for the {cert_name} certification.
 
-The user scored incorrectly on these topics within {topic}:
-{incorrect_summary}
-
-Based on their incorrect answers, provide:
-1. Specific knowledge gaps they should address
-2. Recommended learning topics and AWS services to study
-3. Study priorities (most important first)
+The learner's most recent quiz was on {topic}. Their weakest areas, already ranked from their quiz history (most important first), are:
+{gaps_text}
+Write short, encouraging study advice for these areas only. Do not add new areas.
 
 Format your response as JSON:
 {{
-  "overall_assessment": "Brief assessment of their knowledge level",
-  "gaps": [
-    {{
-      "gap": "Specific knowledge gap",
-      "severity": "high/medium/low",
-      "aws_service": "Relevant AWS service",
-      "description": "Why this matters for the certification"
-    }}
-  ],
+  "overall_assessment": "One or two sentences on where they stand",
   "recommendations": [
     {{
-      "topic": "Topic to study",
+      "topic": "Area from the list above",
       "priority": 1,
       "learning_resources": "What to focus on",
       "practice_area": "Specific area to practice"
@@ -340,48 +613,25 @@ Format your response as JSON:
 }}
 
 Return ONLY valid JSON, no additional text."""
+    return prompt
 
-        request_body = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [{"text": prompt}]
-                }
-            ],
-            "inferenceConfig": {
-                "maxTokens": 4000,
-                "temperature": 0.7,
-                "topP": 0.9
-            }
-        }
 
-        response = bedrock_client.converse(
-            modelId="us.amazon.nova-pro-v1:0",
-            messages=request_body["messages"],
-            inferenceConfig=request_body["inferenceConfig"]
-        )
+def parse_knowledge_gaps(response_text):
+    """
+    Parse the advice object, or None if the output is unusable
+    """
+    try:
+        advice = json.loads(strip_code_fence(response_text))
+    except json.JSONDecodeError as e:
+        print(f"JSON parsing error in gap advice: {str(e)}")
+        return None
 
-        response_text = response['output']['message']['content'][0]['text']
-        
-        # Clean up response
-        response_text = response_text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        knowledge_gaps = json.loads(response_text)
-        return knowledge_gaps
+    if not isinstance(advice, dict) or not isinstance(advice.get('overall_assessment'), str) \
+            or not isinstance(advice.get('recommendations'), list):
+        print("Error: Gap advice response is missing fields")
+        return None
 
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error in knowledge gaps: {str(e)}")
-        return {"gaps": [], "recommendations": []}
-    except Exception as e:
-        print(f"Error identifying knowledge gaps: {str(e)}")
-        return {"gaps": [], "recommendations": []}
+    return advice
 
 
 def get_performance_summary(percentage_score):
@@ -411,7 +661,7 @@ def create_error_response(event, status_code, error_message):
             "httpStatusCode": status_code,
             "responseBody": {
                 "application/json": {
-                    "body": json.dumps({
+                    "body": dumps({
                         "error": error_message
                     })
                 }
@@ -0,0 +1,114 @@
+import json
+from botocore.exceptions import ClientError
+from cohort_stats import COHORT_STATS_TABLE, DEFAULT_COHORT, cert_key, get_stats, question_key, topic_key
+from session_profile import get_user_profile
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+TABLES = ['user_profile', COHORT_STATS_TABLE]
+preload_clients(CLIENTS, TABLES)
+
+def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS, TABLES)
+
+    try:
+        print("INSIDE COHORT STATS LAMBDA FUNCTION")
+        print("Full event:", json.dumps(event, indent=2))
+
+        # Extract parameters from event['parameters']
+        params = {}
+        if 'parameters' in event:
+            for param in event['parameters']:
+                name = param.get('name')
+                value = param.get('value')
+                if name and value is not None:
+                    params[name] = value
+
+        # Fallback: try extracting from requestBody (optional)
+        if not params and 'requestBody' in event:
+            try:
+                content = event['requestBody'].get('content', {})
+                app_json = content.get('application/json', {})
+                properties = app_json.get('properties', [])
+                for prop in properties:
+                    name = prop.get('name')
+                    value = prop.get('value')
+                    if name and value is not None:
+                        params[name] = value
+            except Exception as e:
+                print(f"Error extracting from requestBody: {e}")
+
+        username = params.get('username')
+        cohort = params.get('cohort') or DEFAULT_COHORT
+        topic = params.get('topic')
+        question_id = params.get('question_id')
+
+        if not username:
+            return create_error_response(event, 400, 'username is required')
+
+        # Statistics are precomputed by tools/cohort_analytics.py; each call is
+        # one GetItem (plus the profile when the cert is not given)
+        if question_id:
+            stats_key = question_key(question_id, cohort)
+        else:
+            cert = params.get('certification')
+            if not cert:
+                profile = get_user_profile(event, username.lower(), get_table('user_profile'))
+                if profile is None:
+                    return create_error_response(event, 404, f"User '{username}' not found")
+                cert = profile.get('recommended_cert', 'AWS Certified Cloud Practitioner')
+            stats_key = topic_key(cert, topic, cohort) if topic else cert_key(cert, cohort)
+
+        stats = get_stats(get_table(COHORT_STATS_TABLE), stats_key)
+        if stats is None:
+            return create_error_response(event, 404, f"No cohort statistics for '{stats_key}' yet")
+        stats.pop('stats_key', None)
+
+        return {
+            "messageVersion": "1.0",
+            "response": {
+                "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+                "apiPath": event.get('apiPath'),
+                "httpMethod": event.get('httpMethod', 'POST'),
+                "httpStatusCode": 200,
+                "responseBody": {
+                    "application/json": {
+                        "body": dumps(stats)
+                    }
+                }
+            }
+        }
+
+    except ClientError as e:
+        print(f"DynamoDB ClientError: {str(e)}")
+        return create_error_response(event, 500, f"DynamoDB error: {str(e)}")
+    except Exception as e:
+        print(f"Unhandled error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
+
+
+def create_error_response(event, status_code, error_message):
+    """
+    Helper function to create standardized error responses
+    """
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'POST'),
+            "httpStatusCode": status_code,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps({
+                        "error": error_message
+                    })
+                }
+            }
+        }
+    }
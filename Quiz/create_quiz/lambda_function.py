@@ -1,11 +1,48 @@
 import json
-import boto3
 import os
 import uuid
 from datetime import datetime
 from botocore.exceptions import ClientError
+from bedrock_guard import BedrockUnavailable
+from model_router import converse_routed, strip_code_fence
+from session_profile import get_user_profile
+from gap_analytics import DIFFICULTIES
+from quiz_store import append_packed_questions, create_packed_quiz, end_generation, static_question, use_packed_layout
+from seen_questions import SEEN_QUESTION_FILTER, SEEN_QUESTIONS_TABLE, TOPUP_ROUNDS, split_seen
+from seen_questions import load as load_seen
+from question_index import QUESTION_INDEX, QuestionIndex, assign_clusters, flush_clusters
+from async_jobs import (ASYNC_QUIZ_MIN_QUESTIONS, JOBS_TABLE, JobFailed, create_job, enqueue, is_job_event,
+                        job_event, new_job_id, run_job, update_ready, use_async)
+from profile_events import PROFILE_EVENTS, cert_changes, is_stream_event
+from starter_quiz import (STARTER_QUIZ_QUESTIONS, STARTER_QUIZ_TABLE, STARTER_QUIZ_TOPIC, STARTER_QUIZZES, claim_starter,
+                          has_starter, store_starter)
+from json_codec import dumps
+from call_ledger import set_context, update_context
+from aws_clients import get_bedrock_runtime, get_dynamodb, get_lambda, get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients this function uses; built during init (see common/aws_clients.py).
+# lambda queues the background job of a full-length quiz and primes loadcertinfo.
+CLIENTS = ['dynamodb', 'bedrock-runtime', 'lambda']
+preload_clients(CLIENTS)
+
+# Questions per model call in the background job. Each batch is stored as
+# soon as it is generated, so the next question is usually there before the
+# user answers the current one.
+GENERATION_BATCH = int(os.environ.get('QUIZ_GENERATION_BATCH', '5'))
+
+# Warmed with the CertInfo record of a user's new recommended_cert
+LOADCERTINFO_FUNCTION = os.environ.get('LOADCERTINFO_FUNCTION', 'loadcertinfo')
 
 def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS)
+
+    if is_job_event(event):
+        return run_job(get_table(JOBS_TABLE), event, {'create_quiz': complete_quiz_generation}, context)
+
+    if is_stream_event(event):
+        return prewarm_certifications(event)
+
     try:
         print("INSIDE CREATE QUIZ LAMBDA FUNCTION")
         print("Full event:", json.dumps(event, indent=2))
@@ -41,14 +78,14 @@ def lambda_handler(event, context):
 
         # lowercase username
         username = username.lower()
+        set_context(handler='create_quiz', user=username)
 
         # Optional parameters
         topic = params.get('topic', 'AWS General')
         num_questions = int(params.get('num_questions', 5))
 
         # Initialize AWS clients
-        dynamodb = boto3.resource('dynamodb')
-        bedrock_runtime = boto3.client('bedrock-runtime')
+        bedrock_runtime = get_bedrock_runtime()
         
         # Get table names from environment or use defaults
         user_profile_table_name = os.environ.get('USER_PROFILE_TABLE', 'user_profile')
@@ -56,36 +93,65 @@ def lambda_handler(event, context):
         question_table_name = os.environ.get('QUESTION_TABLE', 'question')
 
         # Step 1: Lookup user profile to get recommended_cert
-        user_profile_table = dynamodb.Table(user_profile_table_name)
+        user_profile_table = get_table(user_profile_table_name)
         
         try:
-            user_response = user_profile_table.get_item(Key={'username': username})
-            if 'Item' not in user_response:
+            user_profile = get_user_profile(event, username, user_profile_table)
+            if user_profile is None:
                 return create_error_response(event, 404, f"User '{username}' not found")
             
-            recommended_cert = user_response['Item'].get('recommended_cert', 'AWS Certified Cloud Practitioner')
+            recommended_cert = user_profile.get('recommended_cert', 'AWS Certified Cloud Practitioner')
         except ClientError as e:
             print(f"Error fetching user profile: {str(e)}")
             return create_error_response(event, 500, f"Error fetching user profile: {str(e)}")
 
-        # Step 2: Generate questions using Bedrock Nova Pro
-        print(f"Generating {num_questions} questions for {recommended_cert} on topic: {topic}")
+        # Step 2: Generate questions using Bedrock Nova Pro. A full-length quiz
+        # can outlast the action group timeout, so only its first question is
+        # generated here and a background job adds the rest (common/async_jobs.py).
+        # A starter quiz generated when the cert was recommended is served
+        # without any model call (common/starter_quiz.py).
+        run_async = num_questions > 1 and use_async(num_questions >= ASYNC_QUIZ_MIN_QUESTIONS)
+        generate_count = 1 if run_async else num_questions
         
-        questions = generate_questions_with_bedrock(
-            bedrock_runtime, 
-            recommended_cert, 
-            topic, 
-            num_questions
-        )
+        # The quiz id is chosen up front so the model calls are tagged with it
+        # in the call ledger (common/call_ledger.py)
+        quiz_id = f"quiz-{uuid.uuid4()}"
+        update_context(ref=quiz_id)
+
+        try:
+            # Questions the user was already served are replaced (common/seen_questions.py)
+            seen = load_seen_questions(username)
+            index = question_index()
+            questions = claim_starter_quiz(username, recommended_cert, topic, num_questions)
+            if questions:
+                run_async = False
+                print(f"Serving the starter quiz for {recommended_cert} on topic: {topic}")
+            else:
+                print(f"Generating {generate_count} of {num_questions} questions for {recommended_cert} on topic: {topic}")
+                questions = generate_unseen_questions(
+                    bedrock_runtime, 
+                    recommended_cert, 
+                    topic, 
+                    generate_count,
+                    seen,
+                    index=index
+                )
+        except BedrockUnavailable as e:
+            print(f"Question generation unavailable: {str(e)}")
+            return create_error_response(
+                event,
+                503,
+                "Quiz generation is busy right now, please try again shortly",
+                retry_after=e.retry_after
+            )
         
         if not questions:
             return create_error_response(event, 500, "Failed to generate questions")
 
-        # Step 3: Create quiz_id and store in DynamoDB
-        quiz_id = f"quiz-{uuid.uuid4()}"
+        # Step 3: Store the quiz in DynamoDB
         
         # Store quiz metadata
-        quiz_table = dynamodb.Table(quiz_table_name)
+        quiz_table = get_table(quiz_table_name)
         quiz_item = {
             'id': quiz_id,
             'username': username,
@@ -95,22 +161,32 @@ def lambda_handler(event, context):
             'user_score': 0,
             'created_at': datetime.utcnow().isoformat()
         }
-        
-        quiz_table.put_item(Item=quiz_item)
-        
-        # Store questions
-        question_table = dynamodb.Table(question_table_name)
-        
-        for idx, q in enumerate(questions, start=1):
-            question_item = {
+
+        job_id = None
+        if run_async:
+            # Readers treat a quiz with generation_job as still growing
+            job_id = new_job_id()
+            quiz_item['generation_job'] = job_id
+            create_job(get_table(JOBS_TABLE), job_id, 'create_quiz', username, {
                 'quiz_id': quiz_id,
-                'order': str(idx),
-                'question': q['question'],
-                'options': q['options'],
-                'correct_answer': q['correct_answer'],
-                'user_score': 0
-            }
-            question_table.put_item(Item=question_item)
+                'topic': topic,
+                'recommended_cert': recommended_cert,
+                'num_questions': num_questions,
+                'packed': use_packed_layout(),
+                'first_question': static_question(questions[0])
+            }, ready={'quiz_id': quiz_id, 'questions_ready': 1})
+        
+        if use_packed_layout():
+            # Packed layout: the whole quiz is one item in the quiz table
+            create_packed_quiz(quiz_table, quiz_item, questions)
+        else:
+            quiz_table.put_item(Item=quiz_item)
+            store_question_rows(get_table(question_table_name), quiz_id, questions)
+
+        record_seen_questions(seen, questions)
+        flush_clusters(index)
+        if job_id:
+            start_generation_job(job_id)
 
         # Prepare first question for response
         first_question = questions[0] if questions else None
@@ -127,6 +203,8 @@ def lambda_handler(event, context):
                 "correct_answer": first_question['correct_answer']
             }
         }
+        if job_id:
+            response_body.update(job_id=job_id, questions_ready=1, generation_pending=True)
 
         # Return formatted Bedrock Agent response
         return {
@@ -138,7 +216,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 200,
                 "responseBody": {
                     "application/json": {
-                        "body": json.dumps(response_body)
+                        "body": dumps(response_body)
                     }
                 }
             }
@@ -154,24 +232,305 @@ def lambda_handler(event, context):
         return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
 
 
-def generate_questions_with_bedrock(bedrock_client, cert_name, topic, num_questions):
+def start_generation_job(job_id):
+    """
+    Queue the background job; if it can't be queued, run it right here so
+    the quiz is still completed
+    """
+    try:
+        enqueue(job_id)
+    except Exception as e:
+        print(f"Could not queue job {job_id}, generating inline: {str(e)}")
+        run_job(get_table(JOBS_TABLE), job_event(job_id), {'create_quiz': complete_quiz_generation})
+
+
+def complete_quiz_generation(job):
     """
-    Generate quiz questions using Amazon Bedrock Nova Pro model
+    Background job of an async quiz: generate the questions after the first
+    in batches, store each batch, then clear the quiz's generation_job. If
+    generation fails, the quiz is cut to the questions it already has.
     """
+    payload = job['payload']
+    quiz_id, username = payload['quiz_id'], job['username']
+    set_context(handler='create_quiz', user=username, ref=quiz_id)
+    num_questions = int(payload['num_questions'])
+    quiz_table = get_table(os.environ.get('QUIZ_TABLE', 'quiz'))
+    question_table = get_table(os.environ.get('QUESTION_TABLE', 'question'))
+    jobs_table = get_table(JOBS_TABLE)
+    seen = load_seen_questions(username)
+    index = question_index()
+
+    questions = [payload['first_question']]
+    while len(questions) < num_questions:
+        batch_size = min(GENERATION_BATCH, num_questions - len(questions))
+        try:
+            batch = generate_unseen_questions(
+                get_bedrock_runtime(),
+                payload['recommended_cert'],
+                payload['topic'],
+                batch_size,
+                seen,
+                kept=questions,
+                index=index
+            )
+        except BedrockUnavailable as e:
+            print(f"Question generation unavailable: {str(e)}")
+            batch = None
+        if not batch:
+            end_generation(quiz_table, username, quiz_id, len(questions))
+            raise JobFailed(f"Only {len(questions)} of {num_questions} questions could be generated; the quiz ends after question {len(questions)}",
+                            {'quiz_id': quiz_id, 'questions_ready': len(questions)})
+
+        start = len(questions) + 1
+        questions.extend(batch)
+        final = len(questions) == num_questions
+        if payload.get('packed'):
+            append_packed_questions(quiz_table, username, quiz_id, job['job_id'], questions, final)
+        else:
+            store_question_rows(question_table, quiz_id, batch, start=start)
+            if final:
+                end_generation(quiz_table, username, quiz_id)
+        record_seen_questions(seen, batch)
+        flush_clusters(index)
+        update_ready(jobs_table, job['job_id'], {'quiz_id': quiz_id, 'questions_ready': len(questions)})
+
+    return {'quiz_id': quiz_id, 'total_question_count': num_questions, 'questions_ready': num_questions}
+
+
+def claim_starter_quiz(username, cert, topic, num_questions):
+    """
+    The user's parked starter quiz if it matches this request, else None
+    """
+    if not STARTER_QUIZZES:
+        return None
     try:
-        prompt = f"""You are an AWS certification exam expert. Generate {num_questions} multiple-choice questions for the {cert_name} certification exam, focusing on the topic: {topic}.
+        return claim_starter(get_table(STARTER_QUIZ_TABLE), username, cert, topic, num_questions)
+    except ClientError as e:
+        print(f"Starter quiz unavailable, generating: {str(e)}")
+        return None
+
+
+def prewarm_certifications(event):
+    """
+    user_profile stream consumer (common/profile_events.py): for each user
+    whose recommended_cert changed, warm loadcertinfo with the cert's
+    CertInfo record and park a starter quiz for the cert. Best effort; a
+    failure is logged and never retried, so the stream keeps moving.
+    """
+    prewarmed = []
+    for username, cert in cert_changes(event):
+        set_context(handler='create_quiz', user=username, ref='starter')
+        prime_cert_info(cert)
+        try:
+            prewarmed.append({'username': username, 'recommended_cert': cert,
+                              'starter_quiz': generate_starter_quiz(username, cert)})
+        except (BedrockUnavailable, ClientError) as e:
+            print(f"Could not generate the starter quiz for {username} ({cert}): {str(e)}")
+    print(f"Prewarmed: {dumps(prewarmed)}")
+    return {'prewarmed': prewarmed}
+
+
+def prime_cert_info(cert):
+    """
+    Asynchronous warm-up of loadcertinfo that also loads the CertInfo record
+    into its cache (common/cert_info.py)
+    """
+    if PROFILE_EVENTS == 'local':
+        return
+    try:
+        get_lambda().invoke(
+            FunctionName=LOADCERTINFO_FUNCTION,
+            InvocationType='Event',
+            Payload=dumps({'warmup': True, 'prime': {'certification': cert}}).encode('utf-8')
+        )
+    except ClientError as e:
+        print(f"Could not prime {LOADCERTINFO_FUNCTION}: {str(e)}")
+
+
+def generate_starter_quiz(username, cert):
+    """
+    Generate and park the starter quiz. Returns whether one was generated.
+    """
+    if not STARTER_QUIZZES:
+        return False
+    starter_table = get_table(STARTER_QUIZ_TABLE)
+    if has_starter(starter_table, username, cert):
+        return False
+    # Filtered like a normal quiz; recorded as seen only when it is claimed
+    index = question_index()
+    questions = generate_unseen_questions(
+        get_bedrock_runtime(), cert, STARTER_QUIZ_TOPIC, STARTER_QUIZ_QUESTIONS,
+        load_seen_questions(username), index=index
+    )
+    if not questions:
+        return False
+    store_starter(starter_table, username, cert, STARTER_QUIZ_TOPIC, questions)
+    flush_clusters(index)
+    return True
+
+
+def load_seen_questions(username):
+    """
+    The user's seen-question record, or None when the filter is off or the
+    record can't be read (the quiz is then generated unfiltered)
+    """
+    if not SEEN_QUESTION_FILTER:
+        return None
+    try:
+        return load_seen(get_table(SEEN_QUESTIONS_TABLE), username)
+    except ClientError as e:
+        print(f"Seen-question record unavailable, not filtering: {str(e)}")
+        return None
+
+
+def record_seen_questions(seen, questions):
+    if seen is None:
+        return
+    for q in questions:
+        seen.add(q['question'], q.get('cluster_id'))
+    try:
+        seen.save(get_table(SEEN_QUESTIONS_TABLE))
+    except ClientError as e:
+        print(f"Could not save seen questions: {str(e)}")
+
+
+def question_index():
+    """
+    Near-duplicate index for this request (common/question_index.py), or
+    None when it is turned off
+    """
+    return QuestionIndex(get_dynamodb()) if QUESTION_INDEX else None
+
+
+def generate_unseen_questions(bedrock_client, cert_name, topic, num_questions, seen, kept=(), index=None):
+    """
+    generate_questions_with_bedrock, minus questions the user has seen or
+    that repeat kept (questions the quiz already has). Repeats are replaced by
+    top-up calls for just the missing count. If the top-ups run out, repeats
+    fill the gap so the quiz keeps its size. With index, questions are tagged
+    with their near-duplicate cluster_id first, so paraphrases count as repeats.
+    """
+    exclude = [q['question'] for q in kept] + (seen.recent if seen is not None else [])
+    questions = generate_questions_with_bedrock(bedrock_client, cert_name, topic, num_questions, exclude or None)
+    assign_clusters(index, questions)
+    if not questions or seen is None:
+        return questions
+
+    fresh, repeats = split_seen(seen, questions, kept)
+    for _ in range(TOPUP_ROUNDS):
+        if len(fresh) >= num_questions:
+            break
+        missing = num_questions - len(fresh)
+        print(f"{missing} of {num_questions} generated questions were already seen, generating replacements")
+        exclude += [q['question'] for q in fresh + repeats]
+        top_up = generate_questions_with_bedrock(bedrock_client, cert_name, topic, missing, exclude)
+        if not top_up:
+            break
+        assign_clusters(index, top_up)
+        new_fresh, new_repeats = split_seen(seen, top_up, list(kept) + fresh)
+        fresh += new_fresh
+        repeats += new_repeats
+
+    if len(fresh) < num_questions:
+        print(f"Serving {num_questions - len(fresh)} repeated questions, no fresh replacements were generated")
+        fresh += repeats[:num_questions - len(fresh)]
+    return fresh[:num_questions]
+
+
+def generate_questions_with_bedrock(bedrock_client, cert_name, topic, num_questions, exclude_questions=None):
+    """
+    Generate quiz questions using Amazon Bedrock, starting on the model tier the
+    router picks for this quiz size and escalating when the output is invalid
+    """
+    try:
+        request_body = {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"text": build_question_prompt(cert_name, topic, num_questions, exclude_questions)}]
+                }
+            ],
+            "inferenceConfig": {
+                "maxTokens": 5000,
+                "temperature": 0.7,
+                "topP": 0.9
+            }
+        }
+
+        questions, model_id = converse_routed(
+            bedrock_client,
+            'quiz_generation',
+            num_questions,
+            request_body["messages"],
+            request_body["inferenceConfig"],
+            lambda response_text: parse_questions(response_text, num_questions)
+        )
+        return questions
+
+    except BedrockUnavailable:
+        raise
+    except Exception as e:
+        print(f"Error generating questions with Bedrock: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def store_question_rows(question_table, quiz_id, questions, start=1):
+    """
+    Two-table layout: one row per question in the question table. start is
+    the order of the first question in the list.
+    """
+    for idx, q in enumerate(questions, start=start):
+        question_item = {
+            'quiz_id': quiz_id,
+            'order': str(idx),
+            'question': q['question'],
+            'options': q['options'],
+            'correct_answer': q['correct_answer'],
+            'explanation': q['explanation'],
+            'domain': q['domain'],
+            'aws_service': q['aws_service'],
+            'difficulty': q['difficulty'],
+            'user_score': 0
+        }
+        if q.get('cluster_id'):
+            question_item['cluster_id'] = q['cluster_id']
+        question_table.put_item(Item=question_item)
+
+
+def build_question_prompt(cert_name, topic, num_questions, exclude_questions=None):
+    """
+    Prompt used for question generation. exclude_questions: questions the
+    quiz already has (later batches of an async quiz).
+    """
+    exclude_text = ""
+    if exclude_questions:
+        exclude_text = "\n- Do not repeat or rephrase any of these questions, which the quiz already has:\n"
+        exclude_text += "\n".join(f"  * {question}" for question in exclude_questions)
+    prompt = f"""You are an AWS certification exam expert. Generate {num_questions} multiple-choice questions for the {cert_name} certification exam, focusing on the topic: {topic}.
 
 For each question, provide:
 1. A clear, exam-style question
 2. Exactly 4 answer options (labeled A, B, C, D)
 3. The index (0-3) of the correct answer
+4. An explanation: why the correct answer is right, a one or two sentence rationale for EACH option (why it is right or wrong), and the key concepts being tested
+5. Tags: the official {cert_name} exam domain the question belongs to, the main AWS service it tests, and its difficulty (easy, medium or hard)
 
 Format your response as a valid JSON array with this exact structure:
 [
   {{
     "question": "Question text here?",
     "options": ["Option A text", "Option B text", "Option C text", "Option D text"],
-    "correct_answer": 0
+    "correct_answer": 0,
+    "domain": "Exam domain name",
+    "aws_service": "Amazon S3",
+    "difficulty": "medium",
+    "explanation": {{
+      "why_correct": "Why the correct option is right",
+      "option_rationales": ["Rationale for A", "Rationale for B", "Rationale for C", "Rationale for D"],
+      "key_concepts": ["concept1", "concept2"]
+    }}
   }}
 ]
 
@@ -179,79 +538,81 @@ Requirements:
 - Questions should be realistic exam-level difficulty
 - Options should be plausible but only one clearly correct
 - Cover different aspects of {topic}
-- Return ONLY the JSON array, no additional text
+- Return ONLY the JSON array, no additional text{exclude_text}
 
 Generate {num_questions} questions now:"""
+    return prompt
 
-        # Prepare request for Nova Pro
-        request_body = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [{"text": prompt}]
-                }
-            ],
-            "inferenceConfig": {
-                "maxTokens": 4000,
-                "temperature": 0.7,
-                "topP": 0.9
-            }
-        }
-
-        # Invoke Bedrock model
-        response = bedrock_client.converse(
-            modelId="us.amazon.nova-pro-v1:0",
-            messages=request_body["messages"],
-            inferenceConfig=request_body["inferenceConfig"]
-        )
-
-        # Extract response text
-        response_text = response['output']['message']['content'][0]['text']
-        print(f"Bedrock response: {response_text}")
-
-        # Parse JSON response
-        # Clean up response in case there's markdown formatting
-        response_text = response_text.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.startswith('```'):
-            response_text = response_text[3:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        questions = json.loads(response_text)
-        
-        # Validate questions format
-        if not isinstance(questions, list):
-            print("Error: Response is not a list")
-            return None
-        
-        for q in questions:
-            if not all(key in q for key in ['question', 'options', 'correct_answer']):
-                print(f"Error: Invalid question format: {q}")
-                return None
-            if not isinstance(q['options'], list) or len(q['options']) != 4:
-                print(f"Error: Invalid options format: {q}")
-                return None
-
-        return questions
 
+def parse_questions(response_text, num_questions):
+    """
+    Parse and validate the model output. Returns the list of questions, or None
+    if the output is unusable (which makes the router escalate)
+    """
+    print(f"Bedrock response: {response_text}")
+    try:
+        questions = json.loads(strip_code_fence(response_text))
     except json.JSONDecodeError as e:
         print(f"JSON parsing error: {str(e)}")
-        print(f"Response text: {response_text}")
         return None
-    except Exception as e:
-        print(f"Error generating questions with Bedrock: {str(e)}")
-        import traceback
-        traceback.print_exc()
+
+    # Validate questions format
+    if not isinstance(questions, list):
+        print("Error: Response is not a list")
         return None
 
+    if len(questions) < num_questions:
+        print(f"Error: Expected {num_questions} questions, got {len(questions)}")
+        return None
+
+    for q in questions:
+        if not isinstance(q, dict) or not all(key in q for key in ['question', 'options', 'correct_answer']):
+            print(f"Error: Invalid question format: {q}")
+            return None
+        if not isinstance(q['options'], list) or len(q['options']) != 4:
+            print(f"Error: Invalid options format: {q}")
+            return None
+        if q['correct_answer'] not in [0, 1, 2, 3]:
+            print(f"Error: Invalid correct_answer: {q}")
+            return None
+        if not is_valid_explanation(q.get('explanation')):
+            print(f"Error: Invalid explanation: {q}")
+            return None
+        if not all(isinstance(q.get(tag), str) and q[tag].strip() for tag in ['domain', 'aws_service', 'difficulty']):
+            print(f"Error: Missing question tags: {q}")
+            return None
+        q['difficulty'] = q['difficulty'].strip().lower()
+        if q['difficulty'] not in DIFFICULTIES:
+            print(f"Error: Invalid difficulty: {q}")
+            return None
+
+    return questions[:num_questions]
+
+
+def is_valid_explanation(explanation):
+    """
+    Explanations are stored on the question row and served by ShowResult as-is,
+    so they must be complete
+    """
+    if not isinstance(explanation, dict):
+        return False
+    if not isinstance(explanation.get('why_correct'), str) or not explanation['why_correct'].strip():
+        return False
+    rationales = explanation.get('option_rationales')
+    if not isinstance(rationales, list) or len(rationales) != 4:
+        return False
+    if not all(isinstance(r, str) for r in rationales):
+        return False
+    return isinstance(explanation.get('key_concepts'), list)
+
 
-def create_error_response(event, status_code, error_message):
+def create_error_response(event, status_code, error_message, retry_after=None):
     """
     Helper function to create standardized error responses
     """
+    error_body = {"error": error_message}
+    if retry_after is not None:
+        error_body["retry_after_seconds"] = round(retry_after, 1)
     return {
         "messageVersion": "1.0",
         "response": {
@@ -261,9 +622,7 @@ def create_error_response(event, status_code, error_message):
             "httpStatusCode": status_code,
             "responseBody": {
                 "application/json": {
-                    "body": json.dumps({
-                        "error": error_message
-                    })
+                    "body": dumps(error_body)
                 }
             }
         }
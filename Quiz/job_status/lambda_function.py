@@ -0,0 +1,100 @@
+import json
+from botocore.exceptions import ClientError
+from async_jobs import JOBS_TABLE, get_job, job_view
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+TABLES = [JOBS_TABLE]
+preload_clients(CLIENTS, TABLES)
+
+def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS, TABLES)
+
+    try:
+        print("INSIDE JOB STATUS LAMBDA FUNCTION")
+        print("Full event:", json.dumps(event, indent=2))
+
+        # Extract parameters from event['parameters']
+        params = {}
+        if 'parameters' in event:
+            for param in event['parameters']:
+                name = param.get('name')
+                value = param.get('value')
+                if name and value is not None:
+                    params[name] = value
+
+        # Fallback: try extracting from requestBody (optional)
+        if not params and 'requestBody' in event:
+            try:
+                content = event['requestBody'].get('content', {})
+                app_json = content.get('application/json', {})
+                properties = app_json.get('properties', [])
+                for prop in properties:
+                    name = prop.get('name')
+                    value = prop.get('value')
+                    if name and value is not None:
+                        params[name] = value
+            except Exception as e:
+                print(f"Error extracting from requestBody: {e}")
+
+        job_id = params.get('job_id')
+        username = params.get('username')
+
+        if not job_id:
+            return create_error_response(event, 400, 'job_id is required')
+        if not username:
+            return create_error_response(event, 400, 'username is required')
+
+        # One consistent GetItem; jobs of other users are reported as missing
+        job = get_job(get_table(JOBS_TABLE), job_id)
+        if job is None or job.get('username') != username.lower():
+            return create_error_response(event, 404, f"Job '{job_id}' not found")
+
+        return {
+            "messageVersion": "1.0",
+            "response": {
+                "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+                "apiPath": event.get('apiPath'),
+                "httpMethod": event.get('httpMethod', 'POST'),
+                "httpStatusCode": 200,
+                "responseBody": {
+                    "application/json": {
+                        "body": dumps(job_view(job))
+                    }
+                }
+            }
+        }
+
+    except ClientError as e:
+        print(f"DynamoDB ClientError: {str(e)}")
+        return create_error_response(event, 500, f"DynamoDB error: {str(e)}")
+    except Exception as e:
+        print(f"Unhandled error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return create_error_response(event, 500, f"Unhandled exception: {str(e)}")
+
+
+def create_error_response(event, status_code, error_message):
+    """
+    Helper function to create standardized error responses
+    """
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'POST'),
+            "httpStatusCode": status_code,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps({
+                        "error": error_message
+                    })
+                }
+            }
+        }
+    }
@@ -1,9 +1,19 @@
 import json
-import boto3
 import os
 from botocore.exceptions import ClientError
+from session_profile import refreshed_session_attributes
+from profile_events import publish_profile_change
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+preload_clients(CLIENTS)
 
 def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS)
+
     try:
         print("INSIDE LAMBDA FUNCTION")
         print("Full event:", json.dumps(event, indent=2))
@@ -36,7 +46,7 @@ def lambda_handler(event, context):
         if not username:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'username is required'})
+                'body': dumps({'error': 'username is required'})
             }
 
         # Allowed update fields
@@ -52,13 +62,12 @@ def lambda_handler(event, context):
         if not update_expr:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'No valid fields to update'})
+                'body': dumps({'error': 'No valid fields to update'})
             }
 
         # DynamoDB table from environment or default
         table_name = os.environ.get('DYNAMODB_TABLE', 'user_profile')
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(table_name)
+        table = get_table(table_name)
 
         # Update the user profile
         response = table.update_item(
@@ -69,9 +78,11 @@ def lambda_handler(event, context):
         )
 
         updated_attributes = response.get("Attributes", {})
+        # Stand-in for the user_profile stream in local runs (common/profile_events.py)
+        publish_profile_change(username, updated_attributes)
 
         # Return formatted Bedrock Agent response
-        return {
+        agent_response = {
             "messageVersion": "1.0",
             "response": {
                 "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
@@ -80,7 +91,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 200,
                 "responseBody": {
                     "application/json": {
-                        "body": json.dumps({
+                        "body": dumps({
                             "message": "User profile updated successfully!",
                             "updatedAttributes": updated_attributes
                         })
@@ -89,15 +100,22 @@ def lambda_handler(event, context):
             }
         }
 
+        # Keep the profile carried in the agent session in sync with the update
+        session_attributes = refreshed_session_attributes(event, username, updated_attributes)
+        if session_attributes is not None:
+            agent_response["sessionAttributes"] = session_attributes
+
+        return agent_response
+
     except ClientError as e:
         print(f"DynamoDB ClientError: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': f"DynamoDB error: {str(e)}"})
+            'body': dumps({'error': f"DynamoDB error: {str(e)}"})
         }
     except Exception as e:
         print(f"Unhandled error: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': f"Unhandled exception: {str(e)}"})
+            'body': dumps({'error': f"Unhandled exception: {str(e)}"})
         }  
@@ -1,9 +1,19 @@
 import json
-import boto3
 import os
 from botocore.exceptions import ClientError
+from session_profile import refreshed_session_attributes
+from profile_events import publish_profile_change
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+preload_clients(CLIENTS)
 
 def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS)
+
     try:
         print("INSIDE UPDATE RECOMMENDED CERT LAMBDA FUNCTION")
         print("Full event:", json.dumps(event, indent=2))
@@ -38,19 +48,18 @@ def lambda_handler(event, context):
         if not username:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'username is required'})
+                'body': dumps({'error': 'username is required'})
             }
         
         if not recommended_cert:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'recommended_cert is required'})
+                'body': dumps({'error': 'recommended_cert is required'})
             }
 
         # DynamoDB table from environment or default
         table_name = os.environ.get('DYNAMODB_TABLE', 'user_profile')
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(table_name)
+        table = get_table(table_name)
 
         # Update the recommended_cert field
         response = table.update_item(
@@ -63,9 +72,11 @@ def lambda_handler(event, context):
         )
 
         updated_attributes = response.get("Attributes", {})
+        # Stand-in for the user_profile stream in local runs (common/profile_events.py)
+        publish_profile_change(username, updated_attributes)
 
         # Return formatted Bedrock Agent response
-        return {
+        agent_response = {
             "messageVersion": "1.0",
             "response": {
                 "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
@@ -74,7 +85,7 @@ def lambda_handler(event, context):
                 "httpStatusCode": 200,
                 "responseBody": {
                     "application/json": {
-                        "body": json.dumps({
+                        "body": dumps({
                             "message": f"Recommended certification updated successfully for user: {username}",
                             "username": username,
                             "recommended_cert": recommended_cert,
@@ -85,6 +96,13 @@ def lambda_handler(event, context):
             }
         }
 
+        # Keep the profile carried in the agent session in sync with the update
+        session_attributes = refreshed_session_attributes(event, username, updated_attributes)
+        if session_attributes is not None:
+            agent_response["sessionAttributes"] = session_attributes
+
+        return agent_response
+
     except ClientError as e:
         error_code = e.response['Error']['Code']
         print(f"DynamoDB ClientError: {str(e)}")
@@ -93,16 +111,16 @@ def lambda_handler(event, context):
         if error_code == 'ResourceNotFoundException':
             return {
                 'statusCode': 404,
-                'body': json.dumps({'error': f"User with username '{params.get('username')}' not found"})
+                'body': dumps({'error': f"User with username '{params.get('username')}' not found"})
             }
         
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': f"DynamoDB error: {str(e)}"})
+            'body': dumps({'error': f"DynamoDB error: {str(e)}"})
         }
     except Exception as e:
         print(f"Unhandled error: {str(e)}")
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': f"Unhandled exception: {str(e)}"})
+            'body': dumps({'error': f"Unhandled exception: {str(e)}"})
         }
@@ -0,0 +1,239 @@
+import json
+import os
+import re
+from botocore.exceptions import ClientError
+from bedrock_guard import BedrockUnavailable
+from model_router import converse_routed, strip_code_fence
+from tutor_lessons import (DEPTHS, DEPTH_GUIDANCE, LESSONS_TABLE, lesson_id, load_catalogue,
+                           store_catalogue, store_lesson)
+from json_codec import dumps
+from call_ledger import set_context
+from aws_clients import get_bedrock_runtime, get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb', 'bedrock-runtime']
+TABLES = ['CertInfo', LESSONS_TABLE]
+preload_clients(CLIENTS, TABLES)
+
+# CertInfo attributes that may hold the exam domains, in order of preference.
+# Certifications without any of them get their domains from the model once.
+CERT_DOMAIN_ATTRIBUTES = os.environ.get('CERT_DOMAIN_ATTRIBUTES', 'Domains,ExamDomains,domains,Topics,topics').split(',')
+
+# Stop starting new lessons when less than this much Lambda time is left;
+# the run reports what remains and can simply be invoked again
+TIME_MARGIN_MS = int(os.environ.get('TUTOR_GENERATION_MARGIN_MS', '90000'))
+
+MAX_TOKENS = {'overview': 1500, 'standard': 3500, 'deep_dive': 5000}
+
+def lambda_handler(event, context):
+    """
+    Offline lesson pipeline (scheduled or invoked by tools/generate_tutor_lessons.py).
+    Event: {"certification": optional, "depths": optional, "domains": optional, "force": false}
+    """
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS, TABLES)
+
+    print("INSIDE GENERATE LESSONS LAMBDA FUNCTION")
+    print("Full event:", json.dumps(event, indent=2))
+
+    depths = [d for d in event.get('depths') or DEPTHS if d in DEPTHS]
+    force = bool(event.get('force'))
+
+    def time_left():
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return True
+        return context.get_remaining_time_in_millis() > TIME_MARGIN_MS
+
+    try:
+        certs = load_certifications(get_table('CertInfo'), event.get('certification'))
+    except ClientError as e:
+        print(f"Error reading CertInfo: {str(e)}")
+        return {'statusCode': 500, 'body': dumps({'error': f"DynamoDB error: {str(e)}"})}
+
+    summary = {'generated': [], 'skipped': 0, 'failed': [], 'remaining': []}
+    for cert_item in certs:
+        set_context(handler='generate_lessons', ref=cert_item['CertificationName'])
+        try:
+            generate_certification(cert_item, depths, event.get('domains'), force, time_left, summary)
+        except BedrockUnavailable as e:
+            print(f"Stopping, Bedrock unavailable: {str(e)}")
+            summary['remaining'].append(cert_item['CertificationName'])
+            break
+        except ClientError as e:
+            print(f"DynamoDB error for {cert_item['CertificationName']}: {str(e)}")
+            summary['failed'].append(cert_item['CertificationName'])
+
+    summary['done'] = not summary['remaining']
+    print(f"Lesson generation summary: {json.dumps(summary)}")
+    return {'statusCode': 200, 'body': dumps(summary)}
+
+
+def load_certifications(cert_table, cert_name=None):
+    if cert_name:
+        item = cert_table.get_item(Key={'CertificationName': cert_name}).get('Item')
+        return [item] if item else []
+    items, kwargs = [], {}
+    while True:
+        response = cert_table.scan(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def generate_certification(cert_item, depths, only_domains, force, time_left, summary):
+    """
+    Generate the missing lessons of one certification and keep its catalogue
+    current after every lesson, so an interrupted run loses nothing
+    """
+    lessons_table = get_table(LESSONS_TABLE)
+    cert = cert_item['CertificationName']
+    catalogue = load_catalogue(lessons_table, cert) or {}
+    domains = catalogue.get('domains') or cert_domains(cert_item) or generate_domains(cert)
+    if not domains:
+        print(f"No exam domains for {cert}, skipping")
+        summary['failed'].append(cert)
+        return
+    lessons = dict(catalogue.get('lessons', {}))
+    store_catalogue(lessons_table, cert, domains, lessons)
+
+    for domain in domains:
+        if only_domains and domain not in only_domains:
+            continue
+        for depth in depths:
+            lid = lesson_id(cert, domain, depth)
+            if lid in lessons and not force:
+                summary['skipped'] += 1
+                continue
+            if not time_left():
+                summary['remaining'].append(lid)
+                continue
+            lesson, model_id = generate_lesson(cert, domain, depth, domains)
+            if lesson is None:
+                summary['failed'].append(lid)
+                continue
+            lessons[lid] = store_lesson(lessons_table, cert, domain, depth, lesson, model_id)
+            store_catalogue(lessons_table, cert, domains, lessons)
+            summary['generated'].append(lid)
+
+
+def cert_domains(cert_item):
+    """
+    Exam domains from the CertInfo record, accepting a list of names, a list
+    of maps with a name field, or a delimited string
+    """
+    for attribute in CERT_DOMAIN_ATTRIBUTES:
+        value = cert_item.get(attribute.strip())
+        if not value:
+            continue
+        if isinstance(value, str):
+            value = re.split(r'[\n;]|,(?![^(]*\))', value)
+        names = []
+        for entry in value:
+            if isinstance(entry, dict):
+                entry = entry.get('name') or entry.get('Name') or entry.get('domain') or entry.get('Domain') or ''
+            entry = re.sub(r'^\s*(domain\s*)?\d+[.:)]?\s*', '', str(entry), flags=re.IGNORECASE).strip()
+            if entry:
+                names.append(entry)
+        if names:
+            return names
+    return None
+
+
+def generate_domains(cert_name):
+    domains, _ = converse_routed(
+        get_bedrock_runtime(),
+        'exam_domains',
+        0,
+        [{"role": "user", "content": [{"text": build_domains_prompt(cert_name)}]}],
+        {"maxTokens": 500, "temperature": 0.2, "topP": 0.9},
+        parse_domains
+    )
+    return domains
+
+
+def build_domains_prompt(cert_name):
+    return f"""List the official exam domains of the {cert_name} exam, in the order of the exam guide.
+
+Return ONLY a JSON array of domain names, without numbering or weightings, e.g.
+["Design Secure Architectures", "Design Resilient Architectures"]"""
+
+
+def parse_domains(response_text):
+    try:
+        domains = json.loads(strip_code_fence(response_text))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(domains, list) or not 2 <= len(domains) <= 10:
+        return None
+    if not all(isinstance(d, str) and d.strip() for d in domains):
+        return None
+    return [d.strip() for d in domains]
+
+
+def generate_lesson(cert_name, domain, depth, domains):
+    """
+    One lesson, starting on the tier the router picks for the depth
+    """
+    try:
+        return converse_routed(
+            get_bedrock_runtime(),
+            'lesson_generation',
+            DEPTHS.index(depth),
+            [{"role": "user", "content": [{"text": build_lesson_prompt(cert_name, domain, depth, domains)}]}],
+            {"maxTokens": MAX_TOKENS[depth], "temperature": 0.5, "topP": 0.9},
+            parse_lesson
+        )
+    except BedrockUnavailable:
+        raise
+    except Exception as e:
+        print(f"Error generating lesson {cert_name} / {domain} / {depth}: {str(e)}")
+        return None, None
+
+
+def build_lesson_prompt(cert_name, domain, depth, domains):
+    other_domains = ', '.join(d for d in domains if d != domain)
+    return f"""You are an AWS certification tutor writing study material for the {cert_name} exam.
+
+Write {DEPTH_GUIDANCE[depth]}.
+
+Exam domain: {domain}
+Other domains of this exam (do not cover them here): {other_domains}
+
+Structure the lesson as:
+- What: definitions and core concepts
+- Why: use cases and why it matters for the exam
+- How: configuration and implementation details
+- When: decision criteria between the relevant services and features
+- Gotchas: common mistakes and exam traps
+
+Use plain text paragraphs separated by blank lines inside each section body. Do not use markdown headings inside bodies.
+
+Return ONLY valid JSON in this exact format:
+{{
+  "title": "Lesson title",
+  "sections": [
+    {{"heading": "What", "body": "Paragraph one.\\n\\nParagraph two."}}
+  ],
+  "key_points": ["Short takeaway", "Another takeaway"]
+}}"""
+
+
+def parse_lesson(response_text):
+    try:
+        lesson = json.loads(strip_code_fence(response_text))
+    except json.JSONDecodeError as e:
+        print(f"Failed to parse lesson JSON: {str(e)}")
+        return None
+    if not isinstance(lesson, dict) or not isinstance(lesson.get('title'), str):
+        return None
+    sections = lesson.get('sections')
+    if not isinstance(sections, list) or not 2 <= len(sections) <= 12:
+        return None
+    for section in sections:
+        if not isinstance(section, dict) or not str(section.get('heading', '')).strip() or not str(section.get('body', '')).strip():
+            return None
+    key_points = lesson.get('key_points', [])
+    if not isinstance(key_points, list) or not all(isinstance(k, str) for k in key_points):
+        return None
+    return {'title': lesson['title'].strip(), 'sections': sections, 'key_points': key_points}
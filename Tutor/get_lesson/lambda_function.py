@@ -0,0 +1,243 @@
+import json
+from botocore.exceptions import ClientError
+from session_profile import get_user_profile
+from tutor_lessons import (DEFAULT_DEPTH, DEPTHS, LESSONS_TABLE, PROGRESS_TABLE, catalogue_entry,
+                           find_domain, lesson_id, load_catalogue, load_page, load_progress,
+                           next_position, save_progress)
+from json_codec import dumps
+from aws_clients import get_table, is_warmup_event, preload_clients, warmup_response
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py)
+CLIENTS = ['dynamodb']
+TABLES = ['user_profile', LESSONS_TABLE, PROGRESS_TABLE]
+preload_clients(CLIENTS, TABLES)
+
+def lambda_handler(event, context):
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS, TABLES)
+
+    try:
+        print("INSIDE GET LESSON LAMBDA FUNCTION")
+        print("Full event:", json.dumps(event, indent=2))
+
+        # Extract parameters from event['parameters']
+        params = {}
+        if 'parameters' in event:
+            for param in event['parameters']:
+                name = param.get('name')
+                value = param.get('value')
+                if name and value is not None:
+                    params[name] = value
+
+        # Fallback: try extracting from requestBody (optional)
+        if not params and 'requestBody' in event:
+            try:
+                content = event['requestBody'].get('content', {})
+                app_json = content.get('application/json', {})
+                properties = app_json.get('properties', [])
+                for prop in properties:
+                    name = prop.get('name')
+                    value = prop.get('value')
+                    if name and value is not None:
+                        params[name] = value
+            except Exception as e:
+                print(f"Error extracting from requestBody: {e}")
+
+        route = ROUTES.get(event.get('apiPath'))
+        if route is None:
+            return create_error_response(event, 400, f"Unknown apiPath {event.get('apiPath')}")
+
+        username = params.get('username')
+        if not username:
+            return create_error_response(event, 400, 'username is required')
+        username = username.lower()
+
+        depth = params.get('depth')
+        if depth and depth not in DEPTHS:
+            return create_error_response(event, 400, f"depth must be one of {', '.join(DEPTHS)}")
+
+        # The lesson a user continues is only relevant for the same certification
+        progress = load_progress(get_table(PROGRESS_TABLE), username)
+        cert = params.get('certification') or recommended_cert(event, username) or (progress or {}).get('certification')
+        if not cert:
+            return create_error_response(event, 400, 'certification is required (the user has no recommended certification)')
+        if progress and progress.get('certification') != cert:
+            progress = None
+
+        catalogue = load_catalogue(get_table(LESSONS_TABLE), cert)
+        if catalogue is None:
+            return create_error_response(event, 404, f"No lessons available for {cert} yet")
+
+        return route(event, params, username, catalogue, depth, progress)
+
+    except ClientError as e:
+        print(f"DynamoDB error: {str(e)}")
+        return create_error_response(event, 500, f"Database error: {str(e)}")
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return create_error_response(event, 500, f"Internal server error: {str(e)}")
+
+
+def recommended_cert(event, username):
+    profile = get_user_profile(event, username, get_table('user_profile'))
+    return (profile or {}).get('recommended_cert')
+
+
+def list_lessons(event, params, username, catalogue, depth, progress):
+    """
+    The certification's exam domains in syllabus order with the depths that
+    have a stored lesson, plus where the user left off
+    """
+    domains = []
+    for domain in catalogue.get('domains', []):
+        available = {}
+        for lesson_depth in DEPTHS:
+            entry = catalogue_entry(catalogue, domain, lesson_depth)
+            if entry:
+                available[lesson_depth] = {'title': entry['title'], 'pages': int(entry['pages'])}
+        domains.append({'domain': domain, 'lessons': available})
+
+    response_body = {
+        "certification": catalogue['certification'],
+        "domains": domains,
+        "depths": DEPTHS,
+        "last_position": position_body(progress) if progress else None
+    }
+    return create_response(event, response_body)
+
+
+def get_lesson(event, params, username, catalogue, depth, progress):
+    """
+    One page of a lesson. Without a domain the user's current domain is used,
+    else the first domain of the syllabus.
+    """
+    if params.get('domain'):
+        domain = find_domain(catalogue, params['domain'])
+        if domain is None:
+            return create_error_response(event, 404, f"No exam domain of {catalogue['certification']} matches '{params['domain']}'")
+    elif progress:
+        domain = progress['domain']
+    else:
+        domain = catalogue['domains'][0]
+
+    depth = depth or (progress or {}).get('depth') or DEFAULT_DEPTH
+    try:
+        page = int(params.get('page', 1))
+    except ValueError:
+        return create_error_response(event, 400, 'page must be a valid number')
+    return serve_page(event, username, catalogue, domain, depth, page)
+
+
+def continue_learning(event, params, username, catalogue, depth, progress):
+    """
+    The page after the user's last one: the rest of the current lesson, then
+    the next domain at the same depth
+    """
+    if progress is None:
+        # First lesson of the syllabus that exists at this depth
+        position = next_position(catalogue, None, depth or DEFAULT_DEPTH, 0)
+    elif depth and depth != progress['depth']:
+        # Switching depth restarts the current domain at the new depth
+        position = {'domain': progress['domain'], 'depth': depth, 'page': 1}
+    else:
+        position = next_position(catalogue, progress['domain'], progress['depth'], int(progress['page']))
+
+    if position is None:
+        response_body = {
+            "certification": catalogue['certification'],
+            "course_complete": True,
+            "message": f"All stored {depth or (progress or {}).get('depth', DEFAULT_DEPTH)} lessons of {catalogue['certification']} are finished. Try another depth or take a quiz."
+        }
+        return create_response(event, response_body)
+    return serve_page(event, username, catalogue, position['domain'], position['depth'], position['page'])
+
+
+def serve_page(event, username, catalogue, domain, depth, page):
+    cert = catalogue['certification']
+    entry = catalogue_entry(catalogue, domain, depth)
+    if entry is None:
+        available = [d for d in DEPTHS if catalogue_entry(catalogue, domain, d)]
+        return create_error_response(event, 404, f"No {depth} lesson for {domain} yet (available: {', '.join(available) or 'none'})")
+    pages = int(entry['pages'])
+    if not 1 <= page <= pages:
+        return create_error_response(event, 400, f"page must be between 1 and {pages}")
+
+    lessons_table = get_table(LESSONS_TABLE)
+    content = load_page(lessons_table, cert, domain, depth, page)
+    if content is None:
+        return create_error_response(event, 404, f"Page {page} of {entry['title']} not found")
+
+    position = {'domain': domain, 'depth': depth, 'page': page}
+    save_progress(get_table(PROGRESS_TABLE), username, cert, position)
+    following = next_position(catalogue, domain, depth, page)
+
+    response_body = {
+        "certification": cert,
+        "domain": domain,
+        "depth": depth,
+        "title": entry['title'],
+        "page": page,
+        "pages": pages,
+        "content": content,
+        "has_more": following is not None,
+        "next": following
+    }
+    if page == pages:
+        # Close the lesson with its takeaways (stored on the header item)
+        header = lessons_table.get_item(Key={'lesson_id': lesson_id(cert, domain, depth), 'chunk': 0}).get('Item') or {}
+        response_body["key_points"] = header.get('key_points', [])
+    return create_response(event, response_body)
+
+
+def position_body(progress):
+    return {'domain': progress['domain'], 'depth': progress['depth'], 'page': int(progress['page'])}
+
+
+# apiPath -> handler, one per operation of the Tutor action group
+ROUTES = {
+    '/list_lessons': list_lessons,
+    '/get_lesson': get_lesson,
+    '/continue_learning': continue_learning,
+}
+
+
+def create_response(event, response_body):
+    # Return formatted Bedrock Agent response
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'GET'),
+            "httpStatusCode": 200,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps(response_body)
+                }
+            }
+        }
+    }
+
+
+def create_error_response(event, status_code, error_message):
+    """
+    Helper function to create standardized error responses
+    """
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            "actionGroup": event.get('actionGroup', 'UnknownActionGroup'),
+            "apiPath": event.get('apiPath'),
+            "httpMethod": event.get('httpMethod', 'GET'),
+            "httpStatusCode": status_code,
+            "responseBody": {
+                "application/json": {
+                    "body": dumps({
+                        "error": error_message
+                    })
+                }
+            }
+        }
+    }
@@ -22,6 +22,10 @@ const ChatInterface = () => {
   const [lastCreatedAt, setLastCreatedAt] = useState(null);
   const [receivedFinalResponse, setReceivedFinalResponse] = useState(false);
   const pollingIntervalRef = useRef(null);
+  // Idempotency key of the message in flight, reused when the same message
+  // is sent again before the server answered (double click). A failed send
+  // keeps its key only on its error message, for the Retry button.
+  const pendingSendRef = useRef(null);
 
   const suggestions = [
     "My username is Charles, tell me about my recommended cert.",
@@ -133,7 +137,7 @@ const ChatInterface = () => {
 
   useEffect(() => stopPolling, []);
 
-  const sendMessage = async (e, messageText) => {
+  const sendMessage = async (e, messageText, retrySend) => {
     if (e) e.preventDefault();
 
     if (isListening) {
@@ -141,9 +145,20 @@ const ChatInterface = () => {
       setIsListening(false);
     }
 
-    const messageToSend = messageText || inputValue.trim();
+    const messageToSend = retrySend ? retrySend.text : messageText || inputValue.trim();
     if (!messageToSend) return;
 
+    // One idempotency key per composed message: sending the same text again
+    // while it is in flight, or retrying it after an error, reuses the key,
+    // so the resent request joins the original agent run instead of starting
+    // a second one. Any other send is a new message with a new key.
+    const pending = pendingSendRef.current;
+    const send = retrySend
+      || (pending && pending.sessionId === sessionId && pending.text === messageToSend
+        ? pending
+        : { key: uuidv4(), sessionId: sessionId, text: messageToSend });
+    pendingSendRef.current = send;
+
     const userMessage = { id: uuidv4(), text: messageToSend, sender: 'user' };
     setMessages((prev) => [...prev, userMessage]);
     setInputValue('');
@@ -152,7 +167,7 @@ const ChatInterface = () => {
     try {
       axios.post(
         API_CONFIG.API_URL + "/chat",
-        { message: messageToSend, sessionId: sessionId },
+        { message: messageToSend, sessionId: sessionId, idempotencyKey: send.key },
         {
           headers: {
             'Content-Type': 'application/json',
@@ -160,12 +175,16 @@ const ChatInterface = () => {
           },
           timeout: 120000
         }
-      ).catch((error) => {
+      ).then(() => {
+        if (pendingSendRef.current === send) pendingSendRef.current = null;
+      }).catch((error) => {
+        if (pendingSendRef.current === send) pendingSendRef.current = null;
         console.error('Error sending message:', error);
         const errorMessage = {
           id: uuidv4(),
           text: `Error sending message: ${error.message}`,
-          sender: 'error'
+          sender: 'error',
+          retrySend: send
         };
         setMessages((prev) => [...prev, errorMessage]);
       });
@@ -188,8 +207,14 @@ const ChatInterface = () => {
     sendMessage(null, suggestion);
   };
 
+  const handleRetry = (message) => {
+    setMessages((prev) => prev.filter((msg) => msg.id !== message.id));
+    sendMessage(null, null, message.retrySend);
+  };
+
   const clearChat = () => {
     stopPolling();
+    pendingSendRef.current = null;
     setMessages([]);
     setSessionId(`session-${Date.now()}-${Math.floor(1000 + Math.random() * 9000)}`);
     setLastCreatedAt(null);
@@ -244,6 +269,11 @@ const ChatInterface = () => {
                 }`}
               >
                 <ReactMarkdown>{message.text}</ReactMarkdown>
+                {message.retrySend && message.retrySend.sessionId === sessionId && (
+                  <button className="btn btn-sm btn-outline-secondary" onClick={() => handleRetry(message)}>
+                    Retry
+                  </button>
+                )}
               </div>
             </div>
           ))
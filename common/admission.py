@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+from decimal import Decimal
+from botocore.exceptions import ClientError
+
+# Admission control in front of the Bedrock agent. bedrock_guard limits the
+# calls of one container; this limits the whole deployment, across containers:
+#
+#   user bucket    each user (see invoke_agent.admission_identity) gets
+#                  ADMISSION_USER_RATE requests/s with a burst. A user over it
+#                  is told to retry right away and never queues.
+#   global bucket  shared by everyone, sized to the agent quota.
+#   waiting room   when the global bucket is empty a request waits up to
+#                  ADMISSION_MAX_WAIT_SECONDS in a bounded queue. Each user
+#                  holds at most one place, and places are served in ticket
+#                  order, so a scripted loop can't crowd others out.
+#
+# The waiting room lives in the global bucket's item, and the tokens it
+# refills are held for the waiters: a request only gets a token when there
+# are more tokens than waiters ahead of it, checked in the same conditional
+# write. A newcomer is behind every waiter, so it can't take the token the
+# queue head is polling for.
+#
+# State lives in DynamoDB (ADMISSION_TABLE) and every change is a conditional
+# write on a version number. ADMISSION_STORE=memory swaps in a per-process
+# stand-in for local runs and tools. Every admission writes the one global
+# item, and DynamoDB takes at most about 1000 writes/s on a single item;
+# conflicting writes retry (CAS_ATTEMPTS), so contention sets in well
+# before that. Agent quotas are far lower; a deployment admitting more than
+# ~100 requests/s would need the global bucket split into shards.
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'true').lower() == 'true'
+ADMISSION_TABLE = os.environ.get('ADMISSION_TABLE', 'admission_control')
+ADMISSION_STORE = os.environ.get('ADMISSION_STORE', 'dynamodb')
+
+USER_RATE = float(os.environ.get('ADMISSION_USER_RATE', '0.2'))
+USER_BURST = float(os.environ.get('ADMISSION_USER_BURST', '5'))
+GLOBAL_RATE = float(os.environ.get('ADMISSION_GLOBAL_RATE', '5'))
+GLOBAL_BURST = float(os.environ.get('ADMISSION_GLOBAL_BURST', '10'))
+QUEUE_MAX = int(os.environ.get('ADMISSION_QUEUE_MAX', '50'))
+MAX_WAIT_SECONDS = float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', '5'))
+
+GLOBAL_KEY = 'bucket#global'
+# Idle buckets expire; a missing bucket is a full one
+STATE_TTL_SECONDS = 3600
+CAS_ATTEMPTS = 5
+POLL_MIN_SECONDS = 0.05
+POLL_MAX_SECONDS = 0.5
+
+REASON_USER, REASON_BUSY = 'user_rate', 'busy'
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted. reason is REASON_USER (the caller
+    is over its own limit) or REASON_BUSY (no capacity within the wait).
+    """
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Request not admitted: {reason}, retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DynamoStore:
+    """
+    Versioned items in ADMISSION_TABLE (partition key limit_key)
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, key):
+        return self.table.get_item(Key={'limit_key': key}, ConsistentRead=True).get('Item')
+
+    def put_if(self, key, item, version):
+        """
+        Write item as version + 1 if the stored version is still `version`
+        (None: no item yet). False when someone else wrote first.
+        """
+        item = dict(item, limit_key=key, v=(version or 0) + 1, expires_at=int(time.time()) + STATE_TTL_SECONDS)
+        if version is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(limit_key)'}
+        else:
+            condition = {'ConditionExpression': 'v = :v', 'ExpressionAttributeValues': {':v': version}}
+        try:
+            self.table.put_item(Item=item, **condition)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+
+class MemoryStore:
+    """
+    Per-process stand-in for DynamoStore
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            return dict(item) if item is not None else None
+
+    def put_if(self, key, item, version):
+        with self.lock:
+            current = self.items.get(key)
+            if (current['v'] if current else None) != version:
+                return False
+            self.items[key] = dict(item, limit_key=key, v=(version or 0) + 1)
+            return True
+
+
+def _update(store, key, change):
+    """
+    Read-modify-write with retries. change(item or None) returns
+    (new item or None to leave it unchanged, result).
+    """
+    for _ in range(CAS_ATTEMPTS):
+        item = store.get(key)
+        new_item, result = change(item)
+        if new_item is None or store.put_if(key, new_item, int(item['v']) if item else None):
+            return result
+    # Lost every race: callers are piling onto the same item, which only
+    # happens when the deployment is busy
+    raise AdmissionRejected(REASON_BUSY, 1.0)
+
+
+def _tokens(item, rate, burst, now):
+    if item is None or 'tokens' not in item:
+        return float(burst)
+    elapsed = max(0.0, now - float(item['updated_at']))
+    return min(float(burst), float(item['tokens']) + elapsed * rate)
+
+
+def take_token(store, key, rate, burst, now, ticket=None):
+    """
+    Take one token from a bucket. Returns 0 on success, else the seconds
+    until a token will be available. Tokens are held for the bucket's
+    waiters (see enqueue): the caller only gets one when there are more
+    tokens than waiters ahead of it. ticket is the caller's own place, given
+    up in the same write; without one it is behind every waiter.
+    """
+    def change(item):
+        tokens = _tokens(item, rate, burst, now)
+        waiters = _live_waiters(item, now)
+        ahead = sum(1 for w in waiters.values() if ticket is None or int(w['ticket']) < ticket)
+        if tokens < ahead + 1:
+            return None, (ahead + 1 - tokens) / rate
+        new_item = dict(item or {}, tokens=Decimal(str(round(tokens - 1, 6))), updated_at=Decimal(str(round(now, 3))))
+        if ticket is not None:
+            new_item['waiters'] = {user: w for user, w in waiters.items() if int(w['ticket']) != ticket}
+        return new_item, 0
+    return _update(store, key, change)
+
+
+def refund_token(store, key, burst, now):
+    def change(item):
+        if item is None or 'tokens' not in item:
+            return None, None
+        tokens = min(float(burst), float(item['tokens']) + 1)
+        return dict(item, tokens=Decimal(str(round(tokens, 6)))), None
+    _update(store, key, change)
+
+
+def _live_waiters(item, now):
+    waiters = (item or {}).get('waiters') or {}
+    return {user: w for user, w in waiters.items() if float(w['expires']) >= now}
+
+
+def enqueue(store, user, expires, now, queue_max=QUEUE_MAX, key=GLOBAL_KEY):
+    """
+    Give user a place in the waiting room of bucket key. Returns the ticket,
+    or None when the user already holds a place or the room is full.
+    """
+    def change(item):
+        waiters = _live_waiters(item, now)
+        if user in waiters or len(waiters) >= queue_max:
+            return None, None
+        tail = int((item or {}).get('tail', 0)) + 1
+        waiters[user] = {'ticket': tail, 'expires': Decimal(str(round(expires, 3)))}
+        return dict(item or {}, waiters=waiters, tail=tail), tail
+    return _update(store, key, change)
+
+
+def dequeue(store, user, now, key=GLOBAL_KEY):
+    def change(item):
+        if item is None or user not in (item.get('waiters') or {}):
+            return None, None
+        waiters = _live_waiters(item, now)
+        waiters.pop(user, None)
+        return dict(item, waiters=waiters), None
+    _update(store, key, change)
+
+
+class Admission:
+    def __init__(self, store, user_rate=USER_RATE, user_burst=USER_BURST, global_rate=GLOBAL_RATE,
+                 global_burst=GLOBAL_BURST, queue_max=QUEUE_MAX, max_wait=MAX_WAIT_SECONDS):
+        self.store = store
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.queue_max = queue_max
+        self.max_wait = max_wait
+
+    def admit(self, user, clock=time.time, sleep=time.sleep):
+        """
+        Returns the seconds spent waiting once admitted, or raises AdmissionRejected
+        """
+        started = clock()
+        user_key = f"bucket#user#{user}"
+        wait = take_token(self.store, user_key, self.user_rate, self.user_burst, started)
+        if wait:
+            raise AdmissionRejected(REASON_USER, wait)
+        if not take_token(self.store, GLOBAL_KEY, self.global_rate, self.global_burst, started):
+            return 0.0
+
+        deadline = started + self.max_wait
+        ticket = enqueue(self.store, user, deadline, started, self.queue_max)
+        if ticket is None:
+            refund_token(self.store, user_key, self.user_burst, started)
+            raise AdmissionRejected(REASON_BUSY, self.busy_retry_after())
+        try:
+            while True:
+                now = clock()
+                # Waits for the tokens held for the places ahead, too
+                wait = take_token(self.store, GLOBAL_KEY, self.global_rate, self.global_burst, now, ticket)
+                if not wait:
+                    return now - started
+                if now + min(wait, POLL_MAX_SECONDS) > deadline:
+                    refund_token(self.store, user_key, self.user_burst, now)
+                    raise AdmissionRejected(REASON_BUSY, self.busy_retry_after())
+                sleep(min(max(wait, POLL_MIN_SECONDS), POLL_MAX_SECONDS))
+        finally:
+            # No write once admitted: the token took the place with it
+            dequeue(self.store, user, clock())
+
+    def busy_retry_after(self):
+        waiters = len(_live_waiters(self.store.get(GLOBAL_KEY), time.time()))
+        return max(1.0, (waiters + 1) / self.global_rate)
+
+
+def build_store(get_table):
+    if ADMISSION_STORE == 'memory':
+        return MemoryStore()
+    return DynamoStore(get_table(ADMISSION_TABLE))
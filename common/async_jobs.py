@@ -0,0 +1,323 @@
+import os
+import time
+import uuid
+from collections import deque
+from botocore.exceptions import ClientError
+from json_codec import dumps, loads
+from aws_clients import get_lambda
+
+# Background jobs for action groups whose work can outlast the agent's
+# action group timeout (full-length quiz generation, result analysis that
+# needs Bedrock). The handler does the quick part, records a job in
+# JOBS_TABLE and returns the job id with whatever is already available.
+# The same function then runs the rest as a worker: the job is delivered
+# as an asynchronous invocation of itself, with {"asyncJob": {...}} as the
+# event. job_status reads the job item to report progress and results.
+#
+# ASYNC_JOB_QUEUE=local keeps jobs in an in-process queue instead, which
+# tools and local runs drain with local_queue.drain(lambda_handler).
+QUIZ_ASYNC_JOBS = os.environ.get('QUIZ_ASYNC_JOBS', 'auto')
+JOBS_TABLE = os.environ.get('JOBS_TABLE', 'quiz_jobs')
+JOB_QUEUE = os.environ.get('ASYNC_JOB_QUEUE', 'lambda')
+
+# create_quiz goes async from this many questions on (QUIZ_ASYNC_JOBS=auto)
+ASYNC_QUIZ_MIN_QUESTIONS = int(os.environ.get('ASYNC_QUIZ_MIN_QUESTIONS', '8'))
+# Suggested delay before polling again
+POLL_AFTER_SECONDS = int(os.environ.get('ASYNC_JOB_POLL_AFTER_SECONDS', '10'))
+JOB_TTL_SECONDS = 86400
+# A RUNNING job holds a lease until lease_expires_at: the remaining time of
+# the worker's invocation plus this margin. An invocation can't outlive its
+# timeout, so a job still RUNNING after that lost its worker (timeout,
+# crash, out of memory) and counts as FAILED; no heartbeat is needed.
+JOB_LEASE_MARGIN_SECONDS = int(os.environ.get('ASYNC_JOB_LEASE_MARGIN_SECONDS', '60'))
+# Lease of a job run without a Lambda context (inline runs, tools), and of
+# items written before leases: the 15 minute Lambda maximum plus the margin
+JOB_LEASE_SECONDS = int(os.environ.get('ASYNC_JOB_LEASE_SECONDS', str(900 + JOB_LEASE_MARGIN_SECONDS)))
+STALE_JOB_ERROR = 'The job stopped before it finished'
+
+MODE_OFF, MODE_AUTO, MODE_ALWAYS = 'off', 'auto', 'always'
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+JOB_EVENT_KEY = 'asyncJob'
+
+
+class JobFailed(Exception):
+    """
+    Raised by a worker that could not finish. message is shown to the user;
+    result, if any, is kept as the job's partial result.
+    """
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.message = message
+        self.result = result
+
+
+def use_async(long_running):
+    """
+    Whether to run the work as a job. long_running: the handler's own
+    estimate, used in auto mode.
+    """
+    if QUIZ_ASYNC_JOBS == MODE_ALWAYS:
+        return True
+    return QUIZ_ASYNC_JOBS == MODE_AUTO and bool(long_running)
+
+
+def new_job_id():
+    return f"job-{uuid.uuid4()}"
+
+
+def is_job_event(event):
+    return isinstance(event, dict) and isinstance(event.get(JOB_EVENT_KEY), dict)
+
+
+def job_event(job_id):
+    return {JOB_EVENT_KEY: {'job_id': job_id}}
+
+
+def create_job(table, job_id, kind, username, payload, ready=None, now=None):
+    """
+    Register a queued job. A job id that already exists is only replaced when
+    that job failed or is stale (see is_stale). Returns (True, None) when
+    created, else (False, the existing item), so handlers can use
+    deterministic ids to join a job that is already running or finished.
+    """
+    now = int(now if now is not None else time.time())
+    try:
+        table.put_item(
+            Item={
+                'job_id': job_id,
+                'kind': kind,
+                'username': username,
+                'status': QUEUED,
+                'payload': dumps(payload),
+                'ready': dumps(ready or {}),
+                'created_at': now,
+                'updated_at': now,
+                'expires_at': now + JOB_TTL_SECONDS,
+            },
+            ConditionExpression='attribute_not_exists(job_id) OR #status = :failed '
+                                'OR (#status = :running AND lease_expires_at < :now) '
+                                'OR (#status = :running AND attribute_not_exists(lease_expires_at) AND updated_at < :lease_start)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':failed': FAILED, ':running': RUNNING, ':now': now,
+                                       ':lease_start': now - JOB_LEASE_SECONDS},
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+        return True, None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        item = e.response.get('Item')
+    if item is None:
+        item = get_job(table, job_id)
+    return False, item
+
+
+def get_job(table, job_id):
+    return table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+
+
+def lease_seconds(context=None):
+    """
+    How long a worker may hold a job: what is left of its invocation plus
+    the margin
+    """
+    if context is None:
+        return JOB_LEASE_SECONDS
+    return int(context.get_remaining_time_in_millis() / 1000) + JOB_LEASE_MARGIN_SECONDS
+
+
+def is_stale(item, now=None):
+    """
+    Whether the job is RUNNING past its lease, i.e. its worker is gone
+    """
+    if item.get('status') != RUNNING:
+        return False
+    now = int(now if now is not None else time.time())
+    expires = item.get('lease_expires_at')
+    if expires is None:
+        expires = int(item.get('updated_at', 0)) + JOB_LEASE_SECONDS
+    return int(expires) < now
+
+
+def fail_stale(table, item):
+    """
+    Record a stale job as FAILED. Conditional on the lease that was read, so
+    a job a new worker has taken over since is left alone. Returns the
+    failed item, or None when the job changed.
+    """
+    names = {'#status': 'status', '#error': 'error'}
+    values = {':failed': FAILED, ':running': RUNNING, ':error': STALE_JOB_ERROR, ':now': int(time.time())}
+    if item.get('lease_expires_at') is not None:
+        condition = '#status = :running AND lease_expires_at = :lease'
+        values[':lease'] = item['lease_expires_at']
+    else:
+        condition = '#status = :running AND attribute_not_exists(lease_expires_at) AND updated_at = :updated'
+        values[':updated'] = item.get('updated_at', 0)
+    try:
+        response = table.update_item(
+            Key={'job_id': item['job_id']},
+            UpdateExpression='SET #status = :failed, #error = :error, updated_at = :now',
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise
+    return response['Attributes']
+
+
+def _set_status(table, job_id, status, expected=None, **fields):
+    """
+    Update the job's status and fields. With expected, only when the job is
+    still in that status; returns the new item, or None when it was not.
+    """
+    names = {'#status': 'status'}
+    values = {':status': status, ':now': int(time.time())}
+    sets = ['#status = :status', 'updated_at = :now']
+    for idx, (field, value) in enumerate(fields.items()):
+        names[f"#f{idx}"] = field
+        values[f":f{idx}"] = value
+        sets.append(f"#f{idx} = :f{idx}")
+    kwargs = {}
+    if expected is not None:
+        kwargs['ConditionExpression'] = '#status = :expected'
+        values[':expected'] = expected
+    try:
+        response = table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression='SET ' + ', '.join(sets),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW',
+            **kwargs
+        )
+    except ClientError as e:
+        if expected is not None and e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise
+    return response['Attributes']
+
+
+def update_ready(table, job_id, ready):
+    """
+    Publish partial results while the job runs (e.g. questions ready so far)
+    """
+    table.update_item(
+        Key={'job_id': job_id},
+        UpdateExpression='SET ready = :ready, updated_at = :now',
+        ExpressionAttributeValues={':ready': dumps(ready), ':now': int(time.time())}
+    )
+
+
+def job_view(item, now=None):
+    """
+    The job as job_status returns it. A stale job is reported as FAILED.
+    """
+    if is_stale(item, now):
+        item = dict(item, status=FAILED, error=STALE_JOB_ERROR)
+    view = {
+        'job_id': item['job_id'],
+        'kind': item['kind'],
+        'status': item['status'],
+        'ready': loads(item.get('ready') or '{}'),
+    }
+    if item.get('result'):
+        view['result'] = loads(item['result'])
+    if item.get('error'):
+        view['error'] = item['error']
+    if item['status'] in (QUEUED, RUNNING):
+        view['retry_after_seconds'] = POLL_AFTER_SECONDS
+    return view
+
+
+class LambdaQueue:
+    """
+    Jobs as asynchronous invocations of the current function. Lambda keeps
+    its own queue for them, so nothing else has to be deployed.
+    """
+
+    def __init__(self, function_name):
+        self.function_name = function_name
+
+    def send(self, event):
+        get_lambda().invoke(FunctionName=self.function_name, InvocationType='Event', Payload=dumps(event).encode('utf-8'))
+
+
+class LocalQueue:
+    """
+    In-process stand-in for LambdaQueue
+    """
+
+    def __init__(self):
+        self.events = deque()
+
+    def send(self, event):
+        self.events.append(event)
+
+    def drain(self, handler):
+        """
+        Run every queued job (and any job they queue) through handler(event, context)
+        """
+        results = []
+        while self.events:
+            results.append(handler(self.events.popleft(), None))
+        return results
+
+
+local_queue = LocalQueue()
+
+
+def enqueue(job_id):
+    if JOB_QUEUE == 'local':
+        local_queue.send(job_event(job_id))
+    else:
+        LambdaQueue(os.environ['AWS_LAMBDA_FUNCTION_NAME']).send(job_event(job_id))
+
+
+def run_job(table, event, workers, context=None):
+    """
+    Worker side: run one delivered job with workers[kind](job) and record the
+    outcome. The job is leased for the rest of this invocation (context, the
+    Lambda context, if any). A job that is no longer queued (a redelivery) is
+    skipped, and recorded as FAILED if its previous worker's lease ran out.
+    A worker raising JobFailed records its partial result with the failure.
+    """
+    job_id = event[JOB_EVENT_KEY]['job_id']
+    now = int(time.time())
+    item = _set_status(table, job_id, RUNNING, expected=QUEUED,
+                       started_at=now, lease_expires_at=now + lease_seconds(context))
+    if item is None:
+        current = get_job(table, job_id)
+        if current is not None and is_stale(current) and fail_stale(table, current) is not None:
+            print(f"Job {job_id} outlived its lease, recorded as failed")
+            return {'job_id': job_id, 'status': FAILED}
+        print(f"Job {job_id} is not queued, skipping")
+        return {'job_id': job_id, 'status': 'skipped'}
+
+    job = {
+        'job_id': job_id,
+        'kind': item['kind'],
+        'username': item.get('username'),
+        'payload': loads(item.get('payload') or '{}'),
+        'ready': loads(item.get('ready') or '{}'),
+    }
+    started = time.monotonic()
+    try:
+        result = workers[job['kind']](job)
+    except JobFailed as e:
+        print(f"Job {job_id} failed: {e.message}")
+        _set_status(table, job_id, FAILED, error=e.message, result=dumps(e.result) if e.result is not None else '')
+        return {'job_id': job_id, 'status': FAILED}
+    except Exception as e:
+        print(f"Job {job_id} failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        _set_status(table, job_id, FAILED, error=str(e))
+        return {'job_id': job_id, 'status': FAILED}
+
+    _set_status(table, job_id, SUCCEEDED, result=dumps(result))
+    print(f"Job {job_id} ({job['kind']}) succeeded in {int((time.monotonic() - started) * 1000)} ms")
+    return {'job_id': job_id, 'status': SUCCEEDED}
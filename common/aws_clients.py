@@ -0,0 +1,125 @@
+import os
+import time
+from bedrock_guard import bedrock_client_config
+
+# Clients, resources and Table objects are created once per container and
+# reused by every invocation. Creating a client is what loads a service's
+# botocore model (and for resources, the resource model), so a handler only
+# pays for the services it actually touches.
+_clients = {}
+_tables = {}
+
+BEDROCK_AGENT_REGION = os.environ.get('BEDROCK_AGENT_REGION', 'us-east-1')
+
+# Build the handler's clients during the init phase, which runs with a full
+# vCPU and is hidden by provisioned concurrency. Defaults to on inside Lambda
+# only, so tools and local runs don't need credentials or a region at import.
+PRELOAD_CLIENTS = os.environ.get(
+    'PRELOAD_CLIENTS',
+    'true' if 'AWS_LAMBDA_FUNCTION_NAME' in os.environ else 'false'
+).lower() == 'true'
+
+# Scheduled warm-up invocations send {"warmup": true}
+WARMUP_KEY = 'warmup'
+
+_init_started = time.monotonic()
+
+
+def _boto3():
+    """
+    boto3 is imported on first use rather than with this module, so tools and
+    handlers that only need the helpers here never load it. In Lambda the
+    first use is preload_clients, which keeps the import in the init phase.
+    """
+    import boto3
+    return boto3
+
+
+def get_dynamodb():
+    if 'dynamodb' not in _clients:
+        _clients['dynamodb'] = _boto3().resource('dynamodb')
+    return _clients['dynamodb']
+
+
+def get_dynamodb_client():
+    """
+    Plain low-level client for dynamo_fast. The resource's own client
+    (resource.meta.client) can't be used: the resource hooks its type
+    conversion into that client's events.
+    """
+    if 'dynamodb-client' not in _clients:
+        _clients['dynamodb-client'] = _boto3().client('dynamodb')
+    return _clients['dynamodb-client']
+
+
+def get_bedrock_runtime():
+    if 'bedrock-runtime' not in _clients:
+        _clients['bedrock-runtime'] = _boto3().client('bedrock-runtime', config=bedrock_client_config())
+    return _clients['bedrock-runtime']
+
+
+def get_bedrock_agent_runtime():
+    if 'bedrock-agent-runtime' not in _clients:
+        _clients['bedrock-agent-runtime'] = _boto3().client(
+            'bedrock-agent-runtime',
+            region_name=BEDROCK_AGENT_REGION,
+            config=bedrock_client_config()
+        )
+    return _clients['bedrock-agent-runtime']
+
+
+def get_lambda():
+    if 'lambda' not in _clients:
+        _clients['lambda'] = _boto3().client('lambda')
+    return _clients['lambda']
+
+
+SERVICE_CLIENTS = {
+    'dynamodb': get_dynamodb,
+    'dynamodb-client': get_dynamodb_client,
+    'bedrock-runtime': get_bedrock_runtime,
+    'bedrock-agent-runtime': get_bedrock_agent_runtime,
+    'lambda': get_lambda,
+}
+
+
+def get_table(name):
+    """
+    Cached dynamodb.Table(name); building a Table runs boto3's resource
+    class factory, which is too slow to repeat on every invocation
+    """
+    if name not in _tables:
+        _tables[name] = get_dynamodb().Table(name)
+    return _tables[name]
+
+
+def preload_clients(services, tables=(), force=False):
+    """
+    Create the clients (and Table objects) a handler needs. Called at module
+    level, so the work lands in the Lambda init phase instead of the first
+    request. A no-op outside Lambda unless forced or PRELOAD_CLIENTS=true.
+    """
+    if not (PRELOAD_CLIENTS or force):
+        return
+    for service in services:
+        SERVICE_CLIENTS[service]()
+    for name in tables:
+        get_table(name)
+
+
+def is_warmup_event(event):
+    return isinstance(event, dict) and event.get(WARMUP_KEY) is True
+
+
+def warmup_response(services, tables=()):
+    """
+    Answer a warm-up invocation once the handler's clients exist, without
+    touching DynamoDB or Bedrock
+    """
+    preload_clients(services, tables, force=True)
+    return {
+        'warmup': True,
+        'clients': sorted(_clients),
+        'tables': sorted(_tables),
+        'container_age_ms': int((time.monotonic() - _init_started) * 1000)
+    }
@@ -0,0 +1,280 @@
+import json
+import os
+import random
+import threading
+import time
+from botocore.exceptions import ClientError
+
+# Error codes that mean "slow down / try again" rather than "your request is wrong"
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+    'InternalServerException',
+    'ServiceQuotaExceededException',
+}
+
+THROTTLE_ERROR_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceQuotaExceededException',
+}
+
+# Default per-model quota used when BEDROCK_MODEL_QUOTAS has no entry for a model.
+# rps/burst drive the token bucket, max_concurrency caps in-flight calls per container.
+DEFAULT_QUOTA = {'rps': 2.0, 'burst': 4, 'max_concurrency': 4}
+
+MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', '4'))
+CALL_DEADLINE_SECONDS = float(os.environ.get('BEDROCK_CALL_DEADLINE_SECONDS', '25'))
+BACKOFF_BASE_SECONDS = float(os.environ.get('BEDROCK_BACKOFF_BASE_SECONDS', '0.25'))
+BACKOFF_CAP_SECONDS = float(os.environ.get('BEDROCK_BACKOFF_CAP_SECONDS', '4'))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BEDROCK_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.environ.get('BEDROCK_BREAKER_RESET_SECONDS', '30'))
+
+
+class BedrockUnavailable(Exception):
+    """
+    Raised when a Bedrock call is refused locally (circuit open, no capacity
+    within the deadline) or keeps getting throttled. Callers should turn this
+    into a degraded response instead of a 500.
+    """
+    def __init__(self, model_id, reason, retry_after=None):
+        super(BedrockUnavailable, self).__init__(f"Bedrock model '{model_id}' unavailable: {reason}")
+        self.model_id = model_id
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket(object):
+    """
+    Token bucket whose refill rate is adjusted AIMD-style: additive increase
+    on success, multiplicative decrease on throttling.
+    """
+    def __init__(self, rate, burst, min_rate=0.1):
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def acquire(self, deadline):
+        """
+        Take one token, waiting until `deadline` (monotonic seconds) at most.
+        Returns False when no token could be obtained in time.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+
+class CircuitBreaker(object):
+    """
+    Classic closed -> open -> half-open breaker. While open every call fails
+    fast; after the reset timeout a single probe call is let through.
+    """
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def retry_after(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probe_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """
+        End a call that says nothing about the model's health (refused
+        locally, or rejected as a bad request) without changing the state;
+        a half-open breaker lets the next call probe instead
+        """
+        with self.lock:
+            self.probe_in_flight = False
+
+
+class ModelGuard(object):
+    """
+    Per-model state: rate limiter, concurrency cap and circuit breaker.
+    Lives at module level so it survives across warm invocations.
+    """
+    def __init__(self, model_id, quota):
+        self.model_id = model_id
+        self.bucket = TokenBucket(quota['rps'], quota['burst'])
+        self.concurrency = threading.BoundedSemaphore(int(quota['max_concurrency']))
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def load_model_quotas():
+    """
+    Read per-model quotas from the BEDROCK_MODEL_QUOTAS env var, e.g.
+    {"us.amazon.nova-pro-v1:0": {"rps": 1, "burst": 2, "max_concurrency": 2}}
+    """
+    raw = os.environ.get('BEDROCK_MODEL_QUOTAS')
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"Ignoring invalid BEDROCK_MODEL_QUOTAS: {str(e)}")
+        return {}
+
+
+def get_guard(model_id):
+    with _guards_lock:
+        guard = _guards.get(model_id)
+        if guard is None:
+            quota = dict(DEFAULT_QUOTA)
+            quota.update(load_model_quotas().get(model_id, {}))
+            guard = ModelGuard(model_id, quota)
+            _guards[model_id] = guard
+        return guard
+
+
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff
+    """
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def guarded_call(model_id, fn, *args, deadline=None, **kwargs):
+    """
+    Run fn(*args, **kwargs) under the rate limit, concurrency cap and circuit
+    breaker for model_id, retrying retryable errors with jittered backoff.
+    Raises BedrockUnavailable instead of letting callers pile up retries.
+    Waits and retries stop at `deadline` (monotonic seconds), by default
+    CALL_DEADLINE_SECONDS from now.
+
+    Any other exception (read timeouts, connection errors) counts as a
+    breaker failure, which also ends a half-open probe, and is re-raised.
+
+    The bucket, semaphore and breaker are per container: under Lambda
+    fan-out each container enforces its own limits, so the account-wide
+    rate is bounded only by the Bedrock quota and admission control in
+    invoke_agent (common/admission.py). Only the call to fn is guarded; for
+    invoke_agent that is opening the stream, and a throttle raised while the
+    event stream is read surfaces to the caller unguarded.
+    """
+    guard = get_guard(model_id)
+    if deadline is None:
+        deadline = time.monotonic() + CALL_DEADLINE_SECONDS
+
+    for attempt in range(MAX_ATTEMPTS):
+        if not guard.breaker.allow():
+            raise BedrockUnavailable(model_id, 'circuit open', guard.breaker.retry_after())
+
+        if not guard.bucket.acquire(deadline):
+            guard.breaker.release_probe()
+            raise BedrockUnavailable(model_id, 'rate limit exceeded', 1.0 / guard.bucket.rate)
+
+        if not guard.concurrency.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            guard.breaker.release_probe()
+            raise BedrockUnavailable(model_id, 'too many concurrent calls', 1.0)
+
+        try:
+            result = fn(*args, **kwargs)
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code')
+            if error_code not in RETRYABLE_ERROR_CODES:
+                # Our request was wrong, not the model unhealthy: neither a
+                # success that closes the breaker nor a failure
+                guard.breaker.release_probe()
+                raise
+            print(f"Bedrock {model_id} attempt {attempt + 1} failed with {error_code}")
+            guard.breaker.record_failure()
+            if error_code in THROTTLE_ERROR_CODES:
+                guard.bucket.on_throttle()
+        except Exception:
+            guard.breaker.record_failure()
+            raise
+        else:
+            guard.bucket.on_success()
+            guard.breaker.record_success()
+            return result
+        finally:
+            guard.concurrency.release()
+
+        delay = backoff_delay(attempt)
+        if time.monotonic() + delay > deadline:
+            break
+        time.sleep(delay)
+
+    raise BedrockUnavailable(model_id, 'retries exhausted', guard.breaker.retry_after() or 1.0)
+
+
+def converse(bedrock_client, modelId, **kwargs):
+    """
+    Drop-in replacement for bedrock_client.converse(...) with the guard applied
+    """
+    return guarded_call(modelId, bedrock_client.converse, modelId=modelId, **kwargs)
+
+
+def bedrock_client_config():
+    """
+    botocore Config for Bedrock clients: the guard owns retries, so botocore's
+    own retry loop is switched off to avoid multiplying attempts.
+    """
+    from botocore.config import Config
+    return Config(
+        retries={'total_max_attempts': 1, 'mode': 'standard'},
+        read_timeout=int(CALL_DEADLINE_SECONDS) + 5,
+        connect_timeout=5
+    )
@@ -0,0 +1,158 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+
+# One compact record per Bedrock model call (model_router.converse_routed)
+# and per agent turn (invoke_agent), so latency and spend can be broken down
+# by handler, task, user and quiz or session (tools/call_ledger_report.py).
+#
+# Handlers tag their calls with set_context(handler=..., user=..., ref=...),
+# where ref is the quiz or session the call served; calls made without a
+# context are tagged with the function name. Each record is written as soon
+# as the call returns, to CALL_LEDGER_SINK:
+#
+#   log       one "CALL_LEDGER {...}" line in the function log (the default:
+#             no I/O in the request path beyond what Lambda already ships)
+#   dynamodb  one synchronous PutItem into CALL_LEDGER_TABLE per record,
+#             adding a write's latency to every call (export it with
+#             tools/dynamodb_bulk.py for reports)
+#   jsonl     one line appended to CALL_LEDGER_PATH (local runs and tools)
+#
+# Recording never fails a request: sink errors are logged and dropped.
+CALL_LEDGER = os.environ.get('CALL_LEDGER', 'true').lower() == 'true'
+CALL_LEDGER_SINK = os.environ.get('CALL_LEDGER_SINK', 'log')
+CALL_LEDGER_TABLE = os.environ.get('CALL_LEDGER_TABLE', 'model_call_ledger')
+CALL_LEDGER_PATH = os.environ.get('CALL_LEDGER_PATH', 'model_calls.jsonl')
+TTL_DAYS = int(os.environ.get('CALL_LEDGER_TTL_DAYS', '90'))
+LOG_PREFIX = 'CALL_LEDGER'
+
+# USD per 1000 input and output tokens (on-demand, us-east-1). Agent turns are
+# priced at the agent's foundation model. CALL_LEDGER_PRICES (JSON, same
+# shape) overrides or adds entries.
+DEFAULT_PRICES = {
+    'us.amazon.nova-micro-v1:0': [0.000035, 0.00014],
+    'us.amazon.nova-lite-v1:0': [0.00006, 0.00024],
+    'us.amazon.nova-pro-v1:0': [0.0008, 0.0032],
+    'agent': [0.0008, 0.0032],
+}
+
+OK, INVALID, UNAVAILABLE, ERROR = 'ok', 'invalid', 'unavailable', 'error'
+
+_context = {}
+_prices = None
+
+
+def load_prices():
+    prices = dict(DEFAULT_PRICES)
+    raw = os.environ.get('CALL_LEDGER_PRICES')
+    if raw:
+        try:
+            prices.update(json.loads(raw))
+        except ValueError as e:
+            print(f"Invalid CALL_LEDGER_PRICES, using defaults: {str(e)}")
+    return prices
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    """
+    USD for one call, or None for a model without a price
+    """
+    global _prices
+    if _prices is None:
+        _prices = load_prices()
+    price = _prices.get(model) or (_prices.get('agent') if str(model).startswith('agent:') else None)
+    if price is None or input_tokens is None:
+        return None
+    return (input_tokens * price[0] + (output_tokens or 0) * price[1]) / 1000
+
+
+def set_context(handler=None, user=None, ref=None):
+    """
+    Tags for the calls of the current invocation; replaces the previous ones
+    """
+    _context.clear()
+    update_context(handler=handler, user=user, ref=ref)
+
+
+def update_context(**tags):
+    """
+    Add tags learned later in the invocation (e.g. the quiz id)
+    """
+    _context.update({name: value for name, value in tags.items() if value is not None})
+
+
+def build_record(kind, model, latency_ms, task=None, outcome=OK, input_tokens=None, output_tokens=None,
+                 model_latency_ms=None, now=None, **extra):
+    now = now if now is not None else time.time()
+    record = {
+        'call_id': f"{int(now * 1000)}-{uuid.uuid4().hex[:8]}",
+        'ts': int(now),
+        'day': datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d'),
+        'handler': _context.get('handler') or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local'),
+        'kind': kind,
+        'task': task,
+        'model': model,
+        'user': _context.get('user'),
+        'ref': _context.get('ref'),
+        'outcome': outcome,
+        'ms': int(latency_ms),
+        'model_ms': model_latency_ms,
+        'in_tok': input_tokens,
+        'out_tok': output_tokens,
+        'cost_usd': estimate_cost(model, input_tokens, output_tokens),
+    }
+    record.update(extra)
+    return {name: value for name, value in record.items() if value is not None}
+
+
+def _write(record):
+    if CALL_LEDGER_SINK == 'jsonl':
+        with open(CALL_LEDGER_PATH, 'a', encoding='utf-8') as ledger_file:
+            ledger_file.write(json.dumps(record, separators=(',', ':')) + '\n')
+    elif CALL_LEDGER_SINK == 'dynamodb':
+        get_table(CALL_LEDGER_TABLE).put_item(Item=ledger_item(record))
+    else:
+        print(f"{LOG_PREFIX} {json.dumps(record, separators=(',', ':'))}")
+
+
+def ledger_item(record):
+    """
+    The record as stored by the dynamodb sink
+    """
+    item = dict(record, expires_at=record['ts'] + TTL_DAYS * 86400)
+    if 'cost_usd' in item:
+        item['cost_usd'] = Decimal(str(round(item['cost_usd'], 8)))
+    return item
+
+
+def record_call(kind, model, latency_ms, **fields):
+    """
+    Append one record. kind: 'converse' or 'agent'; fields: see build_record.
+    """
+    if not CALL_LEDGER:
+        return
+    try:
+        _write(build_record(kind, model, latency_ms, **fields))
+    except (ClientError, OSError) as e:
+        print(f"Could not record {kind} call in the ledger: {str(e)}")
+
+
+def record_converse(task, model, latency_ms, response=None, outcome=OK):
+    """
+    Record a Converse call from its response (usage and metrics.latencyMs)
+    """
+    usage = (response or {}).get('usage') or {}
+    metrics = (response or {}).get('metrics') or {}
+    record_call(
+        'converse', model, latency_ms,
+        task=task,
+        outcome=outcome,
+        input_tokens=usage.get('inputTokens'),
+        output_tokens=usage.get('outputTokens'),
+        model_latency_ms=metrics.get('latencyMs')
+    )
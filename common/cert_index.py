@@ -0,0 +1,235 @@
+import json
+import math
+import os
+import re
+import time
+from collections import defaultdict
+
+# In-memory inverted index over every CertInfo record, for questions across
+# certifications ("which certs cover Kinesis?"). The index is small (tens of
+# records), so it is built once per container, from a JSON snapshot shipped
+# with the function when there is one, else from a CertInfo scan, and
+# queries never touch DynamoDB.
+SNAPSHOT_PATH = os.environ.get('CERT_INDEX_SNAPSHOT', '')
+INDEX_TTL_SECONDS = int(os.environ.get('CERT_INDEX_TTL_SECONDS', '3600'))
+SNAPSHOT_VERSION = 1
+
+# Indexed field -> (CertInfo attributes it is read from, ranking weight)
+INDEX_FIELDS = {
+    'name': (['CertificationName', 'ExamCode'], 2.0),
+    'services': (['Services', 'AWSServices', 'KeyServices'], 3.0),
+    'domains': (['Domains', 'ExamDomains', 'Topics'], 2.0),
+    'roles': (['Roles', 'TargetRoles', 'JobRoles'], 1.5),
+    'prerequisites': (['Prerequisites', 'RecommendedExperience'], 1.0),
+    'level': (['Level', 'Difficulty'], 1.0),
+    'description': (['Description'], 0.5),
+}
+
+LEVELS = ['foundational', 'associate', 'professional', 'specialty']
+_LEVEL_WORDS = {
+    'foundational': 'foundational', 'practitioner': 'foundational', 'beginner': 'foundational',
+    'associate': 'associate', 'intermediate': 'associate',
+    'professional': 'professional', 'advanced': 'professional', 'expert': 'professional',
+    'specialty': 'specialty', 'speciality': 'specialty',
+}
+
+# Prerequisite texts that mean "none"
+_NO_PREREQUISITES = re.compile(r'^\s*(none|no|n/?a|not required|no prerequisites?)\b', re.IGNORECASE)
+
+STOPWORDS = {
+    'a', 'an', 'and', 'any', 'are', 'aws', 'amazon', 'be', 'by', 'can', 'cert', 'certification',
+    'certifications', 'certs', 'cover', 'covers', 'do', 'does', 'exam', 'exams', 'for', 'how', 'i',
+    'in', 'is', 'it', 'me', 'need', 'of', 'on', 'or', 'the', 'to', 'what', 'which', 'with',
+}
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+_index = None
+_built_at = 0.0
+
+
+def tokenize(text):
+    """
+    Lower-cased word tokens without stopwords; a trailing plural s is
+    dropped so "streams" matches "stream" (but not from "kinesis")
+    """
+    tokens = []
+    for token in _TOKEN.findall(str(text).lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith('s') and not token.endswith(('ss', 'is', 'us')):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _flatten(value):
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        return ' '.join(f"{k} {_flatten(v)}" for k, v in value.items())
+    if isinstance(value, (list, set, tuple)):
+        return ' '.join(_flatten(v) for v in value)
+    return str(value)
+
+
+def _field_text(item, attributes):
+    return ' '.join(_flatten(item.get(a)) for a in attributes if item.get(a) is not None)
+
+
+def normalize_level(text):
+    for word in _TOKEN.findall(str(text or '').lower()):
+        if word in _LEVEL_WORDS:
+            return _LEVEL_WORDS[word]
+    return None
+
+
+class CertIndex:
+    """
+    Field-weighted inverted index: term -> {doc id: weighted term frequency},
+    plus the per-certification attributes the filters need
+    """
+
+    def __init__(self, docs, postings):
+        self.docs = docs
+        self.postings = postings
+        self.idf = {term: math.log(1 + len(docs) / len(posting)) for term, posting in postings.items()}
+        # Term sets per field for the filters; docs keep sorted lists for JSON
+        self.term_sets = [{field: set(terms) for field, terms in doc['terms'].items()} for doc in docs]
+
+    @classmethod
+    def build(cls, items):
+        docs, postings = [], defaultdict(lambda: defaultdict(float))
+        for doc_id, item in enumerate(sorted(items, key=lambda i: i['CertificationName'])):
+            field_terms = {}
+            for field, (attributes, weight) in INDEX_FIELDS.items():
+                terms = tokenize(_field_text(item, attributes))
+                field_terms[field] = sorted(set(terms))
+                counts = defaultdict(int)
+                for term in terms:
+                    counts[term] += 1
+                for term, count in counts.items():
+                    # Saturating term frequency: repeating a word helps less and less
+                    postings[term][doc_id] += weight * count / (count + 1.0)
+            prerequisites = _field_text(item, INDEX_FIELDS['prerequisites'][0])
+            docs.append({
+                'certification': item['CertificationName'],
+                'level': normalize_level(_field_text(item, INDEX_FIELDS['level'][0])) or normalize_level(item['CertificationName']),
+                'no_prerequisites': not prerequisites.strip() or bool(_NO_PREREQUISITES.match(prerequisites)),
+                'terms': field_terms,
+            })
+        return cls(docs, {term: dict(posting) for term, posting in postings.items()})
+
+    def to_snapshot(self):
+        return {
+            'version': SNAPSHOT_VERSION,
+            'docs': self.docs,
+            # JSON object keys are strings
+            'postings': {term: {str(d): w for d, w in posting.items()} for term, posting in self.postings.items()},
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported cert index snapshot version {snapshot.get('version')}")
+        postings = {term: {int(d): w for d, w in posting.items()} for term, posting in snapshot['postings'].items()}
+        return cls(snapshot['docs'], postings)
+
+    def _matches(self, doc_id, level, service_terms, role_terms, no_prerequisites):
+        doc, term_sets = self.docs[doc_id], self.term_sets[doc_id]
+        if level and doc['level'] != level:
+            return False
+        if no_prerequisites and not doc['no_prerequisites']:
+            return False
+        if service_terms and not all(t in term_sets['services'] or t in term_sets['domains'] or t in term_sets['name']
+                                     for t in service_terms):
+            return False
+        if role_terms and not role_terms <= term_sets['roles']:
+            return False
+        return True
+
+    def search(self, query='', level=None, service=None, role=None, no_prerequisites=False, limit=5):
+        """
+        Certifications passing every filter, ranked by the weighted match of
+        the query terms. Without a query all matches are returned by name.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        service_terms = tokenize(service) if service else []
+        role_terms = set(tokenize(role)) if role else set()
+        candidates = [doc_id for doc_id in range(len(self.docs))
+                      if self._matches(doc_id, level, service_terms, role_terms, no_prerequisites)]
+
+        scores = {}
+        if terms:
+            allowed = set(candidates)
+            for term in terms:
+                for doc_id, weight in self.postings.get(term, {}).items():
+                    if doc_id in allowed:
+                        scores[doc_id] = scores.get(doc_id, 0.0) + weight * self.idf[term]
+            ranked = sorted(scores, key=lambda d: (-scores[d], self.docs[d]['certification']))
+        else:
+            ranked = candidates
+
+        results = []
+        for doc_id in ranked[:limit]:
+            doc = self.docs[doc_id]
+            results.append({
+                'certification': doc['certification'],
+                'score': round(scores.get(doc_id, 0.0), 3),
+                'level': doc['level'],
+                'no_prerequisites': doc['no_prerequisites'],
+                'matched': {field: [t for t in terms if t in field_terms]
+                            for field, field_terms in self.term_sets[doc_id].items()
+                            if any(t in field_terms for t in terms)},
+            })
+        return results, len(scores) if terms else len(candidates)
+
+
+def scan_cert_info(table):
+    items, kwargs = [], {}
+    while True:
+        response = table.scan(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def load_snapshot(path):
+    with open(path) as f:
+        return CertIndex.from_snapshot(json.load(f))
+
+
+def save_snapshot(index, path):
+    with open(path, 'w') as f:
+        json.dump(index.to_snapshot(), f, separators=(',', ':'))
+
+
+def cached_index():
+    """
+    The container's index if one was built already, else None; never builds it
+    """
+    return _index
+
+
+def get_index(get_cert_table, force=False, now=None):
+    """
+    The container's index: the snapshot when CERT_INDEX_SNAPSHOT is set,
+    else built from a CertInfo scan and rebuilt after CERT_INDEX_TTL_SECONDS.
+    get_cert_table returns the CertInfo table and is only called to scan.
+    """
+    global _index, _built_at
+    now = now if now is not None else time.time()
+    if _index is not None and not force and (SNAPSHOT_PATH or now - _built_at < INDEX_TTL_SECONDS):
+        return _index
+    started = time.perf_counter()
+    if SNAPSHOT_PATH:
+        _index = load_snapshot(SNAPSHOT_PATH)
+        source = SNAPSHOT_PATH
+    else:
+        _index = CertIndex.build(scan_cert_info(get_cert_table()))
+        source = 'CertInfo scan'
+    _built_at = now
+    print(f"Built cert index from {source}: {len(_index.docs)} certifications, "
+          f"{len(_index.postings)} terms in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return _index
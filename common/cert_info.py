@@ -0,0 +1,192 @@
+import json
+import os
+import re
+import time
+from json_codec import dumps
+
+# CertInfo attributes grouped by the kind of question they answer. The QnA
+# action group projects only the group a question needs instead of returning
+# the whole record. Attribute names a record doesn't have are simply absent
+# from the projection, so one list can cover the naming variants in the table.
+# CERTINFO_CATEGORY_FIELDS (JSON, same shape) overrides groups per category.
+KEY_ATTRIBUTE = 'CertificationName'
+
+DEFAULT_CATEGORY_FIELDS = {
+    'cost': ['ExamCost', 'Cost', 'Price', 'Currency', 'Voucher', 'Discount'],
+    'duration': ['ExamDuration', 'Duration', 'NumberOfQuestions', 'Questions'],
+    'format': ['ExamFormat', 'Format', 'QuestionTypes', 'NumberOfQuestions', 'PassingScore', 'Languages', 'DeliveryMethod'],
+    'domains': ['Domains', 'ExamDomains', 'Topics', 'Services', 'DomainWeights'],
+    'difficulty': ['Level', 'Difficulty', 'PassingScore', 'RecommendedExperience'],
+    'prerequisites': ['Prerequisites', 'RecommendedExperience', 'Level', 'Roles'],
+    'recertification': ['Recertification', 'Validity', 'ValidityYears', 'Renewal'],
+    'overview': ['Description', 'Level', 'Roles', 'ExamCode'],
+}
+
+# Words in a user's question that select a category, checked in this order
+CATEGORY_KEYWORDS = [
+    ('cost', ['cost', 'price', 'fee', 'pay', 'voucher', 'discount', '$', 'usd', 'expensive', 'cheap']),
+    ('recertification', ['recertif', 'renew', 'expire', 'expiry', 'valid', 'validity']),
+    ('duration', ['duration', 'how long', 'minutes', 'hours', 'time limit', 'how many questions']),
+    ('format', ['format', 'question type', 'multiple choice', 'multiple response', 'passing score', 'pass mark', 'language', 'online', 'test center', 'proctor']),
+    ('prerequisites', ['prerequisite', 'prereq', 'experience', 'before taking', 'eligib', 'requirement']),
+    ('difficulty', ['difficult', 'hard', 'easy', 'level', 'tough']),
+    ('domains', ['domain', 'topic', 'cover', 'syllabus', 'services', 'weight', 'study', 'content']),
+]
+
+# Largest JSON size of a single attribute in a response; longer values are
+# cut at a word or item boundary and listed in truncated_fields
+FIELD_MAX_CHARS = int(os.environ.get('CERTINFO_FIELD_MAX_CHARS', '1200'))
+
+_FIELD_NAME = re.compile(r'^[A-Za-z0-9_]+$')
+
+
+def _load_json_env(name, default):
+    raw = os.environ.get(name)
+    if not raw:
+        return default
+    try:
+        merged = dict(default)
+        merged.update(json.loads(raw))
+        return merged
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        print(f"Ignoring invalid {name}: {str(e)}")
+        return default
+
+
+CATEGORY_FIELDS = _load_json_env('CERTINFO_CATEGORY_FIELDS', DEFAULT_CATEGORY_FIELDS)
+
+# Per-attribute overrides of FIELD_MAX_CHARS, e.g. {"Domains": 3000}
+FIELD_BUDGETS = _load_json_env('CERTINFO_FIELD_BUDGETS', {})
+
+# Warm-container cache of whole CertInfo records, filled by prime_cert_info
+# when a user's recommended_cert changes (see create_quiz). Projected reads of
+# a primed record are answered from memory.
+CACHE_TTL_SECONDS = int(os.environ.get('CERTINFO_CACHE_TTL_SECONDS', '900'))
+_cache = {}
+
+
+def categorize(question):
+    """
+    Category of a free-text question, or None when no keyword matches
+    """
+    text = str(question or '').lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return None
+
+
+def parse_fields(raw_fields):
+    """
+    Attribute names from a list or a comma-separated string. Names that are
+    not plain identifiers are dropped rather than put into an expression.
+    """
+    if isinstance(raw_fields, str):
+        raw_fields = raw_fields.split(',')
+    fields = []
+    for field in raw_fields or []:
+        field = str(field).strip()
+        if _FIELD_NAME.match(field) and field not in fields:
+            fields.append(field)
+    return fields
+
+
+def fields_for(fields=None, category=None):
+    """
+    Attributes to project for the request, always including the key, or None
+    for the whole record. Explicit fields win over the category.
+    """
+    selected = parse_fields(fields)
+    if not selected and category:
+        selected = list(CATEGORY_FIELDS.get(category, []))
+    if not selected:
+        return None
+    return [KEY_ATTRIBUTE] + [f for f in selected if f != KEY_ATTRIBUTE]
+
+
+def projection_kwargs(fields):
+    """
+    get_item/query keyword arguments projecting fields. Placeholders keep
+    reserved words (Duration, Level, Format...) valid in the expression.
+    """
+    if not fields:
+        return {}
+    names = {f"#f{idx}": field for idx, field in enumerate(fields)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+
+
+def _size(value):
+    # Measured with the encoder that writes the response
+    return len(dumps(value))
+
+
+def fit_value(value, max_chars):
+    """
+    value trimmed to about max_chars of JSON: strings at a word boundary,
+    lists and maps by dropping trailing entries. Returns (value, truncated).
+    """
+    if _size(value) <= max_chars:
+        return value, False
+    if isinstance(value, str):
+        cut = value[:max(0, max_chars - 3)].rsplit(' ', 1)[0]
+        return cut.rstrip(' ,;.') + '...', True
+    if isinstance(value, (list, set, tuple)):
+        kept = []
+        for entry in value:
+            if _size(kept + [entry]) > max_chars:
+                break
+            kept.append(entry)
+        return kept, True
+    if isinstance(value, dict):
+        kept = {}
+        for key, entry in value.items():
+            kept[key] = entry
+            if _size(kept) > max_chars:
+                del kept[key]
+                break
+        return kept, True
+    return value, False
+
+
+def apply_budget(item, default_budget=FIELD_MAX_CHARS, budgets=None):
+    """
+    Copy of a CertInfo item with every attribute within its size budget, and
+    the names of the attributes that were cut
+    """
+    budgets = FIELD_BUDGETS if budgets is None else budgets
+    fitted, truncated = {}, []
+    for field, value in item.items():
+        budget = budgets.get(field, default_budget)
+        if field == KEY_ATTRIBUTE or not budget:
+            fitted[field] = value
+            continue
+        fitted[field], was_cut = fit_value(value, int(budget))
+        if was_cut:
+            truncated.append(field)
+    return fitted, truncated
+
+
+def get_cert_info(table, cert_name, fields=None):
+    """
+    CertInfo item for a certification, projected to fields when given.
+    None when the certification does not exist.
+    """
+    cached = _cache.get(cert_name)
+    if cached is not None and time.time() - cached[0] < CACHE_TTL_SECONDS:
+        return {field: value for field, value in cached[1].items() if not fields or field in fields}
+    response = table.get_item(Key={KEY_ATTRIBUTE: cert_name}, **projection_kwargs(fields))
+    return response.get('Item')
+
+
+def prime_cert_info(table, cert_name):
+    """
+    Load a whole CertInfo record into this container's cache. Returns
+    whether the certification exists.
+    """
+    item = table.get_item(Key={KEY_ATTRIBUTE: cert_name}).get('Item')
+    if item is not None:
+        _cache[cert_name] = (time.time(), item)
+    return item is not None
@@ -0,0 +1,58 @@
+import os
+from decimal import Decimal
+
+# Precomputed cohort statistics over quiz results: score distributions per
+# certification and topic, and item statistics per question. They are
+# computed offline from table exports by tools/cohort_analytics.py (with
+# NumPy) and published here; the cohort_stats action group only reads them,
+# one GetItem per call.
+#
+# Items in COHORT_STATS_TABLE, partition key stats_key:
+#
+#   <cohort>                          certifications covered, computed_at
+#   <cohort>#cert#<cert>              score distribution, topics, hardest and weakest questions
+#   <cohort>#topic#<cert>#<topic>     score distribution and hardest questions of one topic
+#   <cohort>#question#<question_id>   p-value, discrimination and option shares of one question
+#
+# The cohort is "all" unless the tool was given a list of users (a training
+# cohort). A question_id is the question's cluster_id from question_index.
+COHORT_STATS_TABLE = os.environ.get('COHORT_STATS_TABLE', 'cohort_stats')
+DEFAULT_COHORT = 'all'
+
+# Score percentiles kept per certification and topic
+PERCENTILES = [10, 25, 50, 75, 90]
+# Score histogram bins over 0-100%
+HISTOGRAM_BINS = 10
+
+
+def cohort_key(cohort=DEFAULT_COHORT):
+    return cohort
+
+
+def cert_key(cert, cohort=DEFAULT_COHORT):
+    return f"{cohort}#cert#{cert}"
+
+
+def topic_key(cert, topic, cohort=DEFAULT_COHORT):
+    return f"{cohort}#topic#{cert}#{topic}"
+
+
+def question_key(question_id, cohort=DEFAULT_COHORT):
+    return f"{cohort}#question#{question_id}"
+
+
+def to_dynamodb(value):
+    """
+    DynamoDB rejects floats; store them as Decimals rounded to 4 places
+    """
+    if isinstance(value, float):
+        return Decimal(str(round(value, 4)))
+    if isinstance(value, dict):
+        return {k: to_dynamodb(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamodb(v) for v in value]
+    return value
+
+
+def get_stats(table, stats_key):
+    return table.get_item(Key={'stats_key': stats_key}).get('Item')
@@ -0,0 +1,149 @@
+import os
+from base64 import b64decode
+from decimal import Decimal
+from aws_clients import get_dynamodb_client
+
+# Hot read/write paths on the low-level DynamoDB client. The resource API
+# runs boto3's TypeSerializer/TypeDeserializer over every attribute of every
+# item, nested option lists included. Here a Projection fixes the attributes
+# a caller needs once at import time, DynamoDB returns only those, and each
+# one is converted by a small decoder with the resource API's output types
+# (Decimal numbers, sets, bytes), so callers can switch without other changes.
+# DYNAMODB_FAST_PATH=false sends callers back to the resource API.
+FAST_PATH_ENABLED = os.environ.get('DYNAMODB_FAST_PATH', 'true').lower() == 'true'
+
+
+class Projection:
+    """
+    Precompiled ProjectionExpression over a fixed list of attributes. Every
+    name goes through a placeholder, since `order`, `layout` and friends are
+    reserved words.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.names = {f"#p{idx}": field for idx, field in enumerate(self.fields)}
+        self.expression = ', '.join(self.names)
+
+    def kwargs(self):
+        return {'ProjectionExpression': self.expression, 'ExpressionAttributeNames': dict(self.names)}
+
+    def decode(self, item):
+        """
+        Plain dict of the projected attributes present in a wire-format item
+        """
+        return {field: decode_value(item[field]) for field in self.fields if field in item}
+
+
+def _decode_map(value):
+    return {k: decode_value(v) for k, v in value.items()}
+
+
+def _decode_list(value):
+    return [decode_value(v) for v in value]
+
+
+def _decode_binary(value):
+    # botocore already decodes B from base64; strings only come from raw JSON
+    return value if isinstance(value, (bytes, bytearray)) else b64decode(value)
+
+
+_DECODERS = {
+    'S': str,
+    'N': Decimal,
+    'BOOL': bool,
+    'NULL': lambda value: None,
+    'M': _decode_map,
+    'L': _decode_list,
+    'B': _decode_binary,
+    'SS': set,
+    'NS': lambda value: {Decimal(v) for v in value},
+    'BS': lambda value: {_decode_binary(v) for v in value},
+}
+
+
+def decode_value(value):
+    """
+    Python value of one wire-format attribute value, e.g. {'N': '3'} -> Decimal('3')
+    """
+    for type_code, raw in value.items():
+        return _DECODERS[type_code](raw)
+    raise ValueError('Empty attribute value')
+
+
+def encode_value(value):
+    """
+    Wire-format attribute value of a Python value (the reverse of decode_value)
+    """
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, float):
+        # Same rule as the resource API, so both paths accept the same items
+        raise TypeError('Float types are not supported. Use Decimal types instead.')
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, dict):
+        return {'M': {k: encode_value(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [encode_value(v) for v in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    if isinstance(value, (set, frozenset)) and value:
+        first = next(iter(value))
+        if isinstance(first, str):
+            return {'SS': sorted(value)}
+        if isinstance(first, (bytes, bytearray)):
+            return {'BS': [bytes(v) for v in value]}
+        return {'NS': [str(v) for v in value]}
+    raw = getattr(value, 'value', None)
+    if isinstance(raw, bytes):
+        # boto3.dynamodb.types.Binary
+        return {'B': raw}
+    raise TypeError(f"Unsupported DynamoDB value of type {type(value).__name__}")
+
+
+def encode_item(item):
+    return {k: encode_value(v) for k, v in item.items()}
+
+
+def get_item(table_name, key, projection, consistent=False):
+    """
+    The projected attributes of one item, or None when it does not exist
+    """
+    response = get_dynamodb_client().get_item(
+        TableName=table_name,
+        Key=encode_item(key),
+        ConsistentRead=consistent,
+        **projection.kwargs()
+    )
+    item = response.get('Item')
+    return projection.decode(item) if item is not None else None
+
+
+def query_partition(table_name, key_name, key_value, projection):
+    """
+    Every item of one partition, projected. Follows LastEvaluatedKey, so
+    partitions over 1 MB come back whole.
+    """
+    kwargs = projection.kwargs()
+    kwargs['ExpressionAttributeNames']['#pk'] = key_name
+    kwargs.update(
+        TableName=table_name,
+        KeyConditionExpression='#pk = :pk',
+        ExpressionAttributeValues={':pk': encode_value(key_value)},
+    )
+    items = []
+    while True:
+        response = get_dynamodb_client().query(**kwargs)
+        items.extend(projection.decode(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def put_item(table_name, item):
+    get_dynamodb_client().put_item(TableName=table_name, Item=encode_item(item))
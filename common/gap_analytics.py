@@ -0,0 +1,283 @@
+import math
+import os
+import time
+from decimal import Decimal
+from botocore.exceptions import ClientError
+
+# Answers lose half their weight every HALF_LIFE_DAYS, so recent quizzes dominate
+HALF_LIFE_DAYS = float(os.environ.get('GAP_HALF_LIFE_DAYS', '14'))
+HALF_LIFE_SECONDS = HALF_LIFE_DAYS * 86400
+
+# Missing an easy question says more about a gap than missing a hard one
+DIFFICULTY_MISS_WEIGHTS = {'easy': 1.25, 'medium': 1.0, 'hard': 0.75}
+DIFFICULTIES = list(DIFFICULTY_MISS_WEIGHTS)
+
+MIN_WEIGHT = 0.05          # decayed attempts below this are pruned on rebuild
+MIN_MISS_RATE = 0.4        # keys answered better than this are not gaps
+MAX_GAPS = 5
+
+# record_answer updates the stats item in place instead of rewriting it. An
+# entry's 't' is an anchor that answers don't move: an answer at `now` ADDs
+# its weight grown by 2 ** ((now - t) / half-life), which leaves
+# m * decay_factor(now - t) exactly as if the entry had been decayed to now
+# first. Concurrent answers then add up instead of overwriting each other.
+# An entry anchored more than REBASE_HALF_LIVES half-lives ago is rewritten
+# decayed to now instead, conditional on nobody having changed it, so the
+# stored numbers stay small.
+REBASE_HALF_LIVES = 20
+MAX_WRITE_ATTEMPTS = 3
+
+
+def stat_key(cert, dimension, value):
+    return f"{cert}|{dimension}|{value}"
+
+
+def parse_stat_key(key):
+    cert, dimension, value = key.split('|', 2)
+    return cert, dimension, value
+
+
+def decay_factor(elapsed_seconds):
+    if elapsed_seconds <= 0:
+        return 1.0
+    return math.pow(0.5, elapsed_seconds / HALF_LIFE_SECONDS)
+
+
+def growth_factor(elapsed_seconds):
+    """
+    Weight of an answer made `elapsed_seconds` after an entry's anchor
+    """
+    return math.pow(2.0, elapsed_seconds / HALF_LIFE_SECONDS)
+
+
+def question_keys(cert, topic, question):
+    """
+    Stat keys an answered question contributes to
+    """
+    keys = []
+    if topic:
+        keys.append(stat_key(cert, 'topic', topic))
+    for dimension in ['domain', 'aws_service']:
+        value = question.get(dimension)
+        if value:
+            keys.append(stat_key(cert, dimension, value))
+    return keys
+
+
+def apply_answer(stats, keys, is_correct, difficulty=None, now=None):
+    """
+    Fold one answer into the stats map {key: {'m': misses, 'n': attempts, 't': epoch}}.
+    Both counters are decayed to `now` first, so each key stays a single
+    exponentially weighted pair no matter how many answers it has seen.
+    """
+    now = int(now if now is not None else time.time())
+    miss_weight = 0.0 if is_correct else DIFFICULTY_MISS_WEIGHTS.get(difficulty, 1.0)
+    for key in keys:
+        entry = stats.get(key) or {'m': 0, 'n': 0, 't': now}
+        factor = decay_factor(now - int(entry['t']))
+        stats[key] = {
+            'm': float(entry['m']) * factor + miss_weight,
+            'n': float(entry['n']) * factor + 1.0,
+            't': now,
+        }
+    return stats
+
+
+def prune(stats, now=None):
+    now = int(now if now is not None else time.time())
+    return {key: entry for key, entry in stats.items()
+            if float(entry['n']) * decay_factor(now - int(entry['t'])) >= MIN_WEIGHT}
+
+
+def rank_gaps(stats, cert, now=None, limit=MAX_GAPS):
+    """
+    Ranked knowledge gaps for one certification. The miss rate is smoothed
+    towards 50% and scaled by how much evidence there is, so one unlucky
+    answer doesn't outrank a topic that was missed again and again.
+    """
+    now = int(now if now is not None else time.time())
+    gaps = []
+    for key, entry in stats.items():
+        key_cert, dimension, value = parse_stat_key(key)
+        if key_cert != cert:
+            continue
+        factor = decay_factor(now - int(entry['t']))
+        misses = float(entry['m']) * factor
+        attempts = float(entry['n']) * factor
+        if attempts < MIN_WEIGHT:
+            continue
+        miss_rate = (misses + 1.0) / (attempts + 2.0)
+        if miss_rate < MIN_MISS_RATE:
+            continue
+        confidence = attempts / (attempts + 2.0)
+        gaps.append({
+            'dimension': dimension,
+            'value': value,
+            'score': round(miss_rate * confidence, 4),
+            'miss_rate': round(min(1.0, misses / attempts), 2),
+            'attempts': round(attempts, 1),
+        })
+    # Services and domains are more actionable than the free-text quiz topic
+    dimension_rank = {'aws_service': 0, 'domain': 1, 'topic': 2}
+    gaps.sort(key=lambda g: (-g['score'], dimension_rank.get(g['dimension'], 3)))
+    return gaps[:limit]
+
+
+def severity(score):
+    if score >= 0.5:
+        return 'high'
+    if score >= 0.3:
+        return 'medium'
+    return 'low'
+
+
+def build_knowledge_gaps(ranked_gaps, cert_name, incorrect_count):
+    """
+    Knowledge-gap section for ShowResult, in the shape the LLM used to return,
+    built from the ranked gaps alone
+    """
+    if incorrect_count == 0 and not ranked_gaps:
+        return {
+            "overall_assessment": "Excellent! You answered all questions correctly.",
+            "gaps": [],
+            "recommendations": []
+        }
+
+    gaps = []
+    recommendations = []
+    for priority, gap in enumerate(ranked_gaps, start=1):
+        label = gap['value']
+        accuracy = int(round((1 - gap['miss_rate']) * 100))
+        gaps.append({
+            "gap": label,
+            "severity": severity(gap['score']),
+            "aws_service": label if gap['dimension'] == 'aws_service' else "",
+            "description": f"{accuracy}% accuracy over ~{gap['attempts']:g} recent weighted answers on this {gap['dimension'].replace('_', ' ')} for {cert_name}",
+            "evidence": {"dimension": gap['dimension'], "miss_rate": gap['miss_rate'], "attempts": gap['attempts']}
+        })
+        recommendations.append({
+            "topic": label,
+            "priority": priority,
+            "learning_resources": f"Review the {label} section of the {cert_name} exam guide and AWS documentation",
+            "practice_area": f"Take a short quiz focused on {label}"
+        })
+
+    if not gaps:
+        assessment = "No recurring weak areas yet. Keep practising to build more evidence."
+    elif gaps[0]['severity'] == 'high':
+        assessment = f"Your weakest area is {gaps[0]['gap']}; focus there before the exam."
+    else:
+        assessment = "A few areas need review, but no critical gaps."
+
+    return {
+        "overall_assessment": assessment,
+        "gaps": gaps,
+        "recommendations": recommendations
+    }
+
+
+def to_number(value):
+    """
+    DynamoDB rejects floats; counters are stored as rounded Decimals
+    """
+    return Decimal(str(round(float(value), 4)))
+
+
+def to_dynamodb(stats):
+    return {key: {'m': to_number(e['m']), 'n': to_number(e['n']), 't': int(e['t'])}
+            for key, e in stats.items()}
+
+
+def load_user_stats(table, username):
+    response = table.get_item(Key={'username': username})
+    return response.get('Item', {}).get('stats', {})
+
+
+def build_stats_update(item, keys, is_correct, difficulty, now, answer_id=None):
+    """
+    UpdateItem arguments that fold one answer into the stats item as it was
+    read (`item`, None if it doesn't exist yet). The condition fails when an
+    entry changed shape since the read, or when answer_id was counted already.
+    """
+    stats = (item or {}).get('stats')
+    miss_weight = 0.0 if is_correct else DIFFICULTY_MISS_WEIGHTS.get(difficulty, 1.0)
+    sets, adds, conditions = ['updated_at = :now'], [], []
+    names, values = {}, {':now': now}
+
+    if answer_id:
+        sets.append('last_answer = :answer')
+        conditions.append('(attribute_not_exists(last_answer) OR last_answer <> :answer)')
+        values[':answer'] = answer_id
+
+    if stats is None:
+        sets.append('stats = :stats')
+        conditions.append('attribute_not_exists(stats)')
+        values[':stats'] = to_dynamodb(apply_answer({}, keys, is_correct, difficulty, now))
+        keys = []
+
+    for idx, key in enumerate(keys):
+        path = f"stats.#k{idx}"
+        names[f"#k{idx}"] = key
+        entry = stats.get(key)
+        if entry is None:
+            sets.append(f"{path} = :e{idx}")
+            conditions.append(f"attribute_not_exists({path})")
+            values[f":e{idx}"] = to_dynamodb(apply_answer({}, [key], is_correct, difficulty, now))[key]
+        elif now - int(entry['t']) > REBASE_HALF_LIVES * HALF_LIFE_SECONDS:
+            rebased = apply_answer({key: entry}, [key], is_correct, difficulty, now)
+            sets.append(f"{path} = :e{idx}")
+            conditions.append(f"{path}.t = :t{idx} AND {path}.m = :m{idx} AND {path}.n = :n{idx}")
+            values.update({f":e{idx}": to_dynamodb(rebased)[key], f":t{idx}": entry['t'],
+                           f":m{idx}": entry['m'], f":n{idx}": entry['n']})
+        else:
+            growth = growth_factor(now - int(entry['t']))
+            adds.append(f"{path}.m :dm{idx}, {path}.n :dn{idx}")
+            conditions.append(f"{path}.t = :t{idx}")
+            values.update({f":dm{idx}": to_number(miss_weight * growth),
+                           f":dn{idx}": to_number(growth), f":t{idx}": entry['t']})
+
+    update = {
+        'UpdateExpression': 'SET ' + ', '.join(sets) + (' ADD ' + ', '.join(adds) if adds else ''),
+        'ConditionExpression': ' AND '.join(conditions),
+        'ExpressionAttributeValues': values,
+    }
+    if names:
+        update['ExpressionAttributeNames'] = names
+    return update
+
+
+def record_answer(table, username, cert, topic, question, is_correct, now=None, answer_id=None):
+    """
+    Fold one answered question into the user's stats item with a single
+    conditional UpdateItem (see REBASE_HALF_LIVES). answer_id (quiz and
+    question) makes a resent answer a no-op. Returns False when it was
+    already counted.
+    """
+    now = int(now if now is not None else time.time())
+    keys = question_keys(cert, topic, question)
+    consistent = False
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        item = table.get_item(Key={'username': username}, ConsistentRead=consistent).get('Item')
+        if answer_id and item and item.get('last_answer') == answer_id:
+            return False
+        try:
+            table.update_item(Key={'username': username},
+                              **build_stats_update(item, keys, is_correct, question.get('difficulty'), now, answer_id))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or attempt == MAX_WRITE_ATTEMPTS - 1:
+                raise
+            # A concurrent answer created or rebased an entry: read it again
+            consistent = True
+
+
+def rebuild_stats(answers, now=None):
+    """
+    Rebuild a user's stats from history. `answers` is an iterable of
+    (answered_at_epoch, cert, topic, question_item, is_correct), any order.
+    """
+    stats = {}
+    for answered_at, cert, topic, question, is_correct in sorted(answers, key=lambda a: a[0]):
+        apply_answer(stats, question_keys(cert, topic, question), is_correct,
+                     question.get('difficulty'), answered_at)
+    return prune(stats, now)
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import time
+import uuid
+from botocore.exceptions import ClientError
+
+# Registry of chat requests in flight or just completed, so a resent message
+# (client timeout, double click, retry storm) joins the original run instead
+# of starting a second agent invocation. Lives in DynamoDB because duplicates
+# usually land on different containers.
+#
+# Keys are client-supplied (idempotencyKey in the body, or an Idempotency-Key
+# header; scoped to the sessionId) or derived from the sessionId and the
+# normalised message. A derived key can't tell a resend from the same text
+# sent again on purpose (e.g. "B" for two quiz questions in a row), so it
+# only joins a run that is still in flight: nobody sends the next answer
+# before seeing the previous reply. Its completed result goes to the
+# duplicates that were waiting on that run; a request arriving after it
+# completed claims the key again and runs.
+#
+# Each claim carries a random claim_token. complete and release are
+# conditional on it, so a run whose claim lapsed (and was taken over by a
+# retry) can't overwrite or delete the newer run's entry.
+IDEMPOTENCY = os.environ.get('IDEMPOTENCY', 'true').lower() == 'true'
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE', 'request_idempotency')
+
+CLIENT_KEY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_CLIENT_KEY_TTL_SECONDS', '3600'))
+# How long the result of a derived key stays for duplicates still polling it
+DERIVED_WINDOW_SECONDS = int(os.environ.get('IDEMPOTENCY_DERIVED_WINDOW_SECONDS', '10'))
+# How long a duplicate waits for the original run before giving up; below
+# API Gateway's 29 second integration timeout
+WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '25'))
+POLL_SECONDS = 0.25
+POLL_MAX_SECONDS = 1.0
+
+IN_FLIGHT, COMPLETED = 'in_flight', 'completed'
+
+
+def request_key(session_id, message, client_key=None):
+    """
+    (key, derived) for a chat request
+    """
+    if client_key:
+        digest = hashlib.sha256(f"{session_id}\n{client_key}".encode('utf-8')).hexdigest()
+        return f"c:{digest}", False
+    normalized = ' '.join(str(message or '').split()).lower()
+    digest = hashlib.sha256(f"{session_id}\n{normalized}".encode('utf-8')).hexdigest()
+    return f"m:{digest}", True
+
+
+def try_claim(table, key, in_flight_seconds, now=None, derived=False, joined=None):
+    """
+    Register the request as in flight. Returns (claim token, None) when this
+    caller owns the run, else (None, the registered item). With derived, a
+    completed run is claimed over, except the run with claim token joined
+    (the one this caller was waiting on).
+    """
+    now = int(now if now is not None else time.time())
+    token = uuid.uuid4().hex
+    condition = 'attribute_not_exists(request_key) OR expires_at < :now'
+    values = {':now': now}
+    names = {}
+    if derived:
+        condition += ' OR (#status = :completed AND claim_token <> :joined)'
+        values.update({':completed': COMPLETED, ':joined': joined or ''})
+        names['#status'] = 'status'
+    kwargs = {'ExpressionAttributeNames': names} if names else {}
+    try:
+        table.put_item(
+            Item={'request_key': key, 'status': IN_FLIGHT, 'claim_token': token, 'started_at': now,
+                  'expires_at': now + int(in_flight_seconds)},
+            ConditionExpression=condition,
+            ExpressionAttributeValues=values,
+            ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            **kwargs
+        )
+        return token, None
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        item = e.response.get('Item')
+    if item is None:
+        item = table.get_item(Key={'request_key': key}, ConsistentRead=True).get('Item')
+    return None, item
+
+
+def acquire(table, key, in_flight_seconds, derived=False, wait_seconds=WAIT_SECONDS, sleep=time.sleep):
+    """
+    (claim token, None) when the caller should run the request. Otherwise
+    (None, the registry item of the original run): completed (with its
+    response) or, once wait_seconds have passed, still in flight. If the
+    original run fails and releases its key while we wait, the key is
+    claimed here and the caller runs instead. A derived key only returns
+    the result of a run that was in flight when this request arrived.
+    """
+    deadline = time.monotonic() + wait_seconds
+    delay = POLL_SECONDS
+    joined = None
+    while True:
+        token, item = try_claim(table, key, in_flight_seconds, derived=derived, joined=joined)
+        if token:
+            return token, None
+        if item is None:
+            # Released between the claim and the read; claim again
+            continue
+        if item.get('status') == COMPLETED:
+            return None, item
+        joined = item.get('claim_token')
+        if time.monotonic() + delay > deadline:
+            return None, item
+        sleep(delay)
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+
+
+def complete(table, key, token, status_code, body, derived, now=None):
+    """
+    Store the response for duplicates, kept for the key's reuse window.
+    False when the claim was no longer ours and nothing was stored.
+    """
+    now = int(now if now is not None else time.time())
+    try:
+        table.put_item(
+            Item={
+                'request_key': key,
+                'status': COMPLETED,
+                'claim_token': token,
+                'status_code': int(status_code),
+                'response_body': body,
+                'completed_at': now,
+                'expires_at': now + (DERIVED_WINDOW_SECONDS if derived else CLIENT_KEY_TTL_SECONDS),
+            },
+            ConditionExpression='claim_token = :token',
+            ExpressionAttributeValues={':token': token}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def release(table, key, token):
+    """
+    Forget a failed run so a retry runs again instead of replaying the error.
+    False when the claim was no longer ours and the entry was left alone.
+    """
+    try:
+        table.delete_item(
+            Key={'request_key': key},
+            ConditionExpression='claim_token = :token',
+            ExpressionAttributeValues={':token': token}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
@@ -0,0 +1,74 @@
+import base64
+import json
+import os
+from decimal import Decimal
+
+# One JSON encoder for every response body. DynamoDB items carry Decimal
+# numbers, sets and Binary values that json.dumps rejects; they are converted
+# while encoding instead of in a separate pass. orjson is used when the layer
+# ships it (JSON_BACKEND=auto), else the standard library. Output is compact
+# and UTF-8 with either backend.
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto').lower()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+USE_ORJSON = orjson is not None and JSON_BACKEND in ('auto', 'orjson')
+
+
+def json_default(o):
+    """
+    default= hook for DynamoDB types: whole Decimals become int, others float
+    """
+    if isinstance(o, Decimal):
+        return int(o) if o % 1 == 0 else float(o)
+    if isinstance(o, (set, frozenset)):
+        return sorted(o)
+    if isinstance(o, (bytes, bytearray)):
+        return base64.b64encode(o).decode('ascii')
+    value = getattr(o, 'value', None)
+    if isinstance(value, bytes):
+        # boto3.dynamodb.types.Binary
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    if USE_ORJSON:
+        try:
+            return orjson.dumps(value, default=json_default).decode('utf-8')
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the standard library handles
+            pass
+    return json.dumps(value, default=json_default, separators=(',', ':'), ensure_ascii=False)
+
+
+def loads(text):
+    if USE_ORJSON:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def to_body(value):
+    """
+    responseBody / HTTP body: strings are taken as already encoded, anything
+    else (including raw DynamoDB items) is encoded once
+    """
+    return value if isinstance(value, str) else dumps(value)
+
+
+def to_json_ready(value):
+    """
+    Copy of a DynamoDB value with only JSON types left, for callers that keep
+    working with the data (e.g. before storing it as a JSON blob)
+    """
+    if isinstance(value, dict):
+        return {k: to_json_ready(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_json_ready(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    converted = json_default(value)
+    return to_json_ready(converted) if isinstance(converted, list) else converted
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from bedrock_guard import CALL_DEADLINE_SECONDS, BedrockUnavailable, converse
+from call_ledger import INVALID, OK, UNAVAILABLE, record_converse
+
+# Model tiers from cheapest/fastest to most capable
+MODEL_TIERS = {
+    'micro': 'us.amazon.nova-micro-v1:0',
+    'lite': 'us.amazon.nova-lite-v1:0',
+    'pro': 'us.amazon.nova-pro-v1:0',
+}
+TIER_ORDER = ['micro', 'lite', 'pro']
+
+# Per-task policy: the first rule whose max_size covers the request size picks
+# the starting tier. "size" is whatever the task measures (questions to generate,
+# questions to explain, ...). Failed validation escalates up to escalate_to.
+DEFAULT_POLICY = {
+    'quiz_generation': {
+        'rules': [{'max_size': 5, 'tier': 'lite'}, {'max_size': None, 'tier': 'pro'}],
+        'escalate_to': 'pro',
+    },
+    'result_explanations': {
+        'rules': [{'max_size': 3, 'tier': 'lite'}, {'max_size': None, 'tier': 'pro'}],
+        'escalate_to': 'pro',
+    },
+    # Only phrases advice for gaps ranked locally by gap_analytics
+    'knowledge_gaps': {
+        'rules': [{'max_size': None, 'tier': 'micro'}],
+        'escalate_to': 'lite',
+    },
+    # Rolling conversation summary for invoke_agent (see session_compaction)
+    'session_summary': {
+        'rules': [{'max_size': None, 'tier': 'micro'}],
+        'escalate_to': 'lite',
+    },
+    # Offline Tutor lessons (see tutor_lessons); size is the depth index
+    'lesson_generation': {
+        'rules': [{'max_size': 1, 'tier': 'lite'}, {'max_size': None, 'tier': 'pro'}],
+        'escalate_to': 'pro',
+    },
+    # Exam domains of certifications whose CertInfo record lists none
+    'exam_domains': {
+        'rules': [{'max_size': None, 'tier': 'lite'}],
+        'escalate_to': 'pro',
+    },
+}
+
+# Tasks without a policy keep the original behaviour
+FALLBACK_POLICY = {'rules': [{'max_size': None, 'tier': 'pro'}], 'escalate_to': 'pro'}
+
+# All tiers of one converse_routed call share a single BEDROCK_CALL_DEADLINE_SECONDS
+# budget; a tier is only tried when at least this much of it is left
+MIN_ESCALATION_SECONDS = float(os.environ.get('MODEL_ROUTER_MIN_ESCALATION_SECONDS', '5'))
+
+
+def load_policy():
+    """
+    DEFAULT_POLICY overlaid with the MODEL_ROUTER_POLICY env var (same shape,
+    per task). Set MODEL_ROUTER_FORCE_TIER=pro to pin every task to one tier.
+    """
+    policy = dict(DEFAULT_POLICY)
+    raw = os.environ.get('MODEL_ROUTER_POLICY')
+    if raw:
+        try:
+            policy.update(json.loads(raw))
+        except json.JSONDecodeError as e:
+            print(f"Ignoring invalid MODEL_ROUTER_POLICY: {str(e)}")
+    forced = os.environ.get('MODEL_ROUTER_FORCE_TIER')
+    if forced in MODEL_TIERS:
+        policy = {task: {'rules': [{'max_size': None, 'tier': forced}], 'escalate_to': forced}
+                  for task in policy}
+    return policy
+
+
+def route(task, size=0, policy=None):
+    """
+    Return the ordered list of model ids to try for a task: the policy's
+    starting tier followed by each larger tier up to escalate_to.
+    """
+    task_policy = (policy or load_policy()).get(task, FALLBACK_POLICY)
+    start_tier = task_policy['rules'][-1]['tier']
+    for rule in task_policy['rules']:
+        if rule.get('max_size') is None or size <= rule['max_size']:
+            start_tier = rule['tier']
+            break
+    stop_tier = task_policy.get('escalate_to', start_tier)
+
+    start = TIER_ORDER.index(start_tier)
+    stop = max(start, TIER_ORDER.index(stop_tier))
+    return [MODEL_TIERS[tier] for tier in TIER_ORDER[start:stop + 1]]
+
+
+def strip_code_fence(response_text):
+    """
+    Remove the ```json ... ``` wrapper models like to add around JSON output
+    """
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    if response_text.startswith('```'):
+        response_text = response_text[3:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+def converse_routed(bedrock_client, task, size, messages, inference_config, parse, models=None):
+    """
+    Call the routed model for `task` and validate the output with parse(text),
+    which returns the parsed value or None when the output is unusable.
+    Escalates to the next tier on invalid output or when a cheaper model is
+    unavailable. Returns (value, model_id); value is None if every tier tried
+    failed validation. Raises BedrockUnavailable if the last tier tried is
+    unavailable.
+
+    Every tier draws on one deadline set at entry, so escalating never
+    extends the call past BEDROCK_CALL_DEADLINE_SECONDS; escalation stops
+    when less than MIN_ESCALATION_SECONDS of it is left.
+    """
+    models = models or route(task, size)
+    deadline = time.monotonic() + CALL_DEADLINE_SECONDS
+    for idx, model_id in enumerate(models):
+        is_last = idx == len(models) - 1
+        started = time.monotonic()
+        try:
+            response = converse(
+                bedrock_client,
+                modelId=model_id,
+                messages=messages,
+                inferenceConfig=inference_config,
+                deadline=deadline
+            )
+        except BedrockUnavailable as e:
+            record_converse(task, model_id, (time.monotonic() - started) * 1000, outcome=UNAVAILABLE)
+            if is_last or deadline - time.monotonic() < MIN_ESCALATION_SECONDS:
+                raise
+            print(f"[{task}] {model_id} unavailable ({e.reason}), escalating")
+            continue
+
+        response_text = response['output']['message']['content'][0]['text']
+        value = parse(response_text)
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        record_converse(task, model_id, elapsed_ms, response, OK if value is not None else INVALID)
+        if value is not None:
+            print(f"[{task}] served by {model_id} in {elapsed_ms} ms")
+            return value, model_id
+        if not is_last and deadline - time.monotonic() < MIN_ESCALATION_SECONDS:
+            print(f"[{task}] {model_id} output failed validation after {elapsed_ms} ms, "
+                  "no time left to escalate")
+            return None, model_id
+        print(f"[{task}] {model_id} output failed validation after {elapsed_ms} ms"
+              + ("" if is_last else ", escalating"))
+    return None, models[-1]
@@ -0,0 +1,63 @@
+import os
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from async_jobs import LocalQueue
+
+# Change events of the user_profile table. In AWS they are the table's
+# DynamoDB Stream (view type NEW_AND_OLD_IMAGES), delivered to create_quiz by
+# an event source mapping. PROFILE_EVENTS=local replaces the stream with an
+# in-process queue: the profile updaters publish the records the stream would
+# carry, and tools and local runs deliver them with
+# local_stream.drain(create_quiz.lambda_handler).
+PROFILE_EVENTS = os.environ.get('PROFILE_EVENTS', 'stream')
+PROFILE_EVENT_SOURCE = 'aws:dynamodb'
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+local_stream = LocalQueue()
+
+
+def is_stream_event(event):
+    records = event.get('Records') if isinstance(event, dict) else None
+    return bool(records) and all(r.get('eventSource') == PROFILE_EVENT_SOURCE for r in records)
+
+
+def _image(record, name):
+    image = (record.get('dynamodb') or {}).get(name) or {}
+    return {key: _deserializer.deserialize(value) for key, value in image.items()}
+
+
+def cert_changes(event):
+    """
+    (username, new recommended_cert) for every record that sets or changes it
+    """
+    changes = []
+    for record in event.get('Records', []):
+        if record.get('eventName') not in ('INSERT', 'MODIFY'):
+            continue
+        new, old = _image(record, 'NewImage'), _image(record, 'OldImage')
+        cert = new.get('recommended_cert')
+        if cert and cert != old.get('recommended_cert') and new.get('username'):
+            changes.append((new['username'], cert))
+    return changes
+
+
+def stream_record(new_image, old_image=None):
+    """
+    A DynamoDB Streams MODIFY record for the given images
+    """
+    dynamodb = {'NewImage': {key: _serializer.serialize(value) for key, value in new_image.items()}}
+    if old_image is not None:
+        dynamodb['OldImage'] = {key: _serializer.serialize(value) for key, value in old_image.items()}
+    return {'eventSource': PROFILE_EVENT_SOURCE, 'eventName': 'MODIFY', 'dynamodb': dynamodb}
+
+
+def publish_profile_change(username, updated_attributes):
+    """
+    Called by the profile updaters after a write. The stream already carries
+    the change in AWS, so this only does something in local mode; the old
+    image is unknown there, so every update counts as a change.
+    """
+    if PROFILE_EVENTS != 'local' or 'recommended_cert' not in updated_attributes:
+        return
+    local_stream.send({'Records': [stream_record(dict(updated_attributes, username=username))]})
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from botocore.exceptions import ClientError
+
+# MinHash/LSH index over generated questions, so paraphrases of the same
+# question ("Which S3 class suits archives?" / "For archival data, which S3
+# storage class fits best?") share a cluster id across quizzes and users.
+#
+# A question's shingles are the words and word pairs of its stem plus its
+# options. MINHASH_PERMUTATIONS min-hashes over them estimate the Jaccard
+# similarity of two questions; the signature is cut into LSH_BANDS bands, and
+# two questions land in the same bucket of a band when that band matches, so
+# similar questions meet in at least one bucket with high probability.
+# Candidates from the buckets are confirmed against DUPLICATE_THRESHOLD.
+#
+# QUESTION_INDEX_TABLE holds, under partition key index_key:
+#
+#   cluster#<id>     signature and sample text of a cluster
+#   b<band>#<hash>   the cluster last written to that bucket
+#
+# One bucket holds one cluster, so the index only takes BatchGetItem and
+# BatchWriteItem calls and items never grow; a cluster overwritten in one
+# bucket is still found through its other bands.
+QUESTION_INDEX = os.environ.get('QUESTION_INDEX', 'true').lower() == 'true'
+QUESTION_INDEX_TABLE = os.environ.get('QUESTION_INDEX_TABLE', 'question_index')
+
+PERMUTATIONS = int(os.environ.get('MINHASH_PERMUTATIONS', '32'))
+BANDS = int(os.environ.get('LSH_BANDS', '8'))
+DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.6'))
+
+ROWS = PERMUTATIONS // BANDS
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures have to be comparable across containers and runs
+_rng = random.Random(0x5EED)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(PERMUTATIONS)]
+
+BATCH_GET_KEYS = 100
+
+_STOPWORDS = frozenset(
+    'a an and are as at be by can do does for from has have how i if in is it its of on or that the '
+    'their this to what when which will with would you your'.split()
+)
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _words(text):
+    return [w for w in _WORD.findall(str(text).lower()) if w not in _STOPWORDS]
+
+
+def shingles(question):
+    """
+    Stem words and word pairs, plus option words (prefixed, so an option word
+    and the same stem word count separately)
+    """
+    words = _words(question.get('question', ''))
+    result = set(words)
+    result.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for option in question.get('options') or []:
+        result.update(f"o:{w}" for w in _words(option))
+    return result
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def signature(question):
+    hashes = [_hash(s) for s in shingles(question)] or [0]
+    return tuple(min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMS)
+
+
+def similarity(sig_a, sig_b):
+    """
+    Estimated Jaccard similarity of two signatures
+    """
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def bucket_keys(sig):
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(pack_signature(rows), digest_size=8).hexdigest()
+        keys.append(f"b{band}#{digest}")
+    return keys
+
+
+def pack_signature(sig):
+    return b''.join(value.to_bytes(4, 'big') for value in sig)
+
+
+def unpack_signature(blob):
+    blob = bytes(blob.value if hasattr(blob, 'value') else blob)
+    return tuple(int.from_bytes(blob[i:i + 4], 'big') for i in range(0, len(blob), 4))
+
+
+def new_cluster_id(sig):
+    return 'qc-' + hashlib.blake2b(pack_signature(sig), digest_size=8).hexdigest()
+
+
+class LSHIndex:
+    """
+    In-memory index: buckets map to every cluster that landed in them. Used
+    on its own by offline jobs, and as the per-request overlay of
+    QuestionIndex.
+    """
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = defaultdict(set)
+        self.clusters = {}
+
+    def add_cluster(self, cluster_id, sig, sample=None):
+        self.clusters[cluster_id] = {'signature': sig, 'sample': sample}
+        for key in bucket_keys(sig):
+            self.buckets[key].add(cluster_id)
+
+    def match(self, sig, candidates=None):
+        """
+        (cluster_id, similarity) of the most similar cluster at or above the
+        threshold, or None. candidates: cluster ids to consider besides the
+        ones found in the buckets.
+        """
+        found = set(candidates or ())
+        for key in bucket_keys(sig):
+            found.update(self.buckets.get(key, ()))
+        best = None
+        for cluster_id in found:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is None:
+                continue
+            score = similarity(sig, cluster['signature'])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (cluster_id, score)
+        return best
+
+    def assign(self, question):
+        """
+        Cluster id for question: the matching cluster, or a new one. Returns
+        (cluster_id, created).
+        """
+        sig = signature(question)
+        best = self.match(sig)
+        if best is not None:
+            return best[0], False
+        cluster_id = new_cluster_id(sig)
+        self.add_cluster(cluster_id, sig, question.get('question'))
+        return cluster_id, True
+
+
+class QuestionIndex:
+    """
+    The DynamoDB index, for one request. assign() tags questions with a
+    cluster_id (one BatchGetItem for the buckets and one for the candidate
+    clusters per call); flush() writes the clusters assign() created.
+    """
+
+    def __init__(self, dynamodb, table_name=QUESTION_INDEX_TABLE):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.local = LSHIndex()
+        self.pending = []
+
+    def _batch_get(self, keys):
+        items = []
+        keys = [{'index_key': key} for key in dict.fromkeys(keys)]
+        for start in range(0, len(keys), BATCH_GET_KEYS):
+            request = {self.table_name: {'Keys': keys[start:start + BATCH_GET_KEYS]}}
+            while request:
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                items.extend(response.get('Responses', {}).get(self.table_name, []))
+                request = response.get('UnprocessedKeys') or None
+        return items
+
+    def assign(self, questions):
+        """
+        Set question['cluster_id'] on every question. Questions of the same
+        call that are near-duplicates of each other get the same id.
+        """
+        sigs = [signature(q) for q in questions]
+        buckets = self._batch_get([key for sig in sigs for key in bucket_keys(sig)])
+        candidates = {item['cluster_id'] for item in buckets} - set(self.local.clusters)
+        for item in self._batch_get([f"cluster#{c}" for c in candidates]):
+            self.local.add_cluster(item['cluster_id'], unpack_signature(item['signature']), item.get('sample'))
+        stored = {item['index_key']: item['cluster_id'] for item in buckets}
+
+        for q, sig in zip(questions, sigs):
+            best = self.local.match(sig, [stored[key] for key in bucket_keys(sig) if key in stored])
+            if best is not None:
+                q['cluster_id'] = best[0]
+                continue
+            cluster_id = new_cluster_id(sig)
+            self.local.add_cluster(cluster_id, sig, q.get('question'))
+            self.pending.append((cluster_id, sig, q.get('question')))
+            q['cluster_id'] = cluster_id
+
+    def flush(self):
+        items = []
+        now = int(time.time())
+        for cluster_id, sig, sample in self.pending:
+            items.append({'index_key': f"cluster#{cluster_id}", 'cluster_id': cluster_id,
+                          'signature': pack_signature(sig), 'sample': sample, 'created_at': now})
+            items.extend({'index_key': key, 'cluster_id': cluster_id} for key in bucket_keys(sig))
+        write_items(self.dynamodb.Table(self.table_name), items)
+        self.pending = []
+
+
+def write_items(table, items):
+    with table.batch_writer(overwrite_by_pkeys=['index_key']) as batch:
+        for item in items:
+            batch.put_item(Item=item)
+
+
+def assign_clusters(index, questions):
+    """
+    index.assign, best effort: the index only improves deduplication, so a
+    DynamoDB error leaves the questions untagged
+    """
+    if index is None or not questions:
+        return
+    try:
+        index.assign(questions)
+    except ClientError as e:
+        print(f"Question index unavailable, not clustering: {str(e)}")
+
+
+def flush_clusters(index):
+    if index is None or not index.pending:
+        return
+    try:
+        index.flush()
+    except ClientError as e:
+        print(f"Could not write {len(index.pending)} question clusters: {str(e)}")
@@ -0,0 +1,241 @@
+import json
+import os
+import re
+import time
+
+# Pre-router for invoke_agent. While a quiz is running, most user messages are
+# a bare answer letter, "next" or "show results". Each of those used to run a
+# full Planner -> Quiz agent orchestration only to end in one action group
+# call with parameters the chat already knew. invoke_agent keeps the quiz
+# state of each chat (learned from the action group outputs in the agent
+# trace), recognises these inputs, calls the quiz Lambda directly and words
+# the reply itself. Anything else still goes to the agent.
+QUIZ_PREROUTER = os.environ.get('QUIZ_PREROUTER', 'true').lower() == 'true'
+
+SHOW_NEXT_QUESTION_FUNCTION = os.environ.get('SHOW_NEXT_QUESTION_FUNCTION', 'show_next_question')
+SHOW_RESULT_FUNCTION = os.environ.get('SHOW_RESULT_FUNCTION', 'ShowResult')
+
+# The state lives in the agent_sessions table next to the compaction state
+STATE_KEY_SUFFIX = '#quiz'
+STATE_TTL_SECONDS = 86400
+
+INTENT_ANSWER, INTENT_NEXT, INTENT_RESULTS = 'quiz_answer', 'quiz_next', 'quiz_results'
+
+LETTERS = 'ABCDEFGH'
+
+# Whole-message patterns only: "B", "(b)", "answer: C", "my answer is d",
+# "option A". A letter inside a sentence is free-form text for the agent.
+_ANSWER = re.compile(r'^(?:(?:my\s+)?answer(?:\s+is)?|option|choice)?\s*[:\-]?\s*\(?([a-h])\)?\s*[.!]?$', re.IGNORECASE)
+_NEXT = re.compile(r'^(?:next|next question|show (?:the )?(?:next|current) question|continue)\s*[.!]?$', re.IGNORECASE)
+_RESULTS = re.compile(r'^(?:show (?:me )?(?:my |the )?(?:quiz )?(?:results?|score)|(?:my |quiz )?(?:results?|score)|'
+                      r'how did i do\??)\s*[.!]?$', re.IGNORECASE)
+
+
+def parse_intent(message):
+    """
+    (intent, answer index) for an unambiguous structured message, else None
+    """
+    text = ' '.join(str(message or '').split())
+    match = _ANSWER.match(text)
+    if match:
+        return INTENT_ANSWER, LETTERS.index(match.group(1).upper())
+    if _NEXT.match(text):
+        return INTENT_NEXT, None
+    if _RESULTS.match(text):
+        return INTENT_RESULTS, None
+    return None
+
+
+def routable(intent, state):
+    """
+    Whether the chat's quiz state is enough to serve the intent without the agent
+    """
+    if intent is None or not state or not state.get('quiz_id'):
+        return False
+    name, index = intent
+    if name == INTENT_ANSWER:
+        return state.get('pending_order') is not None and index < len(state.get('options') or [])
+    return True
+
+
+def load_state(table, session_id):
+    item = table.get_item(Key={'session_id': session_id + STATE_KEY_SUFFIX}).get('Item')
+    if item is None or int(item.get('expires_at', 0)) < time.time():
+        return None
+    state = dict(item)
+    for field in ['pending_order', 'total', 'score']:
+        if state.get(field) is not None:
+            state[field] = int(state[field])
+    return state
+
+
+def save_state(table, session_id, state, now=None):
+    now = int(now if now is not None else time.time())
+    item = {k: v for k, v in state.items() if v is not None}
+    item['session_id'] = session_id + STATE_KEY_SUFFIX
+    item['updated_at'] = now
+    item['expires_at'] = now + STATE_TTL_SECONDS
+    table.put_item(Item=item)
+
+
+def clear_state(table, session_id):
+    table.delete_item(Key={'session_id': session_id + STATE_KEY_SUFFIX})
+
+
+def observe(state, body, username=None):
+    """
+    Quiz state after a quiz action group returned body (create_quiz or
+    show_next_question). Returns None when body is not a quiz response.
+    """
+    if not isinstance(body, dict) or not body.get('quiz_id'):
+        return None
+    if body.get('quiz_id') != (state or {}).get('quiz_id'):
+        state = {'quiz_id': body['quiz_id'], 'score': 0}
+    else:
+        state = dict(state)
+    if username:
+        state['username'] = username
+    total = body.get('total_question_count') or body.get('max_score') or (body.get('progress') or {}).get('total_questions')
+    if total:
+        state['total'] = int(total)
+    if 'current_score' in (body.get('progress') or {}):
+        state['score'] = int(body['progress']['current_score'])
+    if body.get('quiz_complete'):
+        state.update(pending_order=None, question=None, options=None, complete=True)
+        if body.get('final_score') is not None:
+            state['score'] = int(body['final_score'])
+        return state
+    question = body.get('current_question')
+    if not isinstance(question, dict) or 'order' not in question:
+        return None
+    state.update(pending_order=int(question['order']), question=question.get('question'),
+                 options=list(question.get('options') or []), complete=False)
+    return state
+
+
+def action_body(text):
+    """
+    Body of an action group output as seen in the trace (a JSON string)
+    """
+    try:
+        body = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def build_action_event(api_path, params, session_id):
+    """
+    Event shaped like the one Bedrock sends an action group Lambda
+    """
+    return {
+        'messageVersion': '1.0',
+        'actionGroup': 'QuizPreRouter',
+        'apiPath': api_path,
+        'httpMethod': 'POST',
+        'sessionId': session_id,
+        'parameters': [{'name': k, 'type': 'string', 'value': str(v)} for k, v in params.items()],
+    }
+
+
+def invoke_action(lambda_client, function_name, api_path, params, session_id):
+    """
+    Call a quiz action group Lambda directly. Returns (status, body).
+    """
+    response = lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(build_action_event(api_path, params, session_id)).encode('utf-8')
+    )
+    payload = json.loads(response['Payload'].read())
+    if response.get('FunctionError'):
+        raise RuntimeError(f"{function_name} failed: {payload}")
+    result = payload['response']
+    return result['httpStatusCode'], action_body(result['responseBody']['application/json']['body'])
+
+
+def format_question(order, total, question, options):
+    lines = [f"**Question {order}{f' of {total}' if total else ''}:** {question}", ""]
+    lines += [f"{LETTERS[idx]}. {option}" for idx, option in enumerate(options)]
+    lines += ["", f"Reply with {', '.join(LETTERS[:len(options) - 1])} or {LETTERS[len(options) - 1]}."]
+    return "\n".join(lines)
+
+
+def format_answer(state, body):
+    """
+    Reply to an answer from the show_next_question body and the question
+    that was answered (still in state)
+    """
+    correct = body.get('correct_answer')
+    options = state.get('options') or []
+    if body.get('previous_question_correct'):
+        lines = ["✅ Correct!"]
+    elif correct is not None and int(correct) < len(options):
+        lines = [f"❌ Not quite. The correct answer is {LETTERS[int(correct)]}. {options[int(correct)]}"]
+    else:
+        lines = ["❌ Not quite."]
+    lines.append("")
+    if body.get('quiz_complete'):
+        lines.append(f"🎉 Quiz complete! You scored {body.get('final_score')} out of {body.get('max_score')}.")
+        lines.append('Say "show results" for explanations and your knowledge gaps.')
+    else:
+        question = body['current_question']
+        progress = body.get('progress') or {}
+        lines.append(f"Score so far: {progress.get('current_score')}")
+        lines.append("")
+        lines.append(format_question(question['order'], progress.get('total_questions'),
+                                     question['question'], question['options']))
+    return "\n".join(lines)
+
+
+def format_pending(state):
+    if state.get('pending_order') is None:
+        return (f"You've finished this quiz with {state.get('score', 0)} out of {state.get('total')}. "
+                'Say "show results" for the full report, or ask for a new quiz.')
+    return format_question(state['pending_order'], state.get('total'), state['question'], state['options'])
+
+
+def format_results(body):
+    """
+    Short report from the ShowResult body
+    """
+    score = body.get('final_score') or {}
+    lines = [f"**Your score: {score.get('correct')}/{score.get('total')} ({score.get('percentage')}%)**"]
+    if body.get('performance_summary'):
+        lines.append(str(body['performance_summary']))
+    explanations = body.get('detailed_explanations') or []
+    if explanations:
+        lines += ["", "**Questions to review**"]
+        for item in explanations:
+            explanation = item.get('explanation') or {}
+            lines.append(f"- Q{item.get('question_number')}: {item.get('question_text')}")
+            lines.append(f"  Correct answer: {item.get('correct_answer')}")
+            if explanation.get('why_correct'):
+                lines.append(f"  Why: {explanation['why_correct']}")
+    gaps = body.get('knowledge_gaps') or {}
+    if gaps.get('overall_assessment'):
+        lines += ["", "**Knowledge gaps**", str(gaps['overall_assessment'])]
+    for recommendation in (gaps.get('recommendations') or [])[:3]:
+        if isinstance(recommendation, dict):
+            lines.append(f"- {recommendation.get('topic')}: {recommendation.get('practice_area') or recommendation.get('learning_resources')}")
+        else:
+            lines.append(f"- {recommendation}")
+    if body.get('results_pending'):
+        # Async result (common/async_jobs.py): the score only, for now
+        lines += ["", 'Explanations and knowledge gaps are still being prepared. Say "show results" again in a few seconds for the full report.']
+    if body.get('degraded'):
+        lines += ["", str(body.get('degraded_reason', ''))]
+    return "\n".join(lines)
+
+
+def prompt_attribute(state):
+    """
+    One line for promptSessionAttributes so the agent knows where the quiz
+    stands after turns it did not see
+    """
+    if not state or not state.get('quiz_id'):
+        return None
+    if state.get('pending_order') is None:
+        return f"Quiz {state['quiz_id']} is complete; score {state.get('score', 0)}/{state.get('total')}."
+    return (f"Quiz {state['quiz_id']} for username {state.get('username')} is in progress: question "
+            f"{state['pending_order']} of {state.get('total')} is waiting for an answer; score so far {state.get('score', 0)}.")
@@ -0,0 +1,284 @@
+import os
+import time
+import zlib
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from json_codec import dumps, loads, to_json_ready
+
+# 'two_table' keeps the original quiz + question rows; 'packed' stores the
+# whole quiz in its quiz row. Readers handle both, so the flag only decides
+# how new quizzes are written.
+STORAGE_LAYOUT = os.environ.get('QUIZ_STORAGE_LAYOUT', 'two_table')
+PACKED_LAYOUT = 'packed'
+
+COMPRESS = os.environ.get('QUIZ_PACKED_COMPRESS', 'true').lower() == 'true'
+
+# Packed quiz items must stay well below DynamoDB's 400 KB item limit
+MAX_PACKED_BYTES = 350 * 1024
+
+# Warm-container cache of the static part of active quizzes (question text,
+# options, correct answers, explanations). User answers and scores are
+# never cached, so the cache can't go stale.
+CACHE_MAX_QUIZZES = int(os.environ.get('QUIZ_CACHE_MAX_QUIZZES', '256'))
+CACHE_TTL_SECONDS = int(os.environ.get('QUIZ_CACHE_TTL_SECONDS', '3600'))
+_quiz_cache = OrderedDict()
+
+
+def use_packed_layout():
+    return STORAGE_LAYOUT == PACKED_LAYOUT
+
+
+def pack_questions(questions):
+    """
+    Serialize the static question content into a single attribute value:
+    zlib-compressed JSON bytes, or a plain JSON string when compression is off
+    """
+    payload = dumps(questions)
+    if COMPRESS:
+        packed = zlib.compress(payload.encode('utf-8'), 6)
+    else:
+        packed = payload
+    size = len(packed) if COMPRESS else len(payload.encode('utf-8'))
+    if size > MAX_PACKED_BYTES:
+        raise ValueError(f"Packed quiz is {size} bytes, over the {MAX_PACKED_BYTES} byte limit")
+    return packed
+
+
+def unpack_questions(blob):
+    # boto3 returns Binary attributes wrapped in boto3.dynamodb.types.Binary
+    if hasattr(blob, 'value'):
+        blob = blob.value
+    if isinstance(blob, (bytes, bytearray)):
+        return loads(zlib.decompress(bytes(blob)))
+    return loads(blob)
+
+
+def static_question(q):
+    """
+    The parts of a question that never change after create_quiz
+    """
+    fields = ['question', 'options', 'correct_answer', 'explanation', 'domain', 'aws_service', 'difficulty', 'cluster_id']
+    return {field: to_json_ready(q[field]) for field in fields if field in q}
+
+
+def build_packed_item(quiz_item, questions):
+    """
+    Quiz row carrying every question in `questions_blob` and an `answers`
+    list with one map per question, updated in place by list index
+    """
+    item = dict(quiz_item)
+    item['layout'] = PACKED_LAYOUT
+    item['questions_blob'] = pack_questions([static_question(q) for q in questions])
+    item['answers'] = [{} for _ in questions]
+    return item
+
+
+def create_packed_quiz(quiz_table, quiz_item, questions):
+    item = build_packed_item(quiz_item, questions)
+    quiz_table.put_item(Item=item)
+    return item
+
+
+def quiz_entry(quiz_item, questions):
+    return {
+        'username': quiz_item['username'],
+        'recommended_cert': quiz_item.get('recommended_cert'),
+        'topic': quiz_item.get('topic'),
+        'max_score': int(quiz_item.get('max_score', len(questions))),
+        'questions': questions,
+        'generation_job': quiz_item.get('generation_job'),
+        'expires_at': time.time() + CACHE_TTL_SECONDS,
+    }
+
+
+def cache_quiz(quiz_item, questions):
+    _quiz_cache[quiz_item['id']] = quiz_entry(quiz_item, questions)
+    _quiz_cache.move_to_end(quiz_item['id'])
+    while len(_quiz_cache) > CACHE_MAX_QUIZZES:
+        _quiz_cache.popitem(last=False)
+
+
+def cached_quiz(quiz_id, username):
+    entry = _quiz_cache.get(quiz_id)
+    if entry is None:
+        return None
+    if entry['expires_at'] < time.time() or entry['username'] != username:
+        _quiz_cache.pop(quiz_id, None)
+        return None
+    _quiz_cache.move_to_end(quiz_id)
+    return entry
+
+
+def load_quiz(quiz_table, username, quiz_id):
+    """
+    Returns (quiz_item, packed_quiz). packed_quiz is the cached static content
+    of a packed quiz, or None for a two-table quiz. quiz_item is None when the
+    answer could be served from the cache alone, and also when the quiz does
+    not exist (then packed_quiz is None as well).
+    """
+    entry = cached_quiz(quiz_id, username)
+    if entry is not None:
+        return None, entry
+
+    response = quiz_table.get_item(Key={'username': username, 'id': quiz_id})
+    quiz_item = response.get('Item')
+    if quiz_item is None or quiz_item.get('layout') != PACKED_LAYOUT:
+        return quiz_item, None
+
+    questions = unpack_questions(quiz_item['questions_blob'])
+    if quiz_item.get('generation_job'):
+        # Later questions are still being added by the create_quiz worker
+        return quiz_item, quiz_entry(quiz_item, questions)
+    cache_quiz(quiz_item, questions)
+    return quiz_item, _quiz_cache[quiz_id]
+
+
+def record_packed_answer(quiz_table, username, quiz_id, order, user_answer, is_correct):
+    """
+    One UpdateItem per answer: set answers[order - 1] and bump the running
+    score atomically. Returns the new total score, or None when the question
+    was answered already, so an answer sent twice is only scored once (see
+    recorded_packed_answer).
+    """
+    idx = int(order) - 1
+    user_score = 1 if is_correct else 0
+    try:
+        response = quiz_table.update_item(
+            Key={'username': username, 'id': quiz_id},
+            UpdateExpression=f'SET answers[{idx}] = :answer, user_score = user_score + :score',
+            ConditionExpression=f'attribute_exists(answers) AND attribute_not_exists(answers[{idx}].user_answer)',
+            ExpressionAttributeValues={
+                ':answer': {
+                    'user_answer': user_answer,
+                    'answered_correctly': is_correct,
+                    'user_score': user_score
+                },
+                ':score': user_score
+            },
+            ReturnValues='UPDATED_NEW'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise
+    return int(response['Attributes']['user_score'])
+
+
+def recorded_packed_answer(quiz_table, username, quiz_id, order):
+    """
+    (answer, total score) as stored for one question of a packed quiz;
+    answer is {} when the question has no answer
+    """
+    response = quiz_table.get_item(
+        Key={'username': username, 'id': quiz_id},
+        ProjectionExpression=f'answers[{int(order) - 1}], user_score',
+        ConsistentRead=True
+    )
+    item = response.get('Item', {})
+    answers = item.get('answers') or [{}]
+    return answers[0], int(item.get('user_score', 0))
+
+
+def append_packed_questions(quiz_table, username, quiz_id, job_id, questions, final):
+    """
+    Store the questions a create_quiz job generated so far in a packed quiz.
+    questions is the whole list, the first ones included. final also clears
+    generation_job, which marks the quiz complete.
+    """
+    quiz_item = quiz_table.get_item(Key={'username': username, 'id': quiz_id}, ConsistentRead=True)['Item']
+    added = len(questions) - len(quiz_item.get('answers', []))
+    quiz_table.update_item(
+        Key={'username': username, 'id': quiz_id},
+        UpdateExpression='SET questions_blob = :blob, answers = list_append(answers, :answers)' +
+                         (' REMOVE generation_job' if final else ''),
+        ConditionExpression='generation_job = :job',
+        ExpressionAttributeValues={
+            ':blob': pack_questions([static_question(q) for q in questions]),
+            ':answers': [{} for _ in range(added)],
+            ':job': job_id
+        }
+    )
+
+
+def end_generation(quiz_table, username, quiz_id, max_score=None, job_id=None):
+    """
+    Clear generation_job; with max_score, also cut the quiz to that many
+    questions. With job_id, only while that job is still the quiz's
+    generation_job; returns False when it no longer was.
+    """
+    kwargs = {'UpdateExpression': 'REMOVE generation_job'}
+    values = {}
+    if max_score is not None:
+        kwargs['UpdateExpression'] = 'SET max_score = :max_score REMOVE generation_job'
+        values[':max_score'] = max_score
+    if job_id is not None:
+        kwargs['ConditionExpression'] = 'generation_job = :job'
+        values[':job'] = job_id
+    if values:
+        kwargs['ExpressionAttributeValues'] = values
+    try:
+        quiz_table.update_item(Key={'username': username, 'id': quiz_id}, **kwargs)
+    except ClientError as e:
+        if job_id is not None and e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+    return True
+
+
+def question_rows(quiz_item):
+    """
+    Rebuild rows shaped like the question table from a packed quiz item, so
+    readers (ShowResult, tools) can treat both layouts the same way
+    """
+    questions = unpack_questions(quiz_item['questions_blob'])
+    answers = quiz_item.get('answers', [])
+    rows = []
+    for idx, q in enumerate(questions):
+        row = dict(q)
+        row['quiz_id'] = quiz_item['id']
+        row['order'] = str(idx + 1)
+        answer = answers[idx] if idx < len(answers) else {}
+        row['user_score'] = answer.get('user_score', 0)
+        if 'user_answer' in answer:
+            row['user_answer'] = answer['user_answer']
+            row['answered_correctly'] = answer['answered_correctly']
+        rows.append(row)
+    return rows
+
+
+def migrate_quiz(quiz_table, quiz_item, question_items):
+    """
+    Rewrite a two-table quiz as a packed quiz: one UpdateItem adding the
+    packed attributes. Conditional on the quiz row still being in the
+    two-table layout, with the user_score and answered_orders read along
+    with it: an answer recorded in between fails the write
+    (ConditionalCheckFailedException) instead of being lost, and it can be
+    re-run safely. Question rows are left in place; delete them separately
+    once readers are switched.
+    """
+    question_items = sorted(question_items, key=lambda x: int(x.get('order', 0)))
+    item = build_packed_item(quiz_item, question_items)
+    for idx, q in enumerate(question_items):
+        if 'user_answer' in q:
+            item['answers'][idx] = {
+                'user_answer': q['user_answer'],
+                'answered_correctly': q.get('answered_correctly', False),
+                'user_score': q.get('user_score', 0)
+            }
+    conditions = ['attribute_not_exists(#layout)']
+    values = {':layout': item['layout'], ':blob': item['questions_blob'], ':answers': item['answers']}
+    # Unchanged score and answered set: no answer was recorded since the read
+    for field, placeholder in [('user_score', ':score'), ('answered_orders', ':answered')]:
+        if field in quiz_item:
+            conditions.append(f"{field} = {placeholder}")
+            values[placeholder] = quiz_item[field]
+        else:
+            conditions.append(f"attribute_not_exists({field})")
+    quiz_table.update_item(
+        Key={'username': quiz_item['username'], 'id': quiz_item['id']},
+        UpdateExpression='SET #layout = :layout, questions_blob = :blob, answers = :answers',
+        ConditionExpression=' AND '.join(conditions),
+        ExpressionAttributeNames={'#layout': 'layout'},
+        ExpressionAttributeValues=values
+    )
+    return item
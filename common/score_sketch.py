@@ -0,0 +1,180 @@
+import os
+import time
+from botocore.exceptions import ClientError
+from aws_clients import get_table
+
+# Score distribution per (recommended_cert, topic), so ShowResult can tell a
+# user how their score compares to everyone else's without scanning the quiz
+# table. show_next_question adds each completed quiz; ShowResult reads one
+# item per distribution.
+#
+# A quiz score is a share in [0, 1], so the sketch is a fixed grid of
+# SKETCH_BUCKETS counters over it: a score lands in bucket
+# round(share * (SKETCH_BUCKETS - 1)). That makes it:
+#   * exact to half a bucket (0.5 score points at the default 101 buckets),
+#     however many attempts it holds
+#   * compact: one item of SKETCH_BUCKETS numbers per distribution
+#   * incremental: adding a score is one in-place UpdateItem
+#     ("SET counts[37] = counts[37] + :one"), with no read and no conflict
+#     between concurrent completions
+#   * mergeable: sketches add counter by counter (see merge)
+#
+# Each score goes into its topic's sketch and its cert's ALL_TOPICS sketch.
+# Changing SKETCH_BUCKETS needs a rebuild (tools/backfill_score_sketches.py).
+SCORE_SKETCHES = os.environ.get('SCORE_SKETCHES', 'true').lower() == 'true'
+SCORE_SKETCH_TABLE = os.environ.get('SCORE_SKETCH_TABLE', 'score_sketches')
+SKETCH_BUCKETS = int(os.environ.get('SCORE_SKETCH_BUCKETS', '101'))
+ALL_TOPICS = '*'
+
+# Quantiles reported with a rank, in score percent
+RANK_QUANTILES = [25, 50, 75, 90]
+
+
+def sketch_key(cert, topic=ALL_TOPICS):
+    return f"{cert}#{topic}"
+
+
+def bucket(score, max_score, buckets=SKETCH_BUCKETS):
+    share = min(max(float(score) / max_score, 0.0), 1.0) if max_score else 0.0
+    return int(round(share * (buckets - 1)))
+
+
+def empty_counts(buckets=SKETCH_BUCKETS):
+    return [0] * buckets
+
+
+def merge(*sketches):
+    """
+    Counter-wise sum of sketches of the same size
+    """
+    merged = empty_counts(len(sketches[0])) if sketches else empty_counts()
+    for counts in sketches:
+        for index, count in enumerate(counts):
+            merged[index] += int(count)
+    return merged
+
+
+def _increment(table, key, index, now):
+    return table.update_item(
+        Key={'sketch_key': key},
+        UpdateExpression=f'SET counts[{index}] = counts[{index}] + :one, attempts = attempts + :one, updated_at = :now',
+        ConditionExpression='attribute_exists(counts)',
+        ExpressionAttributeValues={':one': 1, ':now': now}
+    )
+
+
+def add_score(table, cert, topic, score, max_score, now=None):
+    """
+    Add one completed quiz to its topic and cert sketches
+    """
+    now = int(now if now is not None else time.time())
+    index = bucket(score, max_score)
+    for key in dict.fromkeys([sketch_key(cert, topic), sketch_key(cert)]):
+        try:
+            _increment(table, key, index, now)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # First score of this distribution: create the sketch, unless a
+            # concurrent completion just did, then count the score
+            try:
+                table.put_item(
+                    Item={'sketch_key': key, 'counts': empty_counts(), 'attempts': 0, 'created_at': now},
+                    ConditionExpression='attribute_not_exists(sketch_key)'
+                )
+            except ClientError as put_error:
+                if put_error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+            _increment(table, key, index, now)
+
+
+def mark_ranked(quiz_table, username, quiz_id, now=None):
+    """
+    Flag the quiz as counted. False when it already was, so an answer sent
+    twice doesn't count the quiz twice.
+    """
+    try:
+        quiz_table.update_item(
+            Key={'username': username, 'id': quiz_id},
+            UpdateExpression='SET score_ranked_at = :now',
+            ConditionExpression='attribute_not_exists(score_ranked_at)',
+            ExpressionAttributeValues={':now': int(now if now is not None else time.time())}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def record_completed_quiz(quiz_table, username, quiz_id, cert, topic, score, max_score):
+    """
+    Called by show_next_question when the last answer is in. Best effort:
+    errors are logged and never fail the answer.
+    """
+    if not SCORE_SKETCHES or not max_score:
+        return
+    try:
+        if mark_ranked(quiz_table, username, quiz_id):
+            add_score(get_table(SCORE_SKETCH_TABLE), cert, topic, score, max_score)
+    except ClientError as e:
+        print(f"Error updating score sketches: {str(e)}")
+
+
+def load_sketches(dynamodb, keys):
+    """
+    key -> counts for the sketches that exist, in one BatchGetItem (plus a
+    retry of any keys DynamoDB left unprocessed)
+    """
+    items = []
+    request = {SCORE_SKETCH_TABLE: {'Keys': [{'sketch_key': key} for key in dict.fromkeys(keys)],
+                                    'ProjectionExpression': 'sketch_key, counts'}}
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        items.extend(response.get('Responses', {}).get(SCORE_SKETCH_TABLE, []))
+        request = response.get('UnprocessedKeys') or None
+    return {item['sketch_key']: [int(count) for count in item['counts']] for item in items}
+
+
+def without_score(counts, score, max_score):
+    """
+    The sketch minus one attempt at score, e.g. to rank a quiz that was
+    already counted against everyone else's
+    """
+    counts = list(counts)
+    index = bucket(score, max_score, len(counts))
+    counts[index] = max(0, counts[index] - 1)
+    return counts
+
+
+def quantile(counts, q):
+    """
+    Score percent below which a share q of the attempts fall
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    target, running = q * total, 0
+    for index, count in enumerate(counts):
+        running += count
+        if running >= target and count:
+            return round(100.0 * index / (len(counts) - 1), 1)
+    return 100.0
+
+
+def percentile_rank(counts, score, max_score):
+    """
+    Where a score sits in a sketch: the mid-rank percentile (ties count
+    half), the share of attempts it beat, and the sketch's quartiles
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    index = bucket(score, max_score, len(counts))
+    below = sum(counts[:index])
+    return {
+        'attempts': total,
+        'percentile': round(100.0 * (below + 0.5 * counts[index]) / total, 1),
+        'better_than_pct': round(100.0 * below / total, 1),
+        'score_quantiles': {f"p{q}": quantile(counts, q / 100.0) for q in RANK_QUANTILES},
+    }
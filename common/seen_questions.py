@@ -0,0 +1,199 @@
+import hashlib
+import math
+import os
+import re
+import time
+from botocore.exceptions import ClientError
+
+# Per-user record of the questions a user has already been served, so
+# create_quiz can drop repeats and generate targeted replacements instead.
+# One item per user in SEEN_QUESTIONS_TABLE, read once per quiz:
+#
+#   current / previous  Bloom filters over question fingerprints. When the
+#                       current one reaches SEEN_FILTER_CAPACITY, it becomes
+#                       previous and a new one starts, so the item stays a
+#                       fixed size (about 2 x 2.4 KB at the defaults) and the
+#                       oldest questions are eventually allowed again.
+#   recent              The last RECENT_QUESTIONS question texts, passed to
+#                       the model so it avoids them in the first place.
+#
+# A Bloom filter has no false negatives; at the default sizing about 1% of
+# new questions are wrongly taken for repeats and replaced.
+SEEN_QUESTION_FILTER = os.environ.get('SEEN_QUESTION_FILTER', 'true').lower() == 'true'
+SEEN_QUESTIONS_TABLE = os.environ.get('SEEN_QUESTIONS_TABLE', 'seen_questions')
+
+FILTER_CAPACITY = int(os.environ.get('SEEN_FILTER_CAPACITY', '2000'))
+FILTER_ERROR_RATE = float(os.environ.get('SEEN_FILTER_ERROR_RATE', '0.01'))
+RECENT_QUESTIONS = int(os.environ.get('SEEN_RECENT_QUESTIONS', '20'))
+# Top-up generations per batch when questions turn out to be repeats
+TOPUP_ROUNDS = int(os.environ.get('SEEN_TOPUP_ROUNDS', '2'))
+SAVE_ATTEMPTS = 3
+
+# Words that don't tell two questions apart
+_STOPWORDS = frozenset(
+    'a an and are as at be by can could do does for from has have how i if in is it its of on or should '
+    'that the their this to what when which while who why will with would you your'.split()
+)
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def fingerprint(text):
+    """
+    16-byte fingerprint of a question. Case, punctuation, stopwords and word
+    order are ignored, so light rewordings of the same question collide.
+    """
+    words = sorted({w for w in _WORD.findall(str(text).lower()) if w not in _STOPWORDS})
+    return hashlib.blake2b(' '.join(words).encode('utf-8'), digest_size=16).digest()
+
+
+def cluster_key(cluster_id):
+    return hashlib.blake2b(f"cluster:{cluster_id}".encode('utf-8'), digest_size=16).digest()
+
+
+class BloomFilter:
+    def __init__(self, size_bits, hashes, bits=None, count=0):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((size_bits + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity=FILTER_CAPACITY, error_rate=FILTER_ERROR_RATE):
+        size_bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = max(1, int(round(size_bits / capacity * math.log(2))))
+        return cls(size_bits, hashes)
+
+    def _positions(self, fp):
+        # Double hashing over the two halves of the fingerprint
+        h1 = int.from_bytes(fp[:8], 'big')
+        h2 = int.from_bytes(fp[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hashes)]
+
+    def add(self, fp):
+        for pos in self._positions(fp):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, fp):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fp))
+
+
+def _bytes(value):
+    # boto3 returns Binary attributes wrapped in boto3.dynamodb.types.Binary
+    return bytes(value.value if hasattr(value, 'value') else value)
+
+
+class SeenQuestions:
+    """
+    A user's seen-question record. seen() and add() work in memory; save()
+    writes the additions back.
+    """
+
+    def __init__(self, username, item=None):
+        self.username = username
+        self.version = None
+        self.previous = None
+        self.recent = []
+        self.added = []
+        self.current = BloomFilter.for_capacity()
+        if item is not None:
+            self._load(item)
+
+    def _load(self, item):
+        size_bits, hashes = int(item['size_bits']), int(item['hashes'])
+        self.version = int(item['v'])
+        self.current = BloomFilter(size_bits, hashes, _bytes(item['current']), int(item.get('current_count', 0)))
+        if item.get('previous') is not None:
+            self.previous = BloomFilter(size_bits, hashes, _bytes(item['previous']))
+        self.recent = list(item.get('recent') or [])
+
+    def _contains(self, fp):
+        return fp in self.current or (self.previous is not None and fp in self.previous)
+
+    def seen(self, text, cluster_id=None):
+        """
+        cluster_id (common/question_index.py) also matches paraphrases of
+        questions served before
+        """
+        return self._contains(fingerprint(text)) or (cluster_id is not None and self._contains(cluster_key(cluster_id)))
+
+    def add(self, text, cluster_id=None):
+        self._add(text, cluster_id)
+        self.added.append((text, cluster_id))
+
+    def _add(self, text, cluster_id=None):
+        if self.current.count >= FILTER_CAPACITY:
+            self.previous = self.current
+            self.current = BloomFilter(self.current.size_bits, self.current.hashes)
+        self.current.add(fingerprint(text))
+        if cluster_id is not None:
+            self.current.add(cluster_key(cluster_id))
+        self.recent = (self.recent + [text])[-RECENT_QUESTIONS:]
+
+    def item(self):
+        item = {
+            'username': self.username,
+            'size_bits': self.current.size_bits,
+            'hashes': self.current.hashes,
+            'current': bytes(self.current.bits),
+            'current_count': self.current.count,
+            'recent': self.recent,
+            'v': (self.version or 0) + 1,
+            'updated_at': int(time.time()),
+        }
+        if self.previous is not None:
+            item['previous'] = bytes(self.previous.bits)
+        return item
+
+    def save(self, table):
+        """
+        Write the record, conditional on the version read. If another quiz
+        wrote first, its record is reloaded and this quiz's additions are
+        applied on top, so concurrent quizzes don't lose each other's questions.
+        """
+        for _ in range(SAVE_ATTEMPTS):
+            if self.version is None:
+                condition = {'ConditionExpression': 'attribute_not_exists(username)'}
+            else:
+                condition = {'ConditionExpression': 'v = :v', 'ExpressionAttributeValues': {':v': self.version}}
+            try:
+                table.put_item(Item=self.item(), **condition)
+                self.version = (self.version or 0) + 1
+                self.added = []
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+            fresh = load(table, self.username)
+            for text, cluster_id in self.added:
+                fresh._add(text, cluster_id)
+            fresh.added = self.added
+            self.__dict__.update(fresh.__dict__)
+        print(f"Gave up saving seen questions for {self.username} after {SAVE_ATTEMPTS} attempts")
+
+
+def load(table, username):
+    item = table.get_item(Key={'username': username}, ConsistentRead=True).get('Item')
+    return SeenQuestions(username, item)
+
+
+def split_seen(seen, questions, kept=()):
+    """
+    (fresh, repeats): repeats were seen before, or repeat an earlier question
+    of the list or of kept (questions already accepted for the quiz). Questions
+    carrying a cluster_id also match on it.
+    """
+    def keys(q):
+        return {fingerprint(q['question'])} | ({q['cluster_id']} if q.get('cluster_id') else set())
+
+    fresh, repeats, batch = [], [], set()
+    for q in kept:
+        batch |= keys(q)
+    for q in questions:
+        q_keys = keys(q)
+        if q_keys & batch or seen.seen(q['question'], q.get('cluster_id')):
+            repeats.append(q)
+        else:
+            batch |= q_keys
+            fresh.append(q)
+    return fresh, repeats
@@ -0,0 +1,172 @@
+import os
+import time
+from model_router import converse_routed
+
+# A conversation (the sessionId the web app keeps for a whole chat) is served
+# by a chain of Bedrock Agent sessions. When the current agent session gets
+# long, older turns are summarised and the next turn starts a fresh agent
+# session carrying only the summary, so the orchestration prompt stops growing.
+COMPACT_AFTER_TURNS = int(os.environ.get('SESSION_COMPACT_AFTER_TURNS', '10'))
+COMPACT_INPUT_TOKENS = int(os.environ.get('SESSION_COMPACT_INPUT_TOKENS', '12000'))
+
+# Turns not yet in the summary (recent_turns) are kept until a compaction
+# succeeds; this many of them also trigger one, whether the agent or
+# quiz_router served them
+RECENT_TURNS_KEPT = int(os.environ.get('SESSION_RECENT_TURNS', '10'))
+# Bound on the item size if compaction keeps failing; older turns beyond it
+# are dropped, and logged
+UNSUMMARIZED_MAX_TURNS = 50
+TURN_MAX_CHARS = 1500
+SUMMARY_MAX_CHARS = 2000
+SESSION_TTL_SECONDS = 7 * 86400
+
+# promptSessionAttributes keys the agent's orchestration prompt sees
+SUMMARY_ATTRIBUTE = 'conversation_summary'
+PREVIOUS_EXCHANGE_ATTRIBUTE = 'previous_exchange'
+
+
+def estimate_tokens(text):
+    # ~4 characters per token; only used when the trace is off
+    return len(text or '') // 4
+
+
+def new_conversation(session_id):
+    return {
+        'session_id': session_id,
+        'generation': 0,
+        'agent_session_id': session_id,
+        'summary': '',
+        'turns': 0,
+        'total_turns': 0,
+        'input_tokens': 0,
+        'recent_turns': [],
+        'last_turn': None,
+    }
+
+
+def load_conversation(table, session_id):
+    """
+    Compaction state for a conversation, or a fresh one. Generation 0 uses the
+    client's sessionId as the agent session id, so existing chats carry on.
+    """
+    item = table.get_item(Key={'session_id': session_id}).get('Item')
+    if item is None:
+        return new_conversation(session_id)
+    conversation = new_conversation(session_id)
+    conversation.update(item)
+    for field in ['generation', 'turns', 'total_turns', 'input_tokens']:
+        conversation[field] = int(conversation[field])
+    if conversation['last_turn'] is None and conversation['recent_turns']:
+        # Saved before last_turn was kept
+        conversation['last_turn'] = conversation['recent_turns'][-1]
+    return conversation
+
+
+def save_conversation(table, conversation, now=None):
+    now = int(now if now is not None else time.time())
+    item = dict(conversation)
+    item['updated_at'] = now
+    item['expires_at'] = now + SESSION_TTL_SECONDS
+    table.put_item(Item=item)
+
+
+def prompt_session_attributes(conversation):
+    """
+    The summary, plus the last exchange verbatim on the first turn of a new
+    agent session (e.g. a quiz question the user is about to answer)
+    """
+    if not conversation['summary']:
+        return {}
+    attributes = {SUMMARY_ATTRIBUTE: conversation['summary']}
+    last = conversation.get('last_turn')
+    if conversation['turns'] == 0 and last:
+        attributes[PREVIOUS_EXCHANGE_ATTRIBUTE] = f"User: {last['user']}\nAssistant: {last['agent']}"
+    return attributes
+
+
+def record_turn(conversation, user_message, agent_response, input_tokens=None, agent_turn=True):
+    """
+    Fold a finished turn into the state. input_tokens is the largest
+    orchestration prompt of the turn, read from the trace; without a trace it
+    is estimated from the text kept for the session. Turns served without the
+    agent (agent_turn=False) go into the summary but not the agent session.
+    """
+    if agent_turn:
+        conversation['turns'] += 1
+    conversation['total_turns'] += 1
+    turn = {
+        'user': (user_message or '')[:TURN_MAX_CHARS],
+        'agent': (agent_response or '')[:TURN_MAX_CHARS],
+    }
+    conversation['last_turn'] = turn
+    recent_turns = conversation['recent_turns'] + [turn]
+    if len(recent_turns) > UNSUMMARIZED_MAX_TURNS:
+        print(f"Session {conversation['session_id']}: {len(recent_turns) - UNSUMMARIZED_MAX_TURNS} "
+              f"unsummarised turns dropped, compaction keeps failing")
+        recent_turns = recent_turns[-UNSUMMARIZED_MAX_TURNS:]
+    conversation['recent_turns'] = recent_turns
+    if input_tokens is None:
+        input_tokens = estimate_tokens(conversation['summary']) + sum(
+            estimate_tokens(t['user']) + estimate_tokens(t['agent']) for t in conversation['recent_turns'])
+    conversation['input_tokens'] = int(input_tokens)
+    return conversation
+
+
+def needs_compaction(conversation):
+    return (conversation['turns'] >= COMPACT_AFTER_TURNS
+            or conversation['input_tokens'] >= COMPACT_INPUT_TOKENS
+            or len(conversation['recent_turns']) >= RECENT_TURNS_KEPT)
+
+
+def build_summary_prompt(previous_summary, turns):
+    transcript = "\n".join(f"User: {t['user']}\nAssistant: {t['agent']}" for t in turns)
+    return f"""You maintain the running summary of a study-assistant chat about AWS certifications.
+
+Previous summary:
+{previous_summary or '(none)'}
+
+Latest exchanges:
+{transcript}
+
+Write an updated summary in at most 150 words that lets the assistant continue the conversation without the transcript.
+Keep every identifier and number exactly as written: quiz ids, question numbers, scores, certification names, the current topic.
+Keep anything still pending (an unanswered quiz question, a promised follow-up). Drop greetings and small talk.
+Return only the summary text, with no heading."""
+
+
+def parse_summary(response_text):
+    summary = (response_text or '').strip()
+    if not summary or len(summary) > SUMMARY_MAX_CHARS:
+        return None
+    return summary
+
+
+def compact(bedrock_client, conversation):
+    """
+    Summarise the previous summary and the turns not yet in it, then move
+    the conversation to a new agent session. Returns False (state unchanged,
+    the turns kept for the next attempt) if no usable summary came back. May
+    raise BedrockUnavailable.
+    """
+    prompt = build_summary_prompt(conversation['summary'], conversation['recent_turns'])
+    summary, model_id = converse_routed(
+        bedrock_client,
+        'session_summary',
+        len(conversation['recent_turns']),
+        [{"role": "user", "content": [{"text": prompt}]}],
+        {"maxTokens": 400, "temperature": 0.2, "topP": 0.9},
+        parse_summary
+    )
+    if summary is None:
+        return False
+
+    conversation['generation'] += 1
+    conversation['agent_session_id'] = f"{conversation['session_id']}-g{conversation['generation']}"
+    conversation['summary'] = summary
+    conversation['turns'] = 0
+    conversation['input_tokens'] = estimate_tokens(summary)
+    # All in the summary now; last_turn still seeds the new agent session
+    conversation['recent_turns'] = []
+    print(f"Compacted session {conversation['session_id']} into {conversation['agent_session_id']} "
+          f"({len(summary)} chars, {model_id})")
+    return True
@@ -0,0 +1,108 @@
+import json
+import os
+import time
+from json_codec import dumps
+
+# Session attribute names shared by invoke_agent and the action-group Lambdas
+USERNAME_ATTRIBUTE = 'username'
+PROFILE_ATTRIBUTE = 'user_profile'
+PROFILE_LOADED_AT_ATTRIBUTE = 'user_profile_loaded_at'
+
+# A profile carried in the session is trusted for this long before the
+# action groups go back to DynamoDB
+PROFILE_MAX_AGE_SECONDS = int(os.environ.get('SESSION_PROFILE_MAX_AGE_SECONDS', '900'))
+
+# Fields copied into promptSessionAttributes so the orchestration prompt can
+# answer simple questions without calling getuserdetails at all
+PROMPT_PROFILE_FIELDS = ['recommended_cert', 'currentjobrole', 'aspiringjobrole']
+
+
+def build_session_state(profile, now=None):
+    """
+    sessionState for invoke_agent carrying the user's profile. Bedrock keeps
+    sessionAttributes for the whole session and forwards them to every
+    action-group Lambda and collaborator agent.
+    """
+    now = int(now if now is not None else time.time())
+    username = profile.get('username', '')
+    session_attributes = {
+        USERNAME_ATTRIBUTE: username,
+        PROFILE_ATTRIBUTE: dumps(profile),
+        PROFILE_LOADED_AT_ATTRIBUTE: str(now),
+    }
+    prompt_session_attributes = {USERNAME_ATTRIBUTE: username}
+    for field in PROMPT_PROFILE_FIELDS:
+        if profile.get(field):
+            prompt_session_attributes[field] = str(profile[field])
+    return {
+        'sessionAttributes': session_attributes,
+        'promptSessionAttributes': prompt_session_attributes,
+    }
+
+
+def profile_from_event(event, username, now=None):
+    """
+    Return the profile carried in the event's sessionAttributes, or None if it
+    is missing, belongs to another user or is older than PROFILE_MAX_AGE_SECONDS
+    """
+    session_attributes = event.get('sessionAttributes') or {}
+    raw_profile = session_attributes.get(PROFILE_ATTRIBUTE)
+    if not raw_profile:
+        return None
+
+    try:
+        loaded_at = int(session_attributes.get(PROFILE_LOADED_AT_ATTRIBUTE, '0'))
+    except ValueError:
+        return None
+    now = now if now is not None else time.time()
+    if now - loaded_at > PROFILE_MAX_AGE_SECONDS:
+        print("Session profile is stale, falling back to DynamoDB")
+        return None
+
+    try:
+        profile = json.loads(raw_profile)
+    except json.JSONDecodeError as e:
+        print(f"Ignoring unreadable session profile: {str(e)}")
+        return None
+
+    if str(profile.get('username', '')).lower() != str(username).lower():
+        return None
+    return profile
+
+
+def get_user_profile(event, username, user_profile_table):
+    """
+    User profile for an action-group call: from the session when present and
+    fresh, otherwise a get_item on user_profile. Returns None if the user
+    does not exist.
+    """
+    profile = profile_from_event(event, username)
+    if profile is not None:
+        print(f"Using user profile from session attributes for {username}")
+        return profile
+
+    user_response = user_profile_table.get_item(Key={'username': username})
+    return user_response.get('Item')
+
+
+def refreshed_session_attributes(event, username, updated_attributes):
+    """
+    After a profile update, merge the new values into the profile carried in
+    the session so later action groups don't read a stale copy. Returns the
+    sessionAttributes to send back to the agent, or None when the session
+    carries no profile for this user.
+    """
+    session_attributes = dict(event.get('sessionAttributes') or {})
+    raw_profile = session_attributes.get(PROFILE_ATTRIBUTE)
+    if not raw_profile:
+        return None
+    try:
+        profile = json.loads(raw_profile)
+    except json.JSONDecodeError:
+        return None
+    if str(profile.get('username', '')).lower() != str(username).lower():
+        return None
+
+    profile.update(updated_attributes)
+    session_attributes[PROFILE_ATTRIBUTE] = dumps(profile)
+    return session_attributes
@@ -0,0 +1,64 @@
+import os
+import time
+from botocore.exceptions import ClientError
+from quiz_store import pack_questions, static_question, unpack_questions
+
+# Starter quizzes: when a user's recommended_cert changes, create_quiz
+# generates a short quiz for the new cert in the background (see
+# common/profile_events.py) and parks it here. The user's first matching
+# create_quiz call claims it instead of waiting for the model.
+#
+# One item per user in STARTER_QUIZ_TABLE; a newer cert replaces it. The
+# claim is a conditional delete, so a starter quiz is served at most once.
+STARTER_QUIZZES = os.environ.get('STARTER_QUIZZES', 'true').lower() == 'true'
+STARTER_QUIZ_TABLE = os.environ.get('STARTER_QUIZ_TABLE', 'starter_quizzes')
+STARTER_QUIZ_QUESTIONS = int(os.environ.get('STARTER_QUIZ_QUESTIONS', '5'))
+# create_quiz's default topic, which is what "quiz me" without a topic asks for
+STARTER_QUIZ_TOPIC = os.environ.get('STARTER_QUIZ_TOPIC', 'AWS General')
+STARTER_QUIZ_TTL_SECONDS = int(os.environ.get('STARTER_QUIZ_TTL_HOURS', '24')) * 3600
+
+
+def store_starter(table, username, cert, topic, questions, now=None):
+    now = int(now if now is not None else time.time())
+    table.put_item(Item={
+        'username': username,
+        'recommended_cert': cert,
+        'topic': topic,
+        'question_count': len(questions),
+        'questions_blob': pack_questions([static_question(q) for q in questions]),
+        'created_at': now,
+        'expires_at': now + STARTER_QUIZ_TTL_SECONDS,
+    })
+
+
+def has_starter(table, username, cert, now=None):
+    """
+    Whether an unexpired starter quiz for cert is already parked
+    """
+    now = int(now if now is not None else time.time())
+    item = table.get_item(Key={'username': username}, ConsistentRead=True).get('Item')
+    return bool(item) and item.get('recommended_cert') == cert and int(item['expires_at']) > now
+
+
+def claim_starter(table, username, cert, topic, num_questions, now=None):
+    """
+    The parked questions for this quiz, or None. The starter quiz must be for
+    the same cert and topic and have at least num_questions questions; it is
+    deleted in the same call, so a concurrent claim gets None.
+    """
+    now = int(now if now is not None else time.time())
+    try:
+        response = table.delete_item(
+            Key={'username': username},
+            ConditionExpression='recommended_cert = :cert AND topic = :topic AND question_count >= :count AND expires_at > :now',
+            ExpressionAttributeValues={':cert': cert, ':topic': topic, ':count': num_questions, ':now': now},
+            ReturnValues='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise
+    item = response.get('Attributes')
+    if not item:
+        return None
+    return unpack_questions(item['questions_blob'])[:num_questions]
@@ -0,0 +1,213 @@
+import os
+import re
+import time
+
+# Pre-generated Tutor lessons, one lesson per (certification, exam domain,
+# depth). Lessons are stored in pages of at most CHUNK_CHARS characters so
+# the agent only reads what it is about to teach.
+#
+#   tutor_lessons   pk lesson_id (S), sk chunk (N)
+#                   chunk 0 = lesson header, chunks 1..pages = lesson text
+#                   lesson_id "catalogue#<cert>" = the certification's catalogue
+#   tutor_progress  pk username: where "continue learning" picks up
+LESSONS_TABLE = os.environ.get('TUTOR_LESSONS_TABLE', 'tutor_lessons')
+PROGRESS_TABLE = os.environ.get('TUTOR_PROGRESS_TABLE', 'tutor_progress')
+
+DEPTHS = ['overview', 'standard', 'deep_dive']
+DEFAULT_DEPTH = 'standard'
+DEPTH_GUIDANCE = {
+    'overview': 'a short orientation for someone new to the domain: what it covers, the main services and why they matter for the exam',
+    'standard': 'a full lesson at the depth the exam expects: core concepts, how the services are configured and when to choose each one',
+    'deep_dive': 'an advanced lesson on the harder exam scenarios: trade-offs between similar services, limits, edge cases and common exam traps',
+}
+
+CHUNK_CHARS = int(os.environ.get('TUTOR_CHUNK_CHARS', '1500'))
+
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-')
+
+
+def lesson_id(cert, domain, depth):
+    return f"{slug(cert)}#{slug(domain)}#{depth}"
+
+
+def catalogue_id(cert):
+    return f"catalogue#{slug(cert)}"
+
+
+SENTENCE_END = re.compile(r'[.!?]\s+|\n')
+
+
+def chunk_sections(sections, max_chars=CHUNK_CHARS):
+    """
+    Pack lesson sections ({'heading', 'body'}) into pages of at most
+    max_chars, splitting long sections on paragraph boundaries and
+    paragraphs too long for a page on sentence boundaries
+    """
+    pages = []
+    current = ''
+    for section in sections:
+        heading = str(section.get('heading', '')).strip()
+        room = max(1, max_chars - len(f"## {heading} (continued)\n\n"))
+        paragraphs = [piece for p in str(section.get('body', '')).split('\n\n') if p.strip()
+                      for piece in split_paragraph(p.strip(), room)]
+        block = f"## {heading}"
+        has_body = False
+        for paragraph in paragraphs:
+            candidate = f"{block}\n\n{paragraph}"
+            if has_body and len(candidate) > max_chars:
+                # Flush what we have and carry the heading over to the next page
+                pages, current = _append(pages, current, block, max_chars)
+                block = f"## {heading} (continued)\n\n{paragraph}"
+            else:
+                block = candidate
+            has_body = True
+        pages, current = _append(pages, current, block, max_chars)
+    if current:
+        pages.append(current)
+    return pages
+
+
+def split_paragraph(paragraph, max_chars):
+    """
+    Cut a paragraph into pieces of at most max_chars, each ending at the
+    last sentence or line end that fits, else the last space, else the limit
+    """
+    pieces = []
+    while len(paragraph) > max_chars:
+        window = paragraph[:max_chars + 1]
+        ends = [m.end() for m in SENTENCE_END.finditer(window)]
+        cut = ends[-1] if ends else window.rfind(' ') + 1 or max_chars
+        pieces.append(paragraph[:cut].rstrip())
+        paragraph = paragraph[cut:].lstrip()
+    if paragraph:
+        pieces.append(paragraph)
+    return pieces
+
+
+def _append(pages, current, block, max_chars):
+    if not current:
+        return pages, block
+    if len(current) + 2 + len(block) <= max_chars:
+        return pages, f"{current}\n\n{block}"
+    pages.append(current)
+    return pages, block
+
+
+def store_lesson(table, cert, domain, depth, lesson, model_id, now=None):
+    """
+    Write a generated lesson ({'title', 'sections', 'key_points'}) as a
+    header item plus one item per page. Returns the catalogue entry.
+    """
+    now = int(now if now is not None else time.time())
+    lid = lesson_id(cert, domain, depth)
+    pages = chunk_sections(lesson['sections'])
+    # Pages of an earlier, longer version of the lesson (regenerated with force)
+    stale = table.query(
+        KeyConditionExpression='lesson_id = :lid AND #chunk > :pages',
+        ExpressionAttributeNames={'#chunk': 'chunk'},
+        ExpressionAttributeValues={':lid': lid, ':pages': len(pages)},
+        ProjectionExpression='#chunk'
+    ).get('Items', [])
+    with table.batch_writer() as batch:
+        batch.put_item(Item={
+            'lesson_id': lid,
+            'chunk': 0,
+            'certification': cert,
+            'domain': domain,
+            'depth': depth,
+            'title': lesson['title'],
+            'key_points': lesson.get('key_points', []),
+            'pages': len(pages),
+            'model_id': model_id,
+            'generated_at': now,
+        })
+        for idx, text in enumerate(pages, start=1):
+            batch.put_item(Item={'lesson_id': lid, 'chunk': idx, 'content': text})
+        for item in stale:
+            batch.delete_item(Key={'lesson_id': lid, 'chunk': item['chunk']})
+    return {'lesson_id': lid, 'domain': domain, 'depth': depth, 'title': lesson['title'], 'pages': len(pages)}
+
+
+def store_catalogue(table, cert, domains, lessons, now=None):
+    """
+    Catalogue of a certification: its exam domains in syllabus order and the
+    lessons generated so far, keyed by lesson_id
+    """
+    table.put_item(Item={
+        'lesson_id': catalogue_id(cert),
+        'chunk': 0,
+        'certification': cert,
+        'domains': domains,
+        'lessons': lessons,
+        'updated_at': int(now if now is not None else time.time()),
+    })
+
+
+def load_catalogue(table, cert):
+    return table.get_item(Key={'lesson_id': catalogue_id(cert), 'chunk': 0}).get('Item')
+
+
+def find_domain(catalogue, requested):
+    """
+    Catalogue domain matching a user's wording: exact, then substring, then
+    most shared words. None if nothing matches.
+    """
+    if not requested:
+        return None
+    wanted = str(requested).lower().strip()
+    domains = catalogue.get('domains', [])
+    for domain in domains:
+        if domain.lower() == wanted:
+            return domain
+    for domain in domains:
+        if wanted in domain.lower() or domain.lower() in wanted:
+            return domain
+    wanted_words = set(re.findall(r'[a-z0-9]+', wanted))
+    best, best_overlap = None, 0
+    for domain in domains:
+        overlap = len(wanted_words & set(re.findall(r'[a-z0-9]+', domain.lower())))
+        if overlap > best_overlap:
+            best, best_overlap = domain, overlap
+    return best
+
+
+def catalogue_entry(catalogue, domain, depth):
+    return catalogue.get('lessons', {}).get(lesson_id(catalogue['certification'], domain, depth))
+
+
+def load_page(table, cert, domain, depth, page):
+    item = table.get_item(Key={'lesson_id': lesson_id(cert, domain, depth), 'chunk': int(page)}).get('Item')
+    return item.get('content') if item else None
+
+
+def next_position(catalogue, domain, depth, page):
+    """
+    Position after (domain, depth, page): the next page of the lesson, else
+    page 1 of the next domain's lesson at the same depth, else None
+    """
+    entry = catalogue_entry(catalogue, domain, depth)
+    if entry and page < int(entry['pages']):
+        return {'domain': domain, 'depth': depth, 'page': page + 1}
+    domains = catalogue.get('domains', [])
+    start = domains.index(domain) + 1 if domain in domains else 0
+    for next_domain in domains[start:]:
+        if catalogue_entry(catalogue, next_domain, depth):
+            return {'domain': next_domain, 'depth': depth, 'page': 1}
+    return None
+
+
+def load_progress(table, username):
+    return table.get_item(Key={'username': username}).get('Item')
+
+
+def save_progress(table, username, cert, position, now=None):
+    table.put_item(Item={
+        'username': username,
+        'certification': cert,
+        'domain': position['domain'],
+        'depth': position['depth'],
+        'page': int(position['page']),
+        'updated_at': int(now if now is not None else time.time()),
+    })
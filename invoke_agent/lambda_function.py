@@ -1,24 +1,74 @@
 import json
-import boto3
+import os
+import time
 from datetime import datetime
 from botocore.exceptions import ClientError
-
-# Initialize Bedrock Agent Runtime client
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', region_name='us-east-1')
+from bedrock_guard import BedrockUnavailable, guarded_call
+from session_profile import PROFILE_MAX_AGE_SECONDS, build_session_state
+from session_compaction import compact, load_conversation, needs_compaction, prompt_session_attributes, record_turn, save_conversation
+from json_codec import dumps
+from call_ledger import CALL_LEDGER_TABLE, ERROR, OK, UNAVAILABLE, record_call, set_context
+from dynamo_fast import FAST_PATH_ENABLED, put_item
+from admission import ADMISSION_CONTROL, ADMISSION_TABLE, REASON_USER, Admission, AdmissionRejected, build_store
+from idempotency import COMPLETED, IDEMPOTENCY, IDEMPOTENCY_TABLE, acquire, complete, release, request_key
+from quiz_router import (
+    INTENT_ANSWER, INTENT_NEXT, LETTERS, QUIZ_PREROUTER, SHOW_NEXT_QUESTION_FUNCTION, SHOW_RESULT_FUNCTION,
+    action_body, clear_state, format_answer, format_pending, format_results, invoke_action, load_state, observe,
+    parse_intent, prompt_attribute, routable, save_state
+)
+from aws_clients import get_bedrock_agent_runtime, get_bedrock_runtime, get_lambda, get_table, is_warmup_event, preload_clients, warmup_response
 
 # Replace these with your actual values
 AGENT_ID = 'MFHMV9L4SS'
 AGENT_ALIAS_ID = 'COVZOLG2LV'
 
+# Quota key used by bedrock_guard for agent invocations
+AGENT_GUARD_KEY = f"agent:{AGENT_ID}"
+
+USER_PROFILE_TABLE = os.environ.get('USER_PROFILE_TABLE', 'user_profile')
+MESSAGES_TABLE = 'messages'
+AGENT_SESSIONS_TABLE = os.environ.get('AGENT_SESSIONS_TABLE', 'agent_sessions')
+SESSION_COMPACTION = os.environ.get('SESSION_COMPACTION', 'true').lower() == 'true'
+
+# Clients and tables this function uses; built during init (see common/aws_clients.py).
+# bedrock-runtime is only needed when a session is compacted; lambda serves
+# quiz messages that skip the agent.
+CLIENTS = ['dynamodb', 'dynamodb-client', 'bedrock-agent-runtime', 'lambda']
+TABLES = [MESSAGES_TABLE, USER_PROFILE_TABLE, AGENT_SESSIONS_TABLE, IDEMPOTENCY_TABLE, ADMISSION_TABLE, CALL_LEDGER_TABLE]
+preload_clients(CLIENTS, TABLES)
+
+# How much of the agent trace to request and process, per request:
+#   off      - enableTrace=False; only the final answer is collected
+#   routing  - rationale and collaborator invocations are logged to the
+#              messages table (what the UI shows as progress)
+#   full     - routing, plus every stream event printed to CloudWatch within
+#              a per-event and per-turn character budget
+TRACE_OFF, TRACE_ROUTING, TRACE_FULL = 'off', 'routing', 'full'
+TRACE_LEVELS = [TRACE_OFF, TRACE_ROUTING, TRACE_FULL]
+TRACE_LEVEL = os.environ.get('AGENT_TRACE_LEVEL', TRACE_ROUTING)
+# Highest level a client may ask for with "traceLevel" in the request body
+TRACE_MAX_LEVEL = os.environ.get('AGENT_TRACE_MAX_LEVEL', TRACE_ROUTING)
+TRACE_MAX_EVENT_CHARS = int(os.environ.get('AGENT_TRACE_MAX_EVENT_CHARS', '2000'))
+TRACE_MAX_TURN_CHARS = int(os.environ.get('AGENT_TRACE_MAX_TURN_CHARS', '50000'))
+
+# Sessions this container already injected the user profile into: session_id -> epoch seconds
+profile_injected_at = {}
+MAX_TRACKED_SESSIONS = 1000
+
+# Per-user and global limits on agent invocations (common/admission.py); built on first use
+admission = None
+
 def lambda_handler(event, context):
     """
     Lambda function to interact with AWS Bedrock Agent
     """
+    if is_warmup_event(event):
+        return warmup_response(CLIENTS, TABLES)
     
     # CORS headers
     headers = {
         'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Allow-Headers': 'Content-Type, Idempotency-Key',
         'Access-Control-Allow-Methods': 'POST, OPTIONS',
         'Content-Type': 'application/json'
     }
@@ -46,158 +96,56 @@ def lambda_handler(event, context):
             return {
                 'statusCode': 400,
                 'headers': headers,
-                'body': json.dumps({'error': 'Message is required'})
+                'body': dumps({'error': 'Message is required'})
             }
         
-        # Invoke Bedrock Agent
-        response = bedrock_agent_runtime.invoke_agent(
-            agentId=AGENT_ID,
-            agentAliasId=AGENT_ALIAS_ID,
-            sessionId=session_id,
-            enableTrace=True,
-            streamingConfigurations={
-                'streamFinalResponse': False
-            },
-            inputText=user_message
-        )
-
-        # Initialize AWS clients
-        dynamodb = boto3.resource('dynamodb')
-        messages_table = dynamodb.Table("messages")
-        
-        # Collect the response from the stream
-        agent_response = ""
-        event_stream = response["completion"]
-        chunk_count = 0
+        # A resent message joins the original run instead of invoking the
+        # agent again (common/idempotency.py)
+        idempotency_key, derived = request_key(
+            session_id, user_message, body.get('idempotencyKey') or idempotency_header(event))
+        claim_token, original = claim_request(idempotency_key, derived, context)
+        if original is not None:
+            return replay_response(original, headers)
 
+        response = None
         try:
-            for event in event_stream:
-                chunk_count += 1
-                print(f"Event {chunk_count} received:", json.dumps(event, default=str))
-
-                # Handle chunk events - the main response content
-                if "chunk" in event:
-                    chunk = event["chunk"]
-                    
-                    # Text chunks with bytes
-                    if "bytes" in chunk:
-                        decoded_text = chunk["bytes"].decode("utf-8")
-                        print(f"Chunk {chunk_count} text: {decoded_text}")
-                        agent_response += decoded_text
-                        log_message(
-                            messages_table,
-                            username,
-                            "FINAL_RESPONSE",
-                            f"{agent_response}"
-                        )
-                    
-                    # Attribution can also contain text
-                    if "attribution" in chunk:
-                        print("Attribution:", chunk["attribution"])
-
-                # Handle returnControl for action group responses
-                elif "returnControl" in event:
-                    return_control = event["returnControl"]
-                    if "invocationInputs" in return_control:
-                        for inv_input in return_control["invocationInputs"]:
-                            if "functionInvocationInput" in inv_input:
-                                func_input = inv_input["functionInvocationInput"]
-                                print("Function invocation:", func_input)
-                
-                # Handle trace events for debugging
-                elif "trace" in event:
-                    trace = event["trace"]
-                    print("Trace event type:", list(trace.keys()))
-                    
-                    # Handle nested trace structure (trace → trace → orchestrationTrace)
-                    inner_trace = trace.get("trace", {})
-                    
-                    # Handle rationale events from orchestration trace
-                    if "orchestrationTrace" in inner_trace:
-                        orchestration_trace = inner_trace["orchestrationTrace"]
-                        if "rationale" in orchestration_trace:
-                            rationale = orchestration_trace["rationale"]
-                            rationale_text = rationale.get("text", "")
-                            trace_id = rationale.get("traceId", "")
-                            
-                            print(f"Rationale event detected (TraceId: {trace_id})")
-                            print(f"Rationale text: {rationale_text}")
-                            
-                            # Log the rationale event
-                            log_message(
-                                messages_table,
-                                username,
-                                "RATIONALE",
-                                "RATIONALE: (1) " + rationale_text,
-                                show_to_user=False,
-                                agent="Orchestration"
-                            )
-                        
-                        # Handle agent collaborator invocations within orchestration trace
-                        if "invocationInput" in orchestration_trace:
-                            invocation_input = orchestration_trace["invocationInput"]
-                            if "agentCollaboratorInvocationInput" in invocation_input:
-                                agent_collab_input = invocation_input["agentCollaboratorInvocationInput"]
-                                agent_name = agent_collab_input.get("agentCollaboratorName", "Unknown")
-                                
-                                print(f"Agent collaborator invoked: {agent_name}")
-                                
-                                # Log the agent collaborator event
-                                log_message(
-                                    messages_table,
-                                    username,
-                                    "AGENT_COLLABORATOR",
-                                    f"AGENT_COLLABORATOR: {agent_name} Agent invoked",
-                                    show_to_user=False,
-                                    agent=agent_name
-                                )
-                    
-                    # Handle routing classifier trace for agent collaborator invocations
-                    elif "routingClassifierTrace" in inner_trace:
-                        routing_trace = inner_trace["routingClassifierTrace"]
-                        if "invocationInput" in routing_trace:
-                            invocation_input = routing_trace["invocationInput"]
-                            if "agentCollaboratorInvocationInput" in invocation_input:
-                                agent_collab_input = invocation_input["agentCollaboratorInvocationInput"]
-                                agent_name = agent_collab_input.get("agentCollaboratorName", "Unknown")
-                                
-                                print(f"Agent collaborator invoked: {agent_name}")
-                                
-                                # Log the agent collaborator event
-                                log_message(
-                                    messages_table,
-                                    username,
-                                    "AGENT_COLLABORATOR",
-                                    f"AGENT_COLLABORATOR: {agent_name} Agent invoked",
-                                    show_to_user=False,
-                                    agent=agent_name
-                                )
-                    
-        except Exception as stream_error:
-            print(f"Error reading stream: {str(stream_error)}")
-            import traceback
-            print(f"Stream traceback: {traceback.format_exc()}")
-        
-        print(f"Total chunks received: {chunk_count}")
-        print(f"Final agent response length: {len(agent_response)}")
-        print(f"Final agent response: {agent_response}")
+            response = handle_message(body, user_message, session_id, username, headers,
+                                      admission_identity(event, session_id))
+        finally:
+            finish_request(idempotency_key, claim_token, derived, response)
+        return response
         
-        # Return successful response
+    except AdmissionRejected as e:
+        print(f"Request not admitted ({e.reason}), retry after {e.retry_after:.1f}s")
+        retry_after = max(1, int(round(e.retry_after)))
         return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({
-                'response': agent_response,
-                'sessionId': session_id
+            'statusCode': 429 if e.reason == REASON_USER else 503,
+            'headers': dict(headers, **{'Retry-After': str(retry_after)}),
+            'body': dumps({
+                'error': ('You are sending messages too quickly, please wait a moment' if e.reason == REASON_USER
+                          else 'The assistant is busy right now, please try again shortly'),
+                'retryAfterSeconds': retry_after
             })
         }
-        
+
+    except BedrockUnavailable as e:
+        print(f"Bedrock Agent unavailable: {str(e)}")
+        retry_after = max(1, int(round(e.retry_after or 1)))
+        return {
+            'statusCode': 503,
+            'headers': dict(headers, **{'Retry-After': str(retry_after)}),
+            'body': dumps({
+                'error': 'The assistant is busy right now, please try again shortly',
+                'retryAfterSeconds': retry_after
+            })
+        }
+
     except ClientError as e:
         print(f"AWS Client Error: {str(e)}")
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({
+            'body': dumps({
                 'error': 'Failed to invoke Bedrock Agent',
                 'details': str(e)
             })
@@ -210,12 +158,521 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({
+            'body': dumps({
                 'error': 'Internal server error',
                 'details': str(e)
             })
         }
 
+def handle_message(body, user_message, session_id, username, headers, identity):
+    """
+    One chat turn: the quiz pre-router, or a Bedrock Agent invocation.
+    Exceptions are left to lambda_handler.
+    """
+    messages_table = get_table(MESSAGES_TABLE)
+    set_context(handler='invoke_agent', user=username, ref=session_id)
+
+    # While a quiz is running, answer letters, "next" and "show results"
+    # are served without the agent (common/quiz_router.py)
+    quiz_state = load_quiz_state(session_id)
+    routed = route_quiz_message(quiz_state, user_message, session_id, username, messages_table)
+    if routed is not None:
+        reply, intent = routed
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': dumps({
+                'response': reply,
+                'sessionId': session_id,
+                'routed': intent
+            })
+        }
+
+    # Long chats are served by a chain of agent sessions; older turns are
+    # carried as a summary instead of agent memory (common/session_compaction.py)
+    conversation = load_conversation_state(session_id)
+    agent_session_id = conversation['agent_session_id'] if conversation else session_id
+
+    # Load the user profile once per agent session and hand it to the agent
+    # so the action groups don't each read user_profile again
+    invoke_kwargs = {}
+    session_state = load_session_state(get_table(USER_PROFILE_TABLE), agent_session_id, username)
+    prompt_attributes = prompt_session_attributes(conversation) if conversation else {}
+    quiz_status = prompt_attribute(quiz_state)
+    if quiz_status:
+        # The agent doesn't see the quiz turns served by the pre-router
+        prompt_attributes['active_quiz'] = quiz_status
+    if prompt_attributes:
+        # promptSessionAttributes only last one turn, so the summary is sent every turn
+        session_state = session_state or {}
+        session_state['promptSessionAttributes'] = dict(
+            session_state.get('promptSessionAttributes', {}), **prompt_attributes)
+    if session_state:
+        invoke_kwargs['sessionState'] = session_state
+
+    trace_level = resolve_trace_level(body.get('traceLevel'))
+
+    # Quiz turns served above cost no agent call, so only this path is limited
+    admit_agent_call(identity)
+
+    # Invoke Bedrock Agent
+    started = time.monotonic()
+    try:
+        response = guarded_call(
+            AGENT_GUARD_KEY,
+            get_bedrock_agent_runtime().invoke_agent,
+            agentId=AGENT_ID,
+            agentAliasId=AGENT_ALIAS_ID,
+            sessionId=agent_session_id,
+            enableTrace=trace_level != TRACE_OFF,
+            streamingConfigurations={
+                'streamFinalResponse': False
+            },
+            inputText=user_message,
+            **invoke_kwargs
+        )
+    except BedrockUnavailable:
+        record_call('agent', AGENT_GUARD_KEY, (time.monotonic() - started) * 1000, outcome=UNAVAILABLE)
+        raise
+
+    # Collect the response from the stream
+    turn = AgentTurn(messages_table, username, trace_level)
+    outcome = OK
+    try:
+        for event in response["completion"]:
+            dispatch_stream_event(turn, event)
+    except Exception as stream_error:
+        outcome = ERROR
+        print(f"Error reading stream: {str(stream_error)}")
+        import traceback
+        print(f"Stream traceback: {traceback.format_exc()}")
+    # Token counts come from the trace; with tracing off only latency is known
+    record_call('agent', AGENT_GUARD_KEY, (time.monotonic() - started) * 1000, outcome=outcome,
+                input_tokens=turn.input_tokens, output_tokens=turn.output_tokens if turn.model_calls else None,
+                model_calls=turn.model_calls or None)
+
+    agent_response = turn.response_text
+    print(f"Stream summary: {json.dumps(turn.summary())}")
+    print(f"Final agent response: {agent_response}")
+
+    if conversation:
+        update_conversation_state(conversation, user_message, agent_response, turn.max_input_tokens)
+    update_quiz_state(session_id, quiz_state, turn)
+
+    # Return successful response
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': dumps({
+            'response': agent_response,
+            'sessionId': session_id
+        })
+    }
+
+def admission_identity(event, session_id):
+    """
+    Who the per-user limit applies to: the authenticated caller when API
+    Gateway has an authorizer, else the chat session
+    """
+    authorizer = (event.get('requestContext') or {}).get('authorizer') or {}
+    principal = (authorizer.get('claims') or {}).get('sub') or authorizer.get('principalId')
+    return f"user:{principal}" if principal else f"session:{session_id}"
+
+def admit_agent_call(identity):
+    """
+    Wait for an agent slot or raise AdmissionRejected. If the limit state
+    can't be read the call goes ahead; bedrock_guard still protects the quota.
+    """
+    global admission
+    if not ADMISSION_CONTROL:
+        return
+    if admission is None:
+        admission = Admission(build_store(get_table))
+    try:
+        waited = admission.admit(identity)
+    except ClientError as e:
+        print(f"Admission state unavailable, invoking the agent: {str(e)}")
+        return
+    if waited:
+        print(f"Admitted after waiting {waited:.2f}s")
+
+def idempotency_header(event):
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'idempotency-key':
+            return value
+    return None
+
+def claim_request(idempotency_key, derived, context):
+    """
+    (claim token, None) when this invocation should run the turn, else
+    (None, the registry item of the original run). The token is None too when
+    there is no registry. Registry errors never block a turn.
+    """
+    if not IDEMPOTENCY:
+        return None, None
+    # The claim lapses when this invocation would have timed out
+    in_flight_seconds = context.get_remaining_time_in_millis() / 1000 + 1 if context else 900
+    try:
+        return acquire(get_table(IDEMPOTENCY_TABLE), idempotency_key, in_flight_seconds, derived=derived)
+    except ClientError as e:
+        print(f"Idempotency registry unavailable, running the request: {str(e)}")
+        return None, None
+
+def replay_response(original, headers):
+    """
+    The original run's response for a duplicate, or 409 if it is still running
+    """
+    if original.get('status') != COMPLETED:
+        print("Duplicate request, original still in flight")
+        return {
+            'statusCode': 409,
+            'headers': dict(headers, **{'Retry-After': '5'}),
+            'body': dumps({
+                'error': 'This message is still being processed',
+                'retryAfterSeconds': 5
+            })
+        }
+    print("Duplicate request, replaying the original response")
+    return {
+        'statusCode': int(original['status_code']),
+        'headers': dict(headers, **{'Idempotent-Replayed': 'true'}),
+        'body': original['response_body']
+    }
+
+def finish_request(idempotency_key, claim_token, derived, response):
+    """
+    Keep a successful response for duplicates; forget failed runs (response
+    None when an exception is on its way to lambda_handler) so retries run.
+    Only touches the registry entry this invocation claimed.
+    """
+    if not IDEMPOTENCY or not claim_token:
+        return
+    table = get_table(IDEMPOTENCY_TABLE)
+    try:
+        if response is not None and response['statusCode'] < 500:
+            updated = complete(table, idempotency_key, claim_token, response['statusCode'], response['body'], derived)
+        else:
+            updated = release(table, idempotency_key, claim_token)
+        if not updated:
+            print("Idempotency claim lapsed and was taken over, registry entry left alone")
+    except ClientError as e:
+        print(f"Could not update the idempotency registry: {str(e)}")
+
+def load_conversation_state(session_id):
+    """
+    Compaction state for the chat, or None when compaction is off or the
+    state can't be read (the turn then runs on the client's sessionId)
+    """
+    if not SESSION_COMPACTION:
+        return None
+    try:
+        return load_conversation(get_table(AGENT_SESSIONS_TABLE), session_id)
+    except ClientError as e:
+        print(f"Could not load session state, compaction skipped: {str(e)}")
+        return None
+
+def update_conversation_state(conversation, user_message, agent_response, input_tokens):
+    """
+    Record the turn and compact the conversation once the agent session has
+    grown past the limits. Best effort: failures only delay compaction.
+    """
+    record_turn(conversation, user_message, agent_response, input_tokens)
+    print(f"Session {conversation['agent_session_id']}: turn {conversation['turns']}, "
+          f"~{conversation['input_tokens']} input tokens")
+    if needs_compaction(conversation):
+        try:
+            compact(get_bedrock_runtime(), conversation)
+        except BedrockUnavailable as e:
+            print(f"Session compaction postponed, Bedrock unavailable: {str(e)}")
+    try:
+        save_conversation(get_table(AGENT_SESSIONS_TABLE), conversation)
+    except ClientError as e:
+        print(f"Could not save session state: {str(e)}")
+
+def load_quiz_state(session_id):
+    """
+    Quiz state of the chat, or None when there is no running quiz, the
+    pre-router is off or the state can't be read
+    """
+    if not QUIZ_PREROUTER:
+        return None
+    try:
+        return load_state(get_table(AGENT_SESSIONS_TABLE), session_id)
+    except ClientError as e:
+        print(f"Could not load quiz state, pre-router skipped: {str(e)}")
+        return None
+
+def save_quiz_state(session_id, state):
+    try:
+        save_state(get_table(AGENT_SESSIONS_TABLE), session_id, state)
+    except ClientError as e:
+        print(f"Could not save quiz state: {str(e)}")
+
+def route_quiz_message(quiz_state, user_message, session_id, username, messages_table):
+    """
+    Serve a structured quiz message without the agent. Returns (reply, intent),
+    or None to hand the message to the agent, also when the direct call fails.
+    """
+    intent = parse_intent(user_message) if quiz_state else None
+    if not routable(intent, quiz_state):
+        return None
+    name, answer_index = intent
+    quiz_params = {'quiz_id': quiz_state['quiz_id'], 'username': quiz_state.get('username') or username}
+    started = time.monotonic()
+    try:
+        if name == INTENT_NEXT:
+            reply = format_pending(quiz_state)
+        elif name == INTENT_ANSWER:
+            status, body = invoke_action(get_lambda(), SHOW_NEXT_QUESTION_FUNCTION, '/show_next_question', dict(
+                quiz_params, current_order=quiz_state['pending_order'], user_answer=LETTERS[answer_index]), session_id)
+            if status == 202 and (body or {}).get('generation_pending'):
+                # The next question of an async quiz isn't generated yet and
+                # the answer wasn't recorded; the state stays as it is
+                reply = body['message']
+            elif status != 200 or body is None:
+                print(f"Quiz pre-router: show_next_question returned {status}: {body}")
+                return None
+            else:
+                reply = format_answer(quiz_state, body)
+                new_state = observe(quiz_state, body)
+                if new_state is not None:
+                    save_quiz_state(session_id, new_state)
+        else:
+            status, body = invoke_action(get_lambda(), SHOW_RESULT_FUNCTION, '/show_result', quiz_params, session_id)
+            if status != 200 or body is None:
+                print(f"Quiz pre-router: ShowResult returned {status}: {body}")
+                return None
+            reply = format_results(body)
+    except Exception as e:
+        print(f"Quiz pre-router fell back to the agent: {str(e)}")
+        return None
+
+    print(f"Quiz pre-router served {name} for {quiz_state['quiz_id']} in {int((time.monotonic() - started) * 1000)} ms")
+    log_message(messages_table, username, "FINAL_RESPONSE", reply, agent='Quiz')
+    conversation = load_conversation_state(session_id)
+    if conversation:
+        # Kept for the next summary; compaction itself waits for an agent turn
+        record_turn(conversation, user_message, reply, conversation['input_tokens'], agent_turn=False)
+        try:
+            save_conversation(get_table(AGENT_SESSIONS_TABLE), conversation)
+        except ClientError as e:
+            print(f"Could not save session state: {str(e)}")
+    return reply, name
+
+def update_quiz_state(session_id, quiz_state, turn):
+    """
+    Follow the quiz through the action group outputs the agent produced this
+    turn. Without a trace the agent's quiz moves can't be seen, so a running
+    quiz is handed over to the agent entirely.
+    """
+    if not QUIZ_PREROUTER:
+        return
+    state = quiz_state
+    for username, body in turn.action_outputs:
+        observed = observe(state, body, username)
+        if observed is not None:
+            state = observed
+    if state is not quiz_state:
+        save_quiz_state(session_id, state)
+    elif quiz_state and turn.trace_level == TRACE_OFF:
+        try:
+            clear_state(get_table(AGENT_SESSIONS_TABLE), session_id)
+        except ClientError as e:
+            print(f"Could not clear quiz state: {str(e)}")
+
+def resolve_trace_level(requested=None):
+    """
+    Trace level for this request: the requested one if valid, capped at
+    AGENT_TRACE_MAX_LEVEL, else AGENT_TRACE_LEVEL
+    """
+    level = TRACE_LEVEL if TRACE_LEVEL in TRACE_LEVELS else TRACE_ROUTING
+    if requested in TRACE_LEVELS:
+        level = requested
+    max_level = TRACE_MAX_LEVEL if TRACE_MAX_LEVEL in TRACE_LEVELS else TRACE_ROUTING
+    return min(level, max_level, key=TRACE_LEVELS.index)
+
+class AgentTurn:
+    """
+    State collected from one invoke_agent stream
+    """
+    def __init__(self, messages_table, username, trace_level):
+        self.messages_table = messages_table
+        self.username = username
+        self.trace_level = trace_level
+        self.response_text = ""
+        self.event_counts = {}
+        self.dumped_chars = 0
+        self.dumps_skipped = 0
+        # Largest orchestration prompt seen this turn, from trace usage metadata
+        self.max_input_tokens = None
+        self.output_tokens = 0
+        # Totals over every model invocation of the turn, for the call ledger
+        self.input_tokens = None
+        self.model_calls = 0
+        self.started = time.monotonic()
+        # Action group calls seen in the trace: parameters of the pending
+        # call, then (username, parsed body) per output, for quiz_router
+        self.action_params = {}
+        self.action_outputs = []
+
+    def count(self, name):
+        self.event_counts[name] = self.event_counts.get(name, 0) + 1
+
+    def dump(self, event):
+        """
+        Full level only: print a raw stream event, truncated to the per-event
+        budget, until the per-turn budget is spent
+        """
+        if self.dumped_chars >= TRACE_MAX_TURN_CHARS:
+            self.dumps_skipped += 1
+            return
+        text = json.dumps(event, default=str)
+        if len(text) > TRACE_MAX_EVENT_CHARS:
+            text = text[:TRACE_MAX_EVENT_CHARS] + f"... [{len(text) - TRACE_MAX_EVENT_CHARS} chars truncated]"
+        self.dumped_chars += len(text)
+        print("Stream event:", text)
+
+    def record_action(self, invocation_input, observation):
+        action_input = (invocation_input or {}).get('actionGroupInvocationInput')
+        if action_input:
+            self.action_params = {p.get('name'): p.get('value') for p in action_input.get('parameters', [])}
+        action_output = (observation or {}).get('actionGroupInvocationOutput')
+        if action_output:
+            body = action_body(action_output.get('text'))
+            if body is not None:
+                self.action_outputs.append((self.action_params.get('username'), body))
+
+    def record_usage(self, model_invocation_output):
+        usage = (model_invocation_output or {}).get('metadata', {}).get('usage')
+        if not usage:
+            return
+        self.max_input_tokens = max(self.max_input_tokens or 0, int(usage.get('inputTokens', 0)))
+        self.output_tokens += int(usage.get('outputTokens', 0))
+        self.input_tokens = (self.input_tokens or 0) + int(usage.get('inputTokens', 0))
+        self.model_calls += 1
+
+    def summary(self):
+        return {
+            'trace_level': self.trace_level,
+            'events': self.event_counts,
+            'response_chars': len(self.response_text),
+            'dumped_chars': self.dumped_chars,
+            'dumps_skipped': self.dumps_skipped,
+            'max_input_tokens': self.max_input_tokens,
+            'output_tokens': self.output_tokens,
+            'elapsed_ms': int((time.monotonic() - self.started) * 1000)
+        }
+
+def on_chunk(turn, chunk):
+    # Text chunks with bytes
+    if "bytes" in chunk:
+        turn.response_text += chunk["bytes"].decode("utf-8")
+        log_message(
+            turn.messages_table,
+            turn.username,
+            "FINAL_RESPONSE",
+            f"{turn.response_text}"
+        )
+
+def on_return_control(turn, return_control):
+    # Function invocation inputs for action groups that return control
+    for inv_input in return_control.get("invocationInputs", []):
+        if "functionInvocationInput" in inv_input:
+            print("Function invocation:", inv_input["functionInvocationInput"])
+
+def on_trace(turn, trace):
+    # Nested trace structure: trace → trace → <subtype>; only the subtypes
+    # in TRACE_HANDLERS are decoded, the rest are skipped unread
+    inner_trace = trace.get("trace", {})
+    for subtype, payload in inner_trace.items():
+        handler = TRACE_HANDLERS.get(subtype)
+        turn.count(subtype)
+        if handler:
+            handler(turn, payload)
+
+def on_orchestration_trace(turn, orchestration_trace):
+    turn.record_usage(orchestration_trace.get("modelInvocationOutput"))
+    turn.record_action(orchestration_trace.get("invocationInput"), orchestration_trace.get("observation"))
+    if "rationale" in orchestration_trace:
+        rationale = orchestration_trace["rationale"]
+        print(f"Rationale event detected (TraceId: {rationale.get('traceId', '')})")
+        log_message(
+            turn.messages_table,
+            turn.username,
+            "RATIONALE",
+            "RATIONALE: (1) " + rationale.get("text", ""),
+            show_to_user=False,
+            agent="Orchestration"
+        )
+    log_collaborator_invocation(turn, orchestration_trace.get("invocationInput", {}))
+
+def on_routing_classifier_trace(turn, routing_trace):
+    turn.record_usage(routing_trace.get("modelInvocationOutput"))
+    log_collaborator_invocation(turn, routing_trace.get("invocationInput", {}))
+
+def log_collaborator_invocation(turn, invocation_input):
+    if "agentCollaboratorInvocationInput" not in invocation_input:
+        return
+    agent_name = invocation_input["agentCollaboratorInvocationInput"].get("agentCollaboratorName", "Unknown")
+    print(f"Agent collaborator invoked: {agent_name}")
+    log_message(
+        turn.messages_table,
+        turn.username,
+        "AGENT_COLLABORATOR",
+        f"AGENT_COLLABORATOR: {agent_name} Agent invoked",
+        show_to_user=False,
+        agent=agent_name
+    )
+
+# Stream event type -> handler, and trace subtype -> handler
+EVENT_HANDLERS = {
+    'chunk': on_chunk,
+    'returnControl': on_return_control,
+    'trace': on_trace,
+}
+TRACE_HANDLERS = {
+    'orchestrationTrace': on_orchestration_trace,
+    'routingClassifierTrace': on_routing_classifier_trace,
+}
+
+def dispatch_stream_event(turn, event):
+    if turn.trace_level == TRACE_FULL:
+        turn.dump(event)
+    for event_type, payload in event.items():
+        turn.count(event_type)
+        handler = EVENT_HANDLERS.get(event_type)
+        if handler is None:
+            continue
+        if event_type == 'trace' and turn.trace_level == TRACE_OFF:
+            continue
+        handler(turn, payload)
+
+def load_session_state(user_profile_table, session_id, username):
+    """
+    sessionState carrying the user profile. Only sent on the first turn of a
+    session seen by this container, or once the injected copy is stale;
+    Bedrock keeps sessionAttributes for the rest of the session.
+    """
+    now = time.time()
+    injected_at = profile_injected_at.get(session_id)
+    if injected_at and now - injected_at < PROFILE_MAX_AGE_SECONDS:
+        return None
+
+    try:
+        user_response = user_profile_table.get_item(Key={'username': username})
+    except ClientError as e:
+        print(f"Could not load user profile for session state: {str(e)}")
+        return None
+    if 'Item' not in user_response:
+        return None
+
+    profile_injected_at.pop(session_id, None)
+    profile_injected_at[session_id] = now
+    if len(profile_injected_at) > MAX_TRACKED_SESSIONS:
+        profile_injected_at.pop(next(iter(profile_injected_at)))
+    print(f"Injecting user profile into session {session_id}")
+    return build_session_state(user_response['Item'], now)
+
 def log_message(messages_table, username, message_type, message_content, show_to_user=True, agent='Overall'):
     """
     Log a message to the DynamoDB messages table with partition key (username) and sort key (created_at)
@@ -230,7 +687,10 @@ def log_message(messages_table, username, message_type, message_content, show_to
             'show_to_user': show_to_user,
             'agent': agent
         }
-        messages_table.put_item(Item=message_item)
+        if FAST_PATH_ENABLED:
+            put_item(messages_table.name, message_item)
+        else:
+            messages_table.put_item(Item=message_item)
         print(f"Message logged: {message_type} - {message_content}")
     except Exception as e:
         print(f"Error logging message: {str(e)}")
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the shared layer importable the same way Lambda does (/opt/python),
+# as tools/handler_loader.py does for the tools
+sys.path.insert(0, os.path.join(REPO_ROOT, 'common'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'tools'))
+
+from handler_loader import load_handler  # noqa: E402
+
+_handlers = {}
+
+
+@pytest.fixture(scope='session')
+def handler():
+    """
+    handler(name) imports a Lambda handler module once per test run
+    (names as in tools/handler_loader.py)
+    """
+    def load(name):
+        if name not in _handlers:
+            _handlers[name] = load_handler(name)
+        return _handlers[name]
+    return load
@@ -0,0 +1,376 @@
+import copy
+import re
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+MISSING = object()
+
+TOKEN = re.compile(r'\s*(?:(?P<num>\d+)|(?P<name>[#:]?[A-Za-z_][\w\-]*)|(?P<op><>|<=|>=|[=<>(),.\[\]+\-]))')
+
+
+def tokenize(expression):
+    tokens, pos = [], 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = TOKEN.match(expression, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Can't parse {expression[pos:]!r}")
+        tokens.append(next(value for value in match.groupdict().values() if value is not None))
+        pos = match.end()
+    return tokens
+
+
+class Parser(object):
+    """
+    Recursive-descent reader for the expression subset the handlers use:
+    conditions with AND/OR/NOT, comparisons, attribute_exists,
+    attribute_not_exists, contains and size; updates with SET (+, -,
+    if_not_exists, list_append), REMOVE, ADD and DELETE
+    """
+    def __init__(self, expression, names, values):
+        self.tokens = tokenize(expression)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self, offset=0):
+        idx = self.pos + offset
+        return self.tokens[idx] if idx < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if expected is not None and (token or '').upper() != expected:
+            raise ValueError(f"Expected {expected}, got {token}")
+        self.pos += 1
+        return token
+
+    def done(self):
+        return self.pos >= len(self.tokens)
+
+    # Paths are lists of attribute names and list indexes
+    def path(self):
+        parts = [self._name(self.take())]
+        while self.peek() in ('.', '['):
+            if self.take() == '.':
+                parts.append(self._name(self.take()))
+            else:
+                parts.append(int(self.take()))
+                self.take(']')
+        return parts
+
+    def _name(self, token):
+        return self.names[token] if token.startswith('#') else token
+
+    # Conditions
+    def condition(self):
+        left = self.conjunction()
+        while (self.peek() or '').upper() == 'OR':
+            self.take()
+            right = self.conjunction()
+            left = (lambda a, b: lambda item: a(item) or b(item))(left, right)
+        return left
+
+    def conjunction(self):
+        left = self.negation()
+        while (self.peek() or '').upper() == 'AND':
+            self.take()
+            right = self.negation()
+            left = (lambda a, b: lambda item: a(item) and b(item))(left, right)
+        return left
+
+    def negation(self):
+        if (self.peek() or '').upper() == 'NOT':
+            self.take()
+            inner = self.negation()
+            return lambda item: not inner(item)
+        if self.peek() == '(':
+            self.take()
+            inner = self.condition()
+            self.take(')')
+            return inner
+        function = self.peek()
+        if function in ('attribute_exists', 'attribute_not_exists', 'contains') and self.peek(1) == '(':
+            self.take()
+            self.take('(')
+            path = self.path()
+            operand = None
+            if function == 'contains':
+                self.take(',')
+                operand = self.operand()
+            self.take(')')
+            if function == 'attribute_exists':
+                return lambda item: get_path(item, path) is not MISSING
+            if function == 'attribute_not_exists':
+                return lambda item: get_path(item, path) is MISSING
+            return lambda item: _contains(get_path(item, path), operand(item))
+        left = self.operand()
+        op = self.take()
+        right = self.operand()
+        return lambda item: compare(op, left(item), right(item))
+
+    def operand(self):
+        token = self.peek()
+        if token.startswith(':'):
+            self.take()
+            value = self.values[token]
+            return lambda item: value
+        if token == 'size' and self.peek(1) == '(':
+            self.take()
+            self.take('(')
+            path = self.path()
+            self.take(')')
+            return lambda item: _size(get_path(item, path))
+        path = self.path()
+        return lambda item: get_path(item, path)
+
+    # Updates
+    def update(self):
+        actions = []
+        while not self.done():
+            clause = self.take().upper()
+            while True:
+                if clause == 'SET':
+                    path = self.path()
+                    self.take('=')
+                    actions.append(('SET', path, self.value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', self.path(), None))
+                else:
+                    path = self.path()
+                    actions.append((clause, path, self.operand()))
+                if self.peek() != ',':
+                    break
+                self.take(',')
+        return actions
+
+    def value(self):
+        left = self.value_operand()
+        if self.peek() in ('+', '-'):
+            op = self.take()
+            right = self.value_operand()
+            return (lambda a, b: lambda item: _arith(op, a(item), b(item)))(left, right)
+        return left
+
+    def value_operand(self):
+        function = self.peek()
+        if function in ('if_not_exists', 'list_append') and self.peek(1) == '(':
+            self.take()
+            self.take('(')
+            first = self.path() if function == 'if_not_exists' else self.value_operand()
+            self.take(',')
+            second = self.value_operand()
+            self.take(')')
+            if function == 'if_not_exists':
+                return lambda item: (lambda current: second(item) if current is MISSING else current)(get_path(item, first))
+            return lambda item: list(first(item)) + list(second(item))
+        return self.operand()
+
+
+def get_path(item, path):
+    current = item
+    for part in path:
+        if current is None or current is MISSING:
+            return MISSING
+        if isinstance(part, int):
+            if not isinstance(current, list) or part >= len(current):
+                return MISSING
+            current = current[part]
+        else:
+            if not isinstance(current, dict) or part not in current:
+                return MISSING
+            current = current[part]
+    return current
+
+
+def _parent(item, path):
+    parent = get_path(item, path[:-1]) if len(path) > 1 else item
+    if parent is MISSING:
+        raise ClientError({'Error': {'Code': 'ValidationException',
+                                     'Message': 'The document path provided in the update expression is invalid for update'}},
+                          'UpdateItem')
+    return parent
+
+
+def set_path(item, path, value):
+    parent, last = _parent(item, path), path[-1]
+    if isinstance(last, int):
+        if last >= len(parent):
+            parent.append(value)
+        else:
+            parent[last] = value
+    else:
+        parent[last] = value
+
+
+def remove_path(item, path):
+    parent = get_path(item, path[:-1]) if len(path) > 1 else item
+    if parent is MISSING:
+        return
+    last = path[-1]
+    if isinstance(last, int):
+        if last < len(parent):
+            del parent[last]
+    else:
+        parent.pop(last, None)
+
+
+def compare(op, left, right):
+    if left is MISSING or right is MISSING:
+        return op == '<>' and not (left is MISSING and right is MISSING)
+    if op == '=':
+        return left == right
+    if op == '<>':
+        return left != right
+    try:
+        return {'<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right}[op]
+    except TypeError:
+        return False
+
+
+def _contains(container, value):
+    if container is MISSING:
+        return False
+    return value in container
+
+
+def _size(value):
+    return len(value) if value is not MISSING else MISSING
+
+
+def _arith(op, left, right):
+    if left is MISSING or right is MISSING:
+        raise ClientError({'Error': {'Code': 'ValidationException',
+                                     'Message': 'The provided expression refers to an attribute that does not exist in the item'}},
+                          'UpdateItem')
+    return left + right if op == '+' else left - right
+
+
+def normalize(value):
+    """
+    Numbers come back as Decimal, like from boto3
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: normalize(inner) for key, inner in value.items()}
+    if isinstance(value, list):
+        return [normalize(inner) for inner in value]
+    if isinstance(value, (set, frozenset)):
+        return {normalize(inner) for inner in value}
+    return value
+
+
+class FakeTable(object):
+    """
+    In-memory DynamoDB table with the boto3 Table interface, for tests.
+    Evaluates condition and update expressions, so conditional writes
+    behave like the real thing.
+    """
+    def __init__(self, name, hash_key, range_key=None):
+        self.name = name
+        self.keys = [hash_key] + ([range_key] if range_key else [])
+        self.items = {}
+        self.calls = []
+
+    def _key(self, key):
+        return tuple(key[name] for name in self.keys)
+
+    def _check(self, item, expression, names, values, operation, return_old=False):
+        if not expression:
+            return
+        if not Parser(expression, names, normalize(values)).condition()(item if item is not None else {}):
+            error = {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}
+            if return_old and item is not None:
+                error['Item'] = copy.deepcopy(item)
+            raise ClientError(error, operation)
+
+    def get_item(self, Key, ConsistentRead=False, ProjectionExpression=None, ExpressionAttributeNames=None):
+        self.calls.append('get_item')
+        item = self.items.get(self._key(Key))
+        return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValuesOnConditionCheckFailure=None):
+        self.calls.append('put_item')
+        key = self._key(Item)
+        self._check(self.items.get(key), ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                    'PutItem', ReturnValuesOnConditionCheckFailure == 'ALL_OLD')
+        self.items[key] = normalize(copy.deepcopy(Item))
+        return {}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None):
+        self.calls.append('delete_item')
+        key = self._key(Key)
+        old = self.items.get(key)
+        self._check(old, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'DeleteItem')
+        self.items.pop(key, None)
+        return {'Attributes': copy.deepcopy(old)} if ReturnValues == 'ALL_OLD' and old is not None else {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None, ReturnValuesOnConditionCheckFailure=None):
+        self.calls.append('update_item')
+        key = self._key(Key)
+        old = self.items.get(key)
+        self._check(old, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                    'UpdateItem', ReturnValuesOnConditionCheckFailure == 'ALL_OLD')
+        item = copy.deepcopy(old) if old is not None else dict(normalize(Key))
+        actions = Parser(UpdateExpression, ExpressionAttributeNames, normalize(ExpressionAttributeValues)).update()
+        # Every operand is evaluated against the item as it was
+        before = copy.deepcopy(item)
+        for action, path, operand in actions:
+            if action == 'SET':
+                set_path(item, path, copy.deepcopy(operand(before)))
+            elif action == 'REMOVE':
+                remove_path(item, path)
+            elif action == 'ADD':
+                current, value = get_path(item, path), operand(before)
+                if isinstance(value, set):
+                    set_path(item, path, (current if current is not MISSING else set()) | value)
+                else:
+                    set_path(item, path, (current if current is not MISSING else 0) + value)
+            else:
+                current = get_path(item, path)
+                if current is not MISSING:
+                    set_path(item, path, current - operand(before))
+        self.items[key] = item
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': copy.deepcopy(item)}
+        if ReturnValues == 'UPDATED_NEW':
+            touched = {path[0] for _, path, _ in actions}
+            return {'Attributes': {name: copy.deepcopy(item[name]) for name in touched if name in item}}
+        return {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues=None, ExpressionAttributeNames=None, **kwargs):
+        self.calls.append('query')
+        matches = Parser(KeyConditionExpression, ExpressionAttributeNames, normalize(ExpressionAttributeValues)).condition()
+        items = [copy.deepcopy(item) for _, item in sorted(self.items.items(), key=lambda kv: kv[0])
+                 if matches(item)]
+        return {'Items': items}
+
+    def scan(self, **kwargs):
+        self.calls.append('scan')
+        return {'Items': [copy.deepcopy(item) for item in self.items.values()]}
+
+    def batch_writer(self, **kwargs):
+        return _BatchWriter(self)
+
+
+class _BatchWriter(object):
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.items[self.table._key(Item)] = normalize(copy.deepcopy(Item))
+
+    def delete_item(self, Key):
+        self.table.items.pop(self.table._key(Key), None)
@@ -0,0 +1,82 @@
+import pytest
+
+from admission import GLOBAL_KEY, REASON_BUSY, Admission, AdmissionRejected, MemoryStore, enqueue, take_token
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.on_sleep = None
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-6)
+        if self.on_sleep:
+            self.on_sleep(self.now)
+
+
+def empty_global_bucket(store, now, rate=1.0, burst=1.0):
+    assert take_token(store, GLOBAL_KEY, rate, burst, now) == 0
+
+
+def test_newcomer_cannot_take_the_token_held_for_a_waiter():
+    store = MemoryStore()
+    empty_global_bucket(store, 1000.0)
+    ticket = enqueue(store, 'alice', 1010.0, 1000.0)
+    # One token refilled: it is held for alice
+    assert take_token(store, GLOBAL_KEY, 1.0, 1.0, 1001.0) > 0
+    assert take_token(store, GLOBAL_KEY, 1.0, 1.0, 1001.0, ticket) == 0
+
+
+def test_waiters_are_served_in_ticket_order():
+    store = MemoryStore()
+    empty_global_bucket(store, 1000.0)
+    first = enqueue(store, 'alice', 1010.0, 1000.0)
+    second = enqueue(store, 'bob', 1010.0, 1000.0)
+    assert take_token(store, GLOBAL_KEY, 1.0, 1.0, 1001.0, second) > 0
+    assert take_token(store, GLOBAL_KEY, 1.0, 1.0, 1001.0, first) == 0
+    # alice's place went with her token, so the next one is bob's
+    assert 'alice' not in store.get(GLOBAL_KEY)['waiters']
+    assert take_token(store, GLOBAL_KEY, 1.0, 1.0, 1002.0) > 0
+    assert take_token(store, GLOBAL_KEY, 1.0, 1.0, 1002.0, second) == 0
+
+
+def test_waiter_is_admitted_while_newcomers_keep_arriving():
+    store = MemoryStore()
+    clock = Clock()
+    admission = Admission(store, user_rate=10.0, user_burst=10.0, global_rate=1.0, global_burst=1.0, max_wait=5.0)
+    empty_global_bucket(store, clock.now)
+    newcomers = []
+    # A newcomer tries the bucket between every poll of the waiter
+    clock.on_sleep = lambda now: newcomers.append(take_token(store, GLOBAL_KEY, 1.0, 1.0, now))
+
+    waited = admission.admit('alice', clock=clock, sleep=clock.sleep)
+    assert 0 < waited <= 1.0 + 0.5
+    assert newcomers and all(wait > 0 for wait in newcomers)
+    assert not store.get(GLOBAL_KEY)['waiters']
+
+
+def test_busy_rejection_gives_the_user_token_back():
+    store = MemoryStore()
+    clock = Clock()
+    admission = Admission(store, user_rate=0.001, user_burst=2.0, global_rate=0.01, global_burst=1.0, max_wait=1.0)
+    empty_global_bucket(store, clock.now, rate=0.01)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit('alice', clock=clock, sleep=clock.sleep)
+    assert rejected.value.reason == REASON_BUSY
+    assert float(store.get('bucket#user#alice')['tokens']) == pytest.approx(2.0, abs=0.01)
+    assert not store.get(GLOBAL_KEY)['waiters']
+
+
+def test_full_waiting_room_rejects_at_once():
+    store = MemoryStore()
+    clock = Clock()
+    admission = Admission(store, user_rate=10.0, user_burst=10.0, global_rate=0.01, global_burst=1.0, queue_max=1)
+    empty_global_bucket(store, clock.now, rate=0.01)
+    enqueue(store, 'bob', clock.now + 60, clock.now)
+    sleeps = []
+    with pytest.raises(AdmissionRejected):
+        admission.admit('alice', clock=clock, sleep=sleeps.append)
+    assert sleeps == []
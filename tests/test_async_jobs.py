@@ -0,0 +1,124 @@
+import async_jobs
+from async_jobs import (FAILED, QUEUED, RUNNING, STALE_JOB_ERROR, SUCCEEDED, create_job, fail_stale, get_job,
+                        is_stale, job_event, job_view, run_job)
+from fake_dynamodb import FakeTable
+from quiz_store import end_generation
+
+
+class Context(object):
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def jobs_table():
+    return FakeTable('quiz_jobs', 'job_id')
+
+
+def freeze(monkeypatch, now):
+    monkeypatch.setattr(async_jobs.time, 'time', lambda: now)
+
+
+def crashed_job(table, monkeypatch, now=1000):
+    """
+    A job whose worker died while running it
+    """
+    freeze(monkeypatch, now)
+    create_job(table, 'job-1', 'create_quiz', 'alice', {'quiz_id': 'q1'})
+
+    def crash(job):
+        raise SystemExit('worker killed')
+    try:
+        run_job(table, job_event('job-1'), {'create_quiz': crash}, Context(300000))
+    except SystemExit:
+        pass
+    return get_job(table, 'job-1')
+
+
+def test_run_job_leases_the_rest_of_the_invocation(monkeypatch):
+    table = jobs_table()
+    freeze(monkeypatch, 1000)
+    create_job(table, 'job-1', 'create_quiz', 'alice', {'quiz_id': 'q1'})
+    seen = {}
+
+    def worker(job):
+        seen.update(get_job(table, 'job-1'))
+        return {'quiz_id': job['payload']['quiz_id']}
+    assert run_job(table, job_event('job-1'), {'create_quiz': worker}, Context(300000))['status'] == SUCCEEDED
+    assert seen['status'] == RUNNING
+    assert seen['started_at'] == 1000
+    assert seen['lease_expires_at'] == 1000 + 300 + async_jobs.JOB_LEASE_MARGIN_SECONDS
+    assert get_job(table, 'job-1')['status'] == SUCCEEDED
+
+
+def test_running_job_within_its_lease_is_kept(monkeypatch):
+    table = jobs_table()
+    item = crashed_job(table, monkeypatch)
+    assert item['status'] == RUNNING
+    freeze(monkeypatch, int(item['lease_expires_at']))
+    assert not is_stale(item)
+    assert job_view(item)['status'] == RUNNING
+    created, existing = create_job(table, 'job-1', 'create_quiz', 'alice', {'quiz_id': 'q1'})
+    assert not created and existing['status'] == RUNNING
+    assert run_job(table, job_event('job-1'), {}, None)['status'] == 'skipped'
+    assert get_job(table, 'job-1')['status'] == RUNNING
+
+
+def test_stale_job_is_reported_as_failed(monkeypatch):
+    table = jobs_table()
+    item = crashed_job(table, monkeypatch)
+    freeze(monkeypatch, int(item['lease_expires_at']) + 1)
+    assert is_stale(item)
+    view = job_view(item)
+    assert view['status'] == FAILED
+    assert view['error'] == STALE_JOB_ERROR
+    assert 'retry_after_seconds' not in view
+
+
+def test_stale_job_can_be_created_again(monkeypatch):
+    table = jobs_table()
+    item = crashed_job(table, monkeypatch)
+    freeze(monkeypatch, int(item['lease_expires_at']) + 1)
+    created, existing = create_job(table, 'job-1', 'create_quiz', 'alice', {'quiz_id': 'q1'})
+    assert created and existing is None
+    assert get_job(table, 'job-1')['status'] == QUEUED
+
+
+def test_redelivered_stale_job_is_recorded_as_failed(monkeypatch):
+    table = jobs_table()
+    item = crashed_job(table, monkeypatch)
+    freeze(monkeypatch, int(item['lease_expires_at']) + 1)
+    assert run_job(table, job_event('job-1'), {}, None)['status'] == FAILED
+    stored = get_job(table, 'job-1')
+    assert stored['status'] == FAILED
+    assert stored['error'] == STALE_JOB_ERROR
+
+
+def test_fail_stale_leaves_a_job_taken_over_since(monkeypatch):
+    table = jobs_table()
+    item = crashed_job(table, monkeypatch)
+    freeze(monkeypatch, int(item['lease_expires_at']) + 1)
+    create_job(table, 'job-1', 'create_quiz', 'alice', {'quiz_id': 'q1'})
+    run_job(table, job_event('job-1'), {'create_quiz': lambda job: {}}, Context(300000))
+    assert fail_stale(table, item) is None
+    assert get_job(table, 'job-1')['status'] == SUCCEEDED
+
+
+def test_job_without_a_lease_expires_after_the_default_lease(monkeypatch):
+    item = {'job_id': 'job-1', 'kind': 'create_quiz', 'status': RUNNING, 'updated_at': 1000}
+    freeze(monkeypatch, 1000 + async_jobs.JOB_LEASE_SECONDS)
+    assert not is_stale(item)
+    freeze(monkeypatch, 1000 + async_jobs.JOB_LEASE_SECONDS + 1)
+    assert is_stale(item)
+
+
+def test_end_generation_only_cuts_the_quiz_of_that_job():
+    quiz_table = FakeTable('quiz', 'username', 'id')
+    quiz_table.put_item(Item={'username': 'alice', 'id': 'q1', 'max_score': 10, 'generation_job': 'job-1'})
+    assert not end_generation(quiz_table, 'alice', 'q1', 3, job_id='job-2')
+    assert end_generation(quiz_table, 'alice', 'q1', 3, job_id='job-1')
+    quiz = quiz_table.get_item(Key={'username': 'alice', 'id': 'q1'})['Item']
+    assert quiz['max_score'] == 3
+    assert 'generation_job' not in quiz
@@ -0,0 +1,195 @@
+import pytest
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+import bedrock_guard
+from bedrock_guard import BedrockUnavailable, CircuitBreaker, guarded_call
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # A real sleep always moves the clock, even for a rounding-sized wait
+        self.now += max(seconds, 1e-6)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(bedrock_guard.time, 'monotonic', clock)
+    monkeypatch.setattr(bedrock_guard.time, 'sleep', clock.sleep)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def fresh_guards(monkeypatch):
+    monkeypatch.setattr(bedrock_guard, '_guards', {})
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'Converse')
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+
+
+def test_breaker_lets_one_probe_through_after_reset(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.probe_in_flight
+    assert not breaker.allow()
+
+
+def test_breaker_closes_on_probe_success(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.opened_at is None
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_breaker_reopens_on_probe_failure(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=30)
+    for _ in range(5):
+        breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.probe_in_flight
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+
+
+def test_guarded_call_retries_throttling(clock):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) < 3:
+            raise client_error('ThrottlingException')
+        return 'ok'
+
+    assert guarded_call('model', fn) == 'ok'
+    assert len(calls) == 3
+    assert bedrock_guard.get_guard('model').breaker.failures == 0
+
+
+def test_guarded_call_does_not_retry_client_mistakes(clock):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise client_error('ValidationException')
+
+    with pytest.raises(ClientError):
+        guarded_call('model', fn)
+    assert len(calls) == 1
+    assert bedrock_guard.get_guard('model').breaker.failures == 0
+
+
+def test_guarded_call_fails_fast_while_open(clock):
+    breaker = bedrock_guard.get_guard('model').breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    def fn():
+        raise AssertionError('must not be called while the circuit is open')
+
+    with pytest.raises(BedrockUnavailable) as raised:
+        guarded_call('model', fn)
+    assert raised.value.reason == 'circuit open'
+    assert raised.value.retry_after == breaker.reset_seconds
+
+
+def test_probe_raising_other_error_reopens_breaker(clock):
+    breaker = bedrock_guard.get_guard('model').breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    clock.now += breaker.reset_seconds
+
+    def fn():
+        raise ReadTimeoutError(endpoint_url='https://bedrock-runtime')
+
+    with pytest.raises(ReadTimeoutError):
+        guarded_call('model', fn)
+    assert not breaker.probe_in_flight
+    assert not breaker.allow()
+
+    # The next probe after the reset timeout still gets through
+    clock.now += breaker.reset_seconds
+    assert guarded_call('model', lambda: 'ok') == 'ok'
+    assert breaker.opened_at is None
+
+
+def open_and_cool_down(clock, breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    clock.now += breaker.reset_seconds
+
+
+def test_probe_refused_on_admission_frees_the_probe(clock, monkeypatch):
+    guard = bedrock_guard.get_guard('model')
+    open_and_cool_down(clock, guard.breaker)
+    full = [True]
+    acquire = guard.concurrency.acquire
+    monkeypatch.setattr(guard.concurrency, 'acquire', lambda timeout: not full[0] and acquire(timeout=timeout))
+
+    with pytest.raises(BedrockUnavailable) as raised:
+        guarded_call('model', lambda: 'ok')
+    assert raised.value.reason == 'too many concurrent calls'
+    assert not guard.breaker.probe_in_flight
+
+    # Once capacity frees up the next call probes and closes the breaker
+    full[0] = False
+    assert guarded_call('model', lambda: 'ok') == 'ok'
+    assert guard.breaker.opened_at is None
+
+
+def test_probe_refused_by_rate_limit_frees_the_probe(clock, monkeypatch):
+    guard = bedrock_guard.get_guard('model')
+    open_and_cool_down(clock, guard.breaker)
+    monkeypatch.setattr(guard.bucket, 'acquire', lambda deadline: False)
+
+    with pytest.raises(BedrockUnavailable) as raised:
+        guarded_call('model', lambda: 'ok')
+    assert raised.value.reason == 'rate limit exceeded'
+    assert not guard.breaker.probe_in_flight
+    assert guard.breaker.allow()
+
+
+def test_non_retryable_error_does_not_close_a_half_open_breaker(clock):
+    guard = bedrock_guard.get_guard('model')
+    open_and_cool_down(clock, guard.breaker)
+    opened_at = guard.breaker.opened_at
+
+    def fn():
+        raise client_error('ValidationException')
+
+    with pytest.raises(ClientError):
+        guarded_call('model', fn)
+    assert guard.breaker.opened_at == opened_at
+    assert guard.breaker.failures == guard.breaker.failure_threshold
+    assert not guard.breaker.probe_in_flight
@@ -0,0 +1,84 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+import call_ledger
+from call_ledger import LOG_PREFIX, UNAVAILABLE, build_record, estimate_cost, ledger_item, record_call, set_context, update_context
+
+
+@pytest.fixture(autouse=True)
+def fresh_ledger(monkeypatch):
+    monkeypatch.setattr(call_ledger, '_prices', None)
+    monkeypatch.delenv('CALL_LEDGER_PRICES', raising=False)
+    monkeypatch.setattr(call_ledger, 'CALL_LEDGER', True)
+    set_context()
+    yield
+    set_context()
+
+
+def test_cost_of_a_priced_model():
+    cost = estimate_cost('us.amazon.nova-micro-v1:0', 2000, 500)
+    assert cost == pytest.approx(2 * 0.000035 + 0.5 * 0.00014)
+
+
+def test_agent_turns_use_the_agent_price():
+    assert estimate_cost('agent:ABC123', 1000, 1000) == pytest.approx(0.0008 + 0.0032)
+
+
+def test_cost_is_unknown_without_price_or_tokens():
+    assert estimate_cost('some.other-model', 1000, 1000) is None
+    assert estimate_cost('us.amazon.nova-lite-v1:0', None, None) is None
+    assert estimate_cost('us.amazon.nova-lite-v1:0', 1000, None) == pytest.approx(0.00006)
+
+
+def test_prices_can_be_overridden(monkeypatch):
+    monkeypatch.setenv('CALL_LEDGER_PRICES', json.dumps({'custom.model': [1.0, 2.0]}))
+    assert estimate_cost('custom.model', 1000, 1000) == pytest.approx(3.0)
+    assert estimate_cost('us.amazon.nova-pro-v1:0', 1000, 0) == pytest.approx(0.0008)
+
+
+def test_record_carries_the_context_and_drops_empty_fields():
+    set_context(handler='create_quiz', user='alice')
+    update_context(ref='quiz-1', user=None)
+    record = build_record('converse', 'us.amazon.nova-micro-v1:0', 123.7, task='quiz_questions',
+                          input_tokens=1000, output_tokens=100, now=1750000000.5, attempt=2)
+    assert record['handler'] == 'create_quiz'
+    assert record['user'] == 'alice'
+    assert record['ref'] == 'quiz-1'
+    assert record['ts'] == 1750000000
+    assert record['day'] == '2025-06-15'
+    assert record['ms'] == 123
+    assert record['attempt'] == 2
+    assert record['call_id'].startswith('1750000000500-')
+    assert 'model_ms' not in record
+    assert record['cost_usd'] == pytest.approx(0.000035 + 0.1 * 0.00014)
+
+
+def test_record_without_context_is_tagged_with_the_function(monkeypatch):
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'ShowResult')
+    record = build_record('agent', 'agent:ABC123', 10, outcome=UNAVAILABLE)
+    assert record['handler'] == 'ShowResult'
+    assert record['outcome'] == UNAVAILABLE
+    assert 'user' not in record and 'cost_usd' not in record
+
+
+def test_table_item_has_a_ttl_and_a_decimal_cost():
+    item = ledger_item(build_record('converse', 'us.amazon.nova-micro-v1:0', 10, input_tokens=1000, now=1000))
+    assert item['expires_at'] == 1000 + call_ledger.TTL_DAYS * 86400
+    assert isinstance(item['cost_usd'], Decimal)
+
+
+def test_log_sink_is_the_default(capsys):
+    assert call_ledger.CALL_LEDGER_SINK == 'log'
+    record_call('converse', 'us.amazon.nova-micro-v1:0', 10, task='session_summary')
+    line = capsys.readouterr().out.strip()
+    assert line.startswith(LOG_PREFIX + ' ')
+    assert json.loads(line[len(LOG_PREFIX) + 1:])['task'] == 'session_summary'
+
+
+def test_sink_errors_never_fail_the_call(monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(call_ledger, 'CALL_LEDGER_SINK', 'jsonl')
+    monkeypatch.setattr(call_ledger, 'CALL_LEDGER_PATH', str(tmp_path))
+    record_call('converse', 'us.amazon.nova-micro-v1:0', 10)
+    assert 'Could not record converse call' in capsys.readouterr().out
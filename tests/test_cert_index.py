@@ -0,0 +1,79 @@
+import pytest
+
+import cert_index
+from cert_index import CertIndex, get_index, load_snapshot, save_snapshot, tokenize
+from fake_dynamodb import FakeTable
+
+CERTS = [
+    {'CertificationName': 'AWS Certified Cloud Practitioner', 'Level': 'Foundational',
+     'Prerequisites': 'None', 'Roles': ['Sales', 'Manager'],
+     'Domains': ['Cloud Concepts', 'Billing and Pricing']},
+    {'CertificationName': 'AWS Certified Data Engineer - Associate', 'Level': 'Associate',
+     'Prerequisites': '2 years of data engineering experience', 'Roles': ['Data Engineer'],
+     'Services': ['Kinesis', 'Glue', 'Redshift', 'Kinesis Data Streams']},
+    {'CertificationName': 'AWS Certified Solutions Architect - Professional', 'Level': 'Professional',
+     'Prerequisites': '2 years designing on AWS', 'Roles': ['Solutions Architect'],
+     'Services': ['Organizations', 'Kinesis', 'Direct Connect']},
+]
+
+
+@pytest.fixture
+def index():
+    return CertIndex.build(CERTS)
+
+
+def names(results):
+    return [r['certification'] for r in results[0]]
+
+
+def test_tokens_skip_stopwords_and_plurals():
+    assert tokenize('Which certs cover Kinesis streams?') == ['kinesis', 'stream']
+    assert tokenize('AWS access') == ['access']
+
+
+def test_query_ranks_by_weighted_match(index):
+    results, total = index.search('kinesis streams')
+    assert total == 2
+    assert names((results, total)) == ['AWS Certified Data Engineer - Associate',
+                                       'AWS Certified Solutions Architect - Professional']
+    assert results[0]['matched'] == {'services': ['kinesis', 'stream']}
+    assert results[0]['score'] > results[1]['score']
+
+
+def test_filters_narrow_the_candidates(index):
+    assert names(index.search(level='foundational')) == ['AWS Certified Cloud Practitioner']
+    assert names(index.search(no_prerequisites=True)) == ['AWS Certified Cloud Practitioner']
+    assert names(index.search('kinesis', level='professional')) == ['AWS Certified Solutions Architect - Professional']
+    assert names(index.search(service='Glue')) == ['AWS Certified Data Engineer - Associate']
+    assert names(index.search(role='architect')) == ['AWS Certified Solutions Architect - Professional']
+    assert index.search('quantum') == ([], 0)
+
+
+def test_limit_keeps_the_total(index):
+    results, total = index.search(level=None, service='kinesis', limit=1)
+    assert len(results) == 1 and total == 2
+
+
+def test_snapshot_round_trip(index, tmp_path):
+    path = str(tmp_path / 'cert_index.json')
+    save_snapshot(index, path)
+    loaded = load_snapshot(path)
+    assert loaded.search('kinesis streams') == index.search('kinesis streams')
+    with pytest.raises(ValueError):
+        CertIndex.from_snapshot({'version': 0})
+
+
+def test_index_is_built_once_until_it_expires(monkeypatch):
+    monkeypatch.setattr(cert_index, '_index', None)
+    monkeypatch.setattr(cert_index, 'SNAPSHOT_PATH', '')
+    table = FakeTable('CertInfo', 'CertificationName')
+    for item in CERTS:
+        table.put_item(Item=item)
+    table.calls.clear()
+
+    first = get_index(lambda: table, now=1000)
+    assert get_index(lambda: table, now=1000 + cert_index.INDEX_TTL_SECONDS - 1) is first
+    assert table.calls == ['scan']
+    assert get_index(lambda: table, now=1000 + cert_index.INDEX_TTL_SECONDS) is not first
+    assert table.calls == ['scan', 'scan']
+    assert len(first.docs) == 3
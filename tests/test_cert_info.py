@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+import cert_info
+from cert_info import (KEY_ATTRIBUTE, apply_budget, categorize, fields_for, fit_value, get_cert_info, parse_fields,
+                       prime_cert_info, projection_kwargs)
+
+RECORD = {
+    KEY_ATTRIBUTE: 'AWS Certified Solutions Architect - Associate',
+    'ExamCost': '150 USD',
+    'Duration': '130 minutes',
+    'Level': 'Associate',
+    'Description': 'Validates the ability to design solutions on AWS.',
+}
+
+
+class CertTable:
+    """
+    get_item against one record, keeping the arguments of every call
+    """
+
+    def __init__(self, item):
+        self.item = item
+        self.requests = []
+
+    def get_item(self, Key, **kwargs):
+        self.requests.append(kwargs)
+        return {'Item': dict(self.item)} if Key[KEY_ATTRIBUTE] == self.item[KEY_ATTRIBUTE] else {}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(cert_info, '_cache', {})
+
+
+def test_questions_are_categorized_by_keyword():
+    assert categorize('How much does the exam cost?') == 'cost'
+    assert categorize('Do I need to renew it?') == 'recertification'
+    assert categorize('How long is the exam?') == 'duration'
+    assert categorize('Which topics are on the syllabus?') == 'domains'
+    assert categorize('Tell me something') is None
+    assert categorize(None) is None
+
+
+def test_explicit_fields_win_and_always_include_the_key():
+    assert fields_for('Level, ExamCost,Level', 'cost') == [KEY_ATTRIBUTE, 'Level', 'ExamCost']
+    assert fields_for(None, 'cost')[:2] == [KEY_ATTRIBUTE, 'ExamCost']
+    assert fields_for() is None
+    assert fields_for(category='unknown') is None
+
+
+def test_unsafe_field_names_are_dropped():
+    assert parse_fields(['Level', 'a.b', 'x = :y', ' Duration ', '']) == ['Level', 'Duration']
+
+
+def test_projection_uses_placeholders():
+    kwargs = projection_kwargs([KEY_ATTRIBUTE, 'Duration', 'Level'])
+    assert kwargs['ProjectionExpression'] == '#f0, #f1, #f2'
+    assert kwargs['ExpressionAttributeNames'] == {'#f0': KEY_ATTRIBUTE, '#f1': 'Duration', '#f2': 'Level'}
+    assert projection_kwargs(None) == {}
+
+
+def test_long_values_are_cut_at_a_boundary():
+    text, cut = fit_value('one two three four five six', 16)
+    assert cut and text == 'one two...'
+    kept, cut = fit_value(['alpha', 'beta', 'gamma'], 18)
+    assert cut and kept == ['alpha', 'beta']
+    kept, cut = fit_value({'a': 'x' * 10, 'b': 'y' * 10}, 20)
+    assert cut and kept == {'a': 'x' * 10}
+    assert fit_value('short', 100) == ('short', False)
+
+
+def test_budget_never_cuts_the_key():
+    item = dict(RECORD, Description='word ' * 100)
+    fitted, truncated = apply_budget(item, default_budget=20, budgets={'Level': 0})
+    assert fitted[KEY_ATTRIBUTE] == RECORD[KEY_ATTRIBUTE]
+    assert fitted['Level'] == 'Associate'
+    assert truncated == ['Description']
+    assert len(fitted['Description']) < 20
+
+
+def test_projected_read_goes_to_the_table():
+    table = CertTable(RECORD)
+    fields = fields_for(category='cost')
+    assert get_cert_info(table, RECORD[KEY_ATTRIBUTE], fields) == RECORD
+    assert table.requests == [projection_kwargs(fields)]
+    assert get_cert_info(table, 'Unknown', fields) is None
+
+
+def test_primed_record_is_projected_from_memory(monkeypatch):
+    table = CertTable(RECORD)
+    assert prime_cert_info(table, RECORD[KEY_ATTRIBUTE])
+    assert not prime_cert_info(table, 'Unknown')
+    item = get_cert_info(table, RECORD[KEY_ATTRIBUTE], [KEY_ATTRIBUTE, 'ExamCost', 'Currency'])
+    assert item == {KEY_ATTRIBUTE: RECORD[KEY_ATTRIBUTE], 'ExamCost': '150 USD'}
+    assert len(table.requests) == 2
+
+    monkeypatch.setattr(time, 'time', lambda: cert_info._cache[RECORD[KEY_ATTRIBUTE]][0] + cert_info.CACHE_TTL_SECONDS)
+    get_cert_info(table, RECORD[KEY_ATTRIBUTE], [KEY_ATTRIBUTE])
+    assert len(table.requests) == 3
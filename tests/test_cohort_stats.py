@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from cohort_analytics import Columns, analyze, distinct_per_group, grouped_percentiles, item_statistics, publish  # noqa: E402
+from cohort_stats import cert_key, get_stats, question_key, to_dynamodb, topic_key  # noqa: E402
+from fake_dynamodb import FakeTable  # noqa: E402
+
+
+def quiz(username, topic, answers, max_score=None):
+    """
+    A quiz and its rows; answers are (question_id, chosen option, correct)
+    """
+    rows = [{'cluster_id': question_id, 'question': f"Question {question_id}?", 'user_answer': option,
+             'answered_correctly': correct} for question_id, option, correct in answers]
+    item = {'username': username, 'recommended_cert': 'SAA', 'topic': topic,
+            'max_score': max_score if max_score is not None else len(rows)}
+    return item, rows
+
+
+def build(quizzes):
+    columns = Columns()
+    for item, rows in quizzes:
+        columns.add_quiz(item, rows)
+    return columns.freeze()
+
+
+def test_grouped_percentiles_match_numpy():
+    rng = np.random.default_rng(7)
+    groups = rng.integers(0, 4, 200)
+    values = rng.random(200)
+    result = grouped_percentiles(groups, values, 5, [10, 50, 90])
+    for group in range(4):
+        assert result[group] == pytest.approx(np.percentile(values[groups == group], [10, 50, 90]))
+    assert np.isnan(result[4]).all()
+    assert np.isnan(grouped_percentiles(np.array([], dtype=int), np.array([]), 2, [50])).all()
+
+
+def test_distinct_members_per_group():
+    groups = np.array([0, 0, 0, 1, 1])
+    users = np.array([3, 3, 1, 0, 0])
+    assert distinct_per_group(groups, users, 3).tolist() == [2, 1, 0]
+
+
+def test_discrimination_is_the_item_rest_correlation():
+    quizzes = [quiz('u1', 'IAM', [('q1', 0, True), ('q2', 0, True), ('q3', 0, True)]),
+               quiz('u2', 'IAM', [('q1', 0, True), ('q2', 1, False), ('q3', 0, True)]),
+               quiz('u3', 'IAM', [('q1', 1, False), ('q2', 1, False), ('q3', 0, True)]),
+               quiz('u4', 'IAM', [('q1', 1, False), ('q2', 2, False), ('q3', 3, False)])]
+    columns = build(quizzes)
+    items = item_statistics(columns)
+    assert items['responses'].tolist() == [4, 4, 4]
+    assert items['p_value'].tolist() == [0.5, 0.25, 0.75]
+
+    scores = np.array([[1, 1, 1], [1, 0, 1], [0, 0, 1], [0, 0, 0]], dtype=float)
+    for question in range(3):
+        rest = (scores.sum(axis=1) - scores[:, question]) / 2
+        assert items['discrimination'][question] == pytest.approx(np.corrcoef(scores[:, question], rest)[0, 1])
+    assert items['option_share'][0].tolist() == [0.5, 0.5, 0.0, 0.0]
+
+
+def test_analysis_and_published_items():
+    quizzes = [quiz('u1', 'IAM', [('q1', 0, True), ('q2', 0, True)]),
+               quiz('u1', 'IAM', [('q1', 1, False), ('q2', 0, True)]),
+               quiz('u2', 'S3', [('q3', 2, False), ('q1', 0, True)], max_score=4),
+               quiz('u3', 'S3', [])]
+    columns = build(quizzes)
+    assert len(columns.quiz_group) == 3
+    results = analyze(columns, min_responses=2)
+
+    cert = results['certs']['SAA']
+    # The unfinished S3 quiz counts for answers, not for the score distribution
+    assert cert['attempts'] == 2 and cert['users'] == 1
+    assert cert['mean_score_pct'] == 75.0
+    assert cert['answers'] == 6
+    assert sum(cert['score_histogram']) == 2
+    assert results['topics'][('SAA', 'S3')]['attempts'] == 0
+    assert results['topics'][('SAA', 'S3')]['mean_score_pct'] is None
+    assert [q['question_id'] for q in results['questions']] == ['q1', 'q2']
+
+    table = FakeTable('cohort_stats', 'stats_key')
+    publish(table, 'spring', results)
+    assert get_stats(table, 'spring')['certifications'] == ['SAA']
+    assert get_stats(table, cert_key('SAA', 'spring'))['mean_score_pct'] == Decimal('75.0')
+    assert get_stats(table, topic_key('SAA', 'IAM', 'spring'))['cohort'] == 'spring'
+    assert get_stats(table, question_key('q1', 'spring'))['responses'] == 3
+    assert get_stats(table, cert_key('SAA')) is None
+
+
+def test_floats_are_stored_as_rounded_decimals():
+    assert to_dynamodb({'p': 0.123456, 'none': None, 'list': [1.5, 'x']}) == {'p': Decimal('0.1235'),
+                                                                              'list': [Decimal('1.5'), 'x']}
@@ -0,0 +1,108 @@
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+
+import dynamo_fast
+from dynamo_fast import Projection, decode_value, encode_item, encode_value
+
+ITEM = {
+    'quiz_id': {'S': 'q1'},
+    'order': {'N': '3'},
+    'share': {'N': '0.75'},
+    'answered_correctly': {'BOOL': False},
+    'note': {'NULL': True},
+    'questions_blob': {'B': b'\x00\xff'},
+    'tags': {'SS': ['iam', 's3']},
+    'answered_orders': {'NS': ['1', '2']},
+    'chunks': {'BS': [b'a']},
+    'options': {'L': [{'S': 'EBS'}, {'M': {'text': {'S': 'S3'}, 'weight': {'N': '2'}}}]},
+}
+
+
+class QueryClient:
+    """
+    get_item/query over fixed responses; keeps the arguments of every call
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get_item(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.responses.pop(0)
+
+    def query(self, **kwargs):
+        self.requests.append(dict(kwargs))
+        return self.responses.pop(0)
+
+
+def test_decoding_matches_the_resource_api():
+    deserializer = TypeDeserializer()
+    expected = {k: deserializer.deserialize(v) for k, v in ITEM.items()}
+    # The resource API wraps binary values in Binary; bytes compare equal
+    expected['questions_blob'] = expected['questions_blob'].value
+    expected['chunks'] = {b.value for b in expected['chunks']}
+    decoded = {k: decode_value(v) for k, v in ITEM.items()}
+    assert decoded == expected
+    assert isinstance(decoded['order'], Decimal)
+
+
+def test_binary_from_raw_json_is_base64():
+    assert decode_value({'B': 'AP8='}) == b'\x00\xff'
+
+
+def test_empty_value_is_rejected():
+    with pytest.raises(ValueError):
+        decode_value({})
+
+
+def test_encoding_matches_the_resource_api():
+    value = {'order': Decimal('3'), 'count': 2, 'ok': True, 'none': None, 'tags': {'s3'},
+             'orders': {Decimal('1')}, 'blob': b'\x01', 'wrapped': Binary(b'\x02'), 'list': ('a', 1)}
+    serializer = TypeSerializer()
+    expected = {k: serializer.serialize(v if k != 'list' else list(v)) for k, v in value.items()}
+    expected['wrapped'] = {'B': b'\x02'}
+    expected['blob'] = {'B': b'\x01'}
+    assert encode_item(value) == expected
+    assert decode_value(encode_value(value)) == dict(value, wrapped=b'\x02', list=['a', Decimal('1')],
+                                                     count=Decimal('2'))
+
+
+def test_floats_and_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        encode_value(0.5)
+    with pytest.raises(TypeError):
+        encode_value(object())
+
+
+def test_projection_uses_placeholders_and_skips_absent_fields():
+    projection = Projection(['order', 'layout', 'options'])
+    assert projection.kwargs() == {'ProjectionExpression': '#p0, #p1, #p2',
+                                   'ExpressionAttributeNames': {'#p0': 'order', '#p1': 'layout', '#p2': 'options'}}
+    assert projection.decode(ITEM) == {'order': Decimal('3'),
+                                       'options': ['EBS', {'text': 'S3', 'weight': Decimal('2')}]}
+
+
+def test_get_item_is_projected(monkeypatch):
+    client = QueryClient([{'Item': ITEM}, {}])
+    monkeypatch.setattr(dynamo_fast, 'get_dynamodb_client', lambda: client)
+    projection = Projection(['quiz_id', 'order'])
+    assert dynamo_fast.get_item('quiz', {'quiz_id': 'q1'}, projection) == {'quiz_id': 'q1', 'order': Decimal('3')}
+    assert dynamo_fast.get_item('quiz', {'quiz_id': 'q2'}, projection) is None
+    assert client.requests[0]['Key'] == {'quiz_id': {'S': 'q1'}}
+    assert client.requests[0]['ProjectionExpression'] == '#p0, #p1'
+
+
+def test_partition_query_follows_pages(monkeypatch):
+    client = QueryClient([{'Items': [ITEM], 'LastEvaluatedKey': {'quiz_id': {'S': 'q1'}}},
+                          {'Items': [{'order': {'N': '4'}}]}])
+    monkeypatch.setattr(dynamo_fast, 'get_dynamodb_client', lambda: client)
+    projection = Projection(['order'])
+    items = dynamo_fast.query_partition('quiz', 'quiz_id', 'q1', projection)
+    assert items == [{'order': Decimal('3')}, {'order': Decimal('4')}]
+    assert client.requests[0]['ExpressionAttributeNames'] == {'#p0': 'order', '#pk': 'quiz_id'}
+    assert client.requests[1]['ExclusiveStartKey'] == {'quiz_id': {'S': 'q1'}}
+    # The projection's own names are left alone
+    assert '#pk' not in projection.names
@@ -0,0 +1,131 @@
+import gzip
+import json
+import threading
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+from dynamodb_bulk import (BatchLoader, JsonLinesWriter, Progress, export_segment, json_to_typed, plain_item,
+                           read_items, typed_from_plain, typed_to_json)
+
+TYPED = {
+    'quiz_id': {'S': 'q1'},
+    'user_score': {'N': '7'},
+    'share': {'N': '0.75'},
+    'answered_orders': {'NS': ['1', '3']},
+    'questions_blob': {'B': b'\x00\xff'},
+    'chunks': {'BS': [b'a', b'b']},
+    'answers': {'L': [{'M': {'user_answer': {'N': '1'}, 'flag': {'BOOL': True}}}]},
+}
+
+
+class ScanClient:
+    """
+    Scan over per-segment pages; records the arguments of every call
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def scan(self, **kwargs):
+        self.requests.append(dict(kwargs))
+        pages = self.pages[kwargs['Segment']]
+        page = pages[kwargs.get('ExclusiveStartKey', {}).get('page', 0)]
+        return page
+
+
+class WriteClient:
+    """
+    batch_write_item that throttles once and then leaves the last item of the
+    next batch unprocessed, before accepting everything
+    """
+
+    def __init__(self):
+        self.written = []
+        self.responses = ['throttle', 'unprocessed']
+        self.lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems):
+        (table, requests), = RequestItems.items()
+        with self.lock:
+            outcome = self.responses.pop(0) if self.responses else 'ok'
+        if outcome == 'throttle':
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}}, 'BatchWriteItem')
+        if outcome == 'unprocessed':
+            with self.lock:
+                self.written.extend(r['PutRequest']['Item'] for r in requests[:-1])
+            return {'UnprocessedItems': {table: requests[-1:]}}
+        with self.lock:
+            self.written.extend(r['PutRequest']['Item'] for r in requests)
+        return {'UnprocessedItems': {}}
+
+
+class Writer:
+    def __init__(self):
+        self.items = []
+        self.closed = False
+
+    def write(self, items):
+        self.items.extend(items)
+
+    def close(self):
+        self.closed = True
+
+
+def test_typed_json_round_trip_keeps_binary():
+    encoded = json.loads(json.dumps(typed_to_json(TYPED)))
+    assert encoded['questions_blob'] == {'B': 'AP8='}
+    assert encoded['chunks'] == {'BS': ['YQ==', 'Yg==']}
+    assert json_to_typed(encoded) == TYPED
+
+
+def test_plain_items_use_ordinary_json():
+    plain = plain_item(TYPED)
+    assert plain == {'quiz_id': 'q1', 'user_score': 7, 'share': 0.75, 'answered_orders': [1, 3],
+                     'questions_blob': 'AP8=', 'chunks': ['YQ==', 'Yg=='],
+                     'answers': [{'user_answer': 1, 'flag': True}]}
+    typed = typed_from_plain({'share': Decimal('0.75'), 'ratio': 0.5, 'missing': None})
+    assert typed == {'share': {'N': '0.75'}, 'ratio': {'N': '0.5'}}
+
+
+def test_jsonl_part_round_trip(tmp_path):
+    path = str(tmp_path / 'part.jsonl.gz')
+    writer = JsonLinesWriter(path, plain=False, compress_level=1)
+    writer.write([TYPED, {'quiz_id': {'S': 'q2'}}])
+    writer.write([])
+    writer.close()
+    with gzip.open(path, 'rt') as f:
+        assert len(f.read().splitlines()) == 2
+    assert list(read_items(path, 'dynamodb')) == [TYPED, {'quiz_id': {'S': 'q2'}}]
+
+
+def test_plain_part_is_imported_with_decimal_numbers(tmp_path):
+    path = tmp_path / 'part.jsonl'
+    path.write_text('{"quiz_id":"q1","share":0.1}\n\n')
+    assert list(read_items(str(path), 'plain')) == [{'quiz_id': {'S': 'q1'}, 'share': {'N': '0.1'}}]
+
+
+def test_segment_export_follows_pages():
+    pages = {1: [{'Items': [{'k': {'S': 'a'}}], 'LastEvaluatedKey': {'page': 1}},
+                 {'Items': [{'k': {'S': 'b'}}, {'k': {'S': 'c'}}]}]}
+    client, writer = ScanClient(pages), Writer()
+    count = export_segment(client, 'quiz', 1, 4, writer, 100, Progress('test'))
+    assert count == 3
+    assert [item['k']['S'] for item in writer.items] == ['a', 'b', 'c']
+    assert writer.closed
+    assert client.requests[0] == {'TableName': 'quiz', 'Segment': 1, 'TotalSegments': 4, 'Limit': 100}
+    assert client.requests[1]['ExclusiveStartKey'] == {'page': 1}
+
+
+def test_loader_retries_throttled_and_unprocessed_items():
+    client, progress = WriteClient(), Progress('test')
+    loader = BatchLoader(client, 'quiz', ['quiz_id'], rate=25000, workers=1, progress=progress)
+    loader.put([{'quiz_id': {'S': f'q{i}'}} for i in range(3)])
+    # Same key twice in a batch: the later item is written
+    loader.put([{'quiz_id': {'S': 'q9'}, 'v': {'N': '1'}}, {'quiz_id': {'S': 'q9'}, 'v': {'N': '2'}}])
+    loader.close()
+    assert sorted(item['quiz_id']['S'] for item in client.written) == ['q0', 'q1', 'q2', 'q9']
+    assert [item['v'] for item in client.written if item['quiz_id']['S'] == 'q9'] == [{'N': '2'}]
+    assert progress.items == 4
+    assert loader.throttled == 2
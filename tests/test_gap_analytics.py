@@ -0,0 +1,94 @@
+import re
+
+import pytest
+
+import gap_analytics
+from gap_analytics import HALF_LIFE_SECONDS, apply_answer, build_stats_update, decay_factor, record_answer
+
+CERT = 'AWS Certified Cloud Practitioner'
+QUESTION = {'domain': 'Security', 'aws_service': 'IAM', 'difficulty': 'easy'}
+KEYS = gap_analytics.question_keys(CERT, 'IAM basics', QUESTION)
+
+
+class StatsTable(object):
+    """
+    Enough of a DynamoDB table for the updates build_stats_update writes;
+    conditions are checked by the tests on the expressions themselves
+    """
+    def __init__(self, item=None):
+        self.item = item
+        self.updates = []
+
+    def get_item(self, Key, ConsistentRead=False):
+        return {'Item': self.item} if self.item is not None else {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeValues,
+                    ExpressionAttributeNames=None):
+        self.updates.append(UpdateExpression)
+        names, values = ExpressionAttributeNames or {}, ExpressionAttributeValues
+        item = self.item if self.item is not None else dict(Key)
+        match = re.match(r'SET (.*?)(?: ADD (.*))?$', UpdateExpression)
+        for part in match.group(1).split(', '):
+            path, value = part.split(' = ')
+            parent, name = self._path(item, path, names)
+            parent[name] = values[value]
+        for part in (match.group(2) or '').split(', ') if match.group(2) else []:
+            path, value = part.split(' ')
+            parent, name = self._path(item, path, names)
+            parent[name] += values[value]
+        self.item = item
+
+    @staticmethod
+    def _path(item, path, names):
+        parts = [names.get(part, part) for part in path.split('.')]
+        for part in parts[:-1]:
+            item = item[part]
+        return item, parts[-1]
+
+
+def decayed(entry, now):
+    factor = decay_factor(now - int(entry['t']))
+    return float(entry['m']) * factor, float(entry['n']) * factor
+
+
+def test_answers_add_up_to_the_decayed_stats():
+    table = StatsTable()
+    expected = {}
+    answers = [(0, False), (3 * 86400, True), (20 * 86400, False), (21 * 86400, True)]
+    for now, is_correct in answers:
+        record_answer(table, 'ana', CERT, 'IAM basics', QUESTION, is_correct, now=now)
+        apply_answer(expected, KEYS, is_correct, 'easy', now)
+
+    now = 30 * 86400
+    for key in KEYS:
+        # Every entry keeps the anchor of its first answer
+        assert table.item['stats'][key]['t'] == 0
+        assert decayed(table.item['stats'][key], now) == pytest.approx(decayed(expected[key], now), rel=1e-4)
+    assert table.updates[1].count(' ADD ') == 1
+
+
+def test_only_new_entries_are_set():
+    item = {'username': 'ana', 'stats': {KEYS[0]: {'m': 1, 'n': 1, 't': 0}}}
+    update = build_stats_update(item, KEYS, True, 'easy', 86400)
+    assert 'stats.#k0.m :dm0' in update['UpdateExpression']
+    assert 'stats.#k1 = :e1' in update['UpdateExpression']
+    assert 'attribute_not_exists(stats.#k1)' in update['ConditionExpression']
+    assert 'stats.#k0.t = :t0' in update['ConditionExpression']
+
+
+def test_old_entries_are_rebased_conditionally():
+    now = (gap_analytics.REBASE_HALF_LIVES + 1) * HALF_LIFE_SECONDS
+    item = {'username': 'ana', 'stats': {key: {'m': 2, 'n': 4, 't': 0} for key in KEYS}}
+    update = build_stats_update(item, KEYS, False, 'easy', int(now))
+    assert ' ADD ' not in update['UpdateExpression']
+    assert 'stats.#k0.m = :m0' in update['ConditionExpression']
+    assert update['ExpressionAttributeValues'][':e0']['t'] == int(now)
+
+
+def test_resent_answer_is_counted_once():
+    table = StatsTable()
+    assert record_answer(table, 'ana', CERT, 'IAM basics', QUESTION, False, now=0, answer_id='quiz-1#1')
+    assert not record_answer(table, 'ana', CERT, 'IAM basics', QUESTION, False, now=5, answer_id='quiz-1#1')
+    assert len(table.updates) == 1
+    update = build_stats_update(table.item, KEYS, False, 'easy', 5, answer_id='quiz-1#2')
+    assert 'last_answer <> :answer' in update['ConditionExpression']
@@ -0,0 +1,82 @@
+from fake_dynamodb import FakeTable
+from idempotency import COMPLETED, IN_FLIGHT, acquire, complete, release, request_key
+
+
+def registry():
+    return FakeTable('request_idempotency', 'request_key')
+
+
+def test_client_key_is_scoped_to_the_session():
+    key, derived = request_key('session-1', 'hello', 'click-1')
+    assert not derived
+    assert key.startswith('c:')
+    assert request_key('session-1', 'other text', 'click-1')[0] == key
+    assert request_key('session-2', 'hello', 'click-1')[0] != key
+
+
+def test_derived_key_ignores_case_and_spacing():
+    key, derived = request_key('session-1', '  Quiz me on   IAM ')
+    assert derived
+    assert key.startswith('m:')
+    assert request_key('session-1', 'quiz me on iam')[0] == key
+    assert request_key('session-2', 'quiz me on iam')[0] != key
+    assert request_key('session-1', 'quiz me on s3')[0] != key
+
+
+def test_client_and_derived_keys_never_collide():
+    assert request_key('s', 'x', 'x')[0] != request_key('s', 'x')[0]
+
+
+def test_duplicate_replays_completed_response():
+    table = registry()
+    token, original = acquire(table, 'k', in_flight_seconds=60)
+    assert token and original is None
+    assert complete(table, 'k', token, 200, '{"response": "hi"}', derived=False)
+    token_again, original = acquire(table, 'k', in_flight_seconds=60, wait_seconds=0)
+    assert token_again is None
+    assert original['status'] == COMPLETED and original['response_body'] == '{"response": "hi"}'
+
+
+def test_duplicate_of_a_run_in_flight_gets_the_registered_item():
+    table = registry()
+    acquire(table, 'k', in_flight_seconds=60)
+    token, original = acquire(table, 'k', in_flight_seconds=60, wait_seconds=0, sleep=lambda s: None)
+    assert token is None and original['status'] == IN_FLIGHT
+
+
+def test_lapsed_claim_leaves_the_new_run_alone():
+    table = registry()
+    old_token, _ = acquire(table, 'k', in_flight_seconds=-1)
+    new_token, _ = acquire(table, 'k', in_flight_seconds=60)
+    assert new_token and new_token != old_token
+
+    assert not release(table, 'k', old_token)
+    assert not complete(table, 'k', old_token, 200, 'stale', derived=False)
+    assert table.items[('k',)]['claim_token'] == new_token
+    assert table.items[('k',)]['status'] == IN_FLIGHT
+
+    assert release(table, 'k', new_token)
+    assert ('k',) not in table.items
+
+
+def test_same_message_sent_again_after_its_reply_runs_again():
+    table = registry()
+    key, derived = request_key('session-1', 'B')
+    first, _ = acquire(table, key, in_flight_seconds=60, derived=derived)
+    assert complete(table, key, first, 200, '{"response": "correct"}', derived)
+    second, original = acquire(table, key, in_flight_seconds=60, derived=derived, wait_seconds=0)
+    assert second and second != first and original is None
+    assert table.items[(key,)]['status'] == IN_FLIGHT
+
+
+def test_duplicate_waiting_on_a_derived_run_gets_its_reply():
+    table = registry()
+    key, derived = request_key('session-1', 'B')
+    first, _ = acquire(table, key, in_flight_seconds=60, derived=derived)
+
+    def original_finishes(seconds):
+        complete(table, key, first, 200, '{"response": "correct"}', derived)
+    token, original = acquire(table, key, in_flight_seconds=60, derived=derived, sleep=original_finishes)
+    assert token is None
+    assert original['status'] == COMPLETED and original['claim_token'] == first
+    assert original['response_body'] == '{"response": "correct"}'
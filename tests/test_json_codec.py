@@ -0,0 +1,79 @@
+import json
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import Binary
+
+import json_codec
+from json_codec import dumps, json_default, loads, to_body, to_json_ready
+
+ITEM = {
+    'quiz_id': 'q1',
+    'user_score': Decimal('7'),
+    'share': Decimal('0.75'),
+    'answered_orders': {Decimal('3'), Decimal('1'), Decimal('2')},
+    'tags': {'iam', 's3'},
+    'blob': Binary(b'\x00\xff'),
+    'raw': b'abc',
+    'answers': [{'user_answer': Decimal('1'), 'answered_correctly': True}, {}],
+    'note': 'Zürich ✓',
+    'missing': None,
+}
+
+
+@pytest.fixture(params=['stdlib', 'orjson'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson':
+        if json_codec.orjson is None:
+            pytest.skip('orjson is not installed')
+        monkeypatch.setattr(json_codec, 'USE_ORJSON', True)
+    else:
+        monkeypatch.setattr(json_codec, 'USE_ORJSON', False)
+    return request.param
+
+
+def test_dynamodb_item_round_trip(backend):
+    decoded = loads(dumps(ITEM))
+    assert decoded['user_score'] == 7 and isinstance(decoded['user_score'], int)
+    assert decoded['share'] == 0.75
+    assert decoded['answered_orders'] == [1, 2, 3]
+    assert decoded['tags'] == ['iam', 's3']
+    assert decoded['blob'] == 'AP8='
+    assert decoded['raw'] == 'YWJj'
+    assert decoded['answers'] == [{'user_answer': 1, 'answered_correctly': True}, {}]
+    assert decoded['note'] == 'Zürich ✓'
+    assert decoded['missing'] is None
+
+
+def test_output_is_compact_utf8(backend):
+    text = dumps({'a': [1, 2], 'b': 'é'})
+    assert text == '{"a":[1,2],"b":"é"}'
+
+
+def test_integers_beyond_64_bits(backend):
+    big = 2 ** 70
+    assert loads(dumps({'n': Decimal(big)}))['n'] == big
+
+
+def test_backends_agree():
+    assert json.loads(dumps(ITEM)) == loads(dumps(ITEM))
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        json_default(object())
+
+
+def test_body_is_encoded_once():
+    assert to_body('{"already": "encoded"}') == '{"already": "encoded"}'
+    assert to_body({'n': Decimal('2')}) == '{"n":2}'
+
+
+def test_json_ready_copy_has_only_json_types():
+    ready = to_json_ready(ITEM)
+    assert ready['user_score'] == 7 and type(ready['user_score']) is int
+    assert ready['answered_orders'] == [1, 2, 3]
+    assert ready['answers'][0]['user_answer'] == 1
+    assert json.dumps(ready)
+    # The original is left alone
+    assert isinstance(ITEM['user_score'], Decimal)
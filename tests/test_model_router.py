@@ -0,0 +1,73 @@
+import pytest
+
+import bedrock_guard
+import call_ledger
+import model_router
+from bedrock_guard import BedrockUnavailable
+from model_router import MIN_ESCALATION_SECONDS, converse_routed
+
+MODELS = ['micro', 'lite', 'pro']
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBedrock(object):
+    """
+    converse() that takes `seconds` of the clock per call and answers from
+    `replies` (model id -> text, or an exception to raise)
+    """
+    def __init__(self, clock, replies, seconds):
+        self.clock = clock
+        self.replies = replies
+        self.seconds = seconds
+        self.calls = []
+
+    def converse(self, modelId, **kwargs):
+        self.calls.append(modelId)
+        self.clock.now += self.seconds
+        reply = self.replies[modelId]
+        if isinstance(reply, Exception):
+            raise reply
+        return {'output': {'message': {'content': [{'text': reply}]}}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(model_router.time, 'monotonic', clock)
+    monkeypatch.setattr(bedrock_guard, '_guards', {})
+    monkeypatch.setattr(call_ledger, 'CALL_LEDGER', False)
+    return clock
+
+
+def routed(client):
+    return converse_routed(client, 'quiz_generation', 1, [], {},
+                           lambda text: text if text == 'valid' else None, models=MODELS)
+
+
+def test_escalates_on_invalid_output(clock):
+    client = FakeBedrock(clock, {'micro': 'bad', 'lite': 'bad', 'pro': 'valid'}, seconds=1)
+    assert routed(client) == ('valid', 'pro')
+    assert client.calls == MODELS
+
+
+def test_tiers_share_one_deadline(clock):
+    seconds = bedrock_guard.CALL_DEADLINE_SECONDS - MIN_ESCALATION_SECONDS + 1
+    client = FakeBedrock(clock, {'micro': 'bad', 'lite': 'valid', 'pro': 'valid'}, seconds=seconds)
+    assert routed(client) == (None, 'micro')
+    assert client.calls == ['micro']
+
+
+def test_unavailable_without_time_left_is_raised(clock):
+    seconds = bedrock_guard.CALL_DEADLINE_SECONDS - MIN_ESCALATION_SECONDS + 1
+    unavailable = BedrockUnavailable('micro', 'circuit open', 30)
+    client = FakeBedrock(clock, {'micro': unavailable, 'lite': 'valid', 'pro': 'valid'}, seconds=seconds)
+    with pytest.raises(BedrockUnavailable):
+        routed(client)
+    assert client.calls == ['micro']
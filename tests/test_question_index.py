@@ -0,0 +1,99 @@
+from botocore.exceptions import ClientError
+
+import question_index
+from fake_dynamodb import FakeTable
+from question_index import (BANDS, PERMUTATIONS, LSHIndex, QuestionIndex, assign_clusters, bucket_keys, flush_clusters,
+                            pack_signature, shingles, signature, similarity, unpack_signature)
+
+OPTIONS = ['S3 Standard', 'S3 Glacier Deep Archive', 'S3 One Zone-IA', 'S3 Intelligent-Tiering']
+ARCHIVE = {'question': 'Which S3 storage class is best for long-term archival data?', 'options': OPTIONS}
+ARCHIVE_REWORDED = {'question': 'For long-term archival data, which S3 storage class is best?', 'options': OPTIONS}
+CONTAINERS = {'question': 'Which service runs containers without managing servers?',
+              'options': ['EC2', 'Fargate', 'Lambda', 'Lightsail']}
+
+
+class IndexResource:
+    """
+    The slice of the boto3 resource QuestionIndex uses, over a FakeTable.
+    The first batch_get_item leaves its last key unprocessed.
+    """
+
+    def __init__(self):
+        self.table = FakeTable('question_index', 'index_key')
+        self.requests = []
+
+    def Table(self, name):
+        return self.table
+
+    def batch_get_item(self, RequestItems):
+        (name, request), = RequestItems.items()
+        keys = request['Keys']
+        self.requests.append(len(keys))
+        unprocessed = keys[-1:] if len(self.requests) == 1 and len(keys) > 1 else []
+        found = [self.table.items[(k['index_key'],)] for k in keys[:len(keys) - len(unprocessed)]
+                 if (k['index_key'],) in self.table.items]
+        response = {'Responses': {name: found}}
+        if unprocessed:
+            response['UnprocessedKeys'] = {name: {'Keys': unprocessed}}
+        return response
+
+
+def test_shingles_are_words_pairs_and_option_words():
+    result = shingles({'question': 'What is Amazon S3?', 'options': ['Object storage']})
+    assert result == {'amazon', 's3', 'amazon s3', 'o:object', 'o:storage'}
+
+
+def test_paraphrases_have_similar_signatures():
+    assert len(signature(ARCHIVE)) == PERMUTATIONS
+    assert signature(ARCHIVE) == signature(dict(ARCHIVE))
+    assert similarity(signature(ARCHIVE), signature(ARCHIVE_REWORDED)) >= question_index.DUPLICATE_THRESHOLD
+    assert similarity(signature(ARCHIVE), signature(CONTAINERS)) < 0.2
+
+
+def test_signature_packs_into_band_buckets():
+    sig = signature(ARCHIVE)
+    assert unpack_signature(pack_signature(sig)) == sig
+    keys = bucket_keys(sig)
+    assert len(keys) == BANDS and keys[0].startswith('b0#')
+    # Identical bands share a bucket
+    assert set(bucket_keys(signature(ARCHIVE_REWORDED))) & set(keys)
+
+
+def test_in_memory_index_clusters_paraphrases():
+    index = LSHIndex()
+    cluster_id, created = index.assign(ARCHIVE)
+    assert created and cluster_id.startswith('qc-')
+    assert index.assign(ARCHIVE_REWORDED) == (cluster_id, False)
+    other, created = index.assign(CONTAINERS)
+    assert created and other != cluster_id
+
+
+def test_clusters_are_shared_through_the_table():
+    resource = IndexResource()
+    first = QuestionIndex(resource)
+    questions = [dict(ARCHIVE), dict(ARCHIVE_REWORDED), dict(CONTAINERS)]
+    first.assign(questions)
+    assert questions[0]['cluster_id'] == questions[1]['cluster_id'] != questions[2]['cluster_id']
+    assert len(first.pending) == 2
+    first.flush()
+    assert first.pending == []
+    assert ('cluster#' + questions[0]['cluster_id'],) in resource.table.items
+
+    # A later request finds the stored cluster, despite the unprocessed key
+    later = QuestionIndex(resource)
+    reworded = [dict(ARCHIVE_REWORDED)]
+    later.assign(reworded)
+    assert reworded[0]['cluster_id'] == questions[0]['cluster_id']
+    assert later.pending == []
+
+
+def test_index_errors_leave_questions_untagged():
+    class Unavailable:
+        def batch_get_item(self, RequestItems):
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'no table'}}, 'BatchGetItem')
+
+    questions = [dict(ARCHIVE)]
+    assign_clusters(QuestionIndex(Unavailable()), questions)
+    assert 'cluster_id' not in questions[0]
+    assign_clusters(None, questions)
+    flush_clusters(None)
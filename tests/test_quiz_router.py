@@ -0,0 +1,105 @@
+import io
+import json
+
+import pytest
+
+from fake_dynamodb import FakeTable
+from quiz_router import (INTENT_ANSWER, INTENT_NEXT, INTENT_RESULTS, STATE_TTL_SECONDS, action_body, format_answer,
+                         format_pending, invoke_action, load_state, observe, parse_intent, prompt_attribute, routable,
+                         save_state)
+
+QUESTION = {'order': 2, 'question': 'Which service stores objects?', 'options': ['EBS', 'S3', 'EFS', 'RDS']}
+
+
+@pytest.mark.parametrize('message, expected', [
+    ('B', (INTENT_ANSWER, 1)),
+    ('(c)', (INTENT_ANSWER, 2)),
+    ('answer: d', (INTENT_ANSWER, 3)),
+    ('My answer is  A.', (INTENT_ANSWER, 0)),
+    ('option h', (INTENT_ANSWER, 7)),
+    ('next', (INTENT_NEXT, None)),
+    ('Show the next question!', (INTENT_NEXT, None)),
+    ('continue', (INTENT_NEXT, None)),
+    ('show me my results', (INTENT_RESULTS, None)),
+    ('score', (INTENT_RESULTS, None)),
+    ('How did I do?', (INTENT_RESULTS, None)),
+])
+def test_structured_messages_are_recognised(message, expected):
+    assert parse_intent(message) == expected
+
+
+@pytest.mark.parametrize('message', [
+    'I think B is right because of durability', 'option z', 'what is a', 'next week I take the exam',
+    'results of the SAA exam', '', None,
+])
+def test_free_text_goes_to_the_agent(message):
+    assert parse_intent(message) is None
+
+
+def test_routable_needs_a_pending_question_with_that_option():
+    state = observe(None, {'quiz_id': 'q1', 'current_question': QUESTION, 'progress': {'total_questions': 5}})
+    assert routable((INTENT_ANSWER, 3), state)
+    assert not routable((INTENT_ANSWER, 4), state)
+    assert routable((INTENT_RESULTS, None), state)
+    assert not routable(None, state)
+    assert not routable((INTENT_NEXT, None), {})
+    finished = dict(state, pending_order=None)
+    assert not routable((INTENT_ANSWER, 0), finished)
+
+
+def test_state_follows_the_action_outputs():
+    state = observe(None, {'quiz_id': 'q1', 'current_question': QUESTION, 'total_question_count': 5}, 'alice')
+    assert state == {'quiz_id': 'q1', 'score': 0, 'username': 'alice', 'total': 5, 'pending_order': 2,
+                     'question': QUESTION['question'], 'options': QUESTION['options'], 'complete': False}
+    done = observe(state, {'quiz_id': 'q1', 'quiz_complete': True, 'final_score': 4, 'max_score': 5})
+    assert done['complete'] and done['pending_order'] is None and done['score'] == 4
+    # A different quiz starts over; other bodies are not quiz responses
+    assert observe(done, {'quiz_id': 'q2', 'current_question': QUESTION})['score'] == 0
+    assert observe(state, {'quiz_id': 'q1'}) is None
+    assert observe(state, {'recommended_cert': 'SAA'}) is None
+
+
+def test_state_round_trip_and_expiry(monkeypatch):
+    table = FakeTable('agent_sessions', 'session_id')
+    state = observe(None, {'quiz_id': 'q1', 'current_question': QUESTION, 'total_question_count': 5}, 'alice')
+    save_state(table, 's1', dict(state, question=None), now=1000)
+    monkeypatch.setattr('time.time', lambda: 1000)
+    loaded = load_state(table, 's1')
+    assert loaded['pending_order'] == 2 and isinstance(loaded['pending_order'], int)
+    assert 'question' not in loaded
+    monkeypatch.setattr('time.time', lambda: 1001 + STATE_TTL_SECONDS)
+    assert load_state(table, 's1') is None
+    assert load_state(table, 'other') is None
+
+
+def test_action_body_must_be_a_json_object():
+    assert action_body('{"quiz_id": "q1"}') == {'quiz_id': 'q1'}
+    assert action_body('[1]') is None
+    assert action_body('oops') is None
+    assert action_body(None) is None
+
+
+def test_direct_invocation_unwraps_the_action_response():
+    class LambdaClient:
+        def invoke(self, **kwargs):
+            self.event = json.loads(kwargs['Payload'])
+            body = json.dumps({'quiz_id': 'q1'})
+            payload = {'response': {'httpStatusCode': 200, 'responseBody': {'application/json': {'body': body}}}}
+            return {'Payload': io.BytesIO(json.dumps(payload).encode())}
+
+    client = LambdaClient()
+    status, body = invoke_action(client, 'show_next_question', '/show_next_question',
+                                 {'quiz_id': 'q1', 'user_answer': 1}, 's1')
+    assert (status, body) == (200, {'quiz_id': 'q1'})
+    assert client.event['parameters'][1] == {'name': 'user_answer', 'type': 'string', 'value': '1'}
+
+
+def test_replies_are_worded_from_the_state():
+    state = observe(None, {'quiz_id': 'q1', 'current_question': QUESTION, 'total_question_count': 5}, 'alice')
+    assert format_pending(state).startswith('**Question 2 of 5:** Which service stores objects?')
+    assert 'Reply with A, B, C or D.' in format_pending(state)
+    wrong = format_answer(state, {'correct_answer': 1, 'quiz_complete': True, 'final_score': 3, 'max_score': 5})
+    assert wrong.startswith('❌ Not quite. The correct answer is B. S3')
+    assert 'You scored 3 out of 5' in wrong
+    assert 'question 2 of 5' in prompt_attribute(state)
+    assert prompt_attribute(None) is None
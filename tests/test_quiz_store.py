@@ -0,0 +1,114 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import quiz_store
+from fake_dynamodb import FakeTable
+from quiz_store import (PACKED_LAYOUT, create_packed_quiz, load_quiz, migrate_quiz, question_rows,
+                        record_packed_answer, recorded_packed_answer)
+
+QUESTIONS = [
+    {'question': f'Question {order}?', 'options': ['a', 'b', 'c', 'd'], 'correct_answer': 1, 'explanation': 'b'}
+    for order in range(1, 4)
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    quiz_store._quiz_cache.clear()
+    yield
+    quiz_store._quiz_cache.clear()
+
+
+def quiz_table():
+    return FakeTable('quiz', 'username', 'id')
+
+
+def quiz_row(**fields):
+    return dict({'username': 'alice', 'id': 'q1', 'recommended_cert': 'SAA', 'topic': 'IAM',
+                 'max_score': len(QUESTIONS), 'user_score': 0}, **fields)
+
+
+def stored(table):
+    return table.get_item(Key={'username': 'alice', 'id': 'q1'})['Item']
+
+
+def test_packed_answer_is_scored_once():
+    table = quiz_table()
+    create_packed_quiz(table, quiz_row(), QUESTIONS)
+    assert record_packed_answer(table, 'alice', 'q1', 1, 1, True) == 1
+    assert record_packed_answer(table, 'alice', 'q1', 1, 1, True) is None
+    assert record_packed_answer(table, 'alice', 'q1', 1, 0, False) is None
+    answer, score = recorded_packed_answer(table, 'alice', 'q1', 1)
+    assert score == 1
+    assert answer['user_answer'] == 1 and answer['answered_correctly']
+
+
+def test_quiz_being_generated_is_not_cached():
+    table = quiz_table()
+    create_packed_quiz(table, quiz_row(generation_job='job-1'), QUESTIONS[:1])
+    quiz_item, packed = load_quiz(table, 'alice', 'q1')
+    assert quiz_item is not None and packed['generation_job'] == 'job-1'
+    assert 'q1' not in quiz_store._quiz_cache
+
+    # Later questions arrive and the job ends: the next read sees them
+    table.update_item(Key={'username': 'alice', 'id': 'q1'},
+                      UpdateExpression='SET questions_blob = :blob REMOVE generation_job',
+                      ExpressionAttributeValues={':blob': quiz_store.pack_questions(QUESTIONS)})
+    quiz_item, packed = load_quiz(table, 'alice', 'q1')
+    assert len(packed['questions']) == len(QUESTIONS)
+    assert load_quiz(table, 'alice', 'q1')[0] is None
+
+
+def test_finished_quiz_is_served_from_the_cache():
+    table = quiz_table()
+    create_packed_quiz(table, quiz_row(), QUESTIONS)
+    load_quiz(table, 'alice', 'q1')
+    reads = table.calls.count('get_item')
+    quiz_item, packed = load_quiz(table, 'alice', 'q1')
+    assert quiz_item is None and len(packed['questions']) == len(QUESTIONS)
+    assert table.calls.count('get_item') == reads
+    assert load_quiz(table, 'bob', 'q1') == (None, None)
+
+
+def two_table_quiz(table, answered):
+    table.put_item(Item=quiz_row(user_score=len(answered), answered_orders=set(answered)) if answered else quiz_row())
+    rows = []
+    for order, q in enumerate(QUESTIONS, start=1):
+        row = dict(q, quiz_id='q1', order=str(order), user_score=0)
+        if order in answered:
+            row.update(user_answer=1, answered_correctly=True, user_score=1)
+        rows.append(row)
+    return rows
+
+
+def test_migrate_quiz_keeps_answers():
+    table = quiz_table()
+    rows = two_table_quiz(table, {1, 2})
+    migrate_quiz(table, stored(table), rows)
+    item = stored(table)
+    assert item['layout'] == PACKED_LAYOUT
+    assert item['user_score'] == 2
+    assert [r.get('user_answer') for r in question_rows(item)] == [1, 1, None]
+
+
+def test_migrate_quiz_fails_when_an_answer_lands_meanwhile():
+    table = quiz_table()
+    rows = two_table_quiz(table, {1})
+    quiz_item = stored(table)
+    # An answer recorded through the two-table path after the read
+    table.update_item(Key={'username': 'alice', 'id': 'q1'},
+                      UpdateExpression='SET user_score = user_score + :score ADD answered_orders :order',
+                      ExpressionAttributeValues={':score': 0, ':order': {2}})
+    with pytest.raises(ClientError) as conflict:
+        migrate_quiz(table, quiz_item, rows)
+    assert conflict.value.response['Error']['Code'] == 'ConditionalCheckFailedException'
+    assert 'layout' not in stored(table)
+
+
+def test_migrate_quiz_runs_once():
+    table = quiz_table()
+    rows = two_table_quiz(table, set())
+    quiz_item = stored(table)
+    migrate_quiz(table, quiz_item, rows)
+    with pytest.raises(ClientError):
+        migrate_quiz(table, quiz_item, rows)
@@ -0,0 +1,113 @@
+import math
+
+import pytest
+
+from score_sketch import SCORE_SKETCH_TABLE, bucket, empty_counts, load_sketches, merge, percentile_rank, quantile, without_score
+
+BUCKETS = 11  # one bucket per 10 score points
+
+
+def sketch(*scores, max_score=10):
+    counts = empty_counts(BUCKETS)
+    for score in scores:
+        counts[bucket(score, max_score, BUCKETS)] += 1
+    return counts
+
+
+@pytest.mark.parametrize('score, max_score, expected', [
+    (0, 10, 0),
+    (10, 10, 10),
+    (3, 5, 6),
+    (1, 3, 3),
+    (2, 3, 7),
+    (12, 10, 10),   # clamped to a full score
+    (-1, 10, 0),
+    (3, 0, 0),      # no questions
+])
+def test_bucket(score, max_score, expected):
+    assert bucket(score, max_score, BUCKETS) == expected
+
+
+def test_default_grid_is_exact_to_half_a_point():
+    assert bucket(37, 100) == 37
+    assert bucket(1, 3) == 33
+    assert len(empty_counts()) == 101
+
+
+def test_quantile_of_empty_sketch_is_none():
+    assert quantile(empty_counts(BUCKETS), 0.5) is None
+
+
+def test_quantiles():
+    counts = sketch(*range(11))
+    assert quantile(counts, 0.0) == 0.0
+    assert quantile(counts, 0.5) == 50.0
+    assert quantile(counts, 0.9) == 90.0
+    assert quantile(counts, 1.0) == 100.0
+    # A single attempt is every quantile
+    assert {quantile(sketch(7), q) for q in (0.1, 0.5, 0.9)} == {70.0}
+
+
+def test_quantile_matches_sorted_scores():
+    scores = [2, 2, 3, 5, 5, 5, 6, 8, 9, 10]
+    counts = sketch(*scores)
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+        # Nearest-rank quantile of the raw scores
+        rank = max(1, math.ceil(round(q * len(scores), 9)))
+        assert quantile(counts, q) == 10.0 * sorted(scores)[rank - 1]
+
+
+def test_percentile_rank_counts_ties_half():
+    counts = sketch(2, 4, 6, 6, 8)
+    rank = percentile_rank(counts, 6, 10)
+    assert rank['attempts'] == 5
+    assert rank['better_than_pct'] == 40.0
+    assert rank['percentile'] == 60.0
+    assert rank['score_quantiles']['p50'] == 60.0
+    assert percentile_rank(counts, 10, 10)['better_than_pct'] == 100.0
+    assert percentile_rank(counts, 0, 10)['percentile'] == 0.0
+    assert percentile_rank(empty_counts(BUCKETS), 5, 10) is None
+
+
+def test_merged_sketch_ranks_like_one_sketch():
+    first, second = sketch(1, 2, 3), sketch(7, 8, 9, 10)
+    merged = merge(first, second)
+    assert merged == sketch(1, 2, 3, 7, 8, 9, 10)
+    assert quantile(merged, 0.5) == 70.0
+
+
+class BatchClient(object):
+    """
+    batch_get_item that leaves the second key unprocessed the first time
+    """
+    def __init__(self, items):
+        self.items = items
+        self.requests = []
+
+    def batch_get_item(self, RequestItems):
+        keys = [key['sketch_key'] for key in RequestItems[SCORE_SKETCH_TABLE]['Keys']]
+        self.requests.append(keys)
+        served, unprocessed = (keys[:1], keys[1:]) if len(self.requests) == 1 else (keys, [])
+        response = {'Responses': {SCORE_SKETCH_TABLE: [self.items[key] for key in served if key in self.items]}}
+        if unprocessed:
+            response['UnprocessedKeys'] = {SCORE_SKETCH_TABLE: dict(RequestItems[SCORE_SKETCH_TABLE],
+                                                                    Keys=[{'sketch_key': key} for key in unprocessed])}
+        return response
+
+
+def test_load_sketches_retries_unprocessed_keys():
+    client = BatchClient({
+        'SAA#IAM': {'sketch_key': 'SAA#IAM', 'counts': [1, 2]},
+        'SAA#*': {'sketch_key': 'SAA#*', 'counts': [3, 4]},
+    })
+    assert load_sketches(client, ['SAA#IAM', 'SAA#*']) == {'SAA#IAM': [1, 2], 'SAA#*': [3, 4]}
+    assert client.requests == [['SAA#IAM', 'SAA#*'], ['SAA#*']]
+
+
+def test_own_counted_score_is_left_out_of_the_rank():
+    counts = sketch(4, 6, 8)
+    others = without_score(counts, 8, 10)
+    assert sum(others) == 2
+    assert percentile_rank(others, 8, 10)['better_than_pct'] == 100.0
+    assert percentile_rank(counts, 8, 10)['better_than_pct'] < 100.0
+    assert without_score(empty_counts(BUCKETS), 8, 10) == empty_counts(BUCKETS)
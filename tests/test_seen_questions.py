@@ -0,0 +1,96 @@
+import seen_questions
+from fake_dynamodb import FakeTable
+from seen_questions import BloomFilter, SeenQuestions, fingerprint, load, split_seen
+
+
+def seen_table():
+    return FakeTable('seen_questions', 'username')
+
+
+def test_fingerprint_ignores_case_punctuation_stopwords_and_order():
+    assert fingerprint('Which AWS service stores objects?') == fingerprint('what service stores  AWS objects')
+    assert fingerprint('Which service stores objects?') != fingerprint('Which service stores blocks?')
+    assert len(fingerprint('x')) == 16
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter.for_capacity(capacity=500, error_rate=0.01)
+    added = [fingerprint(f"question {i}") for i in range(500)]
+    for fp in added:
+        bloom.add(fp)
+    assert all(fp in bloom for fp in added)
+    false_positives = sum(fingerprint(f"other {i}") in bloom for i in range(2000))
+    assert false_positives < 2000 * 0.03
+    assert bloom.count == 500
+
+
+def test_full_filter_rotates_and_old_questions_expire(monkeypatch):
+    monkeypatch.setattr(seen_questions, 'FILTER_CAPACITY', 3)
+    seen = SeenQuestions('alice')
+    for i in range(3):
+        seen.add(f"first {i}")
+    assert seen.previous is None
+    seen.add('second 0')
+    # The full filter became previous and is still checked
+    assert seen.previous is not None and seen.current.count == 1
+    assert seen.seen('first 0') and seen.seen('second 0')
+    for i in range(1, 4):
+        seen.add(f"second {i}")
+    # Rotated again: the first questions are allowed again
+    assert not seen.seen('first 0')
+    assert seen.seen('second 0') and seen.seen('second 3')
+
+
+def test_recent_questions_are_capped(monkeypatch):
+    monkeypatch.setattr(seen_questions, 'RECENT_QUESTIONS', 2)
+    seen = SeenQuestions('alice')
+    for text in ['one', 'two', 'three']:
+        seen.add(text)
+    assert seen.recent == ['two', 'three']
+
+
+def test_cluster_id_matches_paraphrases():
+    seen = SeenQuestions('alice')
+    seen.add('Which service stores objects?', cluster_id='c7')
+    assert seen.seen('Where would you keep images durably?', cluster_id='c7')
+    assert not seen.seen('Where would you keep images durably?')
+
+
+def test_record_round_trip():
+    table = seen_table()
+    seen = load(table, 'alice')
+    seen.add('Which service stores objects?')
+    seen.save(table)
+    assert seen.version == 1 and seen.added == []
+    loaded = load(table, 'alice')
+    assert loaded.version == 1
+    assert loaded.seen('which service stores objects')
+    assert loaded.recent == ['Which service stores objects?']
+
+
+def test_concurrent_saves_keep_both_additions():
+    table = seen_table()
+    first, second = load(table, 'alice'), load(table, 'alice')
+    first.add('Which service stores objects?')
+    second.add('Which service runs containers?')
+    first.save(table)
+    second.save(table)
+    assert second.version == 2
+    merged = load(table, 'alice')
+    assert merged.seen('Which service stores objects?') and merged.seen('Which service runs containers?')
+    assert merged.recent == ['Which service stores objects?', 'Which service runs containers?']
+
+
+def test_split_drops_seen_and_repeated_questions():
+    seen = SeenQuestions('alice')
+    seen.add('Which service stores objects?')
+    questions = [{'question': 'Which service stores objects?'},
+                 {'question': 'Which service runs containers?'},
+                 {'question': 'Which service runs containers'},
+                 {'question': 'What is a VPC?', 'cluster_id': 'c1'},
+                 {'question': 'Describe a virtual private cloud', 'cluster_id': 'c1'},
+                 {'question': 'What is IAM?'}]
+    kept = [{'question': 'What is IAM'}]
+    fresh, repeats = split_seen(seen, questions, kept)
+    assert [q['question'] for q in fresh] == ['Which service runs containers?', 'What is a VPC?']
+    assert len(repeats) == 4
@@ -0,0 +1,85 @@
+import pytest
+
+import session_compaction
+from session_compaction import (PREVIOUS_EXCHANGE_ATTRIBUTE, RECENT_TURNS_KEPT, compact, needs_compaction,
+                                new_conversation, prompt_session_attributes, record_turn)
+
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    """
+    Stands in for the summary model; prompts are recorded, and a None reply
+    is an unusable summary
+    """
+    calls = {'prompts': [], 'reply': 'Summary of the chat'}
+
+    def converse_routed(client, task, size, messages, config, parse):
+        calls['prompts'].append(messages[0]['content'][0]['text'])
+        return parse(calls['reply']), 'micro-model'
+    monkeypatch.setattr(session_compaction, 'converse_routed', converse_routed)
+    return calls
+
+
+def test_quiz_turns_do_not_push_agent_turns_out(summarizer):
+    conversation = new_conversation('s1')
+    record_turn(conversation, 'Quiz me on IAM', 'Question 1 ...', 100)
+    for order in range(1, 3 * RECENT_TURNS_KEPT):
+        record_turn(conversation, 'B', f'Correct, question {order + 1}', 100, agent_turn=False)
+    assert compact(None, conversation)
+    assert 'Quiz me on IAM' in summarizer['prompts'][0]
+
+
+def test_failed_compaction_keeps_every_unsummarised_turn(summarizer):
+    conversation = new_conversation('s1')
+    summarizer['reply'] = None
+    for idx in range(RECENT_TURNS_KEPT + 3):
+        record_turn(conversation, f'message {idx}', f'reply {idx}', 100)
+        if needs_compaction(conversation):
+            assert not compact(None, conversation)
+    assert len(conversation['recent_turns']) == RECENT_TURNS_KEPT + 3
+    assert conversation['generation'] == 0
+
+    summarizer['reply'] = 'Summary of the chat'
+    assert compact(None, conversation)
+    assert 'message 0' in summarizer['prompts'][-1]
+    assert f'message {RECENT_TURNS_KEPT + 2}' in summarizer['prompts'][-1]
+
+
+def test_summarised_turns_are_not_summarised_again(summarizer):
+    conversation = new_conversation('s1')
+    record_turn(conversation, 'first question', 'first answer', 100)
+    assert compact(None, conversation)
+    assert conversation['recent_turns'] == []
+    record_turn(conversation, 'second question', 'second answer', 100)
+    assert compact(None, conversation)
+    assert 'first question' not in summarizer['prompts'][-1]
+    assert 'second question' in summarizer['prompts'][-1]
+
+
+def test_new_agent_session_starts_with_the_last_exchange(summarizer):
+    conversation = new_conversation('s1')
+    record_turn(conversation, 'Quiz me', 'Question 1: which service ...', 100)
+    assert compact(None, conversation)
+    attributes = prompt_session_attributes(conversation)
+    assert attributes[PREVIOUS_EXCHANGE_ATTRIBUTE] == 'User: Quiz me\nAssistant: Question 1: which service ...'
+    assert conversation['agent_session_id'] == 's1-g1'
+
+    record_turn(conversation, 'B', 'Correct', 100)
+    assert PREVIOUS_EXCHANGE_ATTRIBUTE not in prompt_session_attributes(conversation)
+
+
+def test_unsummarised_turns_trigger_compaction():
+    conversation = new_conversation('s1')
+    for idx in range(RECENT_TURNS_KEPT - 1):
+        record_turn(conversation, 'B', 'Correct', 100, agent_turn=False)
+    assert not needs_compaction(conversation)
+    record_turn(conversation, 'B', 'Correct', 100, agent_turn=False)
+    assert needs_compaction(conversation)
+
+
+def test_unsummarised_turns_are_bounded(monkeypatch):
+    monkeypatch.setattr(session_compaction, 'UNSUMMARIZED_MAX_TURNS', 5)
+    conversation = new_conversation('s1')
+    for idx in range(8):
+        record_turn(conversation, f'message {idx}', 'reply', 100)
+    assert [t['user'] for t in conversation['recent_turns']] == [f'message {idx}' for idx in range(3, 8)]
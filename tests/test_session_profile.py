@@ -0,0 +1,67 @@
+import json
+from decimal import Decimal
+
+from fake_dynamodb import FakeTable
+from session_profile import (PROFILE_ATTRIBUTE, PROFILE_LOADED_AT_ATTRIBUTE, PROFILE_MAX_AGE_SECONDS,
+                             build_session_state, get_user_profile, profile_from_event,
+                             refreshed_session_attributes)
+
+PROFILE = {'username': 'alice', 'recommended_cert': 'SAA', 'currentjobrole': 'Developer',
+           'aspiringjobrole': '', 'quizzes_taken': Decimal('3')}
+
+
+def event_with(session_state):
+    return {'sessionAttributes': session_state['sessionAttributes']}
+
+
+def test_session_state_carries_the_profile():
+    state = build_session_state(PROFILE, now=1000)
+    attributes = state['sessionAttributes']
+    assert attributes['username'] == 'alice'
+    assert attributes[PROFILE_LOADED_AT_ATTRIBUTE] == '1000'
+    assert json.loads(attributes[PROFILE_ATTRIBUTE])['quizzes_taken'] == 3
+    # Only non-empty prompt fields, all as strings
+    assert state['promptSessionAttributes'] == {'username': 'alice', 'recommended_cert': 'SAA',
+                                                'currentjobrole': 'Developer'}
+
+
+def test_fresh_profile_is_read_from_the_event():
+    event = event_with(build_session_state(PROFILE, now=1000))
+    profile = profile_from_event(event, 'Alice', now=1000 + PROFILE_MAX_AGE_SECONDS)
+    assert profile['recommended_cert'] == 'SAA'
+
+
+def test_stale_foreign_or_broken_profile_is_ignored():
+    event = event_with(build_session_state(PROFILE, now=1000))
+    assert profile_from_event(event, 'alice', now=1001 + PROFILE_MAX_AGE_SECONDS) is None
+    assert profile_from_event(event, 'bob', now=1000) is None
+    assert profile_from_event({}, 'alice', now=1000) is None
+    event['sessionAttributes'][PROFILE_ATTRIBUTE] = '{not json'
+    assert profile_from_event(event, 'alice', now=1000) is None
+    event['sessionAttributes'][PROFILE_LOADED_AT_ATTRIBUTE] = 'yesterday'
+    assert profile_from_event(event, 'alice', now=1000) is None
+
+
+def test_missing_session_profile_falls_back_to_the_table():
+    table = FakeTable('user_profile', 'username')
+    table.put_item(Item=dict(PROFILE, recommended_cert='DVA'))
+    assert get_user_profile({}, 'alice', table)['recommended_cert'] == 'DVA'
+    assert get_user_profile({}, 'bob', table) is None
+
+
+def test_session_profile_saves_the_table_read():
+    table = FakeTable('user_profile', 'username')
+    event = event_with(build_session_state(PROFILE))
+    assert get_user_profile(event, 'alice', table)['recommended_cert'] == 'SAA'
+    assert table.calls == []
+
+
+def test_profile_update_refreshes_the_session_copy():
+    event = event_with(build_session_state(PROFILE, now=1000))
+    attributes = refreshed_session_attributes(event, 'alice', {'recommended_cert': 'SAP'})
+    assert json.loads(attributes[PROFILE_ATTRIBUTE])['recommended_cert'] == 'SAP'
+    assert attributes[PROFILE_LOADED_AT_ATTRIBUTE] == '1000'
+    # The event itself is left alone
+    assert json.loads(event['sessionAttributes'][PROFILE_ATTRIBUTE])['recommended_cert'] == 'SAA'
+    assert refreshed_session_attributes(event, 'bob', {'recommended_cert': 'SAP'}) is None
+    assert refreshed_session_attributes({}, 'alice', {'recommended_cert': 'SAP'}) is None
@@ -0,0 +1,71 @@
+import profile_events
+from fake_dynamodb import FakeTable
+from profile_events import cert_changes, is_stream_event, publish_profile_change, stream_record
+from starter_quiz import STARTER_QUIZ_TTL_SECONDS, claim_starter, has_starter, store_starter
+
+QUESTIONS = [{'question': f"Question {i}?", 'options': ['A', 'B', 'C', 'D'], 'correct_answer': i % 4,
+              'difficulty': 'easy', 'user_answer': None} for i in range(5)]
+
+
+def starter_table():
+    table = FakeTable('starter_quizzes', 'username')
+    store_starter(table, 'alice', 'SAA', 'AWS General', QUESTIONS, now=1000)
+    return table
+
+
+def test_parked_quiz_keeps_only_the_static_content():
+    table = starter_table()
+    assert has_starter(table, 'alice', 'SAA', now=1000)
+    assert not has_starter(table, 'alice', 'DVA', now=1000)
+    assert not has_starter(table, 'alice', 'SAA', now=1000 + STARTER_QUIZ_TTL_SECONDS)
+    assert not has_starter(table, 'bob', 'SAA', now=1000)
+    claimed = claim_starter(table, 'alice', 'SAA', 'AWS General', 5, now=1001)
+    assert [q['question'] for q in claimed] == [q['question'] for q in QUESTIONS]
+    assert 'user_answer' not in claimed[0]
+
+
+def test_starter_quiz_is_claimed_once():
+    table = starter_table()
+    assert len(claim_starter(table, 'alice', 'SAA', 'AWS General', 3, now=1001)) == 3
+    assert claim_starter(table, 'alice', 'SAA', 'AWS General', 3, now=1001) is None
+    assert table.items == {}
+
+
+def test_claim_needs_matching_cert_topic_size_and_age():
+    table = starter_table()
+    assert claim_starter(table, 'alice', 'DVA', 'AWS General', 5, now=1001) is None
+    assert claim_starter(table, 'alice', 'SAA', 'IAM', 5, now=1001) is None
+    assert claim_starter(table, 'alice', 'SAA', 'AWS General', 6, now=1001) is None
+    assert claim_starter(table, 'alice', 'SAA', 'AWS General', 5, now=1000 + STARTER_QUIZ_TTL_SECONDS) is None
+    assert claim_starter(table, 'bob', 'SAA', 'AWS General', 5, now=1001) is None
+    # None of the failed claims removed the quiz
+    assert ('alice',) in table.items
+
+
+def test_cert_changes_come_from_insert_and_modify_records():
+    changed = stream_record({'username': 'alice', 'recommended_cert': 'SAA'}, {'username': 'alice', 'recommended_cert': 'DVA'})
+    unchanged = stream_record({'username': 'bob', 'recommended_cert': 'SAA'}, {'username': 'bob', 'recommended_cert': 'SAA'})
+    inserted = dict(stream_record({'username': 'carol', 'recommended_cert': 'CLF'}), eventName='INSERT')
+    removed = dict(stream_record({'username': 'dave', 'recommended_cert': 'SAA'}), eventName='REMOVE')
+    cleared = stream_record({'username': 'erin'}, {'username': 'erin', 'recommended_cert': 'SAA'})
+    nameless = stream_record({'recommended_cert': 'SAA'})
+    event = {'Records': [changed, unchanged, inserted, removed, cleared, nameless]}
+    assert is_stream_event(event)
+    assert cert_changes(event) == [('alice', 'SAA'), ('carol', 'CLF')]
+
+
+def test_stream_events_are_told_apart_from_action_calls():
+    assert not is_stream_event({'actionGroup': 'Quiz', 'parameters': []})
+    assert not is_stream_event({'Records': []})
+    assert not is_stream_event({'Records': [{'eventSource': 'aws:sqs'}]})
+    assert not is_stream_event(None)
+
+
+def test_local_mode_publishes_cert_updates_only(monkeypatch):
+    monkeypatch.setattr(profile_events, 'local_stream', profile_events.LocalQueue())
+    publish_profile_change('alice', {'recommended_cert': 'SAA'})
+    monkeypatch.setattr(profile_events, 'PROFILE_EVENTS', 'local')
+    publish_profile_change('alice', {'currentjobrole': 'Developer'})
+    publish_profile_change('alice', {'recommended_cert': 'SAA'})
+    events = profile_events.local_stream.drain(lambda event, context: cert_changes(event))
+    assert events == [[('alice', 'SAA')]]
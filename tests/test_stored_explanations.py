@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+
+def question(**overrides):
+    q = {
+        'question': 'Which service stores objects?',
+        'options': ['EBS', 'S3', 'EFS', 'RDS'],
+        'correct_answer': 1,
+        'explanation': {
+            'why_correct': 'S3 is object storage.',
+            'option_rationales': ['EBS is block storage.', 'Correct.', 'EFS is a file system.', 'RDS is a database.'],
+            'key_concepts': ['object storage'],
+        },
+        'domain': 'Design Resilient Architectures',
+        'aws_service': 'S3',
+        'difficulty': 'Easy',
+    }
+    q.update(overrides)
+    return q
+
+
+@pytest.fixture
+def create_quiz(handler):
+    return handler('create_quiz')
+
+
+@pytest.fixture
+def show_result(handler):
+    return handler('show_result')
+
+
+def test_generated_questions_need_a_complete_explanation(create_quiz):
+    parsed = create_quiz.parse_questions(json.dumps([question()]), 1)
+    assert parsed[0]['explanation']['why_correct'] == 'S3 is object storage.'
+    assert parsed[0]['difficulty'] == 'easy'
+
+    incomplete = [
+        None,
+        {'why_correct': ' ', 'option_rationales': ['a'] * 4, 'key_concepts': []},
+        {'why_correct': 'x', 'option_rationales': ['a'] * 3, 'key_concepts': []},
+        {'why_correct': 'x', 'option_rationales': ['a', 'b', 'c', 4], 'key_concepts': []},
+        {'why_correct': 'x', 'option_rationales': ['a'] * 4},
+    ]
+    for explanation in incomplete:
+        assert create_quiz.parse_questions(json.dumps([question(explanation=explanation)]), 1) is None
+
+
+def test_generated_questions_are_validated(create_quiz):
+    assert create_quiz.parse_questions('not json', 1) is None
+    assert create_quiz.parse_questions(json.dumps([question()]), 2) is None
+    assert create_quiz.parse_questions(json.dumps([question(correct_answer=4)]), 1) is None
+    assert create_quiz.parse_questions(json.dumps([question(difficulty='extreme')]), 1) is None
+    assert len(create_quiz.parse_questions(json.dumps([question(), question()]), 1)) == 1
+
+
+def summary_entry(order, user_answer, explanation=True):
+    q = question()
+    return {
+        'order': str(order),
+        'question': q['question'],
+        'options': q['options'],
+        'correct_answer': q['correct_answer'],
+        'user_answer': user_answer,
+        'is_correct': user_answer == q['correct_answer'],
+        'explanation': q['explanation'] if explanation else None,
+    }
+
+
+def test_incorrect_answers_are_explained_from_storage(show_result):
+    summary = [summary_entry(1, 1), summary_entry(2, 0), summary_entry(3, 2, explanation=False)]
+    explanations, missing = show_result.assemble_stored_explanations(summary)
+    assert [e['question_number'] for e in explanations] == [2]
+    entry = explanations[0]
+    assert entry['correct_answer'] == 'S3'
+    assert entry['user_selected'] == 'EBS'
+    assert entry['explanation'] == {'why_correct': 'S3 is object storage.',
+                                    'why_incorrect': 'EBS is block storage.',
+                                    'key_concepts': ['object storage']}
+    assert [q['order'] for q in missing] == ['3']
+
+
+def test_unanswered_question_has_no_selected_option(show_result):
+    explanations, _ = show_result.assemble_stored_explanations([summary_entry(1, None)])
+    assert explanations[0]['user_selected'] is None
+    assert explanations[0]['explanation']['why_incorrect'] == ''
+
+
+def test_generated_explanations_are_numbered_in_quiz_order(show_result):
+    missing = [{'order': '3'}, {'order': '7'}]
+    generated = [{'question_number': 1}, {'question_number': 2}, {'question_number': 9}, 'junk']
+    renumbered = show_result.renumber_generated_explanations(generated, missing)
+    assert [item['question_number'] for item in renumbered] == [3, 7, 9]
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+
+class Messages:
+    """
+    Stands in for the messages table; keeps what log_message writes
+    """
+    name = 'messages'
+
+    def __init__(self):
+        self.items = []
+
+    def put_item(self, Item):
+        self.items.append(Item)
+
+    def types(self):
+        return [item['message_type'] for item in self.items]
+
+
+@pytest.fixture
+def agent(handler, monkeypatch):
+    module = handler('invoke_agent')
+    monkeypatch.setattr(module, 'FAST_PATH_ENABLED', False)
+    return module
+
+
+def new_turn(agent, trace_level):
+    return agent.AgentTurn(Messages(), 'alice', trace_level)
+
+
+def orchestration_event(**trace):
+    return {'trace': {'trace': {'orchestrationTrace': trace}}}
+
+
+USAGE = {'modelInvocationOutput': {'metadata': {'usage': {'inputTokens': 900, 'outputTokens': 40}}}}
+
+
+def test_trace_level_is_capped(agent, monkeypatch):
+    monkeypatch.setattr(agent, 'TRACE_LEVEL', agent.TRACE_ROUTING)
+    monkeypatch.setattr(agent, 'TRACE_MAX_LEVEL', agent.TRACE_ROUTING)
+    assert agent.resolve_trace_level() == agent.TRACE_ROUTING
+    assert agent.resolve_trace_level(agent.TRACE_OFF) == agent.TRACE_OFF
+    assert agent.resolve_trace_level(agent.TRACE_FULL) == agent.TRACE_ROUTING
+    assert agent.resolve_trace_level('verbose') == agent.TRACE_ROUTING
+    monkeypatch.setattr(agent, 'TRACE_LEVEL', 'bogus')
+    monkeypatch.setattr(agent, 'TRACE_MAX_LEVEL', agent.TRACE_FULL)
+    assert agent.resolve_trace_level() == agent.TRACE_ROUTING
+    assert agent.resolve_trace_level(agent.TRACE_FULL) == agent.TRACE_FULL
+
+
+def test_chunks_build_the_response(agent):
+    turn = new_turn(agent, agent.TRACE_OFF)
+    agent.dispatch_stream_event(turn, {'chunk': {'bytes': 'Hello, '.encode()}})
+    agent.dispatch_stream_event(turn, {'chunk': {'bytes': 'Zürich'.encode()}})
+    assert turn.response_text == 'Hello, Zürich'
+    assert turn.event_counts == {'chunk': 2}
+    assert turn.messages_table.items[-1]['message_content'] == 'Hello, Zürich'
+
+
+def test_trace_events_are_skipped_when_tracing_is_off(agent):
+    turn = new_turn(agent, agent.TRACE_OFF)
+    agent.dispatch_stream_event(turn, orchestration_event(rationale={'text': 'thinking'}, **USAGE))
+    assert turn.event_counts == {'trace': 1}
+    assert turn.messages_table.items == []
+    assert turn.max_input_tokens is None
+
+
+def test_routing_level_logs_rationale_and_collaborators(agent):
+    turn = new_turn(agent, agent.TRACE_ROUTING)
+    agent.dispatch_stream_event(turn, orchestration_event(
+        rationale={'text': 'use the quiz agent', 'traceId': 't1'},
+        invocationInput={'agentCollaboratorInvocationInput': {'agentCollaboratorName': 'Quiz'}},
+        **USAGE))
+    agent.dispatch_stream_event(turn, {'trace': {'trace': {
+        'routingClassifierTrace': USAGE, 'preProcessingTrace': {'ignored': True}}}})
+    assert turn.messages_table.types() == ['RATIONALE', 'AGENT_COLLABORATOR']
+    assert turn.messages_table.items[1]['agent'] == 'Quiz'
+    assert turn.event_counts == {'trace': 2, 'orchestrationTrace': 1,
+                                 'routingClassifierTrace': 1, 'preProcessingTrace': 1}
+    assert turn.max_input_tokens == 900
+    assert turn.input_tokens == 1800
+    assert turn.output_tokens == 80
+    assert turn.model_calls == 2
+
+
+def test_action_outputs_are_collected_with_their_username(agent):
+    turn = new_turn(agent, agent.TRACE_ROUTING)
+    action_input = {'actionGroupInvocationInput': {'parameters': [
+        {'name': 'username', 'value': 'alice'}, {'name': 'quiz_id', 'value': 'q1'}]}}
+    agent.dispatch_stream_event(turn, orchestration_event(invocationInput=action_input))
+    agent.dispatch_stream_event(turn, orchestration_event(observation={
+        'actionGroupInvocationOutput': {'text': json.dumps({'quiz_id': 'q1', 'question_number': 1})}}))
+    agent.dispatch_stream_event(turn, orchestration_event(observation={
+        'actionGroupInvocationOutput': {'text': 'not json'}}))
+    assert turn.action_params == {'username': 'alice', 'quiz_id': 'q1'}
+    assert turn.action_outputs == [('alice', {'quiz_id': 'q1', 'question_number': 1})]
+
+
+def test_full_level_dumps_within_the_budget(agent, monkeypatch, capsys):
+    monkeypatch.setattr(agent, 'TRACE_MAX_EVENT_CHARS', 50)
+    monkeypatch.setattr(agent, 'TRACE_MAX_TURN_CHARS', 100)
+    turn = new_turn(agent, agent.TRACE_FULL)
+    for _ in range(4):
+        agent.dispatch_stream_event(turn, {'returnControl': {'invocationInputs': [], 'padding': 'x' * 200}})
+    dumps = [line for line in capsys.readouterr().out.splitlines() if line.startswith('Stream event:')]
+    assert len(dumps) == 2
+    assert 'chars truncated]' in dumps[0]
+    assert turn.dumps_skipped == 2
+    assert turn.summary()['events'] == {'returnControl': 4}
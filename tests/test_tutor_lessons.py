@@ -0,0 +1,77 @@
+from tutor_lessons import chunk_sections, split_paragraph, store_lesson
+
+SENTENCE = "Amazon S3 stores objects in buckets and replicates them across Availability Zones. "
+
+
+class LessonTable(object):
+    """
+    Enough of the tutor_lessons table for store_lesson: items by (lesson_id, chunk)
+    """
+    def __init__(self):
+        self.items = {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+              ProjectionExpression):
+        lid, pages = ExpressionAttributeValues[':lid'], ExpressionAttributeValues[':pages']
+        return {'Items': [{'chunk': chunk} for (key, chunk) in self.items if key == lid and chunk > pages]}
+
+    def batch_writer(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.items[(Item['lesson_id'], Item['chunk'])] = Item
+
+    def delete_item(self, Key):
+        del self.items[(Key['lesson_id'], Key['chunk'])]
+
+
+def lesson(paragraphs):
+    return {'title': 'Storage', 'sections': [{'heading': 'S3', 'body': '\n\n'.join(paragraphs)}]}
+
+
+def test_short_sections_share_a_page():
+    pages = chunk_sections([{'heading': 'A', 'body': 'One.'}, {'heading': 'B', 'body': 'Two.'}], max_chars=100)
+    assert pages == ['## A\n\nOne.\n\n## B\n\nTwo.']
+
+
+def test_oversize_paragraph_is_split_on_sentences():
+    paragraph = (SENTENCE * 40).strip()
+    pages = chunk_sections(lesson([paragraph])['sections'], max_chars=500)
+    assert len(pages) > 1
+    assert all(len(page) <= 500 for page in pages)
+    assert pages[1].startswith('## S3 (continued)\n\n')
+    for page in pages:
+        assert page.endswith('Zones.')
+    # No text is lost or reordered
+    body = ' '.join(page.split('\n\n', 1)[1] for page in pages)
+    assert body == paragraph
+
+
+def test_sentence_longer_than_a_page_is_cut_on_spaces():
+    words = ' '.join(['word'] * 300)
+    pieces = split_paragraph(words, 100)
+    assert all(len(piece) <= 100 for piece in pieces)
+    assert ' '.join(pieces) == words
+    assert split_paragraph('x' * 250, 100) == ['x' * 100, 'x' * 100, 'x' * 50]
+
+
+def test_line_breaks_inside_a_paragraph_are_kept():
+    bullets = '\n'.join(f"- point {idx} without a full stop" for idx in range(20))
+    pieces = split_paragraph(bullets, 120)
+    assert all(len(piece) <= 120 for piece in pieces)
+    assert '\n'.join(pieces) == bullets
+
+
+def test_regenerated_shorter_lesson_drops_old_pages():
+    table = LessonTable()
+    long_entry = store_lesson(table, 'Cert', 'Storage', 'standard', lesson([SENTENCE.strip()] * 60), 'model', now=1)
+    short_entry = store_lesson(table, 'Cert', 'Storage', 'standard', lesson([SENTENCE.strip()]), 'model', now=2)
+    assert long_entry['pages'] > short_entry['pages'] == 1
+    assert sorted(chunk for (_, chunk) in table.items) == [0, 1]
+    assert table.items[(short_entry['lesson_id'], 0)]['pages'] == 1
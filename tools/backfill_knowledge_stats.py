@@ -0,0 +1,99 @@
+"""
+Rebuild the user_knowledge stats (used by ShowResult to rank knowledge gaps)
+from existing quiz and question history.
+
+show_next_question keeps the stats current from now on; run this once after
+deploying, or for a single user whose stats look wrong.
+
+    python tools/backfill_knowledge_stats.py
+    python tools/backfill_knowledge_stats.py --username charles --dry-run
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from gap_analytics import rebuild_stats, to_dynamodb
+from quiz_store import PACKED_LAYOUT, question_rows
+
+
+def iter_quizzes(quiz_table, username=None):
+    if username:
+        kwargs = {'KeyConditionExpression': Key('username').eq(username)}
+        operation = quiz_table.query
+    else:
+        kwargs = {}
+        operation = quiz_table.scan
+    while True:
+        response = operation(**kwargs)
+        for item in response.get('Items', []):
+            yield item
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def quiz_questions(question_table, quiz):
+    if quiz.get('layout') == PACKED_LAYOUT:
+        return question_rows(quiz)
+    kwargs = {'KeyConditionExpression': Key('quiz_id').eq(quiz['id'])}
+    questions = []
+    while True:
+        response = question_table.query(**kwargs)
+        questions.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return questions
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def to_epoch(created_at):
+    try:
+        return int(datetime.fromisoformat(created_at).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--username', help='only rebuild this user')
+    parser.add_argument('--dry-run', action='store_true', help='print stats instead of writing them')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb')
+    quiz_table = dynamodb.Table(os.environ.get('QUIZ_TABLE', 'quiz'))
+    question_table = dynamodb.Table(os.environ.get('QUESTION_TABLE', 'question'))
+    knowledge_table = dynamodb.Table(os.environ.get('USER_KNOWLEDGE_TABLE', 'user_knowledge'))
+
+    answers_by_user = defaultdict(list)
+    for quiz in iter_quizzes(quiz_table, args.username and args.username.lower()):
+        answered_at = to_epoch(quiz.get('created_at'))
+        for question in quiz_questions(question_table, quiz):
+            if question.get('user_answer') is None:
+                continue
+            answers_by_user[quiz['username']].append((
+                answered_at,
+                quiz.get('recommended_cert'),
+                quiz.get('topic'),
+                question,
+                bool(question.get('answered_correctly'))
+            ))
+
+    for username, answers in answers_by_user.items():
+        stats = rebuild_stats(answers)
+        print(f"{username}: {len(answers)} answers -> {len(stats)} stat keys")
+        if args.dry_run:
+            continue
+        knowledge_table.put_item(Item={
+            'username': username,
+            'stats': to_dynamodb(stats),
+            'updated_at': int(time.time())
+        })
+
+
+if __name__ == '__main__':
+    main()
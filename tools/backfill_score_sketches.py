@@ -0,0 +1,83 @@
+"""
+Rebuild the score sketches (used by ShowResult to rank a score against
+everyone else's) from existing quiz history.
+
+show_next_question adds every quiz completed from now on; run this once
+right after deploying, or after changing SCORE_SKETCH_BUCKETS. It replaces
+the sketches it finds scores for and marks the quizzes it counted, so they
+are never counted twice.
+
+    python tools/backfill_score_sketches.py --dry-run
+    python tools/backfill_score_sketches.py
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+
+import boto3
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from backfill_knowledge_stats import iter_quizzes, quiz_questions
+from score_sketch import SCORE_SKETCH_TABLE, bucket, empty_counts, mark_ranked, quantile, sketch_key
+
+
+def completed_score(question_table, quiz):
+    """
+    (score, max_score) of a completed quiz, else None
+    """
+    max_score = int(quiz.get('max_score') or 0)
+    if not max_score or quiz.get('generation_job'):
+        return None
+    questions = quiz_questions(question_table, quiz)
+    if sum(1 for q in questions if q.get('user_answer') is not None) < max_score:
+        return None
+    return sum(1 for q in questions if q.get('answered_correctly')), max_score
+
+
+def build_sketches(quiz_table, question_table):
+    """
+    sketch key -> counts, and the (username, id) of every quiz counted
+    """
+    sketches = defaultdict(empty_counts)
+    counted = []
+    for quiz in iter_quizzes(quiz_table):
+        score = completed_score(question_table, quiz)
+        if score is None:
+            continue
+        index = bucket(*score)
+        cert, topic = quiz.get('recommended_cert'), quiz.get('topic')
+        for key in dict.fromkeys([sketch_key(cert, topic), sketch_key(cert)]):
+            sketches[key][index] += 1
+        counted.append((quiz['username'], quiz['id']))
+    return sketches, counted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--dry-run', action='store_true', help='print the sketches instead of writing them')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb')
+    quiz_table = dynamodb.Table(os.environ.get('QUIZ_TABLE', 'quiz'))
+    question_table = dynamodb.Table(os.environ.get('QUESTION_TABLE', 'question'))
+
+    sketches, counted = build_sketches(quiz_table, question_table)
+    print(f"{len(counted)} completed quizzes -> {len(sketches)} sketches")
+    for key, counts in sorted(sketches.items()):
+        quartiles = ', '.join(f"p{q}={quantile(counts, q / 100.0)}" for q in (25, 50, 75))
+        print(f"  {key}: {sum(counts)} attempts, {quartiles}")
+    if args.dry_run:
+        return
+
+    now = int(time.time())
+    with dynamodb.Table(SCORE_SKETCH_TABLE).batch_writer() as batch:
+        for key, counts in sketches.items():
+            batch.put_item(Item={'sketch_key': key, 'counts': counts, 'attempts': sum(counts),
+                                 'created_at': now, 'updated_at': now})
+    marked = sum(1 for username, quiz_id in counted if mark_ranked(quiz_table, username, quiz_id, now))
+    print(f"wrote {len(sketches)} sketches, marked {marked} quizzes as counted")
+
+
+if __name__ == '__main__':
+    main()
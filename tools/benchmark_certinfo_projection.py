@@ -0,0 +1,134 @@
+"""
+Compare loadcertinfo responses projected by question category with the
+full-record response.
+
+For each category it invokes the loadcertinfo handler for a user and reports
+handler latency, response size and estimated tokens against the full record.
+With --converse it also answers a sample question of that category on a
+Bedrock model with the response as context, and reports the model's real
+input tokens and latency.
+
+Talks to the real user_profile and CertInfo tables (and Bedrock with
+--converse) of the current account.
+
+    python tools/benchmark_certinfo_projection.py --username john --runs 20
+    python tools/benchmark_certinfo_projection.py --username john --converse --tier lite --json
+"""
+import argparse
+import json
+import time
+
+import boto3
+
+from handler_loader import load_handler
+from benchmark_model_router import percentile
+from bedrock_guard import bedrock_client_config, converse
+from cert_info import CATEGORY_FIELDS
+from model_router import MODEL_TIERS
+
+SAMPLE_QUESTIONS = {
+    'all': 'Tell me about this exam.',
+    'cost': 'How much does the exam cost?',
+    'duration': 'How long is the exam?',
+    'format': 'What kind of questions are on the exam and what score do I need?',
+    'domains': 'What topics are covered in it?',
+    'difficulty': 'How difficult is this exam?',
+    'prerequisites': 'Do I need any experience before taking it?',
+    'recertification': 'When do I need to recertify?',
+    'overview': 'What is this certification about?',
+}
+
+
+def response_body(response):
+    body = response['response']['responseBody']['application/json']['body']
+    return body if isinstance(body, str) else json.dumps(body, default=str)
+
+
+def invoke(handler, username, category):
+    event = {
+        'actionGroup': 'benchmark',
+        'apiPath': '/loadcertinfo',
+        'httpMethod': 'GET',
+        'parameters': [{'name': 'username', 'value': username}, {'name': 'category', 'value': category}],
+    }
+    started = time.monotonic()
+    response = handler.lambda_handler(event, None)
+    elapsed_ms = (time.monotonic() - started) * 1000
+    status = response['response']['httpStatusCode']
+    if status != 200:
+        raise SystemExit(f"loadcertinfo returned {status}: {response_body(response)}")
+    return elapsed_ms, response_body(response)
+
+
+def answer(bedrock_client, model_id, question, body):
+    prompt = f"Certification details:\n{body}\n\nAnswer the user's question in two sentences.\nQuestion: {question}"
+    started = time.monotonic()
+    response = converse(
+        bedrock_client,
+        modelId=model_id,
+        messages=[{"role": "user", "content": [{"text": prompt}]}],
+        inferenceConfig={"maxTokens": 200, "temperature": 0.2}
+    )
+    elapsed_ms = (time.monotonic() - started) * 1000
+    return elapsed_ms, response.get('usage', {}).get('inputTokens')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--username', required=True, help='user whose recommended_cert is looked up')
+    parser.add_argument('--categories', nargs='*', default=['all'] + list(CATEGORY_FIELDS),
+                        choices=['all'] + list(CATEGORY_FIELDS), help="'all' is the full-record baseline")
+    parser.add_argument('--runs', type=int, default=10, help='handler invocations per category')
+    parser.add_argument('--converse', action='store_true', help='also measure model input tokens and latency')
+    parser.add_argument('--tier', choices=list(MODEL_TIERS), default='lite')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    handler = load_handler('loadcertinfo')
+    bedrock_client = boto3.client('bedrock-runtime', config=bedrock_client_config()) if args.converse else None
+
+    results = []
+    for category in args.categories:
+        latencies, body = [], None
+        for _ in range(args.runs):
+            elapsed_ms, body = invoke(handler, args.username, category)
+            latencies.append(elapsed_ms)
+        result = {
+            'category': category,
+            'handler_p50_ms': round(percentile(latencies, 50), 1),
+            'handler_p95_ms': round(percentile(latencies, 95), 1),
+            'body_chars': len(body),
+            # ~4 characters per token
+            'est_tokens': len(body) // 4,
+        }
+        if args.converse:
+            model_ms, tokens = [], []
+            for _ in range(max(1, args.runs // 5)):
+                elapsed_ms, input_tokens = answer(bedrock_client, MODEL_TIERS[args.tier], SAMPLE_QUESTIONS[category], body)
+                model_ms.append(elapsed_ms)
+                tokens.append(input_tokens or 0)
+            result['model_input_tokens'] = max(tokens)
+            result['model_p50_ms'] = round(percentile(model_ms, 50), 1)
+        results.append(result)
+
+    baseline = next((r for r in results if r['category'] == 'all'), None)
+    if baseline:
+        for r in results:
+            r['size_vs_full'] = round(r['body_chars'] / baseline['body_chars'], 3)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for r in results:
+        line = (f"{r['category']:<16}handler p50 {r['handler_p50_ms']:>6.1f} ms  p95 {r['handler_p95_ms']:>6.1f} ms"
+                f"  {r['body_chars']:>6} chars  ~{r['est_tokens']:>5} tokens")
+        if 'size_vs_full' in r:
+            line += f"  {r['size_vs_full'] * 100:>5.1f}% of full"
+        if args.converse:
+            line += f"  model {r['model_input_tokens']:>5} input tokens  {r['model_p50_ms']:>7.1f} ms"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Measure Lambda init cost per handler.
+
+Locally, each run starts a fresh Python process (a cold start), imports the
+handler the way Lambda does and sends it a warm-up event. It reports:
+
+  * init ms: importing the handler module, including preload_clients()
+  * warm-up ms: the first (warm-up) invocation after init
+  * the heaviest imports, from python -X importtime
+
+Run it with PRELOAD_CLIENTS on and off to see where the client work lands.
+No AWS credentials are needed: creating clients does not call AWS.
+
+    python tools/benchmark_cold_start.py --runs 5
+    python tools/benchmark_cold_start.py --handlers create_quiz show_result --preload off
+    python tools/benchmark_cold_start.py --cloudwatch elevate-create-quiz elevate-show-result --hours 24
+
+--cloudwatch reads the "Init Duration" of real cold starts from the REPORT
+lines of deployed functions instead.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from handler_loader import HANDLERS
+from benchmark_model_router import percentile
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+from handler_loader import load_handler
+module = load_handler(sys.argv[1])
+initialised = time.perf_counter()
+result = module.lambda_handler({"warmup": True}, None)
+finished = time.perf_counter()
+print(json.dumps({
+    "init_ms": (initialised - started) * 1000,
+    "warmup_ms": (finished - initialised) * 1000,
+    "clients": result.get("clients", []),
+}))
+'''
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+INIT_DURATION = re.compile(r'Init Duration: ([\d.]+) ms')
+
+
+def run_cold_start(handler, preload):
+    env = dict(os.environ)
+    env['PRELOAD_CLIENTS'] = 'true' if preload else 'false'
+    # Client creation needs a region but never calls AWS
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD, handler],
+        cwd=TOOLS_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"{handler} failed:\n{proc.stderr[-2000:]}")
+
+    imports = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # Only modules imported directly (not nested) by the child or handler
+        if match and match.group(3) == ' ':
+            imports[match.group(4)] = int(match.group(2)) / 1000.0
+    return json.loads(proc.stdout.strip().splitlines()[-1]), imports
+
+
+def local_benchmark(args):
+    results = []
+    for handler in args.handlers:
+        init_ms, warmup_ms, import_ms = [], [], defaultdict(list)
+        for _ in range(args.runs):
+            timings, imports = run_cold_start(handler, args.preload == 'on')
+            init_ms.append(timings['init_ms'])
+            warmup_ms.append(timings['warmup_ms'])
+            for module, ms in imports.items():
+                import_ms[module].append(ms)
+        heaviest = sorted(import_ms.items(), key=lambda kv: -percentile(kv[1], 50))[:args.top_imports]
+        results.append({
+            'handler': handler,
+            'preload': args.preload,
+            'runs': args.runs,
+            'init_p50_ms': round(percentile(init_ms, 50), 1),
+            'init_p95_ms': round(percentile(init_ms, 95), 1),
+            'warmup_p50_ms': round(percentile(warmup_ms, 50), 1),
+            'heaviest_imports_ms': {module: round(percentile(ms, 50), 1) for module, ms in heaviest},
+        })
+    return results
+
+
+def cloudwatch_benchmark(args):
+    import boto3
+    logs = boto3.client('logs')
+    start_time = int((time.time() - args.hours * 3600) * 1000)
+    results = []
+    for function_name in args.cloudwatch:
+        durations = []
+        kwargs = {
+            'logGroupName': f"/aws/lambda/{function_name}",
+            'filterPattern': '"Init Duration"',
+            'startTime': start_time,
+        }
+        while True:
+            response = logs.filter_log_events(**kwargs)
+            for event in response.get('events', []):
+                match = INIT_DURATION.search(event['message'])
+                if match:
+                    durations.append(float(match.group(1)))
+            if 'nextToken' not in response:
+                break
+            kwargs['nextToken'] = response['nextToken']
+        results.append({
+            'function': function_name,
+            'cold_starts': len(durations),
+            'init_p50_ms': percentile(durations, 50),
+            'init_p95_ms': percentile(durations, 95),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--handlers', nargs='*', default=list(HANDLERS), choices=list(HANDLERS))
+    parser.add_argument('--runs', type=int, default=3, help='cold starts per handler')
+    parser.add_argument('--preload', choices=['on', 'off'], default='on', help='PRELOAD_CLIENTS for the child processes')
+    parser.add_argument('--top-imports', type=int, default=3)
+    parser.add_argument('--cloudwatch', nargs='*', metavar='FUNCTION', help='report Init Duration of deployed functions instead')
+    parser.add_argument('--hours', type=float, default=24, help='CloudWatch look-back window')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = cloudwatch_benchmark(args) if args.cloudwatch else local_benchmark(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for r in results:
+        if args.cloudwatch:
+            p50 = f"{r['init_p50_ms']:.0f}" if r['init_p50_ms'] is not None else '-'
+            p95 = f"{r['init_p95_ms']:.0f}" if r['init_p95_ms'] is not None else '-'
+            print(f"{r['function']:<32}{r['cold_starts']:>6} cold starts  init p50 {p50} ms  p95 {p95} ms")
+        else:
+            imports = ', '.join(f"{module} {ms:.0f}" for module, ms in r['heaviest_imports_ms'].items())
+            print(f"{r['handler']:<24}init p50 {r['init_p50_ms']:>6.1f} ms  p95 {r['init_p95_ms']:>6.1f} ms"
+                  f"  warm-up {r['warmup_p50_ms']:>6.1f} ms  [{imports}]")
+
+
+if __name__ == '__main__':
+    main()
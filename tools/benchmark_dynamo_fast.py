@@ -0,0 +1,192 @@
+"""
+Compare the quiz result reads of ShowResult on the boto3 resource API with
+the low-level client fast path in common/dynamo_fast.py.
+
+Both paths do what ShowResult does for a two-table quiz: get the quiz item,
+then query its question rows.
+
+By default the DynamoDB responses are canned (a synthetic answered quiz of
+--questions questions, served from a botocore before-call hook). Nothing
+leaves the process, so the timings are the client-side cost alone: parameter
+serialization and the conversion of every returned attribute. With --live
+the same reads go to real tables for an existing quiz. That works against
+DynamoDB Local through AWS_ENDPOINT_URL_DYNAMODB.
+
+    python tools/benchmark_dynamo_fast.py --questions 20 --runs 2000
+    python tools/benchmark_dynamo_fast.py --live --username john --quiz-id quiz-... --json
+"""
+import argparse
+import copy
+import gc
+import json
+import time
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+from handler_loader import load_handler
+import aws_clients
+from benchmark_model_router import percentile
+from dynamo_fast import get_item, query_partition
+
+show_result = load_handler('show_result')
+QUIZ_PROJECTION = show_result.QUIZ_PROJECTION
+QUESTION_PROJECTION = show_result.QUESTION_PROJECTION
+
+OFFLINE_CLIENT_ARGS = {'region_name': 'us-east-1', 'aws_access_key_id': 'benchmark', 'aws_secret_access_key': 'benchmark'}
+
+
+def wire_quiz(quiz_id, username, questions):
+    """
+    Wire-format quiz item and question rows, shaped like create_quiz writes
+    them once every question is answered
+    """
+    quiz = {
+        'id': {'S': quiz_id}, 'username': {'S': username}, 'topic': {'S': 'Design Resilient Architectures'},
+        'recommended_cert': {'S': 'AWS Certified Solutions Architect - Associate'},
+        'max_score': {'N': str(questions)}, 'user_score': {'N': str(questions - 3)},
+        'created_at': {'S': '2026-10-01T12:00:00.000000'},
+    }
+    rows = []
+    for idx in range(questions):
+        rows.append({
+            'quiz_id': {'S': quiz_id},
+            'order': {'S': str(idx + 1)},
+            'question': {'S': f"Question {idx + 1}: which design keeps the application available if an Availability Zone fails?"},
+            'options': {'L': [{'S': f"Option {o}: run the tier on a single instance behind a load balancer"} for o in range(4)]},
+            'correct_answer': {'N': str(idx % 4)},
+            'user_answer': {'N': str((idx + idx // 5) % 4)},
+            'answered_correctly': {'BOOL': idx % 5 != 4},
+            'user_score': {'N': '1' if idx % 5 != 4 else '0'},
+            'explanation': {'M': {
+                'why_correct': {'S': 'Multi-AZ deployments keep a standby copy in another Availability Zone. ' * 3},
+                'option_rationales': {'L': [{'S': f"Rationale for option {o}, covering the trade-off it makes."} for o in range(4)]},
+                'key_concepts': {'L': [{'S': 'Multi-AZ'}, {'S': 'Auto Scaling'}, {'S': 'Elastic Load Balancing'}]},
+            }},
+            'domain': {'S': 'Design Resilient Architectures'},
+            'aws_service': {'S': 'Amazon RDS'},
+            'difficulty': {'S': 'medium'},
+        })
+    return quiz, rows
+
+
+def project(item, projection):
+    return {k: v for k, v in item.items() if k in projection.fields}
+
+
+class CannedResponses:
+    """
+    before-call hook answering GetItem and Query from canned responses. The
+    resource API converts responses in place, so for it every call gets its
+    own copy, made before the timed loop (copies=runs).
+    """
+
+    def __init__(self, client, responses, copies=0):
+        self.responses = responses
+        self.queues = {op: [copy.deepcopy(parsed) for _ in range(copies)] for op, parsed in responses.items()}
+        for op in responses:
+            client.meta.events.register(f"before-call.dynamodb.{op}", self.answer)
+
+    def answer(self, model, **kwargs):
+        http = AWSResponse('https://dynamodb.us-east-1.amazonaws.com/', 200, {}, None)
+        queue = self.queues[model.name]
+        return http, queue.pop() if queue else self.responses[model.name]
+
+
+def resource_path(quiz_table, question_table, username, quiz_id):
+    quiz = quiz_table.get_item(Key={'username': username, 'id': quiz_id}).get('Item')
+    response = question_table.query(
+        KeyConditionExpression='quiz_id = :quiz_id',
+        ExpressionAttributeValues={':quiz_id': quiz_id}
+    )
+    return quiz, response.get('Items', [])
+
+
+def fast_path(quiz_table_name, question_table_name, username, quiz_id):
+    quiz = get_item(quiz_table_name, {'username': username, 'id': quiz_id}, QUIZ_PROJECTION)
+    return quiz, query_partition(question_table_name, 'quiz_id', quiz_id, QUESTION_PROJECTION)
+
+
+def time_runs(fn, runs):
+    timings = []
+    result = None
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+    finally:
+        gc.enable()
+    return timings, result
+
+
+def summary(timings):
+    return {'p50_us': round(percentile(timings, 50), 1), 'p99_us': round(percentile(timings, 99), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--live', action='store_true', help='read a real quiz instead of canned responses')
+    parser.add_argument('--username', default='benchmark')
+    parser.add_argument('--quiz-id', default='quiz-benchmark')
+    parser.add_argument('--quiz-table', default='quiz')
+    parser.add_argument('--question-table', default='question')
+    parser.add_argument('--questions', type=int, default=20, help='questions in the canned quiz')
+    parser.add_argument('--runs', type=int, default=1000, help='result reads per path')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    if args.live:
+        resource = boto3.resource('dynamodb')
+        client = boto3.client('dynamodb')
+    else:
+        resource = boto3.resource('dynamodb', **OFFLINE_CLIENT_ARGS)
+        client = boto3.client('dynamodb', **OFFLINE_CLIENT_ARGS)
+        quiz, rows = wire_quiz(args.quiz_id, args.username, args.questions)
+        CannedResponses(resource.meta.client, {
+            'GetItem': {'Item': quiz},
+            'Query': {'Items': rows, 'Count': len(rows)},
+        }, copies=args.runs)
+        CannedResponses(client, {
+            'GetItem': {'Item': project(quiz, QUIZ_PROJECTION)},
+            'Query': {'Items': [project(row, QUESTION_PROJECTION) for row in rows], 'Count': len(rows)},
+        })
+    aws_clients._clients['dynamodb-client'] = client
+
+    quiz_table = resource.Table(args.quiz_table)
+    question_table = resource.Table(args.question_table)
+    resource_timings, (_, resource_rows) = time_runs(
+        lambda: resource_path(quiz_table, question_table, args.username, args.quiz_id), args.runs)
+    fast_timings, (_, fast_rows) = time_runs(
+        lambda: fast_path(args.quiz_table, args.question_table, args.username, args.quiz_id), args.runs)
+
+    if not fast_rows:
+        raise SystemExit(f"No questions found for quiz '{args.quiz_id}'")
+    mismatched = [field for field in QUESTION_PROJECTION.fields
+                  if [r.get(field) for r in resource_rows] != [r.get(field) for r in fast_rows]]
+    report = {
+        'mode': 'live' if args.live else 'canned',
+        'questions': len(fast_rows),
+        'runs': args.runs,
+        'resource': summary(resource_timings),
+        'fast_path': summary(fast_timings),
+        'mismatched_fields': mismatched,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['mode']} result reads, {report['questions']} questions, {args.runs} runs")
+    for label in ['resource', 'fast_path']:
+        r = report[label]
+        print(f"  {label:<12}p50 {r['p50_us']:>9.1f} us  p99 {r['p99_us']:>9.1f} us")
+    print(f"  speedup (p50) {report['resource']['p50_us'] / report['fast_path']['p50_us']:.1f}x")
+    if mismatched:
+        print(f"  fields that differ between the paths: {', '.join(mismatched)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Micro-benchmark of response body encoding with the shared json_codec.
+
+Encodes a large CertInfo item and a quiz-report body (both carrying the
+Decimal, set and nested values DynamoDB returns) with:
+
+  stdlib_encoder   json.dumps with a DecimalEncoder class, as ShowResult did
+  codec_stdlib     json_codec.dumps on the standard library backend
+  codec_orjson     json_codec.dumps on orjson (skipped when not installed)
+
+and reports p50/p99 encode time and body size per payload. Payloads are
+synthetic by default; --items takes a JSON file of real CertInfo items
+(e.g. from dynamodb_bulk.py export --plain) and encodes the largest one.
+
+    python tools/benchmark_json_codec.py --runs 2000
+    python tools/benchmark_json_codec.py --questions 50 --json
+"""
+import argparse
+import json
+import time
+from decimal import Decimal
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+import json_codec
+from benchmark_model_router import percentile
+
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+        if isinstance(o, set):
+            return sorted(o)
+        return super().default(o)
+
+
+def synthetic_cert_info(domains):
+    return {
+        'CertificationName': 'AWS Certified Solutions Architect - Associate',
+        'ExamCode': 'SAA-C03',
+        'Level': 'Associate',
+        'ExamCost': Decimal('150'),
+        'Currency': 'USD',
+        'ExamDuration': Decimal('130'),
+        'NumberOfQuestions': Decimal('65'),
+        'PassingScore': Decimal('720'),
+        'Languages': {'English', 'Japanese', 'Korean', 'Simplified Chinese', 'Français', 'Español'},
+        'Roles': ['Solutions Architect', 'Cloud Engineer'],
+        'Description': ' '.join(['Validates the ability to design secure, resilient, high-performing '
+                                 'and cost-optimized architectures on AWS.'] * 20),
+        'Domains': [
+            {
+                'Name': f"Domain {idx + 1}",
+                'Weight': Decimal(str(round(100 / domains, 1))),
+                'Tasks': [f"Task statement {idx + 1}.{t + 1}: design a solution using managed services"
+                          for t in range(6)],
+                'Services': [f"Service{s}" for s in range(15)],
+            }
+            for idx in range(domains)
+        ],
+    }
+
+
+def synthetic_quiz_report(questions):
+    return {
+        'quiz_id': 'e3b0c442-98fc-1c14-9afb-f4c8996fb924',
+        'username': 'benchmark',
+        'topic': 'Design Resilient Architectures',
+        'recommended_cert': 'AWS Certified Solutions Architect - Associate',
+        'final_score': {'correct': Decimal(questions - 3), 'total': Decimal(questions),
+                        'percentage': Decimal('86.67')},
+        'performance_summary': 'Good job! You have a solid understanding.',
+        'detailed_explanations': [
+            {
+                'question_number': Decimal(idx + 1),
+                'question_text': f"Question {idx + 1}: which architecture keeps the application available "
+                                 f"if an Availability Zone fails?",
+                'options': [f"Option {o}: deploy to a single instance behind a load balancer" for o in range(4)],
+                'correct_answer': Decimal(idx % 4),
+                'user_answer': Decimal((idx + idx // 5) % 4),
+                'is_correct': idx % 5 != 4,
+                'explanation': 'Multi-AZ deployments keep a standby copy in another Availability Zone. ' * 4,
+            }
+            for idx in range(questions)
+        ],
+        'knowledge_gaps': [
+            {'domain': f"Domain {g}", 'aws_service': f"Service{g}", 'accuracy': Decimal('0.42'),
+             'attempts': Decimal(12)}
+            for g in range(5)
+        ],
+    }
+
+
+def load_largest_item(path):
+    with open(path) as f:
+        items = json.load(f, parse_float=Decimal, parse_int=Decimal)
+    return max(items, key=lambda item: len(json.dumps(item, cls=DecimalEncoder)))
+
+
+def encoders():
+    yield 'stdlib_encoder', lambda value: json.dumps(value, cls=DecimalEncoder)
+    yield 'codec_stdlib', lambda value: _codec_dumps(value, False)
+    if json_codec.orjson is not None:
+        yield 'codec_orjson', lambda value: _codec_dumps(value, True)
+
+
+def _codec_dumps(value, use_orjson):
+    json_codec.USE_ORJSON = use_orjson
+    return json_codec.dumps(value)
+
+
+def time_encoder(encode, payload, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = encode(payload)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return {
+        'p50_us': round(percentile(timings, 50), 1),
+        'p99_us': round(percentile(timings, 99), 1),
+        'bytes': len(body.encode('utf-8')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--items', help='JSON file with a list of CertInfo items; the largest one is encoded')
+    parser.add_argument('--domains', type=int, default=6, help='domains in the synthetic CertInfo item')
+    parser.add_argument('--questions', type=int, default=20, help='questions in the quiz report')
+    parser.add_argument('--runs', type=int, default=1000, help='encodes per payload and encoder')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    payloads = {
+        'cert_info': load_largest_item(args.items) if args.items else synthetic_cert_info(args.domains),
+        'quiz_report': synthetic_quiz_report(args.questions),
+    }
+    backend = json_codec.USE_ORJSON
+    report = {}
+    for name, payload in payloads.items():
+        report[name] = {label: time_encoder(encode, payload, args.runs) for label, encode in encoders()}
+    json_codec.USE_ORJSON = backend
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    if json_codec.orjson is None:
+        print('orjson not installed, codec_orjson skipped')
+    for name, results in report.items():
+        baseline = results['stdlib_encoder']['p50_us']
+        print(name)
+        for label, r in results.items():
+            print(f"  {label:<16}p50 {r['p50_us']:>8.1f} us  p99 {r['p99_us']:>8.1f} us  "
+                  f"{r['bytes']:>7} bytes  {baseline / r['p50_us']:>5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Offline evaluation of the model-tier router.
+
+Runs each routed task against every model tier with the same prompts and
+validators the Lambdas use, and reports latency percentiles and the share of
+outputs that passed validation. Use it to decide the rules in
+common/model_router.py (or MODEL_ROUTER_POLICY).
+
+    python tools/benchmark_model_router.py --runs 5
+    python tools/benchmark_model_router.py --tasks knowledge_gaps --tiers micro lite
+"""
+import argparse
+import json
+import time
+
+import boto3
+
+from handler_loader import load_handler
+from bedrock_guard import BedrockUnavailable, bedrock_client_config, converse
+from model_router import MODEL_TIERS, TIER_ORDER
+from session_compaction import build_summary_prompt, parse_summary
+
+SAMPLE_CERT = 'AWS Certified Solutions Architect - Associate'
+SAMPLE_TOPIC = 'VPC networking'
+
+SAMPLE_SUMMARY = [
+    {
+        'order': '1',
+        'question': 'Which VPC component allows instances in a private subnet to reach the internet for software updates?',
+        'options': ['Internet gateway', 'NAT gateway', 'VPC endpoint', 'Virtual private gateway'],
+        'correct_answer': 1,
+        'user_answer': 0,
+        'is_correct': False
+    },
+    {
+        'order': '2',
+        'question': 'Which feature lets an EC2 instance access Amazon S3 without traversing the internet?',
+        'options': ['Gateway VPC endpoint', 'Elastic IP', 'Transit gateway', 'Egress-only internet gateway'],
+        'correct_answer': 0,
+        'user_answer': 0,
+        'is_correct': True
+    },
+    {
+        'order': '3',
+        'question': 'Security groups are stateful. What does this mean for return traffic?',
+        'options': ['It must be explicitly allowed', 'It is automatically allowed', 'It is always denied', 'It is logged only'],
+        'correct_answer': 1,
+        'user_answer': 2,
+        'is_correct': False
+    },
+]
+
+
+def build_cases(num_questions):
+    """
+    (task, messages, inferenceConfig, parse) for each routed task
+    """
+    create_quiz = load_handler('create_quiz')
+    show_result = load_handler('show_result')
+    sample_turns = [
+        {'user': 'Start a quiz on VPC networking', 'agent': 'Quiz quiz-1234 created. Question 1: Which VPC component ...'},
+        {'user': 'B', 'agent': 'Correct! Question 2: Which feature lets an EC2 instance access Amazon S3 ...'},
+    ]
+    sample_gaps = [
+        {'gap': 'Amazon VPC', 'severity': 'high', 'description': '33% accuracy over ~6 recent weighted answers'},
+        {'gap': 'Design Secure Architectures', 'severity': 'medium', 'description': '50% accuracy over ~8 recent weighted answers'},
+    ]
+
+    def message(text):
+        return [{"role": "user", "content": [{"text": text}]}]
+
+    return {
+        'quiz_generation': (
+            message(create_quiz.build_question_prompt(SAMPLE_CERT, SAMPLE_TOPIC, num_questions)),
+            {"maxTokens": 4000, "temperature": 0.7, "topP": 0.9},
+            lambda text: create_quiz.parse_questions(text, num_questions)
+        ),
+        'result_explanations': (
+            message(show_result.build_explanations_prompt(SAMPLE_CERT, SAMPLE_TOPIC, SAMPLE_SUMMARY)),
+            {"maxTokens": 8000, "temperature": 0.7, "topP": 0.9},
+            show_result.parse_explanations
+        ),
+        'knowledge_gaps': (
+            message(show_result.build_knowledge_gaps_prompt(SAMPLE_CERT, SAMPLE_TOPIC, sample_gaps)),
+            {"maxTokens": 1500, "temperature": 0.5, "topP": 0.9},
+            show_result.parse_knowledge_gaps
+        ),
+        'session_summary': (
+            message(build_summary_prompt('', sample_turns)),
+            {"maxTokens": 400, "temperature": 0.2, "topP": 0.9},
+            parse_summary
+        ),
+    }
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--runs', type=int, default=3, help='calls per task and tier')
+    parser.add_argument('--tasks', nargs='*', help='subset of tasks to evaluate')
+    parser.add_argument('--tiers', nargs='*', default=TIER_ORDER, choices=TIER_ORDER)
+    parser.add_argument('--num-questions', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    bedrock_runtime = boto3.client('bedrock-runtime', config=bedrock_client_config())
+    cases = build_cases(args.num_questions)
+    results = []
+
+    for task, (messages, inference_config, parse) in cases.items():
+        if args.tasks and task not in args.tasks:
+            continue
+        for tier in args.tiers:
+            model_id = MODEL_TIERS[tier]
+            latencies, valid, unavailable = [], 0, 0
+            for _ in range(args.runs):
+                started = time.monotonic()
+                try:
+                    response = converse(bedrock_runtime, modelId=model_id,
+                                        messages=messages, inferenceConfig=inference_config)
+                except BedrockUnavailable:
+                    unavailable += 1
+                    continue
+                latencies.append((time.monotonic() - started) * 1000)
+                text = response['output']['message']['content'][0]['text']
+                if parse(text) is not None:
+                    valid += 1
+            results.append({
+                'task': task,
+                'tier': tier,
+                'model_id': model_id,
+                'runs': args.runs,
+                'valid_rate': round(valid / float(args.runs), 2),
+                'unavailable': unavailable,
+                'p50_ms': percentile(latencies, 50),
+                'p95_ms': percentile(latencies, 95),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'task':<22}{'tier':<7}{'valid':>7}{'p50 ms':>10}{'p95 ms':>10}{'unavail':>9}")
+    for r in results:
+        p50 = f"{r['p50_ms']:.0f}" if r['p50_ms'] is not None else '-'
+        p95 = f"{r['p95_ms']:.0f}" if r['p95_ms'] is not None else '-'
+        print(f"{r['task']:<22}{r['tier']:<7}{r['valid_rate']:>7.0%}{p50:>10}{p95:>10}{r['unavailable']:>9}")
+
+
+if __name__ == '__main__':
+    main()
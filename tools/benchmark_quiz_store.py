@@ -0,0 +1,158 @@
+"""
+Compare the two quiz storage layouts on the answer hot path.
+
+Creates one synthetic quiz per run in each layout, answers every question
+through the show_next_question handler, and reports DynamoDB calls and
+latency per answer. Point it at DynamoDB Local (or a scratch account), never
+at production tables:
+
+    AWS_ENDPOINT_URL_DYNAMODB=http://localhost:8000 python tools/benchmark_quiz_store.py --create-tables
+    python tools/benchmark_quiz_store.py --runs 10 --num-questions 20 --json
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import boto3
+
+from handler_loader import load_handler
+from benchmark_model_router import percentile
+
+TABLE_KEYS = {
+    'QUIZ_TABLE': ('quiz', [('username', 'HASH'), ('id', 'RANGE')]),
+    'QUESTION_TABLE': ('question', [('quiz_id', 'HASH'), ('order', 'RANGE')]),
+    'USER_KNOWLEDGE_TABLE': ('user_knowledge', [('username', 'HASH')]),
+}
+
+call_counts = Counter()
+
+
+def count_call(event_name, **kwargs):
+    # event_name is "before-call.dynamodb.<Operation>"
+    call_counts[event_name.rsplit('.', 1)[-1]] += 1
+
+
+def create_tables(dynamodb):
+    existing = set(dynamodb.meta.client.list_tables()['TableNames'])
+    for env_name, (default, key_schema) in TABLE_KEYS.items():
+        name = os.environ.get(env_name, default)
+        if name in existing:
+            continue
+        dynamodb.create_table(
+            TableName=name,
+            KeySchema=[{'AttributeName': attr, 'KeyType': key_type} for attr, key_type in key_schema],
+            AttributeDefinitions=[{'AttributeName': attr, 'AttributeType': 'S'} for attr, _ in key_schema],
+            BillingMode='PAY_PER_REQUEST'
+        ).wait_until_exists()
+        print(f"created table {name}")
+
+
+def sample_questions(num_questions):
+    return [{
+        'question': f"Sample question {idx} about Amazon VPC routing?",
+        'options': ['Option A', 'Option B', 'Option C', 'Option D'],
+        'correct_answer': idx % 4,
+        'explanation': {
+            'why_correct': 'Because it is the right answer.',
+            'option_rationales': ['A', 'B', 'C', 'D'],
+            'key_concepts': ['VPC']
+        },
+        'domain': 'Design Secure Architectures',
+        'aws_service': 'Amazon VPC',
+        'difficulty': 'medium'
+    } for idx in range(num_questions)]
+
+
+def create_quiz(create_quiz_module, dynamodb, layout, username, questions):
+    quiz_id = f"quiz-bench-{uuid.uuid4()}"
+    quiz_item = {
+        'id': quiz_id,
+        'username': username,
+        'topic': 'VPC networking',
+        'recommended_cert': 'AWS Certified Solutions Architect - Associate',
+        'max_score': len(questions),
+        'user_score': 0,
+        'created_at': datetime.utcnow().isoformat()
+    }
+    quiz_table = dynamodb.Table(os.environ.get('QUIZ_TABLE', 'quiz'))
+    if layout == 'packed':
+        create_quiz_module.create_packed_quiz(quiz_table, quiz_item, questions)
+    else:
+        quiz_table.put_item(Item=quiz_item)
+        create_quiz_module.store_question_rows(
+            dynamodb.Table(os.environ.get('QUESTION_TABLE', 'question')), quiz_id, questions)
+    return quiz_id
+
+
+def answer_event(quiz_id, username, order, answer):
+    return {
+        'actionGroup': 'benchmark',
+        'apiPath': '/show_next_question',
+        'httpMethod': 'POST',
+        'parameters': [
+            {'name': 'quiz_id', 'value': quiz_id},
+            {'name': 'username', 'value': username},
+            {'name': 'current_order', 'value': str(order)},
+            {'name': 'user_answer', 'value': str(answer)},
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='quizzes per layout')
+    parser.add_argument('--num-questions', type=int, default=10)
+    parser.add_argument('--layouts', nargs='*', default=['two_table', 'packed'], choices=['two_table', 'packed'])
+    parser.add_argument('--create-tables', action='store_true', help='create the tables if they do not exist')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb')
+    if args.create_tables:
+        create_tables(dynamodb)
+
+    create_quiz_module = load_handler('create_quiz')
+    show_next_question = load_handler('show_next_question')
+    # The handlers create their own resources from the default session
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register('before-call.dynamodb', count_call)
+
+    questions = sample_questions(args.num_questions)
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    results = []
+
+    for layout in args.layouts:
+        latencies, answers = [], 0
+        call_counts.clear()
+        for _ in range(args.runs):
+            quiz_id = create_quiz(create_quiz_module, dynamodb, layout, username, questions)
+            for order in range(1, args.num_questions + 1):
+                started = time.monotonic()
+                response = show_next_question.lambda_handler(answer_event(quiz_id, username, order, order % 4), None)
+                latencies.append((time.monotonic() - started) * 1000)
+                if response['response']['httpStatusCode'] != 200:
+                    raise SystemExit(f"{layout}: answer {order} failed: {response['response']['responseBody']}")
+                answers += 1
+        results.append({
+            'layout': layout,
+            'answers': answers,
+            'calls_per_answer': {op: round(count / float(answers), 2) for op, count in sorted(call_counts.items())},
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for r in results:
+        calls = ', '.join(f"{op} {count}" for op, count in r['calls_per_answer'].items())
+        print(f"{r['layout']:<10} p50 {r['p50_ms']:.1f} ms  p95 {r['p95_ms']:.1f} ms  calls/answer: {calls}")
+
+
+if __name__ == '__main__':
+    main()
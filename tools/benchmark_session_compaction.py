@@ -0,0 +1,94 @@
+"""
+Drive a long chat through the invoke_agent handler and report how per-turn
+latency and orchestration prompt size evolve, with session compaction on or
+off.
+
+Talks to the real agent, Bedrock and DynamoDB tables of the current account.
+Each run uses a new sessionId.
+
+    python tools/benchmark_session_compaction.py --turns 50
+    python tools/benchmark_session_compaction.py --turns 50 --compaction off --json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import time
+import uuid
+from types import SimpleNamespace
+
+from benchmark_model_router import percentile
+
+SAMPLE_MESSAGES = [
+    "What certification do you recommend for me?",
+    "Why that one and not the Developer Associate?",
+    "Give me a quick overview of the exam domains.",
+    "Which AWS services come up most in the networking questions?",
+    "Explain the difference between security groups and network ACLs.",
+    "When would I pick a NAT gateway over a VPC endpoint?",
+    "How should I split my study time over the next month?",
+    "What is the difference between S3 Standard-IA and One Zone-IA?",
+    "Summarise what we have covered so far.",
+    "What should I review next?",
+]
+
+STREAM_SUMMARY = re.compile(r'^Stream summary: (\{.*\})$', re.MULTILINE)
+
+
+def run_turn(handler, session_id, message):
+    event = {'httpMethod': 'POST', 'body': json.dumps({'message': message, 'sessionId': session_id})}
+    captured = io.StringIO()
+    started = time.monotonic()
+    with contextlib.redirect_stdout(captured):
+        response = handler.lambda_handler(event, SimpleNamespace(aws_request_id=str(uuid.uuid4())))
+    elapsed_ms = (time.monotonic() - started) * 1000
+    logs = captured.getvalue()
+    match = STREAM_SUMMARY.search(logs)
+    summary = json.loads(match.group(1)) if match else {}
+    return {
+        'status': response['statusCode'],
+        'ms': round(elapsed_ms),
+        'input_tokens': summary.get('max_input_tokens'),
+        'compacted': 'Compacted session' in logs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--turns', type=int, default=50)
+    parser.add_argument('--compaction', choices=['on', 'off'], default='on')
+    parser.add_argument('--json', action='store_true', help='print per-turn results as JSON')
+    args = parser.parse_args()
+
+    # Must be set before the handler module reads its configuration
+    os.environ['SESSION_COMPACTION'] = 'true' if args.compaction == 'on' else 'false'
+    from handler_loader import load_handler
+    handler = load_handler('invoke_agent')
+
+    session_id = f"bench-{uuid.uuid4().hex[:12]}"
+    turns = []
+    for idx in range(args.turns):
+        result = run_turn(handler, session_id, SAMPLE_MESSAGES[idx % len(SAMPLE_MESSAGES)])
+        result['turn'] = idx + 1
+        turns.append(result)
+        if not args.json:
+            print(f"turn {result['turn']:>3}  {result['status']}  {result['ms']:>6} ms  "
+                  f"input tokens {result['input_tokens'] or '-':>6}" + ("  compacted" if result['compacted'] else ""))
+
+    if args.json:
+        print(json.dumps(turns, indent=2))
+        return
+
+    # Flat latency means the last decile costs about the same as the first
+    decile = max(1, args.turns // 10)
+    first = [t['ms'] for t in turns[:decile]]
+    last = [t['ms'] for t in turns[-decile:]]
+    print(f"compaction {args.compaction}: first {decile} turns p50 {percentile(first, 50)} ms, "
+          f"last {decile} turns p50 {percentile(last, 50)} ms, "
+          f"{sum(1 for t in turns if t['compacted'])} compactions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Build the CertInfo search index snapshot used by the search_certinfo Lambda
+and time sample queries against it.
+
+Scans CertInfo (or reads a JSON list of CertInfo items with --items), writes
+the snapshot and reports per-query search latency in microseconds, next to
+the time of the CertInfo scan the index replaces.
+
+    python tools/build_cert_index.py --output QnA/search_certinfo/cert_index.json
+    python tools/build_cert_index.py --items certinfo.json --runs 10000 --json
+
+Ship the snapshot with the function and set CERT_INDEX_SNAPSHOT to its path
+(e.g. cert_index.json) to skip the scan at init.
+"""
+import argparse
+import json
+import time
+
+import boto3
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from benchmark_model_router import percentile
+from cert_index import CertIndex, save_snapshot, scan_cert_info
+
+SAMPLE_QUERIES = [
+    {'query': 'kinesis'},
+    {'query': 'machine learning sagemaker'},
+    {'query': 'networking vpc transit gateway'},
+    {'level': 'associate', 'no_prerequisites': True},
+    {'query': 'security', 'level': 'specialty'},
+    {'role': 'data engineer'},
+    {'service': 'lambda', 'query': 'serverless'},
+]
+
+
+def time_queries(index, runs):
+    results = []
+    for sample in SAMPLE_QUERIES:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            matches, total = index.search(**sample)
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        results.append({
+            'query': sample,
+            'matches': total,
+            'top': [m['certification'] for m in matches[:3]],
+            'p50_us': round(percentile(timings, 50), 1),
+            'p99_us': round(percentile(timings, 99), 1),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--items', help='JSON file with a list of CertInfo items instead of scanning the table')
+    parser.add_argument('--table', default='CertInfo')
+    parser.add_argument('--output', help='where to write the snapshot')
+    parser.add_argument('--runs', type=int, default=1000, help='searches per sample query')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.items:
+        with open(args.items) as f:
+            items = json.load(f)
+    else:
+        items = scan_cert_info(boto3.resource('dynamodb').Table(args.table))
+    load_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    index = CertIndex.build(items)
+    build_ms = (time.perf_counter() - started) * 1000
+    if args.output:
+        save_snapshot(index, args.output)
+
+    report = {
+        'certifications': len(index.docs),
+        'terms': len(index.postings),
+        'load_ms': round(load_ms, 1),
+        'build_ms': round(build_ms, 2),
+        'snapshot': args.output,
+        'queries': time_queries(index, args.runs),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    source = args.items or f"{args.table} scan"
+    print(f"{report['certifications']} certifications, {report['terms']} terms; "
+          f"{source} {report['load_ms']} ms, build {report['build_ms']} ms"
+          + (f", snapshot {args.output}" if args.output else ''))
+    for q in report['queries']:
+        print(f"{json.dumps(q['query']):<60}{q['matches']:>3} matches  p50 {q['p50_us']:>7.1f} us  "
+              f"p99 {q['p99_us']:>7.1f} us  {', '.join(q['top'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Latency and spend of Bedrock model and agent calls, from the call ledger
+(common/call_ledger.py).
+
+Reads any mix of:
+  * JSON-lines files written with CALL_LEDGER_SINK=jsonl (.jsonl or .jsonl.gz)
+  * function logs with CALL_LEDGER_SINK=log ("CALL_LEDGER {...}" lines)
+  * exports of the model_call_ledger table made with tools/dynamodb_bulk.py
+    (a directory with manifest.json, JSON lines or Parquet)
+
+and prints one row per group: calls, failure share, latency percentiles
+(end to end, and the model's own latencyMs for Converse calls), tokens and
+estimated cost.
+
+    python tools/dynamodb_bulk.py export --table model_call_ledger --output exports/ledger
+    python tools/call_ledger_report.py exports/ledger --by handler,day
+    python tools/call_ledger_report.py model_calls.jsonl --by user --since 2025-06-01 --top 20
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+from collections import defaultdict
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from call_ledger import LOG_PREFIX, OK
+from dynamodb_bulk import plain_item, read_items
+
+GROUP_FIELDS = ['handler', 'day', 'user', 'task', 'model', 'kind', 'ref', 'outcome']
+SORT_FIELDS = ['calls', 'cost', 'p50', 'p95', 'p99', 'tokens']
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            # Log lines carry a prefix (and, from CloudWatch, a timestamp) before the record
+            start = line.find(LOG_PREFIX + ' {')
+            if start >= 0:
+                line = line[start + len(LOG_PREFIX) + 1:]
+            line = line.strip()
+            if line.startswith('{'):
+                yield json.loads(line)
+
+
+def read_export(directory):
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for entry in manifest['files']:
+        for typed in read_items(os.path.join(directory, entry['file']), manifest.get('item_format', 'dynamodb')):
+            yield plain_item(typed)
+
+
+def load_records(sources):
+    for source in sources:
+        if os.path.isdir(source):
+            if os.path.exists(os.path.join(source, 'manifest.json')):
+                yield from read_export(source)
+                continue
+            files = sorted(glob.glob(os.path.join(source, '*.jsonl*')) + glob.glob(os.path.join(source, '*.log')))
+        else:
+            files = [source]
+        for path in files:
+            yield from read_lines(path)
+
+
+def summarize(records, by):
+    groups = defaultdict(list)
+    for record in records:
+        groups[tuple(str(record.get(field, '-')) for field in by)].append(record)
+
+    rows = []
+    for key, group in groups.items():
+        latencies = [r['ms'] for r in group if 'ms' in r]
+        model_latencies = [r['model_ms'] for r in group if r.get('model_ms') is not None]
+        costs = [r['cost_usd'] for r in group if r.get('cost_usd') is not None]
+        rows.append(dict(zip(by, key), **{
+            'calls': len(group),
+            'failed_pct': round(100.0 * sum(1 for r in group if r.get('outcome', OK) != OK) / len(group), 1),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'model_p50': percentile(model_latencies, 50),
+            'in_tok': sum(r.get('in_tok') or 0 for r in group),
+            'out_tok': sum(r.get('out_tok') or 0 for r in group),
+            'cost': round(sum(costs), 6),
+            # Calls without token counts (agent turns with tracing off) are not priced
+            'unpriced': len(group) - len(costs),
+        }))
+    return rows
+
+
+def sort_key(sort):
+    if sort == 'tokens':
+        return lambda row: row['in_tok'] + row['out_tok']
+    return lambda row: row[sort] if row[sort] is not None else -1
+
+
+def print_table(rows, by):
+    columns = by + ['calls', 'failed_pct', 'p50', 'p95', 'p99', 'model_p50', 'in_tok', 'out_tok', 'cost', 'unpriced']
+    cells = [[str(row[c]) if row[c] is not None else '-' for c in columns] for row in rows]
+    widths = [max([len(c)] + [len(line[i]) for line in cells]) for i, c in enumerate(columns)]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for line in cells:
+        print('  '.join(value.ljust(w) for value, w in zip(line, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('sources', nargs='+', help='ledger files, log files, or directories (dynamodb_bulk exports)')
+    parser.add_argument('--by', default='handler', help=f"comma-separated grouping fields: {', '.join(GROUP_FIELDS)}")
+    parser.add_argument('--since', help='first day to include (YYYY-MM-DD)')
+    parser.add_argument('--until', help='last day to include (YYYY-MM-DD)')
+    parser.add_argument('--handler', help='only this handler')
+    parser.add_argument('--sort', choices=SORT_FIELDS, default='cost')
+    parser.add_argument('--top', type=int, help='only the first N rows')
+    parser.add_argument('--json', action='store_true', help='print the rows as JSON')
+    args = parser.parse_args()
+
+    by = [field.strip() for field in args.by.split(',') if field.strip()]
+    unknown = [field for field in by if field not in GROUP_FIELDS]
+    if unknown:
+        parser.error(f"unknown grouping field(s): {', '.join(unknown)}")
+
+    records = (
+        r for r in load_records(args.sources)
+        if (not args.since or r.get('day', '') >= args.since)
+        and (not args.until or r.get('day', '') <= args.until)
+        and (not args.handler or r.get('handler') == args.handler)
+    )
+    rows = sorted(summarize(records, by), key=sort_key(args.sort), reverse=True)[:args.top]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("No ledger records found")
+        return
+    print_table(rows, by)
+    print(f"total: {sum(r['calls'] for r in rows)} calls, ${sum(r['cost'] for r in rows):.6f} estimated")
+
+
+if __name__ == '__main__':
+    main()
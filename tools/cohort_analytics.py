@@ -0,0 +1,434 @@
+"""
+Cohort statistics over quiz results, from dynamodb_bulk.py exports of the
+quiz and question tables: score distributions and percentiles per
+certification and topic, and item statistics per question (p-value,
+discrimination, option shares).
+
+Every answered question becomes one row of flat NumPy columns (quiz, question,
+correct, chosen option), and every quiz one row of quiz columns (cert and
+topic, user, answered, correct, max_score). All statistics are bincounts,
+sorts and gathers over those columns, so thousands of users take well under
+a second after loading.
+
+  * p-value: share of answers that were correct (low = hard)
+  * discrimination: correlation between getting the question right and the
+    score on the rest of the same quiz (item-rest point-biserial). Near zero
+    or negative means strong candidates miss it as often as weak ones: the
+    question, or its answer key, needs a look.
+  * score distributions: completed quizzes only, as percentiles and a
+    histogram per certification and per (certification, topic)
+
+Questions are identified by the cluster_id that question_index gave them,
+so paraphrases in different quizzes count as one question; untagged
+questions fall back to the seen_questions fingerprint of their text.
+
+--users limits the run to a training cohort (a file with one username per
+line) and --cohort names it. --publish writes the results into the
+cohort_stats table, which the cohort_stats action group reads
+(common/cohort_stats.py).
+
+    python tools/dynamodb_bulk.py export --table quiz --output exports/quiz
+    python tools/dynamodb_bulk.py export --table question --output exports/question
+    python tools/cohort_analytics.py exports/quiz exports/question
+    python tools/cohort_analytics.py exports/quiz exports/question --users spring.txt --cohort spring --publish
+"""
+import argparse
+import base64
+import json
+import os
+import time
+from array import array
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from cohort_stats import (COHORT_STATS_TABLE, DEFAULT_COHORT, HISTOGRAM_BINS, PERCENTILES, cert_key, cohort_key,
+                          question_key, to_dynamodb, topic_key)
+from dynamodb_bulk import read_items
+from quiz_store import PACKED_LAYOUT, question_rows
+from seen_questions import fingerprint
+
+try:
+    import numpy as np
+except ImportError:
+    raise SystemExit("cohort_analytics needs numpy (pip install numpy)")
+
+OPTIONS = 4
+MIN_RESPONSES = 20
+WEAK_DISCRIMINATION = 0.1
+LISTED_QUESTIONS = 10
+
+_deserializer = TypeDeserializer()
+
+
+# ---------------------------------------------------------------------------
+# Loading
+
+def read_export(directory):
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for entry in manifest['files']:
+        for typed in read_items(os.path.join(directory, entry['file']), manifest.get('item_format', 'dynamodb')):
+            yield {k: _deserializer.deserialize(v) for k, v in typed.items()}
+
+
+def packed_rows(quiz):
+    blob = quiz['questions_blob']
+    # Parquet and --plain exports carry binary attributes as base64 text
+    if isinstance(blob, str) and not blob.lstrip().startswith('['):
+        quiz = dict(quiz, questions_blob=base64.b64decode(blob))
+    return question_rows(quiz)
+
+
+class Codes(object):
+    """
+    Dense integer codes for the distinct values of a column
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class Columns(object):
+    """
+    Quiz results as NumPy columns. Quiz columns are indexed by quiz, answer
+    columns by answered question; answer_quiz links the two.
+    """
+
+    def __init__(self):
+        self.groups = Codes()     # (cert, topic)
+        self.certs = Codes()
+        self.users = Codes()
+        self.questions = Codes()  # question_id
+        self.question_text = []
+        self.quiz_group, self.quiz_user, self.quiz_max = array('i'), array('i'), array('i')
+        self.answer_quiz, self.answer_question = array('i'), array('i')
+        self.answer_correct, self.answer_option = array('b'), array('b')
+
+    def add_quiz(self, quiz, rows):
+        answered = [row for row in rows if row.get('user_answer') is not None]
+        if not answered:
+            return
+        cert = quiz.get('recommended_cert') or 'unknown'
+        self.certs.code(cert)
+        quiz_code = len(self.quiz_group)
+        self.quiz_group.append(self.groups.code((cert, quiz.get('topic') or 'unknown')))
+        self.quiz_user.append(self.users.code(quiz['username']))
+        self.quiz_max.append(int(quiz.get('max_score') or len(rows)))
+        for row in answered:
+            question_id = row.get('cluster_id') or 'fp-' + fingerprint(row.get('question', '')).hex()
+            code = self.questions.code(question_id)
+            if code == len(self.question_text):
+                self.question_text.append(row.get('question', ''))
+            self.answer_quiz.append(quiz_code)
+            self.answer_question.append(code)
+            self.answer_correct.append(1 if row.get('answered_correctly') else 0)
+            self.answer_option.append(int(row['user_answer']))
+
+    def freeze(self):
+        for name in ['quiz_group', 'quiz_user', 'quiz_max', 'answer_quiz', 'answer_question',
+                     'answer_correct', 'answer_option']:
+            setattr(self, name, np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode))
+        self.group_cert = np.array([self.certs.index[cert] for cert, _ in self.groups.values], dtype=np.int64)
+        # Per-quiz totals over the answer columns
+        self.quiz_answered = np.bincount(self.answer_quiz, minlength=len(self.quiz_group))
+        self.quiz_correct = np.bincount(self.answer_quiz, weights=self.answer_correct, minlength=len(self.quiz_group))
+        return self
+
+
+def load_columns(quiz_export, question_export, users=None, since=None, until=None):
+    rows_by_quiz = {}
+    for row in read_export(question_export):
+        rows_by_quiz.setdefault(row['quiz_id'], []).append(row)
+
+    columns = Columns()
+    for quiz in read_export(quiz_export):
+        day = str(quiz.get('created_at', ''))[:10]
+        if users is not None and quiz.get('username') not in users:
+            continue
+        if (since and day < since) or (until and day > until):
+            continue
+        if quiz.get('layout') == PACKED_LAYOUT:
+            rows = packed_rows(quiz)
+        else:
+            rows = sorted(rows_by_quiz.get(quiz['id'], []), key=lambda row: int(row['order']))
+        columns.add_quiz(quiz, rows)
+    return columns.freeze()
+
+
+# ---------------------------------------------------------------------------
+# Statistics
+
+def grouped_percentiles(groups, values, group_count, percentiles):
+    """
+    Linear-interpolated percentiles of values per group, as a
+    (group_count, len(percentiles)) array; NaN for empty groups
+    """
+    counts = np.bincount(groups, minlength=group_count)
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = starts[:, None] + np.asarray(percentiles, dtype=float)[None, :] / 100.0 * np.maximum(counts - 1, 0)[:, None]
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    if len(ordered) == 0:
+        return np.full(position.shape, np.nan)
+    low, high = np.minimum(low, len(ordered) - 1), np.minimum(high, len(ordered) - 1)
+    result = ordered[low] + (ordered[high] - ordered[low]) * (position - np.floor(position))
+    result[counts == 0] = np.nan
+    return result
+
+
+def distinct_per_group(groups, members, group_count):
+    """
+    Number of distinct members (e.g. users) per group
+    """
+    pairs = np.unique(groups.astype(np.int64) * (int(members.max(initial=0)) + 1) + members)
+    return np.bincount(pairs // (int(members.max(initial=0)) + 1), minlength=group_count)
+
+
+def score_distributions(columns, groups, group_count):
+    """
+    Score statistics of completed quizzes, for the groups given per quiz
+    """
+    completed = (columns.quiz_max > 0) & (columns.quiz_answered >= columns.quiz_max)
+    g = groups[completed]
+    score = columns.quiz_correct[completed] / columns.quiz_max[completed]
+    attempts = np.bincount(g, minlength=group_count)
+    bins = np.minimum((score * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+    return {
+        'attempts': attempts,
+        'users': distinct_per_group(g, columns.quiz_user[completed], group_count),
+        'mean': np.bincount(g, weights=score, minlength=group_count) / np.maximum(attempts, 1),
+        'percentiles': grouped_percentiles(g, score, group_count, PERCENTILES),
+        'histogram': np.bincount(g * HISTOGRAM_BINS + bins, minlength=group_count * HISTOGRAM_BINS)
+                       .reshape(group_count, HISTOGRAM_BINS),
+    }
+
+
+def answer_p_values(columns, groups, group_count):
+    """
+    Share of correct answers per group, for the groups given per quiz
+    """
+    g = groups[columns.answer_quiz]
+    answers = np.bincount(g, minlength=group_count)
+    correct = np.bincount(g, weights=columns.answer_correct, minlength=group_count)
+    return answers, correct / np.maximum(answers, 1)
+
+
+def item_statistics(columns):
+    question_count = len(columns.questions)
+    item = columns.answer_question
+    x = columns.answer_correct.astype(float)
+    responses = np.bincount(item, minlength=question_count)
+    p_value = np.bincount(item, weights=x, minlength=question_count) / np.maximum(responses, 1)
+
+    # Item-rest correlation: the rest score leaves the question itself out,
+    # so quizzes with a single answer carry no information
+    answered = columns.quiz_answered[columns.answer_quiz]
+    usable = answered > 1
+    item_u, x_u = item[usable], x[usable]
+    rest = (columns.quiz_correct[columns.answer_quiz][usable] - x_u) / (answered[usable] - 1)
+    n = np.bincount(item_u, minlength=question_count).astype(float)
+    sx = np.bincount(item_u, weights=x_u, minlength=question_count)
+    sy = np.bincount(item_u, weights=rest, minlength=question_count)
+    sxy = np.bincount(item_u, weights=x_u * rest, minlength=question_count)
+    syy = np.bincount(item_u, weights=rest * rest, minlength=question_count)
+    covariance = n * sxy - sx * sy
+    variance = (n * sx - sx * sx) * (n * syy - sy * sy)  # x is 0/1, so sum(x^2) = sum(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discrimination = np.where(variance > 0, covariance / np.sqrt(np.maximum(variance, 0)), np.nan)
+
+    options = np.bincount(item * OPTIONS + np.clip(columns.answer_option, 0, OPTIONS - 1),
+                          minlength=question_count * OPTIONS).reshape(question_count, OPTIONS)
+
+    # Each question is listed under the (cert, topic) it was answered in most
+    group_count = len(columns.groups)
+    pairs, counts = np.unique(item.astype(np.int64) * group_count + columns.quiz_group[columns.answer_quiz],
+                              return_counts=True)
+    pair_item = pairs // group_count
+    order = np.lexsort((-counts, pair_item))
+    first = np.unique(pair_item[order], return_index=True)[1]
+    main_group = np.zeros(question_count, dtype=np.int64)
+    main_group[pair_item[order][first]] = pairs[order][first] % group_count
+
+    return {
+        'responses': responses,
+        'p_value': p_value,
+        'discrimination': discrimination,
+        'option_share': options / np.maximum(responses, 1)[:, None],
+        'group': main_group,
+    }
+
+
+def _float(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+
+def distribution_record(dist, index):
+    return {
+        'attempts': int(dist['attempts'][index]),
+        'users': int(dist['users'][index]),
+        'mean_score_pct': _float(100 * dist['mean'][index]) if dist['attempts'][index] else None,
+        'score_percentiles': {f"p{p}": _float(100 * v) for p, v in zip(PERCENTILES, dist['percentiles'][index])},
+        'score_histogram': [int(v) for v in dist['histogram'][index]],
+    }
+
+
+def question_record(columns, items, code):
+    cert, topic = columns.groups.values[items['group'][code]]
+    return {
+        'question_id': columns.questions.values[code],
+        'question': columns.question_text[code][:300],
+        'recommended_cert': cert,
+        'topic': topic,
+        'responses': int(items['responses'][code]),
+        'p_value': _float(items['p_value'][code]),
+        'discrimination': _float(items['discrimination'][code]),
+        'option_share': [_float(v) for v in items['option_share'][code]],
+    }
+
+
+def analyze(columns, min_responses=MIN_RESPONSES):
+    """
+    Plain-Python results: {'certs': {cert: record}, 'topics': {(cert, topic): record}, 'questions': [record]}
+    """
+    if len(columns.quiz_group) == 0:
+        return {'certs': {}, 'topics': {}, 'questions': []}
+    cert_count, group_count = len(columns.certs), len(columns.groups)
+    quiz_cert = columns.group_cert[columns.quiz_group]
+    cert_dist = score_distributions(columns, quiz_cert, cert_count)
+    topic_dist = score_distributions(columns, columns.quiz_group, group_count)
+    cert_answers, cert_p = answer_p_values(columns, quiz_cert, cert_count)
+    topic_answers, topic_p = answer_p_values(columns, columns.quiz_group, group_count)
+    items = item_statistics(columns)
+
+    # Questions with enough answers, hardest first
+    rated = np.flatnonzero(items['responses'] >= min_responses)
+    rated = rated[np.argsort(items['p_value'][rated], kind='stable')]
+    questions = [question_record(columns, items, code) for code in rated]
+    rated_cert = columns.group_cert[items['group'][rated]]
+    weak = (items['discrimination'][rated] < WEAK_DISCRIMINATION)
+
+    topics = {}
+    for group, (cert, topic) in enumerate(columns.groups.values):
+        in_topic = [questions[i] for i in np.flatnonzero(items['group'][rated] == group)[:LISTED_QUESTIONS]]
+        topics[(cert, topic)] = dict(
+            distribution_record(topic_dist, group),
+            recommended_cert=cert, topic=topic,
+            answers=int(topic_answers[group]), p_value=_float(topic_p[group]),
+            hardest_questions=[summary(q) for q in in_topic],
+        )
+
+    certs = {}
+    for code, cert in enumerate(columns.certs.values):
+        in_cert = np.flatnonzero(rated_cert == code)
+        certs[cert] = dict(
+            distribution_record(cert_dist, code),
+            recommended_cert=cert,
+            answers=int(cert_answers[code]), p_value=_float(cert_p[code]),
+            topics=sorted(({'topic': t['topic'], 'attempts': t['attempts'], 'mean_score_pct': t['mean_score_pct'],
+                            'p_value': t['p_value']} for (c, _), t in topics.items() if c == cert),
+                          key=lambda t: t['p_value'] if t['p_value'] is not None else 1),
+            hardest_questions=[summary(questions[i]) for i in in_cert[:LISTED_QUESTIONS]],
+            weakest_questions=[summary(questions[i]) for i in in_cert[weak[in_cert]][:LISTED_QUESTIONS]],
+        )
+    return {'certs': certs, 'topics': topics, 'questions': questions}
+
+
+def summary(question):
+    return {field: question[field] for field in ['question_id', 'question', 'topic', 'responses', 'p_value', 'discrimination']}
+
+
+# ---------------------------------------------------------------------------
+# Output
+
+def fmt(value, digits=1):
+    return '-' if value is None else f"{value:.{digits}f}" if isinstance(value, float) else str(value)
+
+
+def report(columns, results, top):
+    print(f"{len(columns.answer_quiz)} answers in {len(columns.quiz_group)} quizzes by {len(columns.users)} users, "
+          f"{len(columns.questions)} distinct questions ({len(results['questions'])} with enough answers to rate)")
+    header = ['certification / topic', 'attempts', 'users', 'mean%'] + [f"p{p}" for p in PERCENTILES] + ['p_value']
+    lines = []
+    for cert, record in sorted(results['certs'].items()):
+        topics = [results['topics'][(cert, t['topic'])] for t in record['topics']]
+        for name, r in [(cert, record)] + [('  ' + t['topic'], t) for t in topics]:
+            lines.append([name, fmt(r['attempts']), fmt(r['users']), fmt(r['mean_score_pct'])] +
+                         [fmt(r['score_percentiles'][f"p{p}"]) for p in PERCENTILES] + [fmt(r['p_value'], 2)])
+    widths = [max(len(line[i]) for line in [header] + lines) for i in range(len(header))]
+    for line in [header] + lines:
+        print('  '.join(value.ljust(w) for value, w in zip(line, widths)))
+
+    for title, selected in [('hardest questions', results['questions'][:top]),
+                            (f"weakest questions (discrimination < {WEAK_DISCRIMINATION})",
+                             [q for q in results['questions']
+                              if q['discrimination'] is not None and q['discrimination'] < WEAK_DISCRIMINATION][:top])]:
+        print(f"\n{title}:")
+        for q in selected:
+            print(f"  p={fmt(q['p_value'], 2)} d={fmt(q['discrimination'], 2)} n={q['responses']} "
+                  f"shares={q['option_share']}  {q['question'][:90]}")
+
+
+def publish(table, cohort, results):
+    now = int(time.time())
+    items = [{'stats_key': cohort_key(cohort), 'cohort': cohort, 'certifications': sorted(results['certs'])}]
+    items += [dict(record, stats_key=cert_key(cert, cohort)) for cert, record in results['certs'].items()]
+    items += [dict(record, stats_key=topic_key(cert, topic, cohort)) for (cert, topic), record in results['topics'].items()]
+    items += [dict(record, stats_key=question_key(record['question_id'], cohort)) for record in results['questions']]
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=to_dynamodb(dict(item, cohort=cohort, computed_at=now)))
+    print(f"published {len(items)} items to {table.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('quiz_export', help='dynamodb_bulk.py export directory of the quiz table')
+    parser.add_argument('question_export', help='dynamodb_bulk.py export directory of the question table')
+    parser.add_argument('--users', help='file with the usernames of a cohort, one per line')
+    parser.add_argument('--cohort', default=DEFAULT_COHORT, help='name the results are published under')
+    parser.add_argument('--since', help='first quiz day to include (YYYY-MM-DD)')
+    parser.add_argument('--until', help='last quiz day to include (YYYY-MM-DD)')
+    parser.add_argument('--min-responses', type=int, default=MIN_RESPONSES, help='answers needed to rate a question')
+    parser.add_argument('--top', type=int, default=10, help='questions to list')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--publish', action='store_true', help=f'write the results to {COHORT_STATS_TABLE}')
+    args = parser.parse_args()
+    if args.users and args.cohort == DEFAULT_COHORT:
+        parser.error('--users needs a --cohort name')
+
+    users = None
+    if args.users:
+        with open(args.users) as f:
+            users = {line.strip().lower() for line in f if line.strip()}
+
+    started = time.monotonic()
+    columns = load_columns(args.quiz_export, args.question_export, users, args.since, args.until)
+    loaded = time.monotonic()
+    results = analyze(columns, args.min_responses)
+    print(f"loaded in {loaded - started:.1f} s, analyzed in {time.monotonic() - loaded:.3f} s")
+
+    if args.json:
+        print(json.dumps(dict(results, topics=list(results['topics'].values())), indent=2))
+    else:
+        report(columns, results, args.top)
+    if args.publish:
+        publish(boto3.resource('dynamodb').Table(COHORT_STATS_TABLE), args.cohort, results)
+
+
+if __name__ == '__main__':
+    main()
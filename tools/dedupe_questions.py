@@ -0,0 +1,160 @@
+"""
+Cluster near-duplicate questions across all quizzes and rebuild the question
+index that create_quiz uses to spot paraphrases (common/question_index.py).
+
+Questions are read from both layouts, oldest quiz first, and clustered with the
+same MinHash/LSH settings as the online index: each question joins the most
+similar earlier cluster above NEAR_DUPLICATE_THRESHOLD or starts a new one.
+The report lists the largest clusters and how much stored question content
+is a near-duplicate copy.
+
+--write-index replaces the index with one cluster item and one bucket item per
+band for each cluster found here, so clusters from before the index existed
+are recognised too. --tag-rows stores cluster_id on two-table question rows
+that don't have it (packed quizzes are left as they are).
+
+    python tools/dedupe_questions.py --top 20
+    python tools/dedupe_questions.py --write-index --tag-rows
+"""
+import argparse
+import os
+import time
+from collections import Counter, defaultdict
+
+import boto3
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from backfill_knowledge_stats import iter_quizzes, quiz_questions
+from json_codec import dumps
+from question_index import QUESTION_INDEX_TABLE, LSHIndex, bucket_keys, pack_signature, write_items
+from quiz_store import PACKED_LAYOUT, static_question
+
+
+def load_questions(quiz_table, question_table, username=None):
+    """
+    (quiz, question) pairs, oldest quiz first, so the first copy of a
+    question becomes its cluster's representative
+    """
+    quizzes = sorted(iter_quizzes(quiz_table, username), key=lambda quiz: quiz.get('created_at') or '')
+    for quiz in quizzes:
+        for question in quiz_questions(question_table, quiz):
+            if question.get('question'):
+                yield quiz, question
+
+
+def cluster(pairs, index):
+    """
+    cluster_id -> list of (quiz, question)
+    """
+    members = defaultdict(list)
+    for quiz, question in pairs:
+        cluster_id, _ = index.assign(question)
+        members[cluster_id].append((quiz, question))
+    return members
+
+
+def content_size(question):
+    return len(dumps(static_question(question)).encode('utf-8'))
+
+
+def report(members, top):
+    total = sum(len(group) for group in members.values())
+    duplicates = [q for group in members.values() for _, q in group[1:]]
+    duplicate_bytes = sum(content_size(q) for q in duplicates)
+    all_bytes = duplicate_bytes + sum(content_size(group[0][1]) for group in members.values())
+    print(f"questions: {total}, clusters: {len(members)}, near-duplicate copies: {len(duplicates)} "
+          f"({100.0 * len(duplicates) / max(total, 1):.1f}%)")
+    print(f"question content: {all_bytes / 1024:.1f} KB, of which near-duplicate copies: "
+          f"{duplicate_bytes / 1024:.1f} KB ({100.0 * duplicate_bytes / max(all_bytes, 1):.1f}%)")
+
+    sizes = Counter(len(group) for group in members.values())
+    print('cluster sizes: ' + ', '.join(f"{size}: {count}" for size, count in sorted(sizes.items())))
+    largest = sorted(members.items(), key=lambda entry: len(entry[1]), reverse=True)[:top]
+    for cluster_id, group in largest:
+        if len(group) < 2:
+            break
+        users = len({quiz['username'] for quiz, _ in group})
+        print(f"  {cluster_id}  {len(group)} copies, {users} users: {group[0][1]['question'][:100]}")
+
+
+def write_index(table, index, members):
+    """
+    Replace the index contents with the clusters found here
+    """
+    keys = []
+    scan_kwargs = {'ProjectionExpression': 'index_key'}
+    while True:
+        response = table.scan(**scan_kwargs)
+        keys.extend(item['index_key'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    now = int(time.time())
+    items = {}
+    for cluster_id, group in members.items():
+        sig = index.clusters[cluster_id]['signature']
+        items[f"cluster#{cluster_id}"] = {
+            'index_key': f"cluster#{cluster_id}", 'cluster_id': cluster_id, 'signature': pack_signature(sig),
+            'sample': group[0][1]['question'], 'size': len(group), 'created_at': now,
+        }
+        for key in bucket_keys(sig):
+            # Larger clusters win shared buckets: they are the likelier match
+            if key not in items or items[key]['size'] < len(group):
+                items[key] = {'index_key': key, 'cluster_id': cluster_id, 'size': len(group)}
+    for item in items.values():
+        if not item['index_key'].startswith('cluster#'):
+            item.pop('size')
+
+    write_items(table, list(items.values()))
+    stale = [key for key in keys if key not in items]
+    with table.batch_writer() as batch:
+        for key in stale:
+            batch.delete_item(Key={'index_key': key})
+    print(f"index: wrote {len(items)} items, deleted {len(stale)} stale items")
+
+
+def tag_rows(question_table, members):
+    tagged = 0
+    for cluster_id, group in members.items():
+        for quiz, question in group:
+            if quiz.get('layout') == PACKED_LAYOUT or question.get('cluster_id') == cluster_id:
+                continue
+            question_table.update_item(
+                Key={'quiz_id': question['quiz_id'], 'order': question['order']},
+                UpdateExpression='SET cluster_id = :cluster_id',
+                ExpressionAttributeValues={':cluster_id': cluster_id}
+            )
+            tagged += 1
+    print(f"question rows tagged: {tagged}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--username', help="only cluster this user's quizzes (report only)")
+    parser.add_argument('--top', type=int, default=10, help='largest clusters to list')
+    parser.add_argument('--threshold', type=float, help='similarity needed to join a cluster (default: NEAR_DUPLICATE_THRESHOLD)')
+    parser.add_argument('--write-index', action='store_true', help='replace the question index with the clusters found')
+    parser.add_argument('--tag-rows', action='store_true', help='store cluster_id on two-table question rows')
+    args = parser.parse_args()
+    if args.username and args.write_index:
+        parser.error('--write-index needs every quiz; drop --username')
+
+    dynamodb = boto3.resource('dynamodb')
+    quiz_table = dynamodb.Table(os.environ.get('QUIZ_TABLE', 'quiz'))
+    question_table = dynamodb.Table(os.environ.get('QUESTION_TABLE', 'question'))
+
+    index = LSHIndex(args.threshold) if args.threshold is not None else LSHIndex()
+    started = time.monotonic()
+    members = cluster(load_questions(quiz_table, question_table, args.username and args.username.lower()), index)
+    print(f"clustered in {time.monotonic() - started:.1f} s")
+    report(members, args.top)
+
+    if args.write_index:
+        write_index(dynamodb.Table(QUESTION_INDEX_TABLE), index, members)
+    if args.tag_rows:
+        tag_rows(question_table, members)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,574 @@
+"""
+Bulk export and import of DynamoDB tables (CertInfo, question banks, quiz
+history, messages).
+
+export runs a parallel Scan (Segment/TotalSegments), one thread per segment,
+and streams every segment to its own part file: gzip-compressed JSON lines or
+Parquet. A manifest.json next to the parts records the table's key schema,
+the files and the item counts.
+
+import reads those parts (or any .jsonl/.jsonl.gz/.parquet files), and loads
+them with parallel BatchWriteItem workers. The write rate adapts to the
+table: it halves on throttling or unprocessed items and climbs back on
+success (the AIMD token bucket from bedrock_guard).
+
+    python tools/dynamodb_bulk.py export --table messages --segments 16 --output exports/messages
+    python tools/dynamodb_bulk.py export --table quiz --format parquet --output exports/quiz
+    python tools/dynamodb_bulk.py import --table CertInfo --input seed/CertInfo --workers 8 --rate 500
+
+Point it at DynamoDB Local (or LocalStack) to try it without touching real
+tables; --create-table creates the target from the export's key schema:
+
+    AWS_ENDPOINT_URL_DYNAMODB=http://localhost:8000 python tools/dynamodb_bulk.py import --table messages --input exports/messages --create-table
+
+JSON-lines exports keep DynamoDB's typed JSON by default (binary values
+base64-encoded, like DynamoDB's own S3 export), so an import restores sets,
+numbers and binary attributes such as packed quizzes exactly. --plain writes
+ordinary JSON for analysis instead; Parquet is always plain.
+"""
+import argparse
+import base64
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from bedrock_guard import TokenBucket
+
+# Adaptive retry mode adds client-side rate limiting on throttling errors;
+# enough connections for one per segment or worker
+CLIENT_CONFIG = Config(retries={'mode': 'adaptive', 'max_attempts': 10}, max_pool_connections=64)
+
+BATCH_SIZE = 25
+PARQUET_ROW_GROUP = 10000
+PROGRESS_SECONDS = 10
+THROTTLE_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+BINARY_TYPES = {'B', 'BS'}
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+class Progress(object):
+    """
+    Thread-safe item counter that prints the running rate now and then
+    """
+    def __init__(self, label):
+        self.label = label
+        self.items = 0
+        self.started = time.monotonic()
+        self.reported = self.started
+        self.lock = threading.Lock()
+
+    def add(self, count):
+        with self.lock:
+            self.items += count
+            now = time.monotonic()
+            if now - self.reported >= PROGRESS_SECONDS:
+                self.reported = now
+                print(f"{self.label}: {self.items} items, {self.items / (now - self.started):.0f} items/s", flush=True)
+
+    def seconds(self):
+        return time.monotonic() - self.started
+
+
+# ---------------------------------------------------------------------------
+# Item formats
+
+def typed_to_json(value):
+    """
+    Low-level (typed) item as JSON-safe DynamoDB JSON: bytes become base64
+    """
+    if isinstance(value, dict):
+        return {k: (_b64(v) if k in BINARY_TYPES else typed_to_json(v)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [typed_to_json(v) for v in value]
+    return value
+
+
+def _b64(value):
+    if isinstance(value, list):
+        return [base64.b64encode(v).decode('ascii') for v in value]
+    return base64.b64encode(value).decode('ascii')
+
+
+def json_to_typed(value):
+    """
+    Inverse of typed_to_json
+    """
+    if isinstance(value, dict):
+        result = {}
+        for k, v in value.items():
+            if k == 'B':
+                result[k] = base64.b64decode(v)
+            elif k == 'BS':
+                result[k] = [base64.b64decode(b) for b in v]
+            else:
+                result[k] = json_to_typed(v)
+        return result
+    if isinstance(value, list):
+        return [json_to_typed(v) for v in value]
+    return value
+
+
+def to_plain(value):
+    """
+    Python value of a deserialized attribute as ordinary JSON: numbers as
+    int/float, sets as sorted lists, binary as base64
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, Binary):
+        return base64.b64encode(value.value).decode('ascii')
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    if isinstance(value, (set, frozenset)):
+        return sorted(to_plain(v) for v in value)
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    return value
+
+
+def plain_item(typed_item):
+    return {k: to_plain(_deserializer.deserialize(v)) for k, v in typed_item.items()}
+
+
+def _to_dynamodb(value):
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamodb(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamodb(v) for v in value]
+    return value
+
+
+def typed_from_plain(item):
+    return {k: _serializer.serialize(_to_dynamodb(v)) for k, v in item.items() if v is not None}
+
+
+# ---------------------------------------------------------------------------
+# Writers and readers
+
+class JsonLinesWriter(object):
+    def __init__(self, path, plain, compress_level):
+        self.plain = plain
+        if path.endswith('.gz'):
+            self.file = gzip.open(path, 'wt', compresslevel=compress_level, encoding='utf-8')
+        else:
+            self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, typed_items):
+        lines = []
+        for item in typed_items:
+            lines.append(json.dumps(plain_item(item) if self.plain else typed_to_json(item), separators=(',', ':')))
+        if lines:
+            self.file.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(object):
+    """
+    Plain items as Parquet. Column types come from the first row group:
+    booleans, integers, floats and strings are kept, lists and maps are
+    stored as JSON text. Values that don't fit their column, and attributes
+    first seen later, go to the _extra column as a JSON object.
+    """
+    def __init__(self, path, compression):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet needs pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.compression = compression
+        self.writer = None
+        self.columns = None
+        self.rows = []
+
+    def write(self, typed_items):
+        self.rows.extend(plain_item(item) for item in typed_items)
+        if len(self.rows) >= PARQUET_ROW_GROUP:
+            self._flush()
+
+    def _infer_columns(self):
+        columns = {}
+        for row in self.rows:
+            for name, value in row.items():
+                kind = ('bool' if isinstance(value, bool) else 'int' if isinstance(value, int)
+                        else 'float' if isinstance(value, float) else 'string' if isinstance(value, str) else 'json')
+                previous = columns.get(name, kind)
+                if {previous, kind} == {'int', 'float'}:
+                    kind = 'float'
+                elif previous != kind:
+                    kind = 'json'
+                columns[name] = kind
+        types = {'bool': self.pa.bool_(), 'int': self.pa.int64(), 'float': self.pa.float64(),
+                 'string': self.pa.string(), 'json': self.pa.string()}
+        self.columns = columns
+        # Readers need to know which string columns hold JSON
+        json_columns = [name for name, kind in columns.items() if kind == 'json']
+        self.schema = self.pa.schema(
+            [(name, types[kind]) for name, kind in columns.items()] + [('_extra', self.pa.string())],
+            metadata={'json_columns': json.dumps(json_columns)}
+        )
+
+    def _fits(self, kind, value):
+        if kind == 'bool':
+            return isinstance(value, bool)
+        if kind == 'int':
+            return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
+        if kind == 'float':
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+        if kind == 'string':
+            return isinstance(value, str)
+        return True
+
+    def _flush(self):
+        if not self.rows:
+            return
+        if self.columns is None:
+            self._infer_columns()
+            self.writer = self.pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+        data = {name: [] for name in self.columns}
+        data['_extra'] = []
+        for row in self.rows:
+            extra = {}
+            for name, kind in self.columns.items():
+                value = row.get(name)
+                if value is None:
+                    data[name].append(None)
+                elif not self._fits(kind, value):
+                    data[name].append(None)
+                    extra[name] = value
+                elif kind == 'json':
+                    data[name].append(json.dumps(value, separators=(',', ':')))
+                else:
+                    data[name].append(float(value) if kind == 'float' else value)
+            for name, value in row.items():
+                if name not in self.columns:
+                    extra[name] = value
+            data['_extra'].append(json.dumps(extra, separators=(',', ':')) if extra else None)
+        self.writer.write_table(self.pa.Table.from_pydict(data, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def read_items(path, item_format):
+    """
+    Typed items from an export part file
+    """
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet needs pyarrow (pip install pyarrow)")
+        parquet = pyarrow.parquet.ParquetFile(path)
+        metadata = parquet.schema_arrow.metadata or {}
+        json_columns = json.loads(metadata.get(b'json_columns', b'[]'))
+        for batch in parquet.iter_batches():
+            for row in batch.to_pylist():
+                extra = row.pop('_extra', None)
+                item = {k: v for k, v in row.items() if v is not None}
+                for name in json_columns:
+                    if name in item:
+                        item[name] = json.loads(item[name], parse_float=Decimal)
+                if extra:
+                    item.update(json.loads(extra, parse_float=Decimal))
+                yield typed_from_plain(item)
+        return
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if item_format == 'plain':
+                yield typed_from_plain(json.loads(line, parse_float=Decimal))
+            else:
+                yield json_to_typed(json.loads(line))
+
+
+# ---------------------------------------------------------------------------
+# Export
+
+def export_segment(client, table, segment, total_segments, writer, page_size, progress):
+    kwargs = {'TableName': table, 'Segment': segment, 'TotalSegments': total_segments}
+    if page_size:
+        kwargs['Limit'] = page_size
+    count = 0
+    try:
+        while True:
+            response = client.scan(**kwargs)
+            items = response.get('Items', [])
+            writer.write(items)
+            count += len(items)
+            progress.add(len(items))
+            if 'LastEvaluatedKey' not in response:
+                return count
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    finally:
+        writer.close()
+
+
+def export_table(args):
+    client = boto3.client('dynamodb', config=CLIENT_CONFIG)
+    description = client.describe_table(TableName=args.table)['Table']
+    os.makedirs(args.output, exist_ok=True)
+    extension = 'parquet' if args.format == 'parquet' else 'jsonl.gz'
+    plain = args.plain or args.format == 'parquet'
+
+    files, writers = [], []
+    for segment in range(args.segments):
+        name = f"{args.table}-{segment:04d}-of-{args.segments:04d}.{extension}"
+        path = os.path.join(args.output, name)
+        files.append(name)
+        if args.format == 'parquet':
+            writers.append(ParquetWriter(path, args.parquet_compression))
+        else:
+            writers.append(JsonLinesWriter(path, plain, args.compress_level))
+
+    progress = Progress(f"export {args.table}")
+    counts, errors = [0] * args.segments, []
+
+    def run(segment):
+        try:
+            counts[segment] = export_segment(client, args.table, segment, args.segments,
+                                             writers[segment], args.page_size, progress)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(s,), daemon=True) for s in range(args.segments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    manifest = {
+        'table': args.table,
+        'key_schema': description['KeySchema'],
+        'attribute_definitions': description['AttributeDefinitions'],
+        'format': args.format,
+        'item_format': 'plain' if plain else 'dynamodb',
+        'segments': args.segments,
+        'files': [{'file': name, 'items': count} for name, count in zip(files, counts)],
+        'items': sum(counts),
+        'seconds': round(progress.seconds(), 1),
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(args.output, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ---------------------------------------------------------------------------
+# Import
+
+class BatchLoader(object):
+    """
+    BatchWriteItem workers sharing one adaptive rate limiter. Unprocessed
+    items and throttling errors halve the rate and are retried with backoff;
+    successful batches raise it again up to --rate.
+    """
+    def __init__(self, client, table, key_names, rate, workers, progress):
+        self.client = client
+        self.table = table
+        self.key_names = key_names
+        self.bucket = TokenBucket(max(rate / BATCH_SIZE, 0.1), max(1, workers), min_rate=0.05)
+        self.progress = progress
+        self.batches = queue.Queue(maxsize=workers * 4)
+        self.errors = []
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, items):
+        # A batch may not hold the same key twice; the later item wins
+        unique = {tuple(json.dumps(item[k], sort_keys=True, default=str) for k in self.key_names): item for item in items}
+        self.batches.put(list(unique.values()))
+
+    def close(self):
+        for _ in self.threads:
+            self.batches.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def _throttled(self, attempt):
+        with self.lock:
+            self.throttled += 1
+        self.bucket.on_throttle()
+        time.sleep(min(5.0, 0.05 * (2 ** attempt)))
+
+    def _work(self):
+        while True:
+            items = self.batches.get()
+            if items is None:
+                return
+            if self.errors:
+                continue
+            try:
+                self._write(items)
+            except Exception as e:
+                self.errors.append(e)
+
+    def _write(self, items):
+        requests = [{'PutRequest': {'Item': item}} for item in items]
+        attempt = 0
+        while requests:
+            self.bucket.acquire(float('inf'))
+            try:
+                response = self.client.batch_write_item(RequestItems={self.table: requests})
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLE_ERROR_CODES:
+                    raise
+                self._throttled(attempt)
+                attempt += 1
+                continue
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table, [])
+            self.progress.add(len(requests) - len(unprocessed))
+            if unprocessed:
+                self._throttled(attempt)
+                attempt += 1
+            else:
+                self.bucket.on_success()
+            requests = unprocessed
+
+
+def create_table(client, table, manifest):
+    client.create_table(
+        TableName=table,
+        KeySchema=manifest['key_schema'],
+        AttributeDefinitions=manifest['attribute_definitions'],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    client.get_waiter('table_exists').wait(TableName=table)
+    print(f"Created table {table}")
+
+
+def import_table(args):
+    client = boto3.client('dynamodb', config=CLIENT_CONFIG)
+    manifest, files = None, []
+    for source in args.input:
+        if os.path.isdir(source):
+            manifest_path = os.path.join(source, 'manifest.json')
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                files.extend(os.path.join(source, entry['file']) for entry in manifest['files'])
+            else:
+                files.extend(sorted(glob.glob(os.path.join(source, '*.jsonl*')) + glob.glob(os.path.join(source, '*.parquet'))))
+        else:
+            files.append(source)
+    if not files:
+        raise SystemExit("No input files found")
+    item_format = args.item_format or (manifest or {}).get('item_format', 'dynamodb')
+
+    try:
+        description = client.describe_table(TableName=args.table)['Table']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceNotFoundException' or not args.create_table:
+            raise
+        if manifest is None:
+            raise SystemExit("--create-table needs an export directory with a manifest.json")
+        create_table(client, args.table, manifest)
+        description = client.describe_table(TableName=args.table)['Table']
+    key_names = [key['AttributeName'] for key in description['KeySchema']]
+
+    progress = Progress(f"import {args.table}")
+    loader = BatchLoader(client, args.table, key_names, args.rate, args.workers, progress)
+    read = 0
+    try:
+        for path in files:
+            batch = []
+            for item in read_items(path, item_format):
+                batch.append(item)
+                read += 1
+                if len(batch) == BATCH_SIZE:
+                    loader.put(batch)
+                    batch = []
+                if loader.errors:
+                    break
+            if batch:
+                loader.put(batch)
+            if loader.errors:
+                break
+    finally:
+        loader.close()
+
+    return {
+        'table': args.table,
+        'files': len(files),
+        'items_read': read,
+        'items_written': progress.items,
+        'throttled_batches': loader.throttled,
+        'final_rate_items_per_s': round(loader.bucket.rate * BATCH_SIZE),
+        'seconds': round(progress.seconds(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--json', action='store_true', help='print the summary as JSON')
+
+    export_parser = commands.add_parser('export', parents=[common], help='parallel Scan to part files')
+    export_parser.add_argument('--table', required=True)
+    export_parser.add_argument('--output', required=True, help='directory for the part files and manifest.json')
+    export_parser.add_argument('--segments', type=int, default=8, help='parallel Scan segments (one thread each)')
+    export_parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl')
+    export_parser.add_argument('--plain', action='store_true', help='ordinary JSON instead of typed DynamoDB JSON (jsonl only)')
+    export_parser.add_argument('--page-size', type=int, help='Limit per Scan page (default: 1 MB pages)')
+    export_parser.add_argument('--compress-level', type=int, default=3, help='gzip level, 1 (fastest) to 9')
+    export_parser.add_argument('--parquet-compression', default='zstd')
+
+    import_parser = commands.add_parser('import', parents=[common], help='parallel BatchWriteItem from part files')
+    import_parser.add_argument('--table', required=True)
+    import_parser.add_argument('--input', required=True, nargs='+', help='export directories or part files')
+    import_parser.add_argument('--workers', type=int, default=8)
+    import_parser.add_argument('--rate', type=float, default=2000, help='maximum items per second; throttling lowers it')
+    import_parser.add_argument('--item-format', choices=['dynamodb', 'plain'], help='JSON-lines format (default: from the manifest, else dynamodb)')
+    import_parser.add_argument('--create-table', action='store_true', help="create the table from the export's key schema if it does not exist")
+    args = parser.parse_args()
+
+    summary = export_table(args) if args.command == 'export' else import_table(args)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    elif args.command == 'export':
+        print(f"Exported {summary['items']} items from {summary['table']} in {summary['seconds']} s "
+              f"({summary['segments']} segments, {summary['format']}, {summary['item_format']} items) to {args.output}")
+    else:
+        print(f"Imported {summary['items_written']} of {summary['items_read']} items into {summary['table']} "
+              f"in {summary['seconds']} s ({summary['throttled_batches']} throttled batches, "
+              f"final rate {summary['final_rate_items_per_s']} items/s)")
+
+
+if __name__ == '__main__':
+    main()
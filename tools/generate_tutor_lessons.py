@@ -0,0 +1,43 @@
+"""
+Run the Tutor lesson pipeline (Tutor/generate_lessons) from a workstation.
+
+Generates the lessons missing from the tutor_lessons table for every
+CertInfo certification, or for one certification, then prints the run
+summary. Lessons already in a catalogue are skipped unless --force is given.
+
+    python tools/generate_tutor_lessons.py
+    python tools/generate_tutor_lessons.py --certification "AWS Certified Solutions Architect - Associate" --depths overview standard
+    python tools/generate_tutor_lessons.py --certification "AWS Certified Cloud Practitioner" --domains "Security and Compliance" --force
+"""
+import argparse
+import json
+
+from handler_loader import load_handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--certification', help='CertificationName in CertInfo (default: all certifications)')
+    parser.add_argument('--depths', nargs='*', choices=['overview', 'standard', 'deep_dive'])
+    parser.add_argument('--domains', nargs='*', help='only these exam domains, as named in the catalogue')
+    parser.add_argument('--force', action='store_true', help='regenerate lessons that already exist')
+    args = parser.parse_args()
+
+    event = {'force': args.force}
+    if args.certification:
+        event['certification'] = args.certification
+    if args.depths:
+        event['depths'] = args.depths
+    if args.domains:
+        event['domains'] = args.domains
+
+    # Without a Lambda context the run has no time limit
+    response = load_handler('generate_lessons').lambda_handler(event, None)
+    summary = json.loads(response['body'])
+    print(json.dumps(summary, indent=2))
+    if response['statusCode'] != 200 or summary.get('failed'):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import importlib.util
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the shared layer importable the same way Lambda does (/opt/python)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'common'))
+
+HANDLERS = {
+    'getuserdetails': 'Planner/getuserdetails/lambda_function.py',
+    'loadcertinfo': 'QnA/loadcertinfo_lambdafunc/lambda_function.py',
+    'create_quiz': 'Quiz/create_quiz/lambda_function.py',
+    'show_next_question': 'Quiz/ show_next_question/lambda_function.py',
+    'show_result': 'Quiz/ShowResult/lambda_fuction.py',
+    'update_userprofile': 'Recommendation/update_userprofile/lambda_function.py',
+    'update_recommendedcert': 'Recommendation/upupdate_recommendedcert/lambda_function.py',
+    'invoke_agent': 'invoke_agent/lambda_function.py',
+    'generate_lessons': 'Tutor/generate_lessons/lambda_function.py',
+    'get_lesson': 'Tutor/get_lesson/lambda_function.py',
+    'search_certinfo': 'QnA/search_certinfo/lambda_function.py',
+    'job_status': 'Quiz/job_status/lambda_function.py',
+    'cohort_stats': 'Quiz/cohort_stats/lambda_function.py',
+}
+
+
+def load_handler(name):
+    """
+    Import a Lambda handler module by its short name. The Lambda folders are
+    not Python packages (and some have spaces in their names), so they are
+    loaded from their file path.
+    """
+    path = os.path.join(REPO_ROOT, HANDLERS[name])
+    spec = importlib.util.spec_from_file_location(f"handler_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,81 @@
+"""
+Rewrite two-table quizzes (quiz row + one question row per question) in the
+packed single-item layout.
+
+Only completed quizzes are migrated by default: a quiz in progress may be
+answered through the old path while it is being copied. With
+--include-active such a quiz is counted as a conflict and left as it is;
+run the tool again to migrate it. Question rows are
+kept unless --delete-question-rows is given; delete them only after every
+reader (show_next_question, ShowResult, tools) is running the packed-aware code.
+
+    python tools/migrate_quiz_layout.py --dry-run
+    python tools/migrate_quiz_layout.py --username charles --delete-question-rows
+"""
+import argparse
+import os
+
+import boto3
+from botocore.exceptions import ClientError
+
+import handler_loader  # noqa: F401 (puts common/ on sys.path)
+from backfill_knowledge_stats import iter_quizzes, quiz_questions
+from quiz_store import PACKED_LAYOUT, migrate_quiz
+
+
+def is_complete(quiz, questions):
+    answered = sum(1 for q in questions if q.get('user_answer') is not None)
+    return answered >= int(quiz.get('max_score', len(questions)))
+
+
+def delete_question_rows(question_table, questions):
+    with question_table.batch_writer() as batch:
+        for q in questions:
+            batch.delete_item(Key={'quiz_id': q['quiz_id'], 'order': q['order']})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--username', help='only migrate this user')
+    parser.add_argument('--include-active', action='store_true', help='also migrate quizzes that are not finished')
+    parser.add_argument('--delete-question-rows', action='store_true', help='delete the old question rows after migrating')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be migrated')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb')
+    quiz_table = dynamodb.Table(os.environ.get('QUIZ_TABLE', 'quiz'))
+    question_table = dynamodb.Table(os.environ.get('QUESTION_TABLE', 'question'))
+
+    counts = {'migrated': 0, 'already_packed': 0, 'active': 0, 'no_questions': 0, 'conflict': 0}
+    for quiz in iter_quizzes(quiz_table, args.username and args.username.lower()):
+        if quiz.get('layout') == PACKED_LAYOUT:
+            counts['already_packed'] += 1
+            continue
+        questions = quiz_questions(question_table, quiz)
+        if not questions:
+            counts['no_questions'] += 1
+            continue
+        if not args.include_active and not is_complete(quiz, questions):
+            counts['active'] += 1
+            continue
+
+        print(f"{quiz['username']}/{quiz['id']}: {len(questions)} questions")
+        if args.dry_run:
+            counts['migrated'] += 1
+            continue
+        try:
+            migrate_quiz(quiz_table, quiz, questions)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            counts['conflict'] += 1
+            continue
+        counts['migrated'] += 1
+        if args.delete_question_rows:
+            delete_question_rows(question_table, questions)
+
+    print(', '.join(f"{name}: {count}" for name, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()